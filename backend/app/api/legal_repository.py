@@ -19,6 +19,7 @@ from app.models.legal_repository import (
     DocumentType, DocumentStatus, Jurisdiction, Language
 )
 from app.models.admin_user import AdminUser, ProfessionalUser, UserRole
+from app.core.response_cache import llm_response_cache
 
 logger = structlog.get_logger(__name__)
 router = APIRouter(prefix="/legal", tags=["legal-repository"])
@@ -200,6 +201,9 @@ async def validate_legal_document(
         db.add(validation_log)
         await db.commit()
 
+        # Respostas baseadas na versão anterior do documento deixam de valer
+        await llm_response_cache.invalidate_documents([document_id])
+
         return JSONResponse({
             "success": True,
             "message": f"Documento '{document.title}' validado com sucesso",
@@ -244,6 +248,9 @@ async def reject_legal_document(
         db.add(validation_log)
         await db.commit()
 
+        # Respostas sustentadas por este documento deixam de ser válidas
+        await llm_response_cache.invalidate_documents([document_id])
+
         return JSONResponse({
             "success": True,
             "message": "Documento rejeitado",
@@ -11,9 +11,11 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 
 from app.core.factory import LLMFactory
+from app.core.request_context import RequestLane, llm_request_context
 from app.schemas import GenerationParams
 import aiohttp
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,16 @@ class LLMTestResponse(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
+async def get_llm_factory():
+    """Dependency para obter factory LLM."""
+    session = aiohttp.ClientSession()
+    try:
+        factory = LLMFactory(session)
+        yield factory
+    finally:
+        await session.close()
+
+
 
 @router.get("/config", response_model=Dict[str, Any])
 async def get_llm_config(factory: LLMFactory = Depends(get_llm_factory)):
@@ -95,16 +107,6 @@ async def get_llm_config(factory: LLMFactory = Depends(get_llm_factory)):
 
 
 
-async def get_llm_factory():
-    """Dependency para obter factory LLM."""
-    session = aiohttp.ClientSession()
-    try:
-        factory = LLMFactory(session)
-        yield factory
-    finally:
-        await session.close()
-
-
 @router.post("/test", response_model=LLMTestResponse)
 async def test_llm(
     request: LLMTestRequest,
@@ -119,20 +121,20 @@ async def test_llm(
     
     Use 'default' ou 'auto' para usar o modelo principal automaticamente.
     """
-    import time
     start_time = time.time()
     
     try:
         # Criar instância do modelo
         llm = await factory.create_llm(request.model, request.params.dict() if request.params else None)
         
-        # Gerar resposta
-        response = await llm.generate(
-            prompt=request.prompt,
-            context=request.context,
-            system_prompt=request.system_prompt,
-            params=request.params
-        )
+        # Gerar resposta (testes administrativos seguem na faixa batch)
+        with llm_request_context(RequestLane.BATCH):
+            response = await llm.generate(
+                prompt=request.prompt,
+                context=request.context,
+                system_prompt=request.system_prompt,
+                params=request.params
+            )
         
         processing_time = time.time() - start_time
         
@@ -156,8 +158,6 @@ async def test_llm(
             model=request.model,
             provider="unknown",
             processing_time=processing_time,
-            error_message=str(e)
-        )
             error=str(e)
         )
 
@@ -245,10 +245,11 @@ async def quick_test(factory: LLMFactory = Depends(get_llm_factory)):
     for model_name in ["claude-3-5-sonnet-20241022", "gemini-1.5-pro-latest"]:
         try:
             llm = await factory.create_llm(model_name)
-            response = await llm.generate(
-                prompt=test_prompt,
-                system_prompt="Você é um assistente jurídico especializado."
-            )
+            with llm_request_context(RequestLane.BATCH):
+                response = await llm.generate(
+                    prompt=test_prompt,
+                    system_prompt="Você é um assistente jurídico especializado."
+                )
             await llm.close()
             
             results[model_name] = {
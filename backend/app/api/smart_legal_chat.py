@@ -1,23 +1,64 @@
 """
 API para chat inteligente com base no repositório jurídico.
 """
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncGenerator, Set
+from contextlib import aclosing
+import asyncio
+import json
+import time
+import aiohttp
 import structlog
 from datetime import datetime
 import uuid
 from pydantic import validator
 
-from app.database.connection import get_db_session
+from app.database.connection import db_manager, get_db_session
+from app.core.cancellation import (
+    CLIENT_CLOSED_REQUEST, ClientDisconnectedError, cancellation_metrics, run_until_disconnected
+)
+from app.core.config import settings
+from app.core.exceptions import LLMQuotaExceededError
 from app.core.legal_responder import response_generator
+from app.core.protocols import AbstractLLM
+from app.core.request_context import RequestLane, llm_request_context
 from app.models.legal_repository import LegalQuery
+from app.schemas import ContextType
 
 logger = structlog.get_logger(__name__)
 router = APIRouter(prefix="/chat", tags=["smart-legal-chat"])
 
+# Cliente LLM do chat legal (criado sob demanda) e a sessão HTTP que o serve
+_legal_llm: Optional[AbstractLLM] = None
+_legal_llm_session: Optional[aiohttp.ClientSession] = None
+_legal_llm_lock = asyncio.Lock()
+# Referências às tarefas de gravação em segundo plano
+_background_tasks: Set[asyncio.Task] = set()
+# Token opcional: perguntas anónimas continuam permitidas
+_bearer = HTTPBearer(auto_error=False)
+
+
+def chat_user_from_token(token: Optional[str]) -> Optional[str]:
+    """ID do utilizador de um token de acesso (None se ausente ou inválido)."""
+    if not token:
+        return None
+    from app.core.auth import auth_service
+
+    return auth_service.token_subject(token)
+
+
+async def get_chat_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)
+) -> Optional[str]:
+    """ID do utilizador autenticado, para a quota e o ledger de tokens (None se anónimo)."""
+    if credentials is None:
+        return None
+    return chat_user_from_token(credentials.credentials)
+
 
 class LegalChatRequest(BaseModel):
     """Request para chat legal."""
@@ -55,9 +96,16 @@ class LegalChatResponse(BaseModel):
 @router.post("/perguntar", response_model=Dict[str, Any])
 async def perguntar_legal(
     request: LegalChatRequest,
-    db: AsyncSession = Depends(get_db_session)
+    http_request: Request,
+    db: AsyncSession = Depends(get_db_session),
+    user_id: Optional[str] = Depends(get_chat_user_id)
 ):
-    """Endpoint principal para perguntas legais com IA."""
+    """
+    Endpoint principal para perguntas legais com IA.
+
+    Se o cliente se desconectar durante o processamento, a geração é
+    cancelada (incluindo a chamada ao LLM) e nada é registado.
+    """
     try:
         # Gerar ID da conversa se não fornecido
         conversation_id = request.conversa_id or str(uuid.uuid4())
@@ -71,11 +119,25 @@ async def perguntar_legal(
         # Processar pergunta com o gerador de respostas
         start_time = datetime.utcnow()
 
-        result = await response_generator.generate_response(
-            user_query=request.pergunta,
-            db=db,
-            context=request.contexto
-        )
+        # Mesmo caminho de geração (e LLM) que o SSE e o WebSocket
+        llm = await get_legal_llm()
+
+        # Chamadas LLM do chat seguem na faixa interativa (e na quota do utilizador)
+        with llm_request_context(
+            RequestLane.INTERACTIVE,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            context_type=ContextType.LEGAL
+        ):
+            result = await run_until_disconnected(
+                http_request,
+                response_generator.generate_response(
+                    user_query=request.pergunta,
+                    db=db,
+                    context=request.contexto,
+                    llm=llm
+                )
+            )
 
         processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
 
@@ -128,6 +190,16 @@ async def perguntar_legal(
 
         return JSONResponse(response_data)
 
+    except ClientDisconnectedError:
+        logger.info("Pergunta cancelada: cliente desconectado", conversation_id=conversation_id)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except LLMQuotaExceededError as e:
+        logger.info("Quota do utilizador excedida", user_id=user_id, conversation_id=conversation_id)
+        raise HTTPException(
+            status_code=429,
+            detail="Quota de utilização excedida",
+            headers={"Retry-After": str(int(e.retry_after or 0))}
+        )
     except Exception as e:
         logger.error("Erro ao processar pergunta legal", error=str(e))
         raise HTTPException(
@@ -136,6 +208,216 @@ async def perguntar_legal(
         )
 
 
+async def get_legal_llm() -> Optional[AbstractLLM]:
+    """
+    Obtém o cliente LLM do chat legal.
+
+    Com roteamento, o modelo é escolhido por requisição (com hedge no
+    segundo melhor); sem roteamento, Claude com hedge em Gemini. None se
+    ambos estiverem desativados ou nenhum provedor estiver configurado.
+    """
+    global _legal_llm, _legal_llm_session
+    if _legal_llm is None and (settings.llm.routing_enabled or settings.llm.hedging_enabled):
+        async with _legal_llm_lock:
+            if _legal_llm is None:
+                from app.core.factory import LLMFactory
+
+                if _legal_llm_session is None or _legal_llm_session.closed:
+                    _legal_llm_session = aiohttp.ClientSession()
+                try:
+                    factory = LLMFactory(_legal_llm_session)
+                    if settings.llm.routing_enabled:
+                        _legal_llm = factory.create_routed_llm(context_type=ContextType.LEGAL)
+                    else:
+                        _legal_llm = await factory.create_hedged_llm()
+                except Exception as e:
+                    logger.warning("LLM indisponível para o chat legal", error=str(e))
+    return _legal_llm
+
+
+async def close_legal_chat() -> None:
+    """
+    Liberta os recursos do chat legal no encerramento da aplicação.
+
+    Aguarda as gravações de registos pendentes e fecha o cliente LLM e
+    a sessão HTTP criada por get_legal_llm.
+    """
+    global _legal_llm, _legal_llm_session
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+    async with _legal_llm_lock:
+        if _legal_llm is not None:
+            try:
+                await _legal_llm.close()
+            except Exception as e:
+                logger.warning("Erro ao fechar LLM do chat legal", error=str(e))
+            _legal_llm = None
+        if _legal_llm_session is not None:
+            await _legal_llm_session.close()
+            _legal_llm_session = None
+
+
+async def _save_query_log(
+    conversation_id: str,
+    request: LegalChatRequest,
+    result: Dict[str, Any],
+    processing_time_ms: int
+) -> None:
+    """Grava o registo da pergunta numa sessão própria (fora do pedido)."""
+    try:
+        async with db_manager.get_session() as db:
+            db.add(LegalQuery(
+                conversation_id=conversation_id,
+                user_query=request.pergunta,
+                matched_documents=[],
+                matched_articles=[],
+                confidence_scores={},
+                ai_response=result.get("response", ""),
+                escalated_to_human=result.get("requires_human", False),
+                escalation_reason=result.get("escalation_reason"),
+                processing_time_ms=str(processing_time_ms),
+                search_method="semantic",
+                meta_data={
+                    "search_matches": result.get("search_matches", 0),
+                    "response_type": result.get("response_type", "unknown"),
+                    "jurisdiction": request.jurisdicao_preferida,
+                    "streamed": True
+                }
+            ))
+    except Exception as e:
+        logger.error("Erro ao gravar registo da pergunta", conversation_id=conversation_id, error=str(e))
+
+
+async def stream_legal_answer(
+    request: LegalChatRequest,
+    conversation_id: str,
+    user_id: Optional[str] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Responde a uma pergunta legal em eventos (status, token, final).
+
+    Usado pelo endpoint SSE e pelo canal WebSocket. O evento final traz
+    fontes, confiança e tempos; o registo LegalQuery é gravado em
+    segundo plano depois de o evento final ser emitido. As chamadas LLM
+    contam para a quota de `user_id` (se autenticado).
+    """
+    start_time = time.perf_counter()
+    first_token_ms: Optional[int] = None
+    llm = await get_legal_llm()
+
+    # Chamadas LLM do chat seguem na faixa interativa (e na quota do utilizador)
+    with llm_request_context(
+        RequestLane.INTERACTIVE,
+        user_id=user_id,
+        conversation_id=conversation_id,
+        context_type=ContextType.LEGAL
+    ):
+        async with db_manager.get_session() as db:
+            async for event in response_generator.stream_response(
+                user_query=request.pergunta,
+                db=db,
+                context=request.contexto,
+                llm=llm
+            ):
+                elapsed_ms = int((time.perf_counter() - start_time) * 1000)
+                if event["type"] == "token" and first_token_ms is None:
+                    first_token_ms = elapsed_ms
+                if event["type"] != "final":
+                    yield event
+                    continue
+
+                result = event["result"]
+                yield {
+                    "type": "final",
+                    "sucesso": result.get("success", True),
+                    "resposta": result.get("response", ""),
+                    "fontes": result.get("sources", []),
+                    "confianca": result.get("confidence", 0.0),
+                    "requer_humano": result.get("requires_human", False),
+                    "motivo_escalacao": result.get("escalation_reason"),
+                    "conversa_id": conversation_id,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "tempo_processamento_ms": elapsed_ms,
+                    "tempo_primeiro_token_ms": first_token_ms,
+                    "estatisticas": {
+                        "matches_encontrados": result.get("search_matches", 0),
+                        "tipo_resposta": result.get("response_type", "unknown")
+                    }
+                }
+
+                if result.get("requires_human"):
+                    logger.info(
+                        "Pergunta escalada para humano",
+                        conversation_id=conversation_id,
+                        reason=result.get("escalation_reason")
+                    )
+
+                task = asyncio.create_task(
+                    _save_query_log(conversation_id, request, result, elapsed_ms)
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+
+def _sse_event(event: Dict[str, Any]) -> str:
+    """Formata um evento no formato Server-Sent Events."""
+    payload = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/perguntar/stream")
+async def perguntar_legal_stream(
+    request: LegalChatRequest,
+    user_id: Optional[str] = Depends(get_chat_user_id)
+):
+    """
+    Variante em streaming (Server-Sent Events) de /perguntar.
+
+    Eventos: `status` (pesquisa/geração), `token` (texto à medida que é
+    gerado) e `final` (resposta completa com fontes e confiança).
+    """
+    conversation_id = request.conversa_id or str(uuid.uuid4())
+    logger.info(
+        "Nova pergunta recebida (stream)",
+        question=request.pergunta[:100],
+        conversation_id=conversation_id
+    )
+
+    async def event_source() -> AsyncGenerator[str, None]:
+        start = time.monotonic()
+        try:
+            # aclosing: ao desconectar, o gerador interno fecha já o stream do LLM
+            async with aclosing(stream_legal_answer(request, conversation_id, user_id)) as events:
+                async for event in events:
+                    yield _sse_event(event)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Starlette cancela a resposta quando o cliente se desconecta
+            cancellation_metrics.record("sse", time.monotonic() - start)
+            logger.info("Stream cancelado: cliente desconectado", conversation_id=conversation_id)
+            raise
+        except LLMQuotaExceededError as e:
+            logger.info("Quota do utilizador excedida", user_id=user_id, conversation_id=conversation_id)
+            yield _sse_event({
+                "type": "error",
+                "detail": "Quota de utilização excedida",
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            logger.error("Erro no streaming da pergunta legal", error=str(e))
+            yield _sse_event({"type": "error", "detail": "Erro interno ao processar pergunta"})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Evitar buffering em proxies nginx
+            "X-Conversation-Id": conversation_id
+        }
+    )
+
+
 @router.get("/conversa/{conversation_id}")
 async def get_conversation_history(
     conversation_id: str,
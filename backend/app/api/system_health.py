@@ -9,6 +9,19 @@ from pydantic import BaseModel
 from typing import Dict, Any
 import structlog
 
+from app.core.cache import get_function_cache_metrics
+from app.core.cache_tiered import tiered_cache
+from app.core.cancellation import cancellation_metrics
+from app.core.coalescing import request_coalescer
+from app.core.concurrency import concurrency_manager
+from app.core.hedging import hedging_manager
+from app.core.latency import latency_registry
+from app.core.prompt_cache import gemini_context_cache, prompt_cache_metrics
+from app.core.resilience import resilience_manager
+from app.core.response_cache import llm_response_cache
+from app.core.scheduler import llm_scheduler
+from app.core.tokens import token_estimator, token_ledger, token_quota
+
 logger = structlog.get_logger(__name__)
 
 router = APIRouter(prefix="/api/system", tags=["system"])
@@ -92,3 +105,35 @@ async def get_basic_metrics():
     except Exception as e:
         logger.error("Erro ao obter métricas básicas", error=str(e))
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/llm-metrics")
+async def get_llm_metrics():
+    """Retorna métricas da camada de chamadas LLM."""
+    try:
+        return {
+            "coalescing": request_coalescer.get_metrics(),
+            "response_cache": llm_response_cache.get_metrics(),
+            "tiered_cache": tiered_cache.get_metrics(),
+            "function_cache": get_function_cache_metrics(),
+            "latency": latency_registry.get_metrics(),
+            "hedging": hedging_manager.get_metrics(),
+            "concurrency": concurrency_manager.get_metrics(),
+            "scheduler": llm_scheduler.get_metrics(),
+            "prompt_cache": {
+                "usage": prompt_cache_metrics.get_metrics(),
+                "gemini_context_cache": gemini_context_cache.get_metrics(),
+            },
+            "retry_budgets": resilience_manager.get_retry_budget_metrics(),
+            "circuit_breakers": resilience_manager.get_circuit_breaker_metrics("llm:"),
+            "tokens": {
+                "ledger": token_ledger.get_metrics(),
+                "quotas": token_quota.get_metrics(),
+                "calibration": token_estimator.get_metrics(),
+            },
+            "cancellations": cancellation_metrics.get_metrics(),
+            "timestamp": time.time()
+        }
+    except Exception as e:
+        logger.error("Erro ao obter métricas LLM", error=str(e))
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
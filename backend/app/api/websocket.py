@@ -2,9 +2,11 @@
 """
 WebSocket Manager para comunicação em tempo real IA ↔ Técnico ↔ Usuario.
 """
+import asyncio
 import json
 import uuid
-from typing import Dict, List, Optional, Set
+from contextlib import aclosing
+from typing import Coroutine, Dict, List, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect, Depends
 from fastapi.routing import APIRouter
 from datetime import datetime
@@ -12,6 +14,8 @@ import structlog
 
 from app.models.human_handoff import HandoffManager, TechnicianStatus
 from app.database.connection import get_db_session
+from app.core.cancellation import cancellation_metrics
+from app.core.exceptions import LLMQuotaExceededError
 
 logger = structlog.get_logger(__name__)
 
@@ -38,6 +42,9 @@ class WebSocketManager:
         
         # Rooms para broadcasts específicos
         self.rooms: Dict[str, Set[WebSocket]] = {}
+        
+        # Tarefas longas por usuário (canceladas ao desconectar)
+        self.user_tasks: Dict[str, Set[asyncio.Task]] = {}
 
     async def connect_user(self, websocket: WebSocket, user_id: str):
         """Conecta usuário ao WebSocket."""
@@ -62,10 +69,29 @@ class WebSocketManager:
             )
 
     def disconnect_user(self, user_id: str):
-        """Desconecta usuário."""
+        """Desconecta usuário e cancela o trabalho ainda em curso."""
         if user_id in self.user_connections:
             del self.user_connections[user_id]
             logger.info("User disconnected", user_id=user_id)
+        
+        for task in self.user_tasks.pop(user_id, set()):
+            if not task.done():
+                task.cancel()
+                cancellation_metrics.record("websocket")
+                logger.info("Tarefa do usuário cancelada", user_id=user_id)
+
+    def spawn_user_task(self, user_id: str, coro: Coroutine) -> asyncio.Task:
+        """
+        Executa trabalho longo do usuário fora do loop de receção.
+        
+        Assim o endpoint continua a ler o socket e observa a desconexão
+        enquanto a resposta é gerada, cancelando a tarefa de imediato.
+        """
+        task = asyncio.create_task(coro)
+        tasks = self.user_tasks.setdefault(user_id, set())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
 
     async def disconnect_technician(self, technician_id: str):
         """Desconecta técnico."""
@@ -188,8 +214,17 @@ manager = WebSocketManager()
 
 
 @router.websocket("/ws/user/{user_id}")
-async def websocket_user_endpoint(websocket: WebSocket, user_id: str):
-    """Endpoint WebSocket para usuários."""
+async def websocket_user_endpoint(websocket: WebSocket, user_id: str, token: Optional[str] = None):
+    """
+    Endpoint WebSocket para usuários.
+
+    O user_id do caminho só identifica a conexão; a quota e o ledger de
+    tokens usam o utilizador do token de acesso (?token=...), ou nenhum
+    se a conexão for anónima.
+    """
+    from app.api.smart_legal_chat import chat_user_from_token
+
+    auth_user_id = chat_user_from_token(token)
     await manager.connect_user(websocket, user_id)
     
     try:
@@ -198,7 +233,7 @@ async def websocket_user_endpoint(websocket: WebSocket, user_id: str):
             message = json.loads(data)
             
             # Processar mensagem do usuário
-            await handle_user_message(user_id, message)
+            await handle_user_message(user_id, message, auth_user_id)
             
     except WebSocketDisconnect:
         manager.disconnect_user(user_id)
@@ -228,7 +263,7 @@ async def websocket_technician_endpoint(websocket: WebSocket, technician_id: str
         await manager.disconnect_technician(technician_id)
 
 
-async def handle_user_message(user_id: str, message: dict):
+async def handle_user_message(user_id: str, message: dict, auth_user_id: Optional[str] = None):
     """Processa mensagens recebidas do usuário."""
     message_type = message.get("type")
     
@@ -250,6 +285,9 @@ async def handle_user_message(user_id: str, message: dict):
         conversation_id = message.get("conversation_id")
         await manager.join_conversation(conversation_id, user_id)
     
+    elif message_type == "legal_question":
+        manager.spawn_user_task(user_id, handle_legal_question(user_id, message, auth_user_id))
+    
     elif message_type == "typing":
         conversation_id = message.get("conversation_id")
         await manager.broadcast_to_conversation(conversation_id, {
@@ -261,6 +299,59 @@ async def handle_user_message(user_id: str, message: dict):
         })
 
 
+async def handle_legal_question(user_id: str, message: dict, auth_user_id: Optional[str] = None):
+    """
+    Responde a uma pergunta legal em streaming (legal_status, legal_token, legal_final).
+
+    Args:
+        user_id: Conexão para onde os eventos são enviados
+        message: Mensagem legal_question
+        auth_user_id: Utilizador autenticado (quota e ledger); None se anónimo
+    """
+    from app.api.smart_legal_chat import LegalChatRequest, stream_legal_answer
+
+    try:
+        request = LegalChatRequest(
+            pergunta=message.get("content", ""),
+            conversa_id=message.get("conversation_id"),
+            contexto=message.get("context")
+        )
+    except ValueError as e:
+        await manager.send_to_user(user_id, {
+            "type": "legal_error",
+            "conversation_id": message.get("conversation_id"),
+            "detail": str(e)
+        })
+        return
+
+    conversation_id = request.conversa_id or str(uuid.uuid4())
+    try:
+        async with aclosing(stream_legal_answer(request, conversation_id, auth_user_id)) as events:
+            async for event in events:
+                await manager.send_to_user(user_id, {
+                    **event,
+                    "type": f"legal_{event['type']}",
+                    "conversation_id": conversation_id
+                })
+                if user_id not in manager.user_connections:
+                    # Utilizador desconectou-se: parar de gerar
+                    break
+    except LLMQuotaExceededError as e:
+        await manager.send_to_user(user_id, {
+            "type": "legal_error",
+            "conversation_id": conversation_id,
+            "detail": "Quota de utilização excedida",
+            "retry_after": e.retry_after
+        })
+    except Exception as e:
+        logger.error("Erro na pergunta legal via WebSocket", user_id=user_id, error=str(e))
+        await manager.send_to_user(user_id, {
+            "type": "legal_error",
+            "conversation_id": conversation_id,
+            "detail": "Erro interno ao processar pergunta"
+        })
+
+
 async def handle_technician_message(technician_id: str, message: dict):
     """Processa mensagens recebidas do técnico."""
     message_type = message.get("type")
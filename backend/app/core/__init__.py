@@ -10,6 +10,13 @@ Contém os componentes principais do sistema:
 - Protocolos e interfaces
 - Resiliência e recuperação
 - Cache assíncrono em memória
+- Cache em dois níveis (L1 local + L2 Redis)
+- Coalescência de requisições LLM
+- Cache de respostas LLM
+- Latência observada e hedging entre provedores
+- Limite adaptativo de concorrência (AIMD)
+- Escalonamento por faixas de prioridade
+- Contabilização de tokens e quotas por utilizador
 """
 
 # Configurações
@@ -27,8 +34,120 @@ from .cache import (
     AsyncInMemoryCache,
     EvictionPolicy,
     CacheStats,
+    BatchGetResult,
+    NamespaceQuota,
+    NamespaceStats,
     global_cache,
     cache_result,
+    CachedResult,
+    build_call_key,
+    get_function_cache_metrics,
+)
+from .cache_codecs import CodecConfig, CodecPipeline
+from .cache_tiered import (
+    InMemoryRedis,
+    TieredCache,
+    TieredCacheConfig,
+    tiered_cache,
+)
+
+# Coalescência
+from .coalescing import (
+    RequestCoalescer,
+    build_request_key,
+    request_coalescer,
+)
+
+# Cache de respostas LLM
+from .response_cache import (
+    LLMResponseCache,
+    build_scope_key,
+    cache_document_scope,
+    llm_response_cache,
+)
+
+# Latência e hedging
+from .latency import (
+    LatencyRegistry,
+    LatencyWindow,
+    latency_registry,
+)
+from .hedging import (
+    HedgedLLM,
+    HedgingManager,
+    HedgingPolicy,
+    hedging_manager,
+)
+
+# Concorrência adaptativa
+from .concurrency import (
+    AdaptiveConcurrencyLimiter,
+    AdaptiveLimitConfig,
+    ConcurrencyManager,
+    concurrency_manager,
+)
+
+# Escalonamento por prioridade
+from .request_context import (
+    LLMRequestContext,
+    RequestLane,
+    get_request_context,
+    llm_request_context,
+)
+from .scheduler import (
+    LaneConfig,
+    LLMScheduler,
+    SchedulerConfig,
+    llm_scheduler,
+)
+
+# Cache de prefixos de prompt nos provedores
+from .prompt_cache import (
+    ContextCacheRegistry,
+    PromptCacheMetrics,
+    build_prefix_key,
+    gemini_context_cache,
+    prompt_cache_metrics,
+)
+
+# Geração em lote (offline)
+from .batch import (
+    BatchCheckpoint,
+    BatchConfig,
+    BatchGenerator,
+    BatchItem,
+    BatchReport,
+    BatchResult,
+)
+
+# Roteamento de modelos
+from .pricing import MODEL_PRICING, ModelPricing, get_model_pricing
+from .routing import (
+    ModelRouter,
+    RouteCandidate,
+    RoutedLLM,
+    RoutingPolicy,
+)
+
+# Contabilização de tokens e quotas
+from .tokens import (
+    TokenEstimator,
+    TokenLedger,
+    TokenQuotaConfig,
+    TokenQuotaManager,
+    TokenUsage,
+    token_estimator,
+    token_ledger,
+    token_quota,
+)
+
+# Cancelamento por desconexão do cliente
+from .cancellation import (
+    CLIENT_CLOSED_REQUEST,
+    CancellationMetrics,
+    ClientDisconnectedError,
+    cancellation_metrics,
+    run_until_disconnected,
 )
 
 # Resiliência
@@ -37,8 +156,12 @@ from .resilience import (
     CircuitBreakerConfig,
     RateLimiter,
     RateLimiterConfig,
+    RetryBudget,
+    RetryBudgetConfig,
     RetryConfig,
     ResilienceManager,
+    parse_duration,
+    parse_retry_after,
     resilience_manager,
     retry_with_backoff,
 )
@@ -58,6 +181,7 @@ from .exceptions import (
     LLMError,
     LLMConnectionError,
     LLMTimeoutError,
+    LLMRequestError,
     LLMRateLimitError,
     LLMInvalidResponseError,
 
@@ -95,16 +219,109 @@ __all__ = [
     "AsyncInMemoryCache",
     "EvictionPolicy", 
     "CacheStats",
+    "BatchGetResult",
+    "NamespaceQuota",
+    "NamespaceStats",
     "global_cache",
     "cache_result",
+    "CachedResult",
+    "build_call_key",
+    "get_function_cache_metrics",
+    "CodecConfig",
+    "CodecPipeline",
+    "InMemoryRedis",
+    "TieredCache",
+    "TieredCacheConfig",
+    "tiered_cache",
+
+    # Coalescência
+    "RequestCoalescer",
+    "build_request_key",
+    "request_coalescer",
+
+    # Cache de respostas LLM
+    "LLMResponseCache",
+    "build_scope_key",
+    "cache_document_scope",
+    "llm_response_cache",
+
+    # Latência e hedging
+    "LatencyRegistry",
+    "LatencyWindow",
+    "latency_registry",
+    "HedgedLLM",
+    "HedgingManager",
+    "HedgingPolicy",
+    "hedging_manager",
+
+    # Concorrência adaptativa
+    "AdaptiveConcurrencyLimiter",
+    "AdaptiveLimitConfig",
+    "ConcurrencyManager",
+    "concurrency_manager",
+
+    # Escalonamento por prioridade
+    "LLMRequestContext",
+    "RequestLane",
+    "get_request_context",
+    "llm_request_context",
+    "LaneConfig",
+    "LLMScheduler",
+    "SchedulerConfig",
+    "llm_scheduler",
+
+    # Cache de prefixos de prompt nos provedores
+    "ContextCacheRegistry",
+    "PromptCacheMetrics",
+    "build_prefix_key",
+    "gemini_context_cache",
+    "prompt_cache_metrics",
+
+    # Geração em lote (offline)
+    "BatchCheckpoint",
+    "BatchConfig",
+    "BatchGenerator",
+    "BatchItem",
+    "BatchReport",
+    "BatchResult",
+
+    # Roteamento de modelos
+    "MODEL_PRICING",
+    "ModelPricing",
+    "get_model_pricing",
+    "ModelRouter",
+    "RouteCandidate",
+    "RoutedLLM",
+    "RoutingPolicy",
+
+    # Tokens e quotas
+    "TokenEstimator",
+    "TokenLedger",
+    "TokenQuotaConfig",
+    "TokenQuotaManager",
+    "TokenUsage",
+    "token_estimator",
+    "token_ledger",
+    "token_quota",
+
+    # Cancelamento
+    "CLIENT_CLOSED_REQUEST",
+    "CancellationMetrics",
+    "ClientDisconnectedError",
+    "cancellation_metrics",
+    "run_until_disconnected",
 
     # Resiliência
     "CircuitBreaker",
     "CircuitBreakerConfig",
     "RateLimiter",
     "RateLimiterConfig",
+    "RetryBudget",
+    "RetryBudgetConfig",
     "RetryConfig",
     "ResilienceManager",
+    "parse_duration",
+    "parse_retry_after",
     "resilience_manager",
     "retry_with_backoff",
 
@@ -119,6 +336,7 @@ __all__ = [
     "LLMError",
     "LLMConnectionError",
     "LLMTimeoutError",
+    "LLMRequestError",
     "LLMRateLimitError",
     "LLMInvalidResponseError",
 
@@ -321,19 +321,25 @@ class AuthenticationService:
             db.add(session)
             await db.commit()
     
-    async def verify_token(self, token: str) -> Optional[User]:
-        """Verifica token JWT e retorna utilizador."""
+    def token_subject(self, token: str) -> Optional[str]:
+        """ID do utilizador de um token de acesso válido (sem consultar a base de dados)."""
         try:
             payload = jwt.decode(
                 token,
                 settings.JWT_SECRET_KEY,
                 algorithms=[settings.JWT_ALGORITHM]
             )
-            
-            if payload.get("type") != "access":
-                return None
-            
-            user_id = payload.get("sub")
+        except Exception:
+            return None
+
+        if payload.get("type") != "access":
+            return None
+        return payload.get("sub") or None
+
+    async def verify_token(self, token: str) -> Optional[User]:
+        """Verifica token JWT e retorna utilizador."""
+        try:
+            user_id = self.token_subject(token)
             if not user_id:
                 return None
             
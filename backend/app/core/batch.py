@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Geração em Lote (Offline) com LLMs.
+
+Processa grandes volumes de prompts (resumos de artigos, exemplos do
+glossário, reprocessamento de consultas) sem competir com o chat:
+- Endpoints batch dos provedores quando existem (Message Batches da Anthropic)
+- Pool de workers limitado na faixa BATCH do escalonador como alternativa
+- Checkpoint em JSONL para retomar jobs interrompidos
+- Relatório de throughput, tokens e custo
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Union
+)
+
+from app.core.config import settings
+from app.core.protocols import AbstractLLM
+from app.core.request_context import RequestLane, llm_request_context
+from app.schemas import GenerationParams
+
+logger = logging.getLogger(__name__)
+
+# Formato aceite pelos endpoints batch dos provedores
+_CUSTOM_ID_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+@dataclass
+class BatchItem:
+    """
+    Item de um job em lote.
+
+    O custom_id identifica o item no checkpoint e nos resultados do
+    provedor (1-64 caracteres: letras, dígitos, '_' e '-').
+    """
+    custom_id: str
+    prompt: str
+    context: str = ""
+    system_prompt: Optional[str] = None
+    params: Optional[GenerationParams] = None
+
+
+@dataclass
+class BatchResult:
+    """Resultado de um item do lote."""
+    custom_id: str
+    success: bool
+    content: str = ""
+    tokens_used: int = 0
+    cost: float = 0.0
+    error: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BatchResult":
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+
+@dataclass
+class BatchConfig:
+    """Configuração de um job em lote."""
+    checkpoint_dir: str = "data/batch"
+    max_concurrency: int = 4
+    use_provider_batch: bool = True
+    provider_batch_size: int = 10000
+    poll_interval_sec: float = 30.0
+    max_wait_sec: float = 86400.0  # Janela de processamento da Anthropic
+    retry_failed: bool = True
+    progress_every: int = 100
+
+    @classmethod
+    def from_settings(cls) -> "BatchConfig":
+        """Cria configuração a partir das settings."""
+        return cls(
+            checkpoint_dir=settings.llm.batch_checkpoint_dir,
+            max_concurrency=settings.llm.batch_max_concurrency,
+            use_provider_batch=settings.llm.batch_use_provider_api,
+            provider_batch_size=settings.llm.batch_provider_chunk_size,
+            poll_interval_sec=settings.llm.batch_poll_interval_sec,
+        )
+
+
+@dataclass
+class BatchReport:
+    """Relatório de execução de um job em lote."""
+    job_id: str
+    mode: str
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    tokens_used: int = 0
+    cost: float = 0.0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    pending_batches: List[str] = field(default_factory=list)
+
+    @property
+    def elapsed_sec(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def items_per_sec(self) -> float:
+        elapsed = self.elapsed_sec
+        return (self.completed + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        elapsed = self.elapsed_sec
+        return self.tokens_used / elapsed if elapsed > 0 else 0.0
+
+    def record(self, result: BatchResult) -> None:
+        """Contabiliza um resultado."""
+        if result.success:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.tokens_used += result.tokens_used or 0
+        self.cost += result.cost or 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "mode": self.mode,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "tokens_used": self.tokens_used,
+            "cost": self.cost,
+            "elapsed_sec": self.elapsed_sec,
+            "items_per_sec": self.items_per_sec,
+            "tokens_per_sec": self.tokens_per_sec,
+            "pending_batches": list(self.pending_batches),
+        }
+
+
+class BatchCheckpoint:
+    """
+    Checkpoint de um job em JSONL (append-only).
+
+    Registos:
+    - {"type": "result", ...}: resultado de um item
+    - {"type": "submitted", "batch_id", "custom_ids"}: lote enviado ao provedor
+    - {"type": "collected", "batch_id"}: resultados do lote já recolhidos
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.results: Dict[str, BatchResult] = {}
+        self.submitted: Dict[str, List[str]] = {}
+        self.collected: Set[str] = set()
+        self._file = None
+
+    def load(self) -> "BatchCheckpoint":
+        """Lê o checkpoint existente (linhas corrompidas são ignoradas)."""
+        if not self.path.exists():
+            return self
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Última linha cortada por interrupção
+                record_type = record.pop("type", None)
+                if record_type == "result":
+                    result = BatchResult.from_dict(record)
+                    self.results[result.custom_id] = result
+                elif record_type == "submitted":
+                    self.submitted[record["batch_id"]] = record.get("custom_ids", [])
+                elif record_type == "collected":
+                    self.collected.add(record["batch_id"])
+        return self
+
+    def done_ids(self, include_failed: bool = False) -> Set[str]:
+        """Itens que não precisam de ser reprocessados."""
+        return {
+            custom_id for custom_id, result in self.results.items()
+            if result.success or include_failed
+        }
+
+    @property
+    def pending_batches(self) -> Dict[str, List[str]]:
+        """Lotes enviados ao provedor cujos resultados não foram recolhidos."""
+        return {
+            batch_id: custom_ids for batch_id, custom_ids in self.submitted.items()
+            if batch_id not in self.collected
+        }
+
+    def append_result(self, result: BatchResult) -> None:
+        self.results[result.custom_id] = result
+        self._write({"type": "result", **result.to_dict()})
+
+    def mark_submitted(self, batch_id: str, custom_ids: List[str]) -> None:
+        self.submitted[batch_id] = custom_ids
+        self._write({"type": "submitted", "batch_id": batch_id, "custom_ids": custom_ids})
+
+    def mark_collected(self, batch_id: str) -> None:
+        self.collected.add(batch_id)
+        self._write({"type": "collected", "batch_id": batch_id})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BatchGenerator:
+    """
+    Executor de jobs de geração em lote.
+
+    Usa o endpoint batch do provedor quando o cliente o suporta
+    (atributo `supports_batch_api` e métodos `submit_batch`,
+    `get_batch_status` e `iter_batch_results`); caso contrário processa
+    os itens num pool de workers na faixa BATCH do escalonador, que só
+    usa a capacidade deixada livre pelo tráfego interativo.
+    """
+
+    def __init__(self, llm: AbstractLLM, config: Optional[BatchConfig] = None):
+        """
+        Inicializa o executor.
+
+        Args:
+            llm: Cliente LLM usado no job
+            config: Configuração (usa settings se None)
+        """
+        self.llm = llm
+        self.config = config or BatchConfig.from_settings()
+
+    @property
+    def uses_provider_batch(self) -> bool:
+        return self.config.use_provider_batch and getattr(self.llm, "supports_batch_api", False)
+
+    def checkpoint_path(self, job_id: str) -> Path:
+        """Caminho do checkpoint de um job."""
+        safe_id = re.sub(r"[^a-zA-Z0-9_.-]", "_", job_id)
+        return Path(self.config.checkpoint_dir) / f"{safe_id}.jsonl"
+
+    async def run(
+        self,
+        job_id: str,
+        items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]],
+        on_result: Optional[Callable[[BatchResult], Any]] = None
+    ) -> BatchReport:
+        """
+        Executa (ou retoma) um job.
+
+        Args:
+            job_id: Identificador estável do job (nome do checkpoint)
+            items: Itens a processar; podem ser produzidos de forma preguiçosa
+            on_result: Callback chamado com cada resultado novo
+
+        Returns:
+            Relatório de execução
+        """
+        mode = "provider_batch" if self.uses_provider_batch else "worker_pool"
+        report = BatchReport(job_id=job_id, mode=mode)
+        checkpoint = BatchCheckpoint(self.checkpoint_path(job_id)).load()
+
+        logger.info(
+            f"Job em lote '{job_id}' iniciado ({mode}, "
+            f"{len(checkpoint.done_ids())} itens já concluídos no checkpoint)"
+        )
+
+        try:
+            if mode == "provider_batch":
+                await self._run_provider_batches(items, checkpoint, report, on_result)
+            else:
+                await self._run_worker_pool(items, checkpoint, report, on_result)
+        finally:
+            checkpoint.close()
+            report.finished_at = time.time()
+
+        logger.info(
+            f"Job em lote '{job_id}' terminado: {report.completed} concluídos, "
+            f"{report.failed} falhados, {report.skipped} retomados, "
+            f"{report.items_per_sec:.2f} itens/s, custo ${report.cost:.4f}"
+        )
+        return report
+
+    async def _pending_items(
+        self,
+        items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]],
+        skip_ids: Set[str],
+        report: BatchReport
+    ) -> AsyncIterator[BatchItem]:
+        """Itera os itens que ainda precisam de ser processados."""
+        seen: Set[str] = set()
+
+        async def iterate() -> AsyncIterator[BatchItem]:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    yield item
+            else:
+                for item in items:
+                    yield item
+
+        async for item in iterate():
+            if not _CUSTOM_ID_PATTERN.match(item.custom_id):
+                raise ValueError(f"custom_id inválido no lote: {item.custom_id!r}")
+            if item.custom_id in seen:
+                continue
+            seen.add(item.custom_id)
+            report.total += 1
+            if item.custom_id in skip_ids:
+                report.skipped += 1
+                continue
+            yield item
+
+    def _record(
+        self,
+        result: BatchResult,
+        checkpoint: BatchCheckpoint,
+        report: BatchReport,
+        on_result: Optional[Callable[[BatchResult], Any]]
+    ) -> None:
+        """Persiste e contabiliza um resultado."""
+        checkpoint.append_result(result)
+        report.record(result)
+        if on_result is not None:
+            on_result(result)
+
+        processed = report.completed + report.failed
+        if processed % self.config.progress_every == 0:
+            logger.info(
+                f"Job em lote '{report.job_id}': {processed} processados, "
+                f"{report.items_per_sec:.2f} itens/s, {report.tokens_per_sec:.0f} tokens/s, "
+                f"custo ${report.cost:.4f}"
+            )
+
+    # Pool de workers (faixa BATCH)
+    async def _run_worker_pool(
+        self,
+        items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]],
+        checkpoint: BatchCheckpoint,
+        report: BatchReport,
+        on_result: Optional[Callable[[BatchResult], Any]]
+    ) -> None:
+        """Processa os itens com concorrência limitada na faixa BATCH."""
+        skip_ids = checkpoint.done_ids(include_failed=not self.config.retry_failed)
+        workers_count = max(1, self.config.max_concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers_count * 2)
+
+        async def producer() -> None:
+            try:
+                async for item in self._pending_items(items, skip_ids, report):
+                    await queue.put(item)
+            finally:
+                for _ in range(workers_count):
+                    await queue.put(None)
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                result = await self._generate_item(item)
+                self._record(result, checkpoint, report, on_result)
+
+        # As tarefas herdam o contexto: todas as chamadas vão para a faixa BATCH
+        with llm_request_context(lane=RequestLane.BATCH):
+            tasks = [asyncio.create_task(producer())]
+            tasks.extend(asyncio.create_task(worker()) for _ in range(workers_count))
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _generate_item(self, item: BatchItem) -> BatchResult:
+        """Gera a resposta de um item, convertendo erros em resultado falhado."""
+        try:
+            response = await self.llm.generate(
+                item.prompt, item.context, item.system_prompt, item.params
+            )
+        except Exception as e:
+            return BatchResult(custom_id=item.custom_id, success=False, error=str(e))
+
+        if not response.success:
+            return BatchResult(
+                custom_id=item.custom_id, success=False, error=response.error or "Falha na geração"
+            )
+        return BatchResult(
+            custom_id=item.custom_id,
+            success=True,
+            content=response.content,
+            tokens_used=response.tokens_used or 0,
+            cost=response.cost or 0.0,
+            metadata={"model": response.model, "provider": response.provider},
+        )
+
+    # Endpoint batch do provedor
+    async def _run_provider_batches(
+        self,
+        items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]],
+        checkpoint: BatchCheckpoint,
+        report: BatchReport,
+        on_result: Optional[Callable[[BatchResult], Any]]
+    ) -> None:
+        """Envia os itens em lotes ao provedor e recolhe os resultados."""
+        pending = checkpoint.pending_batches
+        batch_ids = list(pending)
+        if batch_ids:
+            logger.info(f"Job em lote '{report.job_id}': a retomar {len(batch_ids)} lotes pendentes")
+
+        # Itens de lotes ainda pendentes não são reenviados
+        skip_ids = checkpoint.done_ids(include_failed=not self.config.retry_failed)
+        for custom_ids in pending.values():
+            skip_ids.update(custom_ids)
+
+        chunk: List[BatchItem] = []
+        async for item in self._pending_items(items, skip_ids, report):
+            chunk.append(item)
+            if len(chunk) >= self.config.provider_batch_size:
+                batch_ids.append(await self._submit_chunk(chunk, checkpoint))
+                chunk = []
+        if chunk:
+            batch_ids.append(await self._submit_chunk(chunk, checkpoint))
+
+        await asyncio.gather(*(
+            self._collect_batch(batch_id, checkpoint, report, on_result)
+            for batch_id in batch_ids
+        ))
+
+    async def _submit_chunk(self, chunk: List[BatchItem], checkpoint: BatchCheckpoint) -> str:
+        """Envia um lote ao provedor e regista-o no checkpoint."""
+        batch_id = await self.llm.submit_batch(chunk)
+        checkpoint.mark_submitted(batch_id, [item.custom_id for item in chunk])
+        logger.info(f"Lote {batch_id} enviado ao provedor ({len(chunk)} itens)")
+        return batch_id
+
+    async def _collect_batch(
+        self,
+        batch_id: str,
+        checkpoint: BatchCheckpoint,
+        report: BatchReport,
+        on_result: Optional[Callable[[BatchResult], Any]]
+    ) -> None:
+        """Aguarda o fim de um lote e recolhe os resultados."""
+        deadline = time.monotonic() + self.config.max_wait_sec
+        while True:
+            status = await self.llm.get_batch_status(batch_id)
+            if status.get("ended"):
+                break
+            if time.monotonic() >= deadline:
+                logger.warning(f"Lote {batch_id} ainda em processamento; fica pendente no checkpoint")
+                report.pending_batches.append(batch_id)
+                return
+            await asyncio.sleep(self.config.poll_interval_sec)
+
+        async for result in self.llm.iter_batch_results(batch_id):
+            self._record(result, checkpoint, report, on_result)
+        checkpoint.mark_collected(batch_id)
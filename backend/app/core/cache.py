@@ -4,22 +4,41 @@ Módulo de Cache Assíncrono em Memória Avançado.
 
 Fornece uma implementação enterprise de cache segura para ambientes concorrentes,
 com TTL (Time-To-Live), limite de tamanho, múltiplas políticas de eviction,
-compressão opcional e métricas detalhadas.
+compressão opcional e métricas detalhadas. O conteúdo pode ser guardado
+em snapshots locais e restaurado no arranque seguinte (warm restart).
 """
 import asyncio
+import dataclasses
+import datetime
+import decimal
+import functools
+import inspect
+import math
+import random
 import time
 import logging
-import pickle
-import gzip
 import hashlib
-from typing import Dict, Any, Optional, List, Union, Callable
+import heapq
+import itertools
+import os
+import pickle
+import struct
+import sys
+import uuid
+from pathlib import PurePath
+from typing import TYPE_CHECKING, Dict, Any, Awaitable, Iterable, Mapping, Optional, List, Union, Callable, Tuple
 from dataclasses import dataclass, field
-from collections import deque, OrderedDict
+from collections import OrderedDict
 from enum import Enum
 import json
 
+from app.core.cache_codecs import COMPRESSORS, CodecConfig, CodecPipeline, EncodedValue
+from app.core.coalescing import RequestCoalescer
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from app.core.cache_tiered import TieredCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,9 +47,11 @@ class EvictionPolicy(Enum):
     FIFO = "fifo"  # First In, First Out
     LRU = "lru"    # Least Recently Used
     LFU = "lfu"    # Least Frequently Used
+    TINY_LFU = "tinylfu"  # LRU com admissão por frequência (count-min sketch)
+    GDS = "gds"    # GreedyDual-Size-Frequency (considera o tamanho em bytes)
 
 
-@dataclass
+@dataclass(slots=True)
 class CacheEntry:
     """Estrutura de dados para uma entrada no cache."""
     value: Any
@@ -40,6 +61,25 @@ class CacheEntry:
     access_count: int = 0
     size_bytes: int = 0
     compressed: bool = False
+    namespace: Optional[str] = None
+    codec: str = "pickle"  # Ver app.core.cache_codecs
+    buffers: Optional[List[bytes]] = None  # Buffers pickle fora de banda
+    memory_bytes: int = 0  # Estimativa de memória ocupada (valor + chave + estruturas)
+
+
+# Custo por entrada além do valor e da chave, medido com tracemalloc
+# (CPython 3.11+): o próprio CacheEntry e os seus timestamps, o slot no
+# dict de entradas, o item no heap de expiração e o cabeçalho do payload.
+# Somam-se os nós do tracker de eviction e do índice de namespace.
+ENTRY_OVERHEAD_BYTES = 340
+NAMESPACE_OVERHEAD_BYTES = 90
+POLICY_OVERHEAD_BYTES = {
+    EvictionPolicy.FIFO: 0,
+    EvictionPolicy.LRU: 85,
+    EvictionPolicy.TINY_LFU: 85,
+    EvictionPolicy.LFU: 120,
+    EvictionPolicy.GDS: 220,
+}
 
 
 @dataclass
@@ -51,8 +91,11 @@ class CacheStats:
     deletes: int = 0
     evictions: int = 0
     expired_removals: int = 0
+    admission_rejections: int = 0
+    oversize_rejections: int = 0
     current_size: int = 0
     total_size_bytes: int = 0
+    memory_bytes: int = 0
     avg_access_time: float = 0.0
     
     @property
@@ -70,18 +113,778 @@ class CacheStats:
         return (compressed_entries / max(self.sets, 1)) * 100
 
 
+@dataclass
+class NamespaceStats:
+    """Estatísticas de um namespace."""
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    deletes: int = 0
+    evictions: int = 0  # Inclui evictions por quota do namespace
+    quota_evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    def merge(self, other: "NamespaceStats") -> None:
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total * 100) if total > 0 else 0.0,
+            "sets": self.sets,
+            "deletes": self.deletes,
+            "evictions": self.evictions,
+            "quota_evictions": self.quota_evictions,
+            "entries": self.entries,
+            "size_bytes": self.size_bytes,
+        }
+
+
+@dataclass
+class NamespaceQuota:
+    """Limites de um namespace (None = sem limite)."""
+    max_entries: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+
+@dataclass
+class BatchGetResult:
+    """Resultado de uma leitura em lote: valores encontrados e chaves em falta."""
+    hits: Dict[str, Any] = field(default_factory=dict)
+    misses: List[str] = field(default_factory=list)
+
+
+class _FrequencyNode:
+    """Nó da lista de frequências do LFU (chaves com a mesma contagem)."""
+    __slots__ = ("freq", "keys", "prev", "next")
+
+    def __init__(self, freq: int):
+        self.freq = freq
+        self.keys: OrderedDict = OrderedDict()  # Ordem de chegada: desempate LRU
+        self.prev: Optional["_FrequencyNode"] = None
+        self.next: Optional["_FrequencyNode"] = None
+
+
+class _LFUTracker:
+    """
+    LFU em O(1) com listas de frequência duplamente ligadas.
+
+    Os nós de frequência ficam em ordem crescente; cada nó guarda as
+    chaves com essa contagem. Acesso, inserção, remoção e escolha da
+    vítima (primeira chave do primeiro nó) são O(1). Com `decay_interval`
+    as contagens são divididas por 2 a cada N acessos (custo amortizado
+    O(1)), para que chaves antigas não fiquem presas para sempre.
+    """
+
+    def __init__(self, decay_interval: int = 0):
+        self._head = _FrequencyNode(0)  # Sentinela
+        self._nodes: Dict[str, _FrequencyNode] = {}
+        self._decay_interval = decay_interval
+        self._accesses = 0
+        self.decays = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _insert_after(self, node: _FrequencyNode, freq: int) -> _FrequencyNode:
+        new = _FrequencyNode(freq)
+        new.prev = node
+        new.next = node.next
+        if node.next is not None:
+            node.next.prev = new
+        node.next = new
+        return new
+
+    def _unlink_if_empty(self, node: _FrequencyNode) -> None:
+        if node.keys or node is self._head:
+            return
+        node.prev.next = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+
+    def add(self, key: str) -> None:
+        """Regista uma nova chave com frequência 1."""
+        first = self._head.next
+        if first is None or first.freq != 1:
+            first = self._insert_after(self._head, 1)
+        first.keys[key] = None
+        self._nodes[key] = first
+
+    def touch(self, key: str) -> None:
+        """Incrementa a frequência de uma chave."""
+        node = self._nodes.get(key)
+        if node is None:
+            return
+        target = node.next
+        if target is None or target.freq != node.freq + 1:
+            target = self._insert_after(node, node.freq + 1)
+        del node.keys[key]
+        target.keys[key] = None
+        self._nodes[key] = target
+        self._unlink_if_empty(node)
+
+        self._accesses += 1
+        if self._decay_interval and self._accesses >= self._decay_interval:
+            self._decay()
+
+    def remove(self, key: str) -> None:
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            del node.keys[key]
+            self._unlink_if_empty(node)
+
+    def victim(self) -> Optional[str]:
+        """Chave menos frequente (a mais antiga entre as empatadas)."""
+        first = self._head.next
+        return next(iter(first.keys)) if first is not None else None
+
+    def frequency(self, key: str) -> int:
+        node = self._nodes.get(key)
+        return node.freq if node is not None else 0
+
+    def ordered(self) -> List[str]:
+        """Chaves pela ordem de eviction (a próxima vítima primeiro)."""
+        keys: List[str] = []
+        node = self._head.next
+        while node is not None:
+            keys.extend(node.keys)
+            node = node.next
+        return keys
+
+    def restore(self, key: str, freq: int) -> None:
+        """Recoloca uma chave com a frequência dada, como a mais antiga do seu nível."""
+        self.remove(key)
+        freq = max(1, freq)
+        node = self._head
+        while node.next is not None and node.next.freq <= freq:
+            node = node.next
+        if node.freq != freq:
+            node = self._insert_after(node, freq)
+        node.keys[key] = None
+        node.keys.move_to_end(key, last=False)
+        self._nodes[key] = node
+
+    def clear(self) -> None:
+        self._head.next = None
+        self._nodes.clear()
+        self._accesses = 0
+
+    def _decay(self) -> None:
+        """Divide todas as frequências por 2, fundindo nós iguais (mantém a ordem)."""
+        self._accesses = 0
+        self.decays += 1
+        tail = self._head
+        node = self._head.next
+        self._head.next = None
+        while node is not None:
+            following = node.next
+            freq = max(1, node.freq // 2)
+            if tail is not self._head and tail.freq == freq:
+                for key in node.keys:
+                    tail.keys[key] = None
+                    self._nodes[key] = tail
+            else:
+                node.freq = freq
+                node.prev = tail
+                node.next = None
+                tail.next = node
+                tail = node
+            node = following
+
+
+class _GreedyDualSizeTracker:
+    """
+    GreedyDual-Size-Frequency com heap e invalidação preguiçosa.
+
+    Prioridade H = L + frequência / tamanho: entradas grandes e pouco
+    usadas saem primeiro. L (inflação) passa a ser a prioridade da última
+    vítima, o que envelhece as entradas que deixaram de ser acedidas.
+    Acesso, inserção e eviction custam O(log n).
+    """
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._state: Dict[str, tuple] = {}  # key -> (prioridade, frequência, tamanho)
+        self._inflation = 0.0
+        self._seq = itertools.count()
+
+    def _push(self, key: str, freq: int, size: int) -> None:
+        priority = self._inflation + freq / max(1, size)
+        self._state[key] = (priority, freq, size)
+        heapq.heappush(self._heap, (priority, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._state) + 64:
+            self._heap = [(p, next(self._seq), k) for k, (p, _, _) in self._state.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, key: str, size: int, freq: int = 1) -> None:
+        self._push(key, max(1, freq), size)
+
+    def frequency(self, key: str) -> int:
+        state = self._state.get(key)
+        return state[1] if state is not None else 0
+
+    def priority(self, key: str) -> float:
+        state = self._state.get(key)
+        return state[0] if state is not None else 0.0
+
+    def ordered(self) -> List[str]:
+        """Chaves pela ordem de eviction (menor prioridade primeiro)."""
+        return sorted(self._state, key=lambda key: self._state[key][0])
+
+    def touch(self, key: str) -> None:
+        state = self._state.get(key)
+        if state is not None:
+            self._push(key, state[1] + 1, state[2])
+
+    def remove(self, key: str) -> None:
+        self._state.pop(key, None)
+
+    def pop_victim(self) -> Optional[str]:
+        """Remove e retorna a chave de menor prioridade (atualiza L)."""
+        heap = self._heap
+        while heap:
+            priority, _, key = heapq.heappop(heap)
+            state = self._state.get(key)
+            if state is not None and state[0] == priority:
+                self._inflation = priority
+                del self._state[key]
+                return key
+        return None
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._state.clear()
+        self._inflation = 0.0
+
+
+# Tabela de tradução que divide cada contador (byte) por 2
+_HALVE_TABLE = bytes(i >> 1 for i in range(256))
+
+
+class FrequencySketch:
+    """
+    Count-min sketch de 4 linhas com contadores de 4 bits (máx. 15).
+
+    Estima a frequência recente de qualquer chave (incluindo chaves que
+    não estão no cache) em memória constante. Após `sample_size`
+    incrementos todos os contadores são divididos por 2 (envelhecimento).
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int, sample_factor: int = 10):
+        width = 1
+        while width < max(16, capacity * 4):
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(self.DEPTH)]
+        self._sample_size = max(1, capacity * sample_factor)
+        self._additions = 0
+        self.resets = 0
+
+    def _indexes(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher) a partir de um único hash
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = ((h >> 32) & 0xFFFFFFFF) | 1
+        mask = self._mask
+        return [(h1 + i * h2) & mask for i in range(self.DEPTH)]
+
+    def increment(self, key: str) -> None:
+        added = False
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+                added = True
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._reset()
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            row[:] = row.translate(_HALVE_TABLE)
+        self._additions //= 2
+        self.resets += 1
+
+
+class _NamespaceQuotaEnforcer:
+    """
+    Quotas de namespace aplicadas sobre o cache inteiro (todos os shards).
+
+    O uso de um namespace é a soma dos shards; ao exceder a quota sai a
+    entrada do namespace usada há mais tempo, em qualquer shard. As
+    secções críticas dos shards nunca cedem o loop, por isso o shard que
+    está a gravar pode retirar entradas de outro sem adquirir o seu lock.
+    """
+
+    def __init__(self, quotas: Dict[str, NamespaceQuota]):
+        self.quotas = quotas
+        self.shards: List["_CacheShard"] = []
+
+    def get(self, namespace: str) -> Optional[NamespaceQuota]:
+        return self.quotas.get(namespace)
+
+    def usage(self, namespace: str) -> Tuple[int, int]:
+        """Entradas e bytes do namespace em todos os shards."""
+        entries = size_bytes = 0
+        for shard in self.shards:
+            stats = shard.namespace_stats.get(namespace)
+            if stats is not None:
+                entries += stats.entries
+                size_bytes += stats.size_bytes
+        return entries, size_bytes
+
+    def make_room(self, namespace: str, quota: NamespaceQuota, size_bytes: int) -> None:
+        """Remove as entradas menos usadas do namespace até caber uma nova."""
+        entries, used = self.usage(namespace)
+        while (
+            (quota.max_entries is not None and entries >= quota.max_entries)
+            or (quota.max_bytes is not None and used + size_bytes > quota.max_bytes)
+        ):
+            victim = self._victim(namespace)
+            if victim is None:
+                break
+            shard, key = victim
+            used -= shard.entries[key].size_bytes
+            entries -= 1
+            shard.remove(key)
+            ns_stats = shard.namespace_stats[namespace]
+            ns_stats.evictions += 1
+            ns_stats.quota_evictions += 1
+            shard.stats.evictions += 1
+
+    def _victim(self, namespace: str) -> Optional[Tuple["_CacheShard", str]]:
+        """Entrada do namespace usada há mais tempo (a mais antiga de cada shard)."""
+        victim = None
+        oldest = float("inf")
+        for shard in self.shards:
+            index = shard.namespaces.get(namespace)
+            if not index:
+                continue
+            key = next(iter(index))
+            last_accessed = shard.entries[key].last_accessed
+            if last_accessed < oldest:
+                victim, oldest = (shard, key), last_accessed
+        return victim
+
+
+class _CacheShard:
+    """
+    Segmento independente do cache.
+
+    Cada shard tem o seu lock, dicionário de entradas, estruturas de
+    eviction e estatísticas; as operações de um shard nunca esperam por
+    outro. As secções críticas só manipulam estruturas em memória
+    (serialização e logging ficam fora do lock).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        eviction_policy: EvictionPolicy,
+        lfu_decay: bool = True,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        namespace_quotas: Optional[_NamespaceQuotaEnforcer] = None
+    ):
+        self.lock = asyncio.Lock()
+        self.entries: Dict[str, CacheEntry] = {}
+        self.stats = CacheStats()
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes
+        self.eviction_policy = eviction_policy
+        self.entry_overhead = ENTRY_OVERHEAD_BYTES + POLICY_OVERHEAD_BYTES[eviction_policy]
+        
+        # Índice de namespaces: chaves de cada namespace por ordem de uso
+        # (clear/size/keys por namespace custam O(tamanho do namespace))
+        self.namespaces: Dict[str, OrderedDict] = {}
+        self.namespace_stats: Dict[str, NamespaceStats] = {}
+        # Quotas partilhadas por todos os shards (aplicadas ao cache inteiro)
+        self.namespace_quotas = namespace_quotas or _NamespaceQuotaEnforcer({})
+        if namespace_quotas is None:
+            self.namespace_quotas.shards.append(self)
+        
+        # Índice de expiração: min-heap (expiration_time, key) com remoção
+        # preguiçosa (itens de chaves já removidas/substituídas são ignorados)
+        self.expiry_heap: List[tuple] = []
+        
+        # Estruturas para políticas de eviction
+        self.sketch: Optional[FrequencySketch] = None
+        if eviction_policy in (EvictionPolicy.FIFO, EvictionPolicy.LRU, EvictionPolicy.TINY_LFU):
+            # FIFO usa a ordem de inserção (sem move_to_end nas leituras);
+            # o OrderedDict remove chaves arbitrárias em O(1)
+            self.order_tracker: OrderedDict = OrderedDict()
+            if eviction_policy == EvictionPolicy.TINY_LFU:
+                self.sketch = FrequencySketch(max_size)
+        elif eviction_policy == EvictionPolicy.LFU:
+            self.lfu = _LFUTracker(decay_interval=max_size * 10 if lfu_decay else 0)
+        elif eviction_policy == EvictionPolicy.GDS:
+            self.gds = _GreedyDualSizeTracker()
+
+    def _ns_stats(self, namespace: str) -> NamespaceStats:
+        stats = self.namespace_stats.get(namespace)
+        if stats is None:
+            stats = self.namespace_stats[namespace] = NamespaceStats()
+        return stats
+
+    def lookup(self, key: str, now: float, namespace: Optional[str] = None) -> Optional[CacheEntry]:
+        """Obtém uma entrada válida, atualizando estatísticas e tracking."""
+        if self.sketch is not None:
+            self.sketch.increment(key)
+        entry = self.entries.get(key)
+        
+        if entry is None:
+            self.stats.misses += 1
+            if namespace:
+                self._ns_stats(namespace).misses += 1
+            return None
+        
+        # Verificar expiração
+        if now >= entry.expiration_time:
+            self.stats.expired_removals += 1
+            self.remove(key)
+            return None
+        
+        # Atualizar estatísticas de acesso
+        self.stats.hits += 1
+        if entry.namespace:
+            self._ns_stats(entry.namespace).hits += 1
+            self.namespaces[entry.namespace].move_to_end(key)
+        entry.last_accessed = time.time()
+        entry.access_count += 1
+        
+        # Atualizar ordem (LRU/TinyLFU) ou frequência (LFU/GDS)
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self.lfu.touch(key)
+        elif self.eviction_policy == EvictionPolicy.GDS:
+            self.gds.touch(key)
+        elif self.eviction_policy != EvictionPolicy.FIFO:
+            self.order_tracker.move_to_end(key)
+        
+        return entry
+
+    def store(self, key: str, entry: CacheEntry) -> bool:
+        """
+        Armazena uma entrada, fazendo eviction se o shard estiver cheio.
+
+        Com TinyLFU, uma chave nova só entra num shard cheio se a sua
+        frequência estimada (leituras recentes) superar a da vítima LRU;
+        caso contrário é rejeitada (admission_rejections) e o cache fica
+        inalterado. Com orçamento de bytes, valores acima de
+        max_entry_bytes são recusados (oversize_rejections). Todas as
+        recusas acontecem antes de mexer no cache: ao regravar uma chave,
+        o valor antigo só sai se o novo for aceite.
+        """
+        entry.memory_bytes = entry.size_bytes + sys.getsizeof(key) + self.entry_overhead
+        if entry.namespace:
+            entry.memory_bytes += NAMESPACE_OVERHEAD_BYTES
+        if self.max_entry_bytes is not None and entry.memory_bytes > self.max_entry_bytes:
+            self.stats.oversize_rejections += 1
+            return False
+        
+        # Quota do namespace: valor maior que a quota inteira nunca cabe
+        namespace = entry.namespace
+        quota = self.namespace_quotas.get(namespace) if namespace else None
+        if quota is not None and quota.max_bytes is not None and entry.size_bytes > quota.max_bytes:
+            self.stats.admission_rejections += 1
+            return False
+        
+        replacing = key in self.entries
+        if self.sketch is not None:
+            if not replacing and self._needs_eviction(entry) and self.order_tracker:
+                # Vítima nunca lida (frequência 0) é sempre substituível
+                victim_freq = self.sketch.estimate(next(iter(self.order_tracker)))
+                if victim_freq and self.sketch.estimate(key) <= victim_freq:
+                    self.stats.admission_rejections += 1
+                    return False
+        
+        # Entrada aceite: remover a existente e libertar espaço no namespace
+        if replacing:
+            self.remove(key)
+        if quota is not None:
+            self.namespace_quotas.make_room(namespace, quota, entry.size_bytes)
+        
+        # Verificar limites (entradas e bytes) e fazer eviction se necessário
+        while self._needs_eviction(entry):
+            if not self.evict_one():
+                return False
+        
+        self.entries[key] = entry
+        if namespace:
+            index = self.namespaces.get(namespace)
+            if index is None:
+                index = self.namespaces[namespace] = OrderedDict()
+            index[key] = None
+            ns_stats = self._ns_stats(namespace)
+            ns_stats.sets += 1
+            ns_stats.entries += 1
+            ns_stats.size_bytes += entry.size_bytes
+        heapq.heappush(self.expiry_heap, (entry.expiration_time, key))
+        if len(self.expiry_heap) > 2 * len(self.entries) + 64:
+            self._compact_expiry_heap()
+        self.stats.sets += 1
+        self.stats.current_size = len(self.entries)
+        self.stats.total_size_bytes += entry.size_bytes
+        self.stats.memory_bytes += entry.memory_bytes
+        
+        # Atualizar estruturas de tracking
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self.lfu.add(key)
+        elif self.eviction_policy == EvictionPolicy.GDS:
+            self.gds.add(key, entry.memory_bytes)
+        else:
+            self.order_tracker[key] = None  # OrderedDict mantém ordem
+        return True
+
+    def hottest_first(self) -> List[str]:
+        """Chaves da mais protegida à próxima vítima da eviction."""
+        if self.eviction_policy == EvictionPolicy.LFU:
+            return self.lfu.ordered()[::-1]
+        if self.eviction_policy == EvictionPolicy.GDS:
+            return self.gds.ordered()[::-1]
+        return list(reversed(self.order_tracker))
+
+    def frequency(self, key: str) -> int:
+        """Frequência usada pela eviction (contagem de acessos nas restantes políticas)."""
+        if self.eviction_policy == EvictionPolicy.LFU:
+            return self.lfu.frequency(key)
+        if self.eviction_policy == EvictionPolicy.GDS:
+            return self.gds.frequency(key)
+        return self.entries[key].access_count
+
+    def heat(self, key: str) -> float:
+        """Ordena chaves de shards diferentes (maior = mais longe da eviction)."""
+        if self.eviction_policy == EvictionPolicy.LFU:
+            return self.lfu.frequency(key)
+        if self.eviction_policy == EvictionPolicy.GDS:
+            return self.gds.priority(key)
+        if self.eviction_policy == EvictionPolicy.FIFO:
+            return self.entries[key].created_at
+        return self.entries[key].last_accessed
+
+    def restore(self, key: str, entry: CacheEntry, freq: int) -> bool:
+        """
+        Insere uma entrada de um snapshot. As entradas chegam da mais
+        quente para a mais fria, por isso cada uma fica na posição de
+        próxima vítima (reconstrói a ordem de eviction original).
+        """
+        if not self.store(key, entry):
+            return False
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self.lfu.restore(key, freq)
+        elif self.eviction_policy == EvictionPolicy.GDS:
+            self.gds.add(key, entry.memory_bytes, freq)
+        else:
+            self.order_tracker.move_to_end(key, last=False)
+        if entry.namespace:
+            # Quotas expulsam pela ordem do namespace: a mais fria vai à frente
+            self.namespaces[entry.namespace].move_to_end(key, last=False)
+        return True
+
+    def _needs_eviction(self, entry: CacheEntry) -> bool:
+        """Se guardar `entry` excederia o limite de entradas ou de bytes."""
+        if len(self.entries) >= self.max_size:
+            return True
+        return (
+            self.max_bytes is not None
+            and self.stats.memory_bytes + entry.memory_bytes > self.max_bytes
+        )
+
+    def evict_one(self) -> bool:
+        """
+        Remove uma entrada baseado na política de eviction (O(1); GDS O(log n)).
+        
+        Returns:
+            True se conseguiu remover uma entrada
+        """
+        if not self.entries:
+            return False
+        
+        try:
+            if self.eviction_policy == EvictionPolicy.LFU:
+                # Primeira chave do nó de menor frequência
+                key_to_evict = self.lfu.victim() or next(iter(self.entries))
+            
+            elif self.eviction_policy == EvictionPolicy.GDS:
+                # Menor prioridade frequência/tamanho
+                key_to_evict = self.gds.pop_victim() or next(iter(self.entries))
+            
+            elif self.order_tracker:
+                # FIFO: a mais antiga; LRU e TinyLFU: a menos usada recentemente
+                key_to_evict, _ = self.order_tracker.popitem(last=False)
+            
+            else:
+                # Fallback: remover primeiro item
+                key_to_evict = next(iter(self.entries))
+            
+            evicted = self.entries.get(key_to_evict)
+            self.remove(key_to_evict)
+            self.stats.evictions += 1
+            if evicted is not None and evicted.namespace:
+                self._ns_stats(evicted.namespace).evictions += 1
+            
+            logger.debug(f"Cache EVICTION ({self.eviction_policy.value}): '{key_to_evict}'")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro na eviction: {e}")
+            return False
+
+    def remove(self, key: str) -> bool:
+        """Remove entrada do shard e das estruturas de tracking."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.stats.total_size_bytes -= entry.size_bytes
+            self.stats.memory_bytes -= entry.memory_bytes
+            self.stats.current_size = len(self.entries)
+            if entry.namespace:
+                index = self.namespaces[entry.namespace]
+                del index[key]
+                if not index:
+                    del self.namespaces[entry.namespace]
+                ns_stats = self.namespace_stats[entry.namespace]
+                ns_stats.entries -= 1
+                ns_stats.size_bytes -= entry.size_bytes
+        
+        # Remover das estruturas de tracking
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self.lfu.remove(key)
+        elif self.eviction_policy == EvictionPolicy.GDS:
+            self.gds.remove(key)
+        else:
+            self.order_tracker.pop(key, None)
+        return entry is not None
+
+    def clear(self) -> int:
+        """Remove todas as entradas do shard."""
+        count = len(self.entries)
+        self.entries.clear()
+        self.expiry_heap.clear()
+        self.namespaces.clear()
+        for ns_stats in self.namespace_stats.values():
+            ns_stats.entries = 0
+            ns_stats.size_bytes = 0
+        self.stats.current_size = 0
+        self.stats.total_size_bytes = 0
+        self.stats.memory_bytes = 0
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self.lfu.clear()
+        elif self.eviction_policy == EvictionPolicy.GDS:
+            self.gds.clear()
+        else:
+            self.order_tracker.clear()
+        return count
+
+    def clear_namespace(self, namespace: str) -> int:
+        """Remove todas as entradas de um namespace (O(tamanho do namespace))."""
+        index = self.namespaces.get(namespace)
+        if not index:
+            return 0
+        keys = list(index)
+        for key in keys:
+            self.remove(key)
+        return len(keys)
+
+    def remove_expired(self, now: float, limit: Optional[int] = None) -> int:
+        """
+        Remove até `limit` entradas expiradas do shard.
+
+        Só percorre o topo do heap de expiração (entradas vencidas), em
+        vez de todas as entradas: O(k log n) para k entradas vencidas.
+        """
+        heap = self.expiry_heap
+        removed = 0
+        while heap and heap[0][0] <= now and (limit is None or removed < limit):
+            _, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            # Item obsoleto: chave removida ou regravada com outro prazo
+            if entry is None or entry.expiration_time > now:
+                continue
+            self.remove(key)
+            removed += 1
+        self.stats.expired_removals += removed
+        return removed
+
+    def _compact_expiry_heap(self) -> None:
+        """Reconstrói o heap só com as entradas vivas (custo amortizado O(1))."""
+        self.expiry_heap = [(entry.expiration_time, key) for key, entry in self.entries.items()]
+        heapq.heapify(self.expiry_heap)
+
+    def record_access_time(self, access_time: float):
+        """Atualiza tempo médio de acesso."""
+        total_accesses = self.stats.hits + self.stats.misses
+        if total_accesses > 0:
+            current_avg = self.stats.avg_access_time
+            new_avg = ((current_avg * (total_accesses - 1)) + access_time) / total_accesses
+            self.stats.avg_access_time = new_avg
+
+
+# Formato de snapshot: MAGIC, cabeçalho e registos em frames
+# <tamanho u32><pickle>; o último frame é o rodapé (dict com o total).
+SNAPSHOT_MAGIC = b"MUZAIA-CACHE-SNAPSHOT\n"
+SNAPSHOT_VERSION = 1
+_FRAME_HEADER = struct.Struct("<I")
+_UNREADABLE_FRAME = object()  # Registo que não deserializa (ignorado na leitura)
+
+
+def _frame(obj: Any) -> bytes:
+    blob = pickle.dumps(obj, protocol=5)
+    return _FRAME_HEADER.pack(len(blob)) + blob
+
+
+def _read_frames(file, limit: int) -> List[Any]:
+    """
+    Lê até `limit` frames (para no rodapé, no fim ou num frame truncado).
+
+    Um frame completo que não deserializa não interrompe a leitura: é
+    devolvido como _UNREADABLE_FRAME para o chamador o saltar.
+    """
+    frames: List[Any] = []
+    while len(frames) < limit:
+        header = file.read(_FRAME_HEADER.size)
+        if len(header) < _FRAME_HEADER.size:
+            break
+        (length,) = _FRAME_HEADER.unpack(header)
+        blob = file.read(length)
+        if len(blob) < length:
+            break
+        try:
+            frames.append(pickle.loads(blob))
+        except Exception:
+            frames.append(_UNREADABLE_FRAME)
+            continue
+        if isinstance(frames[-1], dict):
+            break
+    return frames
+
+
 class AsyncInMemoryCache:
     """
     Implementação enterprise de cache assíncrono em memória.
     
     Características:
     - TTL configurável por entrada
-    - Múltiplas políticas de eviction (FIFO, LRU, LFU)
+    - Múltiplas políticas de eviction (FIFO, LRU, LFU em O(1) com
+      envelhecimento, TinyLFU com filtro de admissão)
     - Compressão automática para valores grandes
     - Métricas detalhadas
     - Cleanup automático de entradas expiradas
     - Thread-safe com asyncio
-    - Namespaces para organização
+    - Namespaces para organização, com índice por namespace (clear/size/keys
+      em O(tamanho do namespace)), estatísticas e quotas por namespace
+    - Modo particionado (shards): as chaves são distribuídas por hash em
+      N segmentos independentes, cada um com lock, eviction e estatísticas
+      próprios; a eviction é aplicada dentro de cada shard
     """
 
     def __init__(
@@ -91,7 +894,14 @@ class AsyncInMemoryCache:
         eviction_policy: EvictionPolicy = EvictionPolicy.LRU,
         enable_compression: bool = None,
         compression_threshold: int = 1024,  # Comprimir se > 1KB
-        cleanup_interval: float = None
+        cleanup_interval: float = None,
+        cleanup_slice_size: int = None,
+        shards: int = None,
+        lfu_decay: bool = True,
+        codecs: Optional[Dict[str, CodecConfig]] = None,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        snapshot_path: Optional[str] = None
     ):
         """
         Inicializa o cache avançado.
@@ -103,6 +913,14 @@ class AsyncInMemoryCache:
             enable_compression: Habilitar compressão (usa config se None)
             compression_threshold: Tamanho mínimo para compressão
             cleanup_interval: Intervalo de cleanup automático
+            cleanup_slice_size: Máximo de remoções por fatia de cleanup (usa config se None)
+            shards: Número de segmentos independentes (usa config se None)
+            lfu_decay: Envelhecer as frequências do LFU (divide por 2 periodicamente)
+            codecs: Codec por namespace (os restantes usam o padrão derivado
+                de enable_compression/compression_threshold)
+            max_bytes: Orçamento de memória em bytes (usa config se None; None = sem limite)
+            max_entry_bytes: Maior valor admitido (padrão: orçamento de um shard)
+            snapshot_path: Ficheiro de snapshot (usa config se None)
         """
         # Configurações
         self._ttl = ttl_sec or settings.cache.cache_ttl_sec
@@ -114,20 +932,60 @@ class AsyncInMemoryCache:
             else settings.cache.cache_compression
         )
         self._compression_threshold = compression_threshold
+        self._codecs = CodecPipeline(
+            CodecConfig(
+                compressor="auto" if self._enable_compression else "none",
+                size_threshold=compression_threshold
+            ),
+            codecs
+        )
         self._cleanup_interval = cleanup_interval or settings.cache.cleanup_interval_sec
+        self._cleanup_slice_size = cleanup_slice_size or settings.cache.cleanup_slice_size
         
-        # Estruturas de dados
-        self._cache: Dict[str, CacheEntry] = {}
-        self._stats = CacheStats()
-        self._lock = asyncio.Lock()
+        # Segmentos (capacidade repartida; 1 shard = comportamento global)
+        num_shards = max(1, min(shards or settings.cache.shards, self._max_size))
+        shard_size = -(-self._max_size // num_shards)
+        self._max_bytes = max_bytes or settings.cache.max_bytes
+        shard_bytes = -(-self._max_bytes // num_shards) if self._max_bytes else None
+        # Quotas de namespace valem para o cache inteiro, não por shard
+        self._namespace_quotas: Dict[str, NamespaceQuota] = {}
+        quota_enforcer = _NamespaceQuotaEnforcer(self._namespace_quotas)
+        self._shards: List[_CacheShard] = [
+            _CacheShard(
+                shard_size, eviction_policy, lfu_decay, shard_bytes, max_entry_bytes, quota_enforcer
+            )
+            for _ in range(num_shards)
+        ]
+        quota_enforcer.shards.extend(self._shards)
+        self._num_shards = num_shards
         
-        # Estruturas para políticas de eviction
-        if eviction_policy == EvictionPolicy.FIFO:
-            self._order_tracker: deque = deque()
-        elif eviction_policy == EvictionPolicy.LRU:
-            self._order_tracker: OrderedDict = OrderedDict()
-        elif eviction_policy == EvictionPolicy.LFU:
-            self._frequency_tracker: Dict[str, int] = {}
+        # Métricas do cleanup por fatias
+        self._cleanup_metrics = {
+            "runs": 0,
+            "slices": 0,
+            "last_run_ms": 0.0,
+            "last_run_slices": 0,
+            "max_slice_ms": 0.0,
+            "avg_slice_ms": 0.0,
+        }
+        
+        # Snapshots para warm restart
+        self._snapshot_path = snapshot_path or settings.cache.snapshot_path
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._restore_task: Optional[asyncio.Task] = None
+        self._snapshot_metrics = {
+            "saves": 0,
+            "last_save_ms": 0.0,
+            "last_saved_entries": 0,
+            "last_save_bytes": 0,
+            "unserializable_skipped": 0,
+            "loads": 0,
+            "last_load_ms": 0.0,
+            "last_loaded_entries": 0,
+            "rejected_snapshots": 0,
+            "truncated_snapshots": 0,
+            "unreadable_records": 0,
+        }
         
         # Task de cleanup automático
         self._cleanup_task: Optional[asyncio.Task] = None
@@ -136,10 +994,18 @@ class AsyncInMemoryCache:
         logger.info(
             f"Cache inicializado: TTL={self._ttl}s, "
             f"max_size={self._max_size}, "
+            f"max_bytes={self._max_bytes}, "
             f"policy={eviction_policy.value}, "
-            f"compression={self._enable_compression}"
+            f"compression={self._enable_compression}, "
+            f"shards={num_shards}"
         )
 
+    def _shard_for(self, key: str) -> _CacheShard:
+        """Seleciona o shard de uma chave (hash estável no processo)."""
+        if self._num_shards == 1:
+            return self._shards[0]
+        return self._shards[hash(key) % self._num_shards]
+
     async def start_background_cleanup(self):
         """Inicia task de cleanup em background."""
         if self._cleanup_task is None:
@@ -172,52 +1038,43 @@ class AsyncInMemoryCache:
                 logger.error(f"Erro no background cleanup: {e}")
                 await asyncio.sleep(60)  # Wait before retry
 
-    async def get(self, key: str, default: Any = None) -> Any:
+    async def get(
+        self, 
+        key: str, 
+        default: Any = None,
+        namespace: Optional[str] = None
+    ) -> Any:
         """
         Obtém um valor do cache.
         
         Args:
             key: Chave do cache
             default: Valor padrão se não encontrado
+            namespace: Namespace opcional
             
         Returns:
             Valor armazenado ou default
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
+        key = f"{namespace}:{key}" if namespace else key
+        shard = self._shard_for(key)
         
-        async with self._lock:
-            entry = self._cache.get(key)
-            
-            if entry is None:
-                self._stats.misses += 1
-                logger.debug(f"Cache MISS: '{key}'")
-                return default
-            
-            # Verificar expiração
-            if time.monotonic() >= entry.expiration_time:
-                self._stats.expired_removals += 1
-                self._remove_entry(key)
-                logger.debug(f"Cache EXPIRED: '{key}'")
-                return default
-            
-            # Atualizar estatísticas de acesso
-            self._stats.hits += 1
-            entry.last_accessed = time.time()
-            entry.access_count += 1
-            
-            # Atualizar ordem para LRU
-            if self._eviction_policy == EvictionPolicy.LRU:
-                self._order_tracker.move_to_end(key)
-            
-            # Descomprimir se necessário
-            value = self._decompress_value(entry)
-            
-            # Atualizar tempo médio de acesso
-            access_time = time.time() - start_time
-            self._update_avg_access_time(access_time)
-            
-            logger.debug(f"Cache HIT: '{key}' (access_time: {access_time:.4f}s)")
-            return value
+        async with shard.lock:
+            entry = shard.lookup(key, time.monotonic(), namespace)
+        
+        if entry is None:
+            logger.debug(f"Cache MISS: '{key}'")
+            return default
+        
+        # Descodificar fora do lock
+        value = self._decompress_value(entry)
+        
+        # Atualizar tempo médio de acesso
+        access_time = time.perf_counter() - start_time
+        shard.record_access_time(access_time)
+        
+        logger.debug(f"Cache HIT: '{key}' (access_time: {access_time:.4f}s)")
+        return value
 
     async def set(
         self, 
@@ -241,52 +1098,31 @@ class AsyncInMemoryCache:
         try:
             # Preparar chave com namespace
             cache_key = f"{namespace}:{key}" if namespace else key
-            
-            # Calcular TTL
             effective_ttl = ttl if ttl is not None else self._ttl
-            expiration_time = time.monotonic() + effective_ttl
             
-            # Comprimir valor se necessário
-            compressed_value, is_compressed, size_bytes = self._compress_value(value)
+            # Codificar valor (fora do lock)
+            entry = self._make_entry(value, effective_ttl, namespace)
             
-            async with self._lock:
-                # Remover entrada existente se presente
-                if cache_key in self._cache:
-                    self._remove_entry(cache_key)
-                
-                # Verificar limite de tamanho e fazer eviction se necessário
-                while len(self._cache) >= self._max_size:
-                    evicted = self._evict_one()
-                    if not evicted:
-                        logger.warning("Não foi possível fazer eviction, cache pode estar cheio")
-                        return False
-                
-                # Criar nova entrada
-                entry = CacheEntry(
-                    value=compressed_value,
-                    expiration_time=expiration_time,
-                    created_at=time.time(),
-                    last_accessed=time.time(),
-                    access_count=0,
-                    size_bytes=size_bytes,
-                    compressed=is_compressed
-                )
-                
-                # Armazenar
-                self._cache[cache_key] = entry
-                self._stats.sets += 1
-                self._stats.current_size = len(self._cache)
-                self._stats.total_size_bytes += size_bytes
-                
-                # Atualizar estruturas de tracking
-                self._update_tracking_structures(cache_key)
-                
-                logger.debug(
-                    f"Cache SET: '{cache_key}' "
-                    f"(size: {size_bytes}B, compressed: {is_compressed}, ttl: {effective_ttl}s)"
-                )
-                
-                return True
+            shard = self._shard_for(cache_key)
+            async with shard.lock:
+                stored = shard.store(cache_key, entry)
+            
+            if not stored:
+                if (
+                    self._eviction_policy == EvictionPolicy.TINY_LFU
+                    or self._max_bytes
+                    or namespace in self._namespace_quotas
+                ):
+                    logger.debug(f"Cache REJECT (admissão/quota/tamanho): '{cache_key}'")
+                else:
+                    logger.warning("Não foi possível fazer eviction, cache pode estar cheio")
+                return False
+            
+            logger.debug(
+                f"Cache SET: '{cache_key}' "
+                f"(size: {entry.size_bytes}B, codec: {entry.codec}, ttl: {effective_ttl}s)"
+            )
+            return True
                 
         except Exception as e:
             logger.error(f"Erro ao definir cache para '{key}': {e}")
@@ -304,14 +1140,135 @@ class AsyncInMemoryCache:
             True se a chave existia e foi removida
         """
         cache_key = f"{namespace}:{key}" if namespace else key
+        shard = self._shard_for(cache_key)
         
-        async with self._lock:
-            if cache_key in self._cache:
-                self._remove_entry(cache_key)
-                self._stats.deletes += 1
-                logger.debug(f"Cache DELETE: '{cache_key}'")
-                return True
-            return False
+        async with shard.lock:
+            entry = shard.entries.get(cache_key)
+            removed = shard.remove(cache_key)
+            if removed:
+                shard.stats.deletes += 1
+                if entry.namespace:
+                    shard.namespace_stats[entry.namespace].deletes += 1
+        
+        if removed:
+            logger.debug(f"Cache DELETE: '{cache_key}'")
+        return removed
+
+    def _make_entry(self, value: Any, ttl: int, namespace: Optional[str]) -> CacheEntry:
+        """Codifica um valor numa entrada nova (chamado fora dos locks)."""
+        encoded = self._compress_value(value, namespace)
+        now = time.time()
+        return CacheEntry(
+            value=encoded.payload,
+            expiration_time=time.monotonic() + ttl,
+            created_at=now,
+            last_accessed=now,
+            access_count=0,
+            size_bytes=encoded.size_bytes,
+            compressed=encoded.compressed,
+            namespace=namespace,
+            codec=encoded.codec,
+            buffers=encoded.buffers
+        )
+
+    def _group_by_shard(self, keys: Iterable[str], namespace: Optional[str]) -> Dict[int, List[tuple]]:
+        """Agrupa (chave, chave com namespace) pelo índice do shard."""
+        groups: Dict[int, List[tuple]] = {}
+        for key in keys:
+            cache_key = f"{namespace}:{key}" if namespace else key
+            index = 0 if self._num_shards == 1 else hash(cache_key) % self._num_shards
+            groups.setdefault(index, []).append((key, cache_key))
+        return groups
+
+    async def get_many(self, keys: Iterable[str], namespace: Optional[str] = None) -> BatchGetResult:
+        """
+        Obtém várias chaves adquirindo o lock uma vez por shard.
+        
+        Args:
+            keys: Chaves a ler
+            namespace: Namespace opcional
+            
+        Returns:
+            BatchGetResult com os valores encontrados e as chaves em falta
+        """
+        result = BatchGetResult()
+        for index, group in self._group_by_shard(keys, namespace).items():
+            shard = self._shards[index]
+            start_time = time.perf_counter()
+            now = time.monotonic()
+            async with shard.lock:
+                found = [(key, shard.lookup(cache_key, now, namespace)) for key, cache_key in group]
+            
+            # Descodificar fora do lock
+            for key, entry in found:
+                if entry is None:
+                    result.misses.append(key)
+                else:
+                    result.hits[key] = self._decompress_value(entry)
+            shard.record_access_time((time.perf_counter() - start_time) / len(group))
+        
+        logger.debug(f"Cache GET_MANY: {len(result.hits)} hits, {len(result.misses)} misses")
+        return result
+
+    async def set_many(
+        self,
+        items: Mapping[str, Any],
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None
+    ) -> Dict[str, bool]:
+        """
+        Define vários valores adquirindo o lock uma vez por shard.
+        
+        Args:
+            items: Mapa chave -> valor
+            ttl: TTL específico (usa padrão se None)
+            namespace: Namespace opcional
+            
+        Returns:
+            Mapa chave -> True se armazenado (False se recusado ou não codificável)
+        """
+        effective_ttl = ttl if ttl is not None else self._ttl
+        stored: Dict[str, bool] = {}
+        for index, group in self._group_by_shard(items, namespace).items():
+            shard = self._shards[index]
+            
+            # Codificar valores (fora do lock)
+            entries = []
+            for key, cache_key in group:
+                try:
+                    entries.append((key, cache_key, self._make_entry(items[key], effective_ttl, namespace)))
+                except Exception as e:
+                    logger.error(f"Erro ao definir cache para '{key}': {e}")
+                    stored[key] = False
+            
+            async with shard.lock:
+                for key, cache_key, entry in entries:
+                    stored[key] = shard.store(cache_key, entry)
+        
+        logger.debug(f"Cache SET_MANY: {sum(stored.values())}/{len(stored)} armazenados")
+        return stored
+
+    async def delete_many(self, keys: Iterable[str], namespace: Optional[str] = None) -> int:
+        """
+        Remove várias chaves adquirindo o lock uma vez por shard.
+        
+        Returns:
+            Número de chaves que existiam e foram removidas
+        """
+        removed = 0
+        for index, group in self._group_by_shard(keys, namespace).items():
+            shard = self._shards[index]
+            async with shard.lock:
+                for _, cache_key in group:
+                    entry = shard.entries.get(cache_key)
+                    if shard.remove(cache_key):
+                        removed += 1
+                        shard.stats.deletes += 1
+                        if entry.namespace:
+                            shard.namespace_stats[entry.namespace].deletes += 1
+        
+        logger.debug(f"Cache DELETE_MANY: {removed} removidas")
+        return removed
 
     async def clear(self, namespace: Optional[str] = None):
         """
@@ -320,24 +1277,20 @@ class AsyncInMemoryCache:
         Args:
             namespace: Se especificado, limpa apenas este namespace
         """
-        async with self._lock:
-            if namespace:
-                # Limpar apenas namespace específico
-                keys_to_remove = [
-                    k for k in self._cache.keys() 
-                    if k.startswith(f"{namespace}:")
-                ]
-                for key in keys_to_remove:
-                    self._remove_entry(key)
-                logger.info(f"Cache namespace '{namespace}' limpo ({len(keys_to_remove)} itens)")
-            else:
-                # Limpar tudo
-                count = len(self._cache)
-                self._cache.clear()
-                self._stats.current_size = 0
-                self._stats.total_size_bytes = 0
-                self._clear_tracking_structures()
-                logger.info(f"Cache completamente limpo ({count} itens)")
+        total = 0
+        for shard in self._shards:
+            async with shard.lock:
+                if namespace:
+                    # Limpar apenas namespace específico (via índice)
+                    total += shard.clear_namespace(namespace)
+                else:
+                    total += shard.clear()
+            await asyncio.sleep(0)
+        
+        if namespace:
+            logger.info(f"Cache namespace '{namespace}' limpo ({total} itens)")
+        else:
+            logger.info(f"Cache completamente limpo ({total} itens)")
 
     async def size(self, namespace: Optional[str] = None) -> int:
         """
@@ -349,13 +1302,9 @@ class AsyncInMemoryCache:
         Returns:
             Número de itens
         """
-        async with self._lock:
-            if namespace:
-                return sum(
-                    1 for k in self._cache.keys() 
-                    if k.startswith(f"{namespace}:")
-                )
-            return len(self._cache)
+        if not namespace:
+            return sum(len(shard.entries) for shard in self._shards)
+        return sum(len(shard.namespaces.get(namespace, ())) for shard in self._shards)
 
     async def keys(self, pattern: Optional[str] = None, namespace: Optional[str] = None) -> List[str]:
         """
@@ -368,201 +1317,426 @@ class AsyncInMemoryCache:
         Returns:
             Lista de chaves
         """
-        async with self._lock:
-            keys = list(self._cache.keys())
-            
-            # Filtrar por namespace
-            if namespace:
-                keys = [k for k in keys if k.startswith(f"{namespace}:")]
-            
-            # Filtrar por padrão
-            if pattern:
-                keys = [k for k in keys if pattern in k]
-            
-            return keys
+        keys: List[str] = []
+        for shard in self._shards:
+            async with shard.lock:
+                # Filtrar por namespace (via índice)
+                if namespace:
+                    keys.extend(shard.namespaces.get(namespace, ()))
+                else:
+                    keys.extend(shard.entries.keys())
+        
+        # Filtrar por padrão
+        if pattern:
+            keys = [k for k in keys if pattern in k]
+        
+        return keys
+
+    def set_namespace_quota(
+        self,
+        namespace: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Define limites de entradas e/ou bytes para um namespace.
+
+        Ao exceder a quota, saem as entradas menos usadas do próprio
+        namespace (os restantes não são afetados). Os limites valem para
+        o cache inteiro: o uso é somado sobre todos os shards.
+
+        Args:
+            namespace: Namespace a limitar
+            max_entries: Máximo de entradas (None = sem limite)
+            max_bytes: Máximo de bytes codificados (None = sem limite)
+        """
+        if max_entries is None and max_bytes is None:
+            self._namespace_quotas.pop(namespace, None)
+            return
+        
+        self._namespace_quotas[namespace] = NamespaceQuota(max_entries, max_bytes)
+        logger.info(
+            f"Quota do namespace '{namespace}': "
+            f"max_entries={max_entries}, max_bytes={max_bytes}"
+        )
+
+    def get_namespace_stats(self, namespace: str) -> Dict[str, Any]:
+        """Estatísticas de um namespace (agregadas por shard)."""
+        total = NamespaceStats()
+        for shard in self._shards:
+            stats = shard.namespace_stats.get(namespace)
+            if stats is not None:
+                total.merge(stats)
+        result = total.to_dict()
+        quota = self._namespace_quotas.get(namespace)
+        result["quota"] = (
+            {"max_entries": quota.max_entries, "max_bytes": quota.max_bytes} if quota else None
+        )
+        return result
+
+    def _namespace_names(self) -> List[str]:
+        names = set()
+        for shard in self._shards:
+            names.update(shard.namespace_stats)
+        return sorted(names)
 
     async def cleanup_expired(self) -> int:
         """
         Remove proativamente itens expirados.
         
+        Usa o índice de expiração de cada shard (só toca nas entradas
+        vencidas) e trabalha em fatias de até `cleanup_slice_size`
+        remoções, cedendo o event loop entre fatias.
+        
         Returns:
             Número de itens removidos
         """
         now = time.monotonic()
         removed_count = 0
+        run_start = time.perf_counter()
+        metrics = self._cleanup_metrics
+        slices = 0
         
-        async with self._lock:
-            expired_keys = [
-                k for k, v in self._cache.items() 
-                if now >= v.expiration_time
-            ]
-            
-            for key in expired_keys:
-                self._remove_entry(key)
-                removed_count += 1
-            
-            self._stats.expired_removals += removed_count
+        for shard in self._shards:
+            while True:
+                slice_start = time.perf_counter()
+                async with shard.lock:
+                    removed = shard.remove_expired(now, self._cleanup_slice_size)
+                slice_ms = (time.perf_counter() - slice_start) * 1000
+                
+                slices += 1
+                metrics["slices"] += 1
+                metrics["max_slice_ms"] = max(metrics["max_slice_ms"], slice_ms)
+                metrics["avg_slice_ms"] += (slice_ms - metrics["avg_slice_ms"]) / metrics["slices"]
+                removed_count += removed
+                
+                # Ceder o loop entre fatias: varrimentos grandes não bloqueiam os pedidos
+                await asyncio.sleep(0)
+                if removed < self._cleanup_slice_size:
+                    break
+        
+        metrics["runs"] += 1
+        metrics["last_run_slices"] = slices
+        metrics["last_run_ms"] = (time.perf_counter() - run_start) * 1000
         
         if removed_count > 0:
-            logger.info(f"Cleanup: {removed_count} itens expirados removidos")
+            logger.info(
+                f"Cleanup: {removed_count} itens expirados removidos "
+                f"({slices} fatias, {metrics['last_run_ms']:.1f}ms)"
+            )
         
         return removed_count
 
+    def _aggregate_stats(self) -> CacheStats:
+        """Soma as estatísticas de todos os shards."""
+        total = CacheStats()
+        weighted_access_time = 0.0
+        for shard in self._shards:
+            stats = shard.stats
+            total.hits += stats.hits
+            total.misses += stats.misses
+            total.sets += stats.sets
+            total.deletes += stats.deletes
+            total.evictions += stats.evictions
+            total.expired_removals += stats.expired_removals
+            total.admission_rejections += stats.admission_rejections
+            total.current_size += stats.current_size
+            total.total_size_bytes += stats.total_size_bytes
+            total.memory_bytes += stats.memory_bytes
+            total.oversize_rejections += stats.oversize_rejections
+            weighted_access_time += stats.avg_access_time * (stats.hits + stats.misses)
+        accesses = total.hits + total.misses
+        total.avg_access_time = weighted_access_time / accesses if accesses else 0.0
+        return total
+
     async def get_stats(self) -> Dict[str, Any]:
-        """Retorna estatísticas detalhadas do cache."""
-        async with self._lock:
-            return {
-                "hits": self._stats.hits,
-                "misses": self._stats.misses,
-                "hit_rate": self._stats.hit_rate,
-                "sets": self._stats.sets,
-                "deletes": self._stats.deletes,
-                "evictions": self._stats.evictions,
-                "expired_removals": self._stats.expired_removals,
-                "current_size": self._stats.current_size,
-                "max_size": self._max_size,
-                "total_size_bytes": self._stats.total_size_bytes,
-                "avg_access_time": self._stats.avg_access_time,
-                "memory_efficiency": self._stats.memory_efficiency,
-                "eviction_policy": self._eviction_policy.value,
-                "ttl_seconds": self._ttl,
-                "compression_enabled": self._enable_compression,
-                "uptime": time.time() - (time.time() - self._stats.hits - self._stats.misses)
-            }
-
-    def _compress_value(self, value: Any) -> tuple[Any, bool, int]:
-        """
-        Comprime valor se necessário.
-        
-        Returns:
-            (valor_final, foi_comprimido, tamanho_bytes)
-        """
-        # Serializar valor
-        try:
-            serialized = pickle.dumps(value)
-            size_bytes = len(serialized)
-            
-            # Comprimir se habilitado e valor for grande
-            if (self._enable_compression and 
-                size_bytes > self._compression_threshold):
-                
-                compressed = gzip.compress(serialized)
-                compressed_size = len(compressed)
-                
-                # Usar compressão apenas se houver benefício
-                if compressed_size < size_bytes * 0.8:  # 20% de economia mínima
-                    return compressed, True, compressed_size
-            
-            return serialized, False, size_bytes
-            
-        except Exception as e:
-            logger.error(f"Erro na compressão: {e}")
-            return value, False, len(str(value).encode())
+        """Retorna estatísticas detalhadas do cache (agregadas por shard)."""
+        stats = self._aggregate_stats()
+        return {
+            "hits": stats.hits,
+            "misses": stats.misses,
+            "hit_rate": stats.hit_rate,
+            "sets": stats.sets,
+            "deletes": stats.deletes,
+            "evictions": stats.evictions,
+            "expired_removals": stats.expired_removals,
+            "admission_rejections": stats.admission_rejections,
+            "current_size": stats.current_size,
+            "max_size": self._max_size,
+            "total_size_bytes": stats.total_size_bytes,
+            "memory_bytes": stats.memory_bytes,
+            "max_bytes": self._max_bytes,
+            "oversize_rejections": stats.oversize_rejections,
+            "avg_access_time": stats.avg_access_time,
+            "memory_efficiency": stats.memory_efficiency,
+            "eviction_policy": self._eviction_policy.value,
+            "ttl_seconds": self._ttl,
+            "compression_enabled": self._enable_compression,
+            "codecs": self._codecs.get_metrics(),
+            "shards": self._num_shards,
+            "shard_sizes": [len(shard.entries) for shard in self._shards],
+            "namespaces": {
+                namespace: self.get_namespace_stats(namespace)
+                for namespace in self._namespace_names()
+            },
+            "cleanup": {
+                **self._cleanup_metrics,
+                "slice_size": self._cleanup_slice_size,
+            },
+            "snapshot": {
+                **self._snapshot_metrics,
+                "path": self._snapshot_path,
+                "restoring": self._restore_task is not None and not self._restore_task.done(),
+            },
+            "uptime": time.time() - (time.time() - stats.hits - stats.misses)
+        }
+
+    def configure_namespace_codec(self, namespace: Optional[str], config: CodecConfig) -> None:
+        """Define o codec de um namespace (None altera o padrão)."""
+        self._codecs.configure(namespace, config)
+
+    def _compress_value(self, value: Any, namespace: Optional[str] = None) -> EncodedValue:
+        """Serializa/comprime o valor segundo o codec do namespace."""
+        return self._codecs.encode(value, namespace)
 
     def _decompress_value(self, entry: CacheEntry) -> Any:
-        """Descomprime valor se necessário."""
+        """Descodifica o valor de uma entrada (None se estiver corrompido)."""
         try:
-            if entry.compressed:
-                decompressed = gzip.decompress(entry.value)
-                return pickle.loads(decompressed)
-            else:
-                return pickle.loads(entry.value)
+            return self._codecs.decode(entry.value, entry.codec, entry.buffers)
         except Exception as e:
-            logger.error(f"Erro na descompressão: {e}")
-            return entry.value
+            logger.error(f"Erro na descodificação ({entry.codec}): {e}")
+            return None
 
-    def _evict_one(self) -> bool:
+    async def save_snapshot(self, path: Optional[str] = None) -> Dict[str, Any]:
         """
-        Remove uma entrada baseado na política de eviction.
-        
+        Grava o conteúdo do cache num snapshot local (escrita atómica).
+
+        Cada shard é copiado (referências) sob o lock e serializado fora
+        dele, em blocos escritos numa thread. Os registos guardam o TTL
+        restante (em tempo de relógio), as contagens de acesso e a
+        frequência da eviction, da entrada mais quente para a mais fria
+        (ordem intercalada entre shards, para que um limite na
+        restauração mantenha as mais quentes).
+        Valores guardados por referência que não sejam serializáveis são
+        ignorados.
+
         Returns:
-            True se conseguiu remover uma entrada
+            Resumo do snapshot (entradas, bytes, duração)
         """
-        if not self._cache:
-            return False
-        
+        path = path or self._snapshot_path
+        if not path:
+            raise ValueError("Caminho do snapshot não configurado")
+        start = time.perf_counter()
+        tmp_path = f"{path}.tmp"
+        written = skipped = 0
+        now_mono, now_wall = time.monotonic(), time.time()
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": now_wall,
+            "eviction_policy": self._eviction_policy.value,
+            "python": list(sys.version_info[:2]),
+        }
+
+        shard_items = []
+        for shard in self._shards:
+            async with shard.lock:
+                shard_items.append([
+                    (shard.heat(key), key, shard.entries[key], shard.frequency(key))
+                    for key in shard.hottest_first()
+                ])
+            await asyncio.sleep(0)
+
+        with open(tmp_path, "wb") as file:
+            await asyncio.to_thread(file.write, SNAPSHOT_MAGIC + _frame(header))
+            chunk: List[bytes] = []
+            chunk_size = 0
+            merged = heapq.merge(*shard_items, key=lambda item: item[0], reverse=True)
+            for i, (_, key, entry, freq) in enumerate(merged, 1):
+                remaining = entry.expiration_time - now_mono
+                if remaining <= 0:
+                    continue
+                try:
+                    frame = _frame((
+                        key, entry.namespace, entry.codec, entry.value, entry.buffers,
+                        now_wall + remaining, entry.size_bytes, entry.compressed,
+                        entry.access_count, entry.created_at, entry.last_accessed, freq
+                    ))
+                except Exception:
+                    skipped += 1
+                    continue
+                chunk.append(frame)
+                chunk_size += len(frame)
+                written += 1
+                if chunk_size >= 1 << 20:
+                    await asyncio.to_thread(file.writelines, chunk)
+                    chunk, chunk_size = [], 0
+                elif i % 1000 == 0:
+                    await asyncio.sleep(0)
+            chunk.append(_frame({"entries": written}))
+            await asyncio.to_thread(file.writelines, chunk)
+            size = file.tell()
+        os.replace(tmp_path, path)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._snapshot_metrics["saves"] += 1
+        self._snapshot_metrics["last_save_ms"] = round(elapsed_ms, 2)
+        self._snapshot_metrics["last_saved_entries"] = written
+        self._snapshot_metrics["last_save_bytes"] = size
+        self._snapshot_metrics["unserializable_skipped"] += skipped
+        logger.info(f"Snapshot do cache gravado: {written} entradas, {size}B em {elapsed_ms:.0f}ms")
+        return {"entries": written, "bytes": size, "skipped": skipped, "elapsed_ms": elapsed_ms}
+
+    async def load_snapshot(
+        self,
+        path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Restaura um snapshot em lotes, cedendo o loop entre lotes.
+
+        Entradas já expiradas, com compressores indisponíveis, que não
+        deserializam ou cujas chaves já foram escritas entretanto são
+        ignoradas. Snapshots de
+        outra versão do formato são recusados. Os limites aplicam-se das
+        entradas mais quentes para as mais frias.
+
+        Args:
+            path: Ficheiro do snapshot (usa o configurado se None)
+            max_entries: Máximo de entradas a restaurar (usa config se None)
+            max_bytes: Máximo de bytes de valores a restaurar (usa config se None)
+            batch_size: Registos lidos e inseridos por lote
+
+        Returns:
+            Número de entradas restauradas
+        """
+        path = path or self._snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+        max_entries = max_entries or settings.cache.snapshot_max_entries
+        max_bytes = max_bytes or settings.cache.snapshot_max_bytes
+        start = time.perf_counter()
+        loaded = loaded_bytes = 0
+        complete = False
+
         try:
-            if self._eviction_policy == EvictionPolicy.FIFO:
-                if self._order_tracker:
-                    key_to_evict = self._order_tracker.popleft()
-                else:
-                    key_to_evict = next(iter(self._cache))
-            
-            elif self._eviction_policy == EvictionPolicy.LRU:
-                if self._order_tracker:
-                    key_to_evict = next(iter(self._order_tracker))
-                    self._order_tracker.popitem(last=False)
-                else:
-                    key_to_evict = next(iter(self._cache))
-            
-            elif self._eviction_policy == EvictionPolicy.LFU:
-                # Encontrar chave com menor frequência
-                if self._frequency_tracker:
-                    key_to_evict = min(
-                        self._frequency_tracker.keys(),
-                        key=lambda k: self._frequency_tracker[k]
-                    )
-                else:
-                    key_to_evict = next(iter(self._cache))
-            
-            else:
-                # Fallback: remover primeiro item
-                key_to_evict = next(iter(self._cache))
-            
-            self._remove_entry(key_to_evict)
-            self._stats.evictions += 1
-            
-            logger.debug(f"Cache EVICTION ({self._eviction_policy.value}): '{key_to_evict}'")
-            return True
-            
+            with open(path, "rb") as file:
+                header = None
+                if await asyncio.to_thread(file.read, len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC:
+                    frames = await asyncio.to_thread(_read_frames, file, 1)
+                    header = frames[0] if frames else None
+                if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION:
+                    version = header.get("version") if isinstance(header, dict) else None
+                    self._snapshot_metrics["rejected_snapshots"] += 1
+                    logger.warning(f"Snapshot incompatível ignorado: {path} (versão {version})")
+                    return 0
+
+                while not complete:
+                    records = await asyncio.to_thread(_read_frames, file, batch_size)
+                    if not records:
+                        break
+                    now_mono, now_wall = time.monotonic(), time.time()
+                    groups: Dict[_CacheShard, List[tuple]] = {}
+                    for record in records:
+                        if isinstance(record, dict):
+                            complete = True
+                            break
+                        if record is _UNREADABLE_FRAME:
+                            self._snapshot_metrics["unreadable_records"] += 1
+                            continue
+                        (key, namespace, codec, payload, buffers, expires_at, size_bytes,
+                         compressed, access_count, created_at, last_accessed, freq) = record
+                        remaining = expires_at - now_wall
+                        _, _, compressor = codec.partition("+")
+                        if remaining <= 0 or (compressor and compressor not in COMPRESSORS):
+                            continue
+                        if (max_entries and loaded >= max_entries) or (max_bytes and loaded_bytes >= max_bytes):
+                            complete = True
+                            break
+                        entry = CacheEntry(
+                            value=payload,
+                            expiration_time=now_mono + remaining,
+                            created_at=created_at,
+                            last_accessed=last_accessed,
+                            access_count=access_count,
+                            size_bytes=size_bytes,
+                            compressed=compressed,
+                            namespace=namespace,
+                            codec=codec,
+                            buffers=buffers
+                        )
+                        groups.setdefault(self._shard_for(key), []).append((key, entry, freq))
+                        loaded += 1
+                        loaded_bytes += size_bytes
+
+                    for shard, group in groups.items():
+                        async with shard.lock:
+                            for key, entry, freq in group:
+                                # Escritas feitas durante a restauração prevalecem
+                                if key in shard.entries or not shard.restore(key, entry, freq):
+                                    loaded -= 1
+                    await asyncio.sleep(0)
         except Exception as e:
-            logger.error(f"Erro na eviction: {e}")
-            return False
+            logger.error(f"Erro ao restaurar snapshot {path}: {e}")
 
-    def _remove_entry(self, key: str):
-        """Remove entrada do cache e estruturas de tracking."""
-        if key in self._cache:
-            entry = self._cache[key]
-            self._stats.total_size_bytes -= entry.size_bytes
-            del self._cache[key]
-            self._stats.current_size = len(self._cache)
-        
-        # Remover das estruturas de tracking
-        if self._eviction_policy == EvictionPolicy.FIFO:
+        if not complete:
+            self._snapshot_metrics["truncated_snapshots"] += 1
+            logger.warning(f"Snapshot truncado ou corrompido: {path} (restauradas {loaded} entradas)")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._snapshot_metrics["loads"] += 1
+        self._snapshot_metrics["last_load_ms"] = round(elapsed_ms, 2)
+        self._snapshot_metrics["last_loaded_entries"] = loaded
+        logger.info(f"Snapshot do cache restaurado: {loaded} entradas em {elapsed_ms:.0f}ms")
+        return loaded
+
+    async def start_snapshots(
+        self,
+        path: Optional[str] = None,
+        interval_sec: Optional[float] = None,
+        restore: bool = True
+    ):
+        """
+        Restaura o último snapshot em background e agenda snapshots periódicos.
+
+        O cache serve pedidos durante a restauração (misses até a chave
+        ser carregada).
+        """
+        self._snapshot_path = path or self._snapshot_path
+        if not self._snapshot_path:
+            raise ValueError("Caminho do snapshot não configurado")
+        if restore and self._restore_task is None:
+            self._restore_task = asyncio.create_task(self.load_snapshot())
+        if self._snapshot_task is None:
+            interval = interval_sec or settings.cache.snapshot_interval_sec
+            self._snapshot_task = asyncio.create_task(self._periodic_snapshots(interval))
+            logger.info(f"Snapshots do cache ativos: {self._snapshot_path} (a cada {interval:.0f}s)")
+
+    async def stop_snapshots(self, final_snapshot: bool = True):
+        """Para os snapshots periódicos e grava um snapshot final."""
+        for task in (self._restore_task, self._snapshot_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        restored = self._restore_task is None or not self._restore_task.cancelled()
+        self._restore_task = self._snapshot_task = None
+        # Um snapshot final com a restauração a meio perderia as entradas em falta
+        if final_snapshot and self._snapshot_path and restored:
+            await self.save_snapshot()
+
+    async def _periodic_snapshots(self, interval_sec: float):
+        """Loop de snapshots executado em background."""
+        while True:
+            await asyncio.sleep(interval_sec)
+            if self._restore_task is not None and not self._restore_task.done():
+                continue
             try:
-                self._order_tracker.remove(key)
-            except ValueError:
-                pass
-        elif self._eviction_policy == EvictionPolicy.LRU:
-            self._order_tracker.pop(key, None)
-        elif self._eviction_policy == EvictionPolicy.LFU:
-            self._frequency_tracker.pop(key, None)
-
-    def _update_tracking_structures(self, key: str):
-        """Atualiza estruturas de tracking para eviction."""
-        if self._eviction_policy == EvictionPolicy.FIFO:
-            self._order_tracker.append(key)
-        elif self._eviction_policy == EvictionPolicy.LRU:
-            self._order_tracker[key] = None  # OrderedDict mantém ordem
-        elif self._eviction_policy == EvictionPolicy.LFU:
-            self._frequency_tracker[key] = 0
-
-    def _clear_tracking_structures(self):
-        """Limpa todas as estruturas de tracking."""
-        if self._eviction_policy == EvictionPolicy.FIFO:
-            self._order_tracker.clear()
-        elif self._eviction_policy == EvictionPolicy.LRU:
-            self._order_tracker.clear()
-        elif self._eviction_policy == EvictionPolicy.LFU:
-            self._frequency_tracker.clear()
-
-    def _update_avg_access_time(self, access_time: float):
-        """Atualiza tempo médio de acesso."""
-        total_accesses = self._stats.hits + self._stats.misses
-        if total_accesses > 0:
-            current_avg = self._stats.avg_access_time
-            new_avg = ((current_avg * (total_accesses - 1)) + access_time) / total_accesses
-            self._stats.avg_access_time = new_avg
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Erro ao gravar snapshot do cache: {e}")
 
     async def __aenter__(self):
         """Context manager entry."""
@@ -578,51 +1752,224 @@ class AsyncInMemoryCache:
 global_cache = AsyncInMemoryCache()
 
 
+# Cache de resultados de funções
+@dataclass
+class CachedResult:
+    """Resultado de função em cache com os metadados de frescura."""
+    value: Any
+    fresh_until: float  # time.time() a partir do qual o valor está vencido
+    compute_time: float  # Duração do cálculo (delta do XFetch)
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Converte um argumento numa estrutura JSON determinística.
+
+    Não usa str()/repr() de objetos arbitrários (endereços de memória,
+    ordem de sets, reprs ambíguos). Objetos sem representação estável
+    devem definir `__cache_key__()`; caso contrário levanta TypeError.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return {"__enum__": type(value).__qualname__, "value": _canonical(value.value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted(_dumps_canonical(item) for item in value)}
+    if isinstance(value, dict):
+        return {"__dict__": sorted(
+            [_dumps_canonical(k), _canonical(v)] for k, v in value.items()
+        )}
+    cache_key = getattr(value, "__cache_key__", None)
+    if callable(cache_key):
+        return {"__obj__": type(value).__qualname__, "key": _canonical(cache_key())}
+    if hasattr(value, "model_dump"):  # Modelos pydantic
+        return {"__obj__": type(value).__qualname__, "fields": _canonical(value.model_dump(mode="json"))}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {"__obj__": type(value).__qualname__, "fields": _canonical(dataclasses.asdict(value))}
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta, uuid.UUID, decimal.Decimal, PurePath)):
+        return {"__obj__": type(value).__qualname__, "value": str(value)}
+    raise TypeError(
+        f"Argumento do tipo {type(value).__qualname__} sem chave de cache estável "
+        f"(defina __cache_key__)"
+    )
+
+
+def _dumps_canonical(value: Any) -> str:
+    return json.dumps(_canonical(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_call_key(func: Callable, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """
+    Chave determinística de uma chamada de função.
+
+    Os argumentos são ligados à assinatura (com valores padrão), pelo que
+    f(1, b=2) e f(a=1) com b=2 por omissão geram a mesma chave.
+
+    Raises:
+        TypeError: Se algum argumento não tiver representação estável
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    except (TypeError, ValueError):
+        arguments = {"args": list(args), "kwargs": kwargs}
+    payload = _dumps_canonical([f"{func.__module__}.{func.__qualname__}", arguments])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Voos únicos por chave e refrescamentos em segundo plano
+_function_flights = RequestCoalescer(enabled=True)
+_refreshing: Dict[str, asyncio.Task] = {}
+_function_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stale_served": 0,
+    "early_refreshes": 0,
+    "background_refreshes": 0,
+    "refresh_failures": 0,
+    "uncacheable_calls": 0,
+}
+
+
+def get_function_cache_metrics() -> Dict[str, Any]:
+    """Métricas do cache de funções (cache_result)."""
+    flights = _function_flights.get_metrics()
+    return {
+        **_function_cache_stats,
+        "coalesced_calls": flights["coalesced_calls"],
+        "in_flight": flights["in_flight"],
+        "refreshing": len(_refreshing),
+    }
+
+
+def _should_refresh(record: CachedResult, now: float, beta: float) -> bool:
+    """
+    Expiração antecipada probabilística (XFetch).
+
+    Perto do fim do TTL cada leitura tem uma probabilidade crescente de
+    refrescar o valor, proporcional ao tempo de cálculo, espalhando os
+    refrescamentos em vez de os concentrar no instante da expiração.
+    """
+    if beta <= 0 or record.compute_time <= 0:
+        return now >= record.fresh_until
+    return now - record.compute_time * beta * math.log(1.0 - random.random()) >= record.fresh_until
+
+
+def _default_function_cache() -> "TieredCache":
+    """Cache padrão do cache_result: L1 local + L2 partilhado entre workers."""
+    from app.core.cache_tiered import tiered_cache  # Import tardio: cache_tiered depende deste módulo
+    return tiered_cache
+
+
+def _refresh_in_background(flight_key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+    """Agenda um refrescamento único por chave (as leituras seguintes não esperam)."""
+    if flight_key in _refreshing:
+        return
+    _function_cache_stats["background_refreshes"] += 1
+    task = asyncio.ensure_future(_function_flights.run(flight_key, compute))
+    _refreshing[flight_key] = task
+
+    def _done(finished: asyncio.Task) -> None:
+        _refreshing.pop(flight_key, None)
+        if not finished.cancelled() and finished.exception() is not None:
+            _function_cache_stats["refresh_failures"] += 1
+            logger.warning(f"Refrescamento em segundo plano falhou: {finished.exception()}")
+
+    task.add_done_callback(_done)
+
+
 # Decorator para cache de função
 def cache_result(
     ttl: Optional[int] = None,
     key_prefix: str = "",
     namespace: str = "functions",
-    include_args: bool = True
+    include_args: bool = True,
+    stale_ttl: int = 0,
+    early_expiration_beta: float = 1.0,
+    key_builder: Optional[Callable[..., str]] = None,
+    cache: Optional[Union[AsyncInMemoryCache, "TieredCache"]] = None
 ):
     """
     Decorator para cachear resultados de funções assíncronas.
+
+    Por omissão usa o tiered_cache: com L2 ativo, um resultado calculado
+    num worker serve os restantes. Misses concorrentes da mesma chave partilham uma única execução
+    (single-flight). Com stale_ttl, um valor vencido continua a ser
+    servido durante essa janela enquanto uma tarefa o refresca. Perto da
+    expiração, a expiração antecipada probabilística refresca o valor em
+    segundo plano antes de vencer. Resultados None não são cacheados.
     
     Args:
-        ttl: TTL específico
+        ttl: TTL específico (tempo em que o valor é fresco)
         key_prefix: Prefixo da chave
         namespace: Namespace do cache
         include_args: Incluir argumentos na chave
+        stale_ttl: Janela após o TTL em que o valor vencido ainda é servido
+        early_expiration_beta: Agressividade da expiração antecipada (0 desliga)
+        key_builder: Função (func, args, kwargs) -> chave (padrão: build_call_key)
+        cache: Cache a usar (padrão: tiered_cache)
     """
     def decorator(func: Callable):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
+            store = cache if cache is not None else _default_function_cache()
+            fresh_ttl = ttl if ttl is not None else settings.cache.ttl_sec
+
             # Gerar chave do cache
             if include_args:
-                key_parts = [func.__name__]
-                if args:
-                    key_parts.extend(str(arg) for arg in args)
-                if kwargs:
-                    key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-                cache_key = hashlib.md5("|".join(key_parts).encode()).hexdigest()
+                try:
+                    cache_key = (key_builder or build_call_key)(func, args, kwargs)
+                except TypeError as e:
+                    _function_cache_stats["uncacheable_calls"] += 1
+                    logger.debug(f"Chamada de {func.__name__} sem cache: {e}")
+                    return await func(*args, **kwargs)
             else:
                 cache_key = func.__name__
             
             if key_prefix:
                 cache_key = f"{key_prefix}:{cache_key}"
-            
-            # Tentar obter do cache
-            result = await global_cache.get(cache_key, namespace=namespace)
-            
-            if result is not None:
-                logger.debug(f"Cache hit para função {func.__name__}")
+            flight_key = f"{namespace}:{cache_key}"
+
+            async def compute():
+                start = time.perf_counter()
+                result = await func(*args, **kwargs)
+                if result is not None:
+                    record = CachedResult(
+                        value=result,
+                        fresh_until=time.time() + fresh_ttl,
+                        compute_time=time.perf_counter() - start
+                    )
+                    await store.set(cache_key, record, ttl=fresh_ttl + stale_ttl, namespace=namespace)
+                    logger.debug(f"Resultado da função {func.__name__} cacheado")
                 return result
             
-            # Executar função e cachear resultado
-            result = await func(*args, **kwargs)
-            await global_cache.set(cache_key, result, ttl=ttl, namespace=namespace)
+            # Tentar obter do cache
+            record = await store.get(cache_key, namespace=namespace)
+            if isinstance(record, CachedResult):
+                now = time.time()
+                if not _should_refresh(record, now, early_expiration_beta):
+                    _function_cache_stats["hits"] += 1
+                    logger.debug(f"Cache hit para função {func.__name__}")
+                    return record.value
+                if now < record.fresh_until:
+                    # Expiração antecipada: ainda fresco, refrescar sem esperar
+                    _function_cache_stats["early_refreshes"] += 1
+                    _refresh_in_background(flight_key, compute)
+                    return record.value
+                if stale_ttl > 0:
+                    # Stale-while-revalidate
+                    _function_cache_stats["stale_served"] += 1
+                    _refresh_in_background(flight_key, compute)
+                    return record.value
             
-            logger.debug(f"Resultado da função {func.__name__} cacheado")
-            return result
+            # Miss: uma única execução por chave
+            _function_cache_stats["misses"] += 1
+            return await _function_flights.run(flight_key, compute)
         
         return wrapper
     return decorator
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Codecs do Cache.
+
+Serialização e compressão dos valores do AsyncInMemoryCache, configuráveis
+por namespace:
+- Identidade para valores imutáveis pequenos (sem pickle)
+- Pickle protocolo 5 com buffers fora de banda (arrays numpy, etc.)
+- Compressão zlib/lzma/gzip com nível configurável e, se instalados,
+  zstandard ou lz4 (mais rápidos)
+- Escolha automática: abaixo do limiar não comprime; acima, a razão de
+  compressão é amostrada e só se comprime quando compensa
+- Estatísticas de tempo e bytes por codec
+"""
+import gzip
+import logging
+import lzma
+import pickle
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Compressores opcionais
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    HAS_ZSTD = False
+
+try:
+    import lz4.frame as lz4_frame
+    HAS_LZ4 = True
+except ImportError:
+    lz4_frame = None
+    HAS_LZ4 = False
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+PICKLE = "pickle"
+
+# Tipos guardados por referência (imutáveis)
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, complex, type(None))
+
+
+@dataclass(frozen=True)
+class CompressorSpec:
+    """Compressor disponível para o cache."""
+    name: str
+    compress: Callable[[bytes, int], bytes]
+    decompress: Callable[[bytes], bytes]
+    default_level: int
+    fast_level: int
+
+
+COMPRESSORS: Dict[str, CompressorSpec] = {
+    "zlib": CompressorSpec("zlib", lambda d, l: zlib.compress(d, l), zlib.decompress, 6, 1),
+    "gzip": CompressorSpec(
+        "gzip", lambda d, l: gzip.compress(d, compresslevel=l), gzip.decompress, 9, 1
+    ),
+    "lzma": CompressorSpec(
+        "lzma", lambda d, l: lzma.compress(d, preset=l), lzma.decompress, 6, 0
+    ),
+}
+
+if HAS_ZSTD:
+    COMPRESSORS["zstd"] = CompressorSpec(
+        "zstd",
+        lambda d, l: zstandard.ZstdCompressor(level=l).compress(d),
+        lambda d: zstandard.ZstdDecompressor().decompress(d),
+        3, 1
+    )
+
+if HAS_LZ4:
+    COMPRESSORS["lz4"] = CompressorSpec(
+        "lz4",
+        lambda d, l: lz4_frame.compress(d, compression_level=l),
+        lz4_frame.decompress,
+        0, 0
+    )
+
+# Compressor usado em modo "auto": o mais rápido instalado
+FAST_COMPRESSOR = "zstd" if HAS_ZSTD else "lz4" if HAS_LZ4 else "zlib"
+
+
+@dataclass
+class CodecConfig:
+    """Configuração de codec de um namespace."""
+    serializer: str = "auto"  # auto | pickle | identity
+    compressor: str = "auto"  # auto | none | zlib | gzip | lzma | zstd | lz4
+    level: Optional[int] = None  # None usa o nível rápido (auto) ou o padrão
+    size_threshold: int = 1024  # Só comprime acima deste tamanho (bytes)
+    identity_max_bytes: int = 1024  # Imutáveis até este tamanho ficam por referência
+    min_saving: float = 0.2  # Economia mínima para guardar comprimido
+    sample_every: int = 16  # Reamostrar a razão de compressão a cada N valores
+
+    def resolve_compressor(self) -> Optional[CompressorSpec]:
+        """Compressor efetivo (None = sem compressão)."""
+        if self.compressor == "none":
+            return None
+        if self.compressor == "auto":
+            return COMPRESSORS[FAST_COMPRESSOR]
+        spec = COMPRESSORS.get(self.compressor)
+        if spec is None:
+            logger.warning(
+                f"Compressor '{self.compressor}' indisponível, usando '{FAST_COMPRESSOR}'"
+            )
+            return COMPRESSORS[FAST_COMPRESSOR]
+        return spec
+
+
+@dataclass
+class EncodedValue:
+    """Valor codificado pronto a guardar numa entrada do cache."""
+    payload: Any
+    codec: str  # identity | pickle | pickle+<compressor>
+    size_bytes: int
+    buffers: Optional[List[bytes]] = None
+
+    @property
+    def compressed(self) -> bool:
+        return "+" in self.codec
+
+
+@dataclass
+class CodecStats:
+    """Tempo e volume de um codec."""
+    encodes: int = 0
+    decodes: int = 0
+    encode_time: float = 0.0
+    decode_time: float = 0.0
+    bytes_in: int = 0  # Tamanho serializado antes de comprimir
+    bytes_out: int = 0  # Tamanho guardado
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "encodes": self.encodes,
+            "decodes": self.decodes,
+            "avg_encode_us": round(self.encode_time / self.encodes * 1e6, 2) if self.encodes else 0.0,
+            "avg_decode_us": round(self.decode_time / self.decodes * 1e6, 2) if self.decodes else 0.0,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 1.0,
+        }
+
+
+@dataclass
+class _RatioSampler:
+    """Razão de compressão observada de um namespace (média móvel)."""
+    ratio: Optional[float] = None
+    seen: int = 0
+    samples: int = 0
+
+    def should_sample(self, every: int) -> bool:
+        self.seen += 1
+        return self.ratio is None or self.seen % max(1, every) == 0
+
+    def observe(self, ratio: float) -> None:
+        self.samples += 1
+        self.ratio = ratio if self.ratio is None else self.ratio + 0.25 * (ratio - self.ratio)
+
+
+def _is_small_immutable(value: Any, max_bytes: int) -> bool:
+    """Valor imutável (ou tuplo de imutáveis) pequeno o suficiente para ficar por referência."""
+    if isinstance(value, tuple):
+        return (
+            len(value) <= 16
+            and all(isinstance(item, _IMMUTABLE_TYPES) for item in value)
+            and sys.getsizeof(value) + sum(_immutable_size(item) for item in value) <= max_bytes
+        )
+    return isinstance(value, _IMMUTABLE_TYPES) and _immutable_size(value) <= max_bytes
+
+
+def _immutable_size(value: Any) -> int:
+    return sys.getsizeof(value)
+
+
+class CodecPipeline:
+    """
+    Escolhe e aplica o codec de cada valor, por namespace.
+
+    A codificação corre fora dos locks do cache. Falhas de serialização
+    (objetos não serializáveis) guardam o valor por referência, e a
+    descodificação respeita sempre o codec registado na entrada.
+    """
+
+    def __init__(
+        self,
+        default: Optional[CodecConfig] = None,
+        namespaces: Optional[Dict[str, CodecConfig]] = None
+    ):
+        self._default = default or CodecConfig()
+        self._namespaces: Dict[str, CodecConfig] = dict(namespaces or {})
+        self._samplers: Dict[Optional[str], _RatioSampler] = {}
+        self._stats: Dict[str, CodecStats] = {}
+
+    def configure(self, namespace: Optional[str], config: CodecConfig) -> None:
+        """Define o codec de um namespace (None = padrão)."""
+        if namespace is None:
+            self._default = config
+        else:
+            self._namespaces[namespace] = config
+        self._samplers.pop(namespace, None)
+
+    def config_for(self, namespace: Optional[str]) -> CodecConfig:
+        if namespace is None:
+            return self._default
+        return self._namespaces.get(namespace, self._default)
+
+    def _record(self, codec: str, encode: bool, elapsed: float, bytes_in: int = 0, bytes_out: int = 0):
+        stats = self._stats.get(codec)
+        if stats is None:
+            stats = self._stats[codec] = CodecStats()
+        if encode:
+            stats.encodes += 1
+            stats.encode_time += elapsed
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+        else:
+            stats.decodes += 1
+            stats.decode_time += elapsed
+
+    def encode(self, value: Any, namespace: Optional[str] = None) -> EncodedValue:
+        """Codifica um valor segundo a configuração do namespace."""
+        config = self.config_for(namespace)
+        start = time.perf_counter()
+
+        # Imutáveis pequenos: guardar por referência
+        if config.serializer == IDENTITY or (
+            config.serializer == "auto" and _is_small_immutable(value, config.identity_max_bytes)
+        ):
+            size = _immutable_size(value)
+            self._record(IDENTITY, True, time.perf_counter() - start, size, size)
+            return EncodedValue(value, IDENTITY, size)
+
+        # Pickle 5: buffers grandes (ex.: numpy) ficam fora do fluxo principal
+        buffers: List[pickle.PickleBuffer] = []
+        try:
+            data = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+        except Exception as e:
+            logger.warning(f"Valor não serializável guardado por referência: {e}")
+            size = sys.getsizeof(value)
+            self._record(IDENTITY, True, time.perf_counter() - start, size, size)
+            return EncodedValue(value, IDENTITY, size)
+
+        raw_buffers = [bytes(buffer.raw()) for buffer in buffers] or None
+        buffers_size = sum(len(b) for b in raw_buffers) if raw_buffers else 0
+        serialized_size = len(data) + buffers_size
+        codec = PICKLE
+        payload = data
+
+        compressor = config.resolve_compressor()
+        if compressor is not None and len(data) > config.size_threshold:
+            sampler = self._samplers.get(namespace)
+            if sampler is None:
+                sampler = self._samplers[namespace] = _RatioSampler()
+            sampling = sampler.should_sample(config.sample_every)
+            # Fora das amostras, só comprimir se a razão observada compensa
+            if sampling or sampler.ratio <= 1 - config.min_saving:
+                level = config.level
+                if level is None:
+                    level = compressor.fast_level if config.compressor == "auto" else compressor.default_level
+                compressed = compressor.compress(data, level)
+                ratio = len(compressed) / len(data)
+                if sampling:
+                    sampler.observe(ratio)
+                if ratio <= 1 - config.min_saving:
+                    payload = compressed
+                    codec = f"{PICKLE}+{compressor.name}"
+
+        stored_size = len(payload) + buffers_size
+        self._record(codec, True, time.perf_counter() - start, serialized_size, stored_size)
+        return EncodedValue(payload, codec, stored_size, raw_buffers)
+
+    def decode(self, payload: Any, codec: str, buffers: Optional[List[bytes]] = None) -> Any:
+        """Descodifica um valor guardado com `codec`."""
+        if codec == IDENTITY:
+            return payload
+        start = time.perf_counter()
+        serializer, _, compressor = codec.partition("+")
+        data = COMPRESSORS[compressor].decompress(payload) if compressor else payload
+        value = pickle.loads(data, buffers=buffers or ())
+        self._record(codec, False, time.perf_counter() - start)
+        return value
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Estatísticas por codec e razões amostradas por namespace."""
+        return {
+            "available_compressors": sorted(COMPRESSORS),
+            "by_codec": {codec: stats.to_dict() for codec, stats in self._stats.items()},
+            "sampled_ratio": {
+                (namespace or "default"): round(sampler.ratio, 3)
+                for namespace, sampler in self._samplers.items()
+                if sampler.ratio is not None
+            },
+        }
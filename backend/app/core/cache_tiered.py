@@ -0,0 +1,766 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Cache em Dois Níveis (L1 em processo + L2 partilhado).
+
+Combina o AsyncInMemoryCache de cada worker (L1) com um backend de
+protocolo Redis partilhado entre workers e nós (L2):
+- Leitura em cascata (L1 -> L2 -> loader) com preenchimento do L1
+- Operações em lote (get_many/set_many/delete_many) com pipeline no L2
+- Escrita síncrona nos dois níveis (write-through)
+- Cache negativo para chaves sabidamente inexistentes
+- Invalidação do L1 dos outros workers por pub/sub (com reconexão)
+- Taxas de acerto por nível e latência de ida e volta ao L2
+- Redis em processo (InMemoryRedis) para testes e desenvolvimento
+
+Os valores no L2 são serializados com pickle: o Redis tem de ser
+infraestrutura confiável, acessível apenas pela aplicação.
+"""
+import asyncio
+import json
+import logging
+import pickle
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+)
+
+from app.core.cache import AsyncInMemoryCache, BatchGetResult, global_cache
+from app.core.cache_codecs import COMPRESSORS, FAST_COMPRESSOR
+from app.core.config import settings
+from app.core.latency import LatencyWindow
+
+# Cliente Redis assíncrono (opcional)
+try:
+    import redis.asyncio as aioredis
+    HAS_REDIS = True
+except ImportError:
+    aioredis = None
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_L2_FAILED = object()
+
+
+class _NegativeMarker:
+    """Marca de chave sabidamente inexistente (sobrevive ao pickle como singleton)."""
+
+    def __reduce__(self):
+        return "NEGATIVE"
+
+    def __repr__(self) -> str:
+        return "NEGATIVE"
+
+
+NEGATIVE = _NegativeMarker()
+
+
+def _encode_l2(value: Any, compress_threshold: int) -> bytes:
+    """Serializa um valor para o L2 (cabeçalho com o codec + payload)."""
+    data = pickle.dumps(value, protocol=5)
+    if len(data) > compress_threshold:
+        spec = COMPRESSORS[FAST_COMPRESSOR]
+        compressed = spec.compress(data, spec.fast_level)
+        if len(compressed) < len(data):
+            return f"pickle+{spec.name}\n".encode() + compressed
+    return b"pickle\n" + data
+
+
+def _decode_l2(raw: bytes) -> Any:
+    """Descodifica um valor lido do L2."""
+    header, _, payload = raw.partition(b"\n")
+    _, _, compressor = header.decode().partition("+")
+    if compressor:
+        payload = COMPRESSORS[compressor].decompress(payload)
+    return pickle.loads(payload)
+
+
+class InMemoryPubSub:
+    """Subscrição pub/sub do InMemoryRedis (interface de redis.asyncio.client.PubSub)."""
+
+    def __init__(self, server: "InMemoryRedis"):
+        self._server = server
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.channels: Set[str] = set()
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self._server._subscribers[channel].append(self)
+            self.channels.add(channel)
+            self._queue.put_nowait({
+                "type": "subscribe", "pattern": None,
+                "channel": channel.encode(), "data": len(self.channels),
+            })
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in channels or tuple(self.channels):
+            subscribers = self._server._subscribers.get(channel, [])
+            if self in subscribers:
+                subscribers.remove(self)
+            self.channels.discard(channel)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            message = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if ignore_subscribe_messages and message["type"] == "subscribe":
+            return None
+        return message
+
+    async def listen(self) -> AsyncIterator[Dict[str, Any]]:
+        while self.channels:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        await self.unsubscribe()
+
+
+class InMemoryPipeline:
+    """
+    Pipeline do InMemoryRedis: acumula comandos e executa-os numa única
+    ida e volta (interface de redis.asyncio.client.Pipeline sem transação).
+    """
+
+    def __init__(self, server: "InMemoryRedis"):
+        self._server = server
+        self._commands: List[Tuple[str, tuple, Dict[str, Any]]] = []
+
+    def _queue(self, name: str, *args: Any, **kwargs: Any) -> "InMemoryPipeline":
+        self._commands.append((name, args, kwargs))
+        return self
+
+    def get(self, name: str) -> "InMemoryPipeline":
+        return self._queue("get", name)
+
+    def mget(self, names: List[str]) -> "InMemoryPipeline":
+        return self._queue("mget", names)
+
+    def set(self, name: str, value: Any, **kwargs: Any) -> "InMemoryPipeline":
+        return self._queue("set", name, value, **kwargs)
+
+    def delete(self, *names: str) -> "InMemoryPipeline":
+        return self._queue("delete", *names)
+
+    def pttl(self, name: str) -> "InMemoryPipeline":
+        return self._queue("pttl", name)
+
+    def publish(self, channel: str, message: Any) -> "InMemoryPipeline":
+        return self._queue("publish", channel, message)
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        await self._server._roundtrip()
+        return [getattr(self._server, f"_cmd_{name}")(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class InMemoryRedis:
+    """
+    Redis em processo com o subconjunto assíncrono usado pelo TieredCache.
+
+    Suporta GET, MGET, SET (ex/px/nx), DELETE, EXISTS, PTTL, PUBLISH,
+    pipeline() e pubsub(). Vários TieredCache podem partilhar a mesma
+    instância para simular workers; `latency_sec` simula a ida e volta
+    ao servidor e `commands` conta as idas e voltas.
+    """
+
+    def __init__(self, latency_sec: float = 0.0):
+        self.latency_sec = latency_sec
+        self.commands = 0
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._subscribers: Dict[str, List[InMemoryPubSub]] = defaultdict(list)
+
+    async def _roundtrip(self) -> None:
+        self.commands += 1
+        await asyncio.sleep(self.latency_sec)
+
+    def _alive(self, name: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        item = self._data.get(name)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return item
+
+    def _cmd_get(self, name: str) -> Optional[bytes]:
+        item = self._alive(name)
+        return item[0] if item else None
+
+    def _cmd_mget(self, names: List[str]) -> List[Optional[bytes]]:
+        return [self._cmd_get(name) for name in names]
+
+    def _cmd_set(
+        self,
+        name: str,
+        value: Any,
+        ex: Optional[float] = None,
+        px: Optional[int] = None,
+        nx: bool = False
+    ) -> Optional[bool]:
+        if nx and self._alive(name) is not None:
+            return None
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = None
+        if ex is not None:
+            expires_at = time.monotonic() + ex
+        elif px is not None:
+            expires_at = time.monotonic() + px / 1000
+        self._data[name] = (bytes(value), expires_at)
+        return True
+
+    def _cmd_delete(self, *names: str) -> int:
+        return sum(1 for name in names if self._alive(name) and self._data.pop(name, None))
+
+    def _cmd_exists(self, *names: str) -> int:
+        return sum(1 for name in names if self._alive(name) is not None)
+
+    def _cmd_pttl(self, name: str) -> int:
+        item = self._alive(name)
+        if item is None:
+            return -2
+        if item[1] is None:
+            return -1
+        return int((item[1] - time.monotonic()) * 1000)
+
+    def _cmd_publish(self, channel: str, message: Any) -> int:
+        if isinstance(message, str):
+            message = message.encode()
+        subscribers = list(self._subscribers.get(channel, ()))
+        for pubsub in subscribers:
+            pubsub._queue.put_nowait({
+                "type": "message", "pattern": None,
+                "channel": channel.encode(), "data": message,
+            })
+        return len(subscribers)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        await self._roundtrip()
+        return self._cmd_get(name)
+
+    async def mget(self, names: List[str]) -> List[Optional[bytes]]:
+        await self._roundtrip()
+        return self._cmd_mget(names)
+
+    async def set(self, name: str, value: Any, **kwargs: Any) -> Optional[bool]:
+        await self._roundtrip()
+        return self._cmd_set(name, value, **kwargs)
+
+    async def delete(self, *names: str) -> int:
+        await self._roundtrip()
+        return self._cmd_delete(*names)
+
+    async def exists(self, *names: str) -> int:
+        await self._roundtrip()
+        return self._cmd_exists(*names)
+
+    async def pttl(self, name: str) -> int:
+        await self._roundtrip()
+        return self._cmd_pttl(name)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        await self._roundtrip()
+        return self._cmd_publish(channel, message)
+
+    def pipeline(self, transaction: bool = False) -> InMemoryPipeline:
+        return InMemoryPipeline(self)
+
+    def pubsub(self) -> InMemoryPubSub:
+        return InMemoryPubSub(self)
+
+    async def aclose(self) -> None:
+        return None
+
+
+@dataclass
+class TieredCacheConfig:
+    """Configuração do cache em dois níveis."""
+    l2_enabled: bool = False  # Ligar ao Redis de redis_url em start()
+    redis_url: str = "redis://localhost:6379"
+    key_prefix: str = "muzaia:cache:"
+    invalidation_channel: str = "muzaia:cache:invalidate"
+    ttl_sec: int = 3600  # TTL padrão no L2
+    l1_ttl_sec: int = 60  # TTL máximo no L1 (limita a divergência se perder invalidações)
+    negative_ttl_sec: int = 30
+    l2_timeout_sec: float = 0.25  # Acima disto o L2 conta como falha (miss)
+    compress_threshold: int = 1024  # Comprime payloads do L2 acima deste tamanho
+    reconnect_delay_sec: float = 0.5  # Espera inicial antes de voltar a subscrever
+    max_reconnect_delay_sec: float = 30.0
+
+
+class TieredCache:
+    """
+    Cache em dois níveis: AsyncInMemoryCache local (L1) e Redis partilhado (L2).
+
+    Leituras tentam o L1, depois o L2 (preenchendo o L1 com o TTL
+    restante no L2) e, em get_or_load, o loader. Escritas vão para o L2,
+    publicam a invalidação da chave e atualizam o L1 local. Falhas ou
+    lentidão do L2 degradam para um miss, nunca para um erro do pedido;
+    valores que não serializam ficam só no L1.
+    """
+
+    def __init__(
+        self,
+        l1: Optional[AsyncInMemoryCache] = None,
+        redis: Any = None,
+        config: Optional[TieredCacheConfig] = None
+    ):
+        """
+        Inicializa o cache.
+
+        Args:
+            l1: Cache local (usa global_cache se None)
+            redis: Cliente Redis assíncrono ou InMemoryRedis (se None e
+                l2_enabled, liga a redis_url em start())
+            config: Configuração (padrões se None)
+        """
+        self.config = config or TieredCacheConfig()
+        self.l1 = l1 if l1 is not None else global_cache
+        self.node_id = uuid.uuid4().hex
+        self._redis = redis
+        self._owns_redis = False
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._listener_alive = False
+        self._started = False
+        self._l2_latency = LatencyWindow()
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "loads": 0,
+            "negative_stores": 0,
+            "l2_errors": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0,
+            "listener_reconnects": 0,
+            "unserializable_values": 0,
+        }
+
+    async def start(self) -> None:
+        """Liga ao L2 (se configurado) e subscreve as invalidações."""
+        if self._started:
+            return
+        self._started = True
+        if self._redis is None and self.config.l2_enabled:
+            if not HAS_REDIS:
+                logger.warning("Pacote redis não instalado, cache apenas com L1")
+                return
+            self._redis = aioredis.from_url(self.config.redis_url)
+            self._owns_redis = True
+        if self._redis is None:
+            return
+        try:
+            await self._subscribe()
+        except Exception as e:
+            # O listener continua a tentar subscrever em segundo plano
+            logger.warning(f"Invalidação do L1 indisponível: {e}")
+        self._listener = asyncio.create_task(self._listen())
+        logger.info(f"Cache L2 ativo (nó {self.node_id[:8]})")
+
+    async def _subscribe(self) -> None:
+        """Abre uma subscrição nova ao canal de invalidações."""
+        pubsub = self._redis.pubsub()
+        try:
+            await pubsub.subscribe(self.config.invalidation_channel)
+        except BaseException:
+            await pubsub.aclose()
+            raise
+        self._pubsub = pubsub
+        self._listener_alive = True
+
+    async def _close_pubsub(self) -> None:
+        self._listener_alive = False
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar a subscrição de invalidações: {e}")
+
+    async def stop(self) -> None:
+        """Cancela a subscrição e fecha a ligação ao L2 (se foi aberta aqui)."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._close_pubsub()
+        if self._owns_redis:
+            await self._redis.aclose()
+            self._redis = None
+            self._owns_redis = False
+        self._started = False
+
+    def _l2_key(self, key: str, namespace: Optional[str]) -> str:
+        return f"{self.config.key_prefix}{namespace or '_'}:{key}"
+
+    async def _l2_call(self, op: str, awaitable: Awaitable) -> Any:
+        """Executa um comando no L2 com timeout, medindo a ida e volta."""
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(awaitable, self.config.l2_timeout_sec)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._l2_latency.record(time.perf_counter() - start, success=False)
+            self._stats["l2_errors"] += 1
+            logger.warning(f"Falha no L2 ({op}): {e!r}")
+            return _L2_FAILED
+        self._l2_latency.record(time.perf_counter() - start)
+        return result
+
+    async def _lookup(self, key: str, namespace: Optional[str]) -> Any:
+        """Procura no L1 e depois no L2 (_MISSING se não existir)."""
+        value = await self.l1.get(key, _MISSING, namespace=namespace)
+        if value is not _MISSING:
+            self._stats["l1_hits"] += 1
+            return value
+
+        if self._redis is not None:
+            l2_key = self._l2_key(key, namespace)
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.get(l2_key)
+            pipe.pttl(l2_key)
+            result = await self._l2_call("get", pipe.execute())
+            raw, pttl = result if result is not _L2_FAILED else (None, None)
+            if raw is not None:
+                try:
+                    value = _decode_l2(raw)
+                except Exception as e:
+                    logger.error(f"Valor inválido no L2 para '{key}': {e}")
+                else:
+                    self._stats["l2_hits"] += 1
+                    await self.l1.set(
+                        key, value, ttl=self._l1_ttl(value, self._remaining_ttl(pttl)), namespace=namespace
+                    )
+                    return value
+
+        self._stats["misses"] += 1
+        return _MISSING
+
+    @staticmethod
+    def _remaining_ttl(pttl: Optional[int]) -> Optional[float]:
+        """TTL restante no L2 (segundos) a partir do PTTL; None se não tiver prazo."""
+        if pttl is None or pttl < 0:
+            return None
+        return pttl / 1000
+
+    def _l1_ttl(self, value: Any, ttl: Optional[float] = None) -> float:
+        """
+        TTL no L1: o do L2, limitado a l1_ttl_sec.
+
+        Sem L2 não há invalidações a perder e o L1 fica com o TTL pedido.
+        """
+        if ttl is None:
+            ttl = self.config.negative_ttl_sec if value is NEGATIVE else self.config.ttl_sec
+        if self._redis is None:
+            return ttl
+        return min(ttl, self.config.l1_ttl_sec)
+
+    def _encode(self, key: str, value: Any) -> Optional[bytes]:
+        """Serializa para o L2 (None se o valor não serializa)."""
+        try:
+            return _encode_l2(value, self.config.compress_threshold)
+        except Exception as e:
+            self._stats["unserializable_values"] += 1
+            logger.debug(f"Valor de '{key}' não serializável, fica só no L1: {e}")
+            return None
+
+    async def get(self, key: str, default: Any = None, namespace: Optional[str] = None) -> Any:
+        """
+        Obtém um valor (L1, depois L2).
+
+        Args:
+            key: Chave do cache
+            default: Valor se não existir ou estiver marcado como inexistente
+            namespace: Namespace opcional
+
+        Returns:
+            Valor armazenado ou default
+        """
+        value = await self._lookup(key, namespace)
+        if value is NEGATIVE:
+            self._stats["negative_hits"] += 1
+            return default
+        return default if value is _MISSING else value
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None
+    ) -> bool:
+        """
+        Grava um valor nos dois níveis e invalida o L1 dos outros workers.
+
+        Returns:
+            True se o L2 (quando existe) aceitou a escrita
+        """
+        ttl = ttl if ttl is not None else self.config.ttl_sec
+        stored = True
+        if self._redis is not None:
+            payload = self._encode(key, value)
+            if payload is None:
+                # A versão antiga no L2 deixaria de corresponder ao L1
+                await self._l2_call("delete", self._redis.delete(self._l2_key(key, namespace)))
+                stored = False
+            else:
+                result = await self._l2_call(
+                    "set",
+                    self._redis.set(self._l2_key(key, namespace), payload, px=max(1, int(ttl * 1000)))
+                )
+                stored = result is not _L2_FAILED
+            await self._publish_invalidation(key, namespace)
+        await self.l1.set(key, value, ttl=self._l1_ttl(value, ttl), namespace=namespace)
+        return stored
+
+    async def set_negative(self, key: str, namespace: Optional[str] = None, ttl: Optional[int] = None) -> bool:
+        """Marca uma chave como inexistente durante negative_ttl_sec."""
+        self._stats["negative_stores"] += 1
+        return await self.set(key, NEGATIVE, ttl=ttl or self.config.negative_ttl_sec, namespace=namespace)
+
+    async def delete(self, key: str, namespace: Optional[str] = None) -> bool:
+        """Remove uma chave dos dois níveis e invalida o L1 dos outros workers."""
+        removed = False
+        if self._redis is not None:
+            result = await self._l2_call("delete", self._redis.delete(self._l2_key(key, namespace)))
+            removed = result is not _L2_FAILED and bool(result)
+            await self._publish_invalidation(key, namespace)
+        return await self.l1.delete(key, namespace=namespace) or removed
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None,
+        default: Any = None
+    ) -> Any:
+        """
+        Leitura em cascata: L1, L2 e, em miss, o loader.
+
+        Um loader que retorna None fica em cache negativo, evitando repetir
+        a busca de chaves inexistentes em todos os workers.
+        """
+        value = await self._lookup(key, namespace)
+        if value is NEGATIVE:
+            self._stats["negative_hits"] += 1
+            return default
+        if value is not _MISSING:
+            return value
+
+        self._stats["loads"] += 1
+        value = await loader()
+        if value is None:
+            await self.set_negative(key, namespace=namespace)
+            return default
+        await self.set(key, value, ttl=ttl, namespace=namespace)
+        return value
+
+    async def get_many(self, keys: Iterable[str], namespace: Optional[str] = None) -> BatchGetResult:
+        """
+        Lê várias chaves: um lote no L1 e um único MGET no L2 para as em falta.
+
+        Chaves em cache negativo contam como em falta (misses).
+        """
+        local = await self.l1.get_many(keys, namespace=namespace)
+        result = BatchGetResult()
+        self._stats["l1_hits"] += len(local.hits)
+        self._collect(local.hits, result)
+
+        pending = local.misses
+        if pending and self._redis is not None:
+            l2_keys = [self._l2_key(key, namespace) for key in pending]
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.mget(l2_keys)
+            for l2_key in l2_keys:
+                pipe.pttl(l2_key)
+            replies = await self._l2_call("mget", pipe.execute())
+            if replies is not _L2_FAILED:
+                raws, pttls = replies[0], replies[1:]
+                found: Dict[str, Any] = {}
+                remaining: Dict[str, Optional[float]] = {}
+                missing: List[str] = []
+                for key, raw, pttl in zip(pending, raws, pttls):
+                    if raw is None:
+                        missing.append(key)
+                        continue
+                    try:
+                        found[key] = _decode_l2(raw)
+                    except Exception as e:
+                        logger.error(f"Valor inválido no L2 para '{key}': {e}")
+                        missing.append(key)
+                    else:
+                        remaining[key] = self._remaining_ttl(pttl)
+                self._stats["l2_hits"] += len(found)
+                self._collect(found, result)
+                await self._fill_l1(found, remaining, namespace)
+                pending = missing
+
+        self._stats["misses"] += len(pending)
+        result.misses.extend(pending)
+        return result
+
+    def _collect(self, values: Dict[str, Any], result: BatchGetResult) -> None:
+        """Separa valores encontrados de marcas de cache negativo."""
+        for key, value in values.items():
+            if value is NEGATIVE:
+                self._stats["negative_hits"] += 1
+                result.misses.append(key)
+            else:
+                result.hits[key] = value
+
+    async def _fill_l1(
+        self,
+        values: Dict[str, Any],
+        remaining: Dict[str, Optional[float]],
+        namespace: Optional[str]
+    ) -> None:
+        """
+        Preenche o L1 com valores lidos do L2, cada um com o TTL que lhe
+        resta no L2 (agrupados por TTL para gravar em lote).
+        """
+        groups: Dict[float, Dict[str, Any]] = defaultdict(dict)
+        for key, value in values.items():
+            groups[self._l1_ttl(value, remaining.get(key))][key] = value
+        for ttl, group in groups.items():
+            await self.l1.set_many(group, ttl=ttl, namespace=namespace)
+
+    async def set_many(
+        self,
+        items: Mapping[str, Any],
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None
+    ) -> Dict[str, bool]:
+        """
+        Grava vários valores: SETs e a invalidação num único pipeline do L2
+        e um lote no L1.
+
+        Returns:
+            Mapa chave -> True se o L2 (quando existe) aceitou a escrita
+        """
+        ttl = ttl if ttl is not None else self.config.ttl_sec
+        stored = {key: True for key in items}
+        if self._redis is not None and items:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, value in items.items():
+                payload = self._encode(key, value)
+                if payload is None:
+                    pipe.delete(self._l2_key(key, namespace))
+                    stored[key] = False
+                else:
+                    pipe.set(self._l2_key(key, namespace), payload, px=max(1, int(ttl * 1000)))
+            pipe.publish(self.config.invalidation_channel, self._invalidation_message(items, namespace))
+            if await self._l2_call("set_many", pipe.execute()) is _L2_FAILED:
+                stored = {key: False for key in items}
+            else:
+                self._stats["invalidations_sent"] += 1
+        await self.l1.set_many(items, ttl=self._l1_ttl(None, ttl), namespace=namespace)
+        return stored
+
+    async def delete_many(self, keys: Iterable[str], namespace: Optional[str] = None) -> int:
+        """
+        Remove várias chaves: um DEL e a invalidação num único pipeline do L2.
+
+        Returns:
+            Número de chaves removidas (no L2, ou no L1 sem L2)
+        """
+        keys = list(keys)
+        removed = 0
+        if self._redis is not None and keys:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.delete(*(self._l2_key(key, namespace) for key in keys))
+            pipe.publish(self.config.invalidation_channel, self._invalidation_message(keys, namespace))
+            result = await self._l2_call("delete_many", pipe.execute())
+            if result is not _L2_FAILED:
+                removed = result[0]
+                self._stats["invalidations_sent"] += 1
+        return max(removed, await self.l1.delete_many(keys, namespace=namespace))
+
+    def _invalidation_message(self, keys: Iterable[str], namespace: Optional[str]) -> str:
+        return json.dumps({"node": self.node_id, "ns": namespace, "keys": list(keys)})
+
+    async def _publish_invalidation(self, key: str, namespace: Optional[str]) -> None:
+        message = self._invalidation_message([key], namespace)
+        result = await self._l2_call("publish", self._redis.publish(self.config.invalidation_channel, message))
+        if result is not _L2_FAILED:
+            self._stats["invalidations_sent"] += 1
+
+    async def _listen(self) -> None:
+        """
+        Remove do L1 as chaves alteradas por outros workers.
+
+        Se a ligação cair, volta a subscrever com espera exponencial; as
+        invalidações perdidas entretanto ficam limitadas pelo l1_ttl_sec.
+        """
+        delay = self.config.reconnect_delay_sec
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    self._stats["listener_reconnects"] += 1
+                    logger.info("Subscrição de invalidações do L1 restabelecida")
+                delay = self.config.reconnect_delay_sec
+                async for message in self._pubsub.listen():
+                    await self._handle_invalidation(message)
+                raise ConnectionError("subscrição fechada pelo servidor")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscrição de invalidações do L1 perdida: {e!r} (nova tentativa em {delay:.1f}s)")
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.config.max_reconnect_delay_sec)
+
+    async def _handle_invalidation(self, message: Dict[str, Any]) -> None:
+        if message.get("type") != "message":
+            return
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("node") == self.node_id:
+            return
+        keys = data.get("keys") or []
+        self._stats["invalidations_received"] += len(keys)
+        await self.l1.delete_many(keys, namespace=data.get("ns"))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Taxas de acerto por nível, invalidações e latência do L2."""
+        stats = self._stats
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        l1_misses = lookups - stats["l1_hits"]
+        return {
+            "l2_connected": self._redis is not None,
+            "listener_alive": self._listener_alive,
+            "node_id": self.node_id,
+            **stats,
+            "lookups": lookups,
+            "l1_hit_rate": stats["l1_hits"] / lookups if lookups else 0.0,
+            "l2_hit_rate": stats["l2_hits"] / l1_misses if l1_misses else 0.0,
+            "hit_rate": (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0,
+            "l2_latency": self._l2_latency.snapshot(),
+        }
+
+
+# Instância global (L2 ativo com cache.l2_enabled)
+tiered_cache = TieredCache(
+    config=TieredCacheConfig(
+        l2_enabled=settings.cache.l2_enabled,
+        redis_url=settings.REDIS_URL,
+        ttl_sec=settings.cache.ttl_sec,
+        l1_ttl_sec=settings.cache.l1_ttl_sec,
+        negative_ttl_sec=settings.cache.negative_ttl_sec,
+        l2_timeout_sec=settings.cache.l2_timeout_sec,
+    )
+)
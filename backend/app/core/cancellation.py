@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Propagação de Cancelamento.
+
+Quando o cliente desiste (fecha o separador, a ligação HTTP ou o
+WebSocket), o trabalho da requisição é cancelado até à chamada ao
+provedor LLM, em vez de continuar a consumir tokens e slots de
+concorrência para uma resposta que ninguém vai ler:
+- `run_until_disconnected` corre o handler numa task e cancela-a se o
+  cliente HTTP se desconectar
+- `cancellation_metrics` conta o trabalho cancelado por origem
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.exceptions import MuzaiaError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Código não padronizado (nginx) para "cliente fechou a requisição"
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnectedError(MuzaiaError):
+    """Cliente desconectou-se antes de a resposta estar pronta."""
+
+    def __init__(self, message: str = "Cliente desconectado", source: str = "http"):
+        super().__init__(message, code="CLIENT_DISCONNECTED")
+        self.source = source
+
+
+class CancellationMetrics:
+    """Contadores de trabalho cancelado por desconexão do cliente."""
+
+    def __init__(self):
+        self._by_source: Dict[str, int] = {}
+        self._elapsed_total = 0.0
+        self._total = 0
+
+    def record(self, source: str, elapsed: Optional[float] = None) -> None:
+        """
+        Regista um cancelamento.
+
+        Args:
+            source: Origem (http, sse, websocket...)
+            elapsed: Tempo de trabalho já gasto até ao cancelamento
+        """
+        self._by_source[source] = self._by_source.get(source, 0) + 1
+        self._total += 1
+        if elapsed is not None:
+            self._elapsed_total += elapsed
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de cancelamento."""
+        return {
+            "total": self._total,
+            "by_source": dict(self._by_source),
+            "avg_elapsed_before_cancel_sec": (
+                round(self._elapsed_total / self._total, 3) if self._total else 0.0
+            ),
+        }
+
+
+async def run_until_disconnected(
+    request: Any,
+    awaitable: Awaitable[T],
+    poll_interval: Optional[float] = None,
+    source: str = "http"
+) -> T:
+    """
+    Executa `awaitable` e cancela-o se o cliente HTTP se desconectar.
+
+    O Starlette só observa a desconexão quando o handler lê o corpo ou
+    escreve a resposta; um handler à espera do LLM continuaria até ao
+    fim. Aqui o handler corre numa task e a ligação é verificada a cada
+    `poll_interval` segundos.
+
+    Args:
+        request: Requisição Starlette/FastAPI (precisa de is_disconnected)
+        awaitable: Trabalho a executar
+        poll_interval: Intervalo entre verificações (default das configurações)
+        source: Origem registada nas métricas
+
+    Returns:
+        Resultado do awaitable
+
+    Raises:
+        ClientDisconnectedError: Se o cliente se desconectou primeiro
+    """
+    interval = poll_interval or settings.llm.disconnect_poll_interval_sec
+    task = asyncio.ensure_future(awaitable)
+    start = time.monotonic()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        # Cancelamento do próprio handler (ex.: shutdown) também se propaga
+        task.cancel()
+        raise
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.debug(f"Erro ignorado após desconexão do cliente: {e}")
+
+    elapsed = time.monotonic() - start
+    cancellation_metrics.record(source, elapsed)
+    logger.info(f"Requisição cancelada após {elapsed:.3f}s: cliente desconectado ({source})")
+    raise ClientDisconnectedError(source=source)
+
+
+# Instância global
+cancellation_metrics = CancellationMetrics()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Coalescência de Requisições (single-flight).
+
+Agrupa chamadas idênticas em voo para que apenas uma requisição
+chegue ao provedor:
+- Chave determinística sobre modelo, prompts, contexto e parâmetros
+- Partilha da mesma LLMResponse entre chamadas concorrentes
+- Fan-out de streaming com replay para subscritores tardios
+- Cancelamento do voo quando todos os chamadores desistem
+- Métricas de deduplicação
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.protocols import LLMStreamChunk
+from app.schemas import GenerationParams
+
+logger = logging.getLogger(__name__)
+
+
+def build_request_key(
+    provider: str,
+    model_name: str,
+    prompt: str,
+    context: str = "",
+    system_prompt: Optional[str] = None,
+    params: Optional[GenerationParams] = None
+) -> str:
+    """
+    Constrói chave determinística para uma requisição LLM.
+
+    Args:
+        provider: Nome do provedor
+        model_name: Nome do modelo
+        prompt: Prompt principal
+        context: Contexto adicional
+        system_prompt: Prompt do sistema
+        params: Parâmetros de geração
+
+    Returns:
+        Hash SHA-256 hexadecimal da requisição
+    """
+    payload = {
+        "provider": provider,
+        "model": model_name,
+        "system_prompt": system_prompt,
+        "context": context,
+        "prompt": prompt,
+        "params": params.model_dump(exclude_none=True) if params else None,
+    }
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CoalescerStats:
+    """Estatísticas do coalescedor."""
+    leader_calls: int = 0
+    coalesced_calls: int = 0
+    stream_leader_calls: int = 0
+    stream_coalesced_calls: int = 0
+    shared_failures: int = 0
+    cancelled_flights: int = 0
+
+    @property
+    def dedup_rate(self) -> float:
+        """Percentagem de chamadas servidas por um voo já existente."""
+        total = (
+            self.leader_calls + self.coalesced_calls +
+            self.stream_leader_calls + self.stream_coalesced_calls
+        )
+        deduplicated = self.coalesced_calls + self.stream_coalesced_calls
+        return (deduplicated / total * 100) if total > 0 else 0.0
+
+
+class _Flight:
+    """Requisição única em voo partilhada por vários chamadores."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.callers = 0  # Total de chamadores que se juntaram ao voo
+
+
+class _StreamBroadcast:
+    """
+    Fan-out de um stream do provedor para múltiplos subscritores.
+
+    Os chunks ficam num buffer para que subscritores que cheguem a meio
+    recebam a resposta completa desde o início.
+    """
+
+    def __init__(self):
+        self.chunks: List[LLMStreamChunk] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def _notify(self) -> None:
+        """Acorda subscritores à espera de novos chunks."""
+        event = self._updated
+        self._updated = asyncio.Event()
+        event.set()
+
+    async def pump(self, source: AsyncIterator[LLMStreamChunk]) -> None:
+        """Consome o stream de origem e distribui os chunks."""
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            # Fechar já a origem (liberta a conexão ao provedor)
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def subscribe(self) -> AsyncGenerator[LLMStreamChunk, None]:
+        """Itera sobre os chunks, incluindo os já emitidos."""
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                # Cópia para que metadados por chamador não se misturem
+                yield dict(self.chunks[index])
+                index += 1
+                continue
+
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+            await self._updated.wait()
+
+
+class RequestCoalescer:
+    """
+    Camada single-flight para chamadas LLM idênticas.
+
+    Características:
+    - Um único pedido ao provedor por chave em voo
+    - Resultado e exceções partilhados entre chamadores
+    - Fan-out de streaming com replay
+    - Cancelamento do voo quando o último chamador é cancelado
+    - Métricas de deduplicação
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """
+        Inicializa o coalescedor.
+
+        Args:
+            enabled: Habilitar coalescência (usa config se None)
+        """
+        self._enabled = (
+            enabled
+            if enabled is not None
+            else settings.llm.request_coalescing_enabled
+        )
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamBroadcast] = {}
+        self._stats = CoalescerStats()
+
+        logger.info(f"Request coalescer inicializado: enabled={self._enabled}")
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se a coalescência está ativa."""
+        return self._enabled
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa `func` uma única vez por chave em voo.
+
+        Args:
+            key: Chave da requisição (ver build_request_key)
+            func: Função assíncrona que faz a chamada ao provedor
+
+        Returns:
+            Resultado partilhado da chamada
+        """
+        if not self._enabled:
+            return await func()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(
+                lambda _task, k=key, f=flight: self._forget_flight(k, f)
+            )
+            self._stats.leader_calls += 1
+        else:
+            self._stats.coalesced_calls += 1
+            logger.debug(f"Requisição coalescida: '{key[:12]}' ({flight.waiters} em espera)")
+
+        flight.waiters += 1
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._stats.cancelled_flights += 1
+                logger.debug(f"Voo cancelado sem chamadores: '{key[:12]}'")
+
+    async def stream(
+        self,
+        key: str,
+        source_factory: Callable[[], AsyncIterator[LLMStreamChunk]]
+    ) -> AsyncGenerator[LLMStreamChunk, None]:
+        """
+        Partilha um stream do provedor entre chamadores idênticos.
+
+        Args:
+            key: Chave da requisição
+            source_factory: Cria o gerador de chunks do provedor
+
+        Yields:
+            Chunks do stream (cópias por subscritor)
+        """
+        if not self._enabled:
+            async for chunk in source_factory():
+                yield chunk
+            return
+
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _StreamBroadcast()
+            broadcast.task = asyncio.ensure_future(broadcast.pump(source_factory()))
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(
+                lambda _task, k=key, b=broadcast: self._forget_stream(k, b)
+            )
+            self._stats.stream_leader_calls += 1
+        else:
+            self._stats.stream_coalesced_calls += 1
+            logger.debug(f"Stream coalescido: '{key[:12]}' ({broadcast.subscribers} subscritores)")
+
+        broadcast.subscribers += 1
+        try:
+            async for chunk in broadcast.subscribe():
+                yield chunk
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                broadcast.task.cancel()
+                self._stats.cancelled_flights += 1
+                logger.debug(f"Stream cancelado sem subscritores: '{key[:12]}'")
+
+    def _forget_flight(self, key: str, flight: _Flight) -> None:
+        """Remove voo concluído do registo."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Evitar avisos de exceção não recuperada quando ninguém aguardava
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            # Uma falha por voo, independentemente de quantos a receberam
+            if flight.callers > 1:
+                self._stats.shared_failures += 1
+
+    def _forget_stream(self, key: str, broadcast: _StreamBroadcast) -> None:
+        """Remove stream concluído do registo."""
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de coalescência."""
+        return {
+            "enabled": self._enabled,
+            "leader_calls": self._stats.leader_calls,
+            "coalesced_calls": self._stats.coalesced_calls,
+            "stream_leader_calls": self._stats.stream_leader_calls,
+            "stream_coalesced_calls": self._stats.stream_coalesced_calls,
+            "deduplicated_total": (
+                self._stats.coalesced_calls + self._stats.stream_coalesced_calls
+            ),
+            "dedup_rate": self._stats.dedup_rate,
+            "shared_failures": self._stats.shared_failures,
+            "cancelled_flights": self._stats.cancelled_flights,
+            "in_flight": len(self._flights),
+            "streams_in_flight": len(self._streams),
+        }
+
+
+# Instância global do coalescedor
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Limite Adaptativo de Concorrência (AIMD).
+
+Ajusta o número de chamadas LLM em voo por provedor/modelo de acordo
+com a capacidade real observada no upstream:
+- Aumento aditivo enquanto a latência se mantém estável
+- Redução multiplicativa em LLMRateLimitError (429) ou picos de latência
+- Fila FIFO com espera limitada para o trabalho excedente
+- Métricas de limite, ocupação, fila e ajustes
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.exceptions import LLMConcurrencyLimitError, LLMRateLimitError, LLMTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AdaptiveLimitConfig:
+    """Configuração do limite adaptativo."""
+    initial_limit: int = 8
+    min_limit: int = 1
+    max_limit: int = 64
+    additive_increase: float = 1.0  # Incremento por janela completa de sucessos
+    rate_limit_backoff: float = 0.5  # Fator multiplicativo em 429
+    latency_backoff: float = 0.9  # Fator multiplicativo em pico de latência
+    latency_tolerance: float = 2.0  # Latência recente / baseline considerada pico
+    baseline_alpha: float = 0.02  # Suavização da latência de referência
+    recent_alpha: float = 0.3  # Suavização da latência recente
+    decrease_cooldown_sec: float = 1.0  # Evita várias reduções pela mesma rajada
+    max_queue_wait_sec: float = 30.0
+    max_queue_size: int = 1000
+
+    def __post_init__(self):
+        """Valida configuração após inicialização."""
+        if self.min_limit <= 0:
+            raise ValueError("min_limit deve ser positivo")
+        if self.min_limit > self.max_limit:
+            raise ValueError("min_limit não pode ser maior que max_limit")
+        self.initial_limit = min(self.max_limit, max(self.min_limit, self.initial_limit))
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveLimitConfig":
+        """Cria configuração a partir das configurações."""
+        return cls(
+            initial_limit=settings.llm.concurrency_initial_limit,
+            min_limit=settings.llm.concurrency_min_limit,
+            max_limit=settings.llm.concurrency_max_limit,
+            max_queue_wait_sec=settings.llm.concurrency_max_queue_wait_sec,
+        )
+
+
+@dataclass
+class ConcurrencyStats:
+    """Estatísticas do limite adaptativo."""
+    acquired: int = 0
+    queued: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+    increases: int = 0
+    rate_limit_decreases: int = 0
+    latency_decreases: int = 0
+    total_queue_wait: float = 0.0
+    peak_in_flight: int = 0
+
+    @property
+    def avg_queue_wait(self) -> float:
+        """Tempo médio de espera na fila."""
+        return (self.total_queue_wait / self.queued) if self.queued > 0 else 0.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limitador de concorrência AIMD com sinal de latência (estilo Vegas).
+
+    Características:
+    - Limite cresce 1/limit por sucesso enquanto o limite está em uso
+    - Redução multiplicativa em 429 e quando a latência recente excede
+      a latência de referência pela tolerância configurada
+    - Fila FIFO com espera máxima e tamanho máximo
+    """
+
+    def __init__(self, name: str, config: Optional[AdaptiveLimitConfig] = None):
+        """
+        Inicializa o limitador.
+
+        Args:
+            name: Identificador (provedor:modelo)
+            config: Configuração do limite (usa config se None)
+        """
+        self.name = name
+        self.config = config or AdaptiveLimitConfig.from_settings()
+        self._limit = float(self.config.initial_limit)
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._baseline_latency: Optional[float] = None
+        self._recent_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._stats = ConcurrencyStats()
+
+    @property
+    def limit(self) -> int:
+        """Limite atual de chamadas em voo."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Chamadas atualmente em voo."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Chamadas à espera de vaga."""
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Obtém uma vaga, aguardando na fila se necessário.
+
+        Raises:
+            LLMConcurrencyLimitError: Se a fila estiver cheia ou a espera exceder o máximo
+        """
+        if self._in_flight < self.limit and not self._waiters:
+            self._take_slot()
+            return
+
+        if len(self._waiters) >= self.config.max_queue_size:
+            self._stats.rejected += 1
+            raise LLMConcurrencyLimitError(
+                f"Fila de concorrência cheia para '{self.name}' "
+                f"({len(self._waiters)} em espera)"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats.queued += 1
+        start_time = time.monotonic()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.config.max_queue_wait_sec)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Vaga concedida no mesmo instante: devolvê-la
+                self.release()
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+            self._stats.timeouts += 1
+            raise LLMConcurrencyLimitError(
+                f"Timeout na fila de concorrência para '{self.name}'",
+                queue_wait_seconds=self.config.max_queue_wait_sec
+            )
+        finally:
+            self._stats.total_queue_wait += time.monotonic() - start_time
+
+    def release(self) -> None:
+        """Devolve uma vaga e acorda chamadores em espera."""
+        self._in_flight = max(0, self._in_flight - 1)
+        self._wake_waiters()
+
+    def on_success(self, latency_sec: float) -> None:
+        """Regista chamada bem-sucedida e ajusta o limite."""
+        config = self.config
+
+        if self._baseline_latency is None:
+            self._baseline_latency = latency_sec
+            self._recent_latency = latency_sec
+        else:
+            self._recent_latency += config.recent_alpha * (latency_sec - self._recent_latency)
+            # Referência acompanha descidas de imediato e subidas lentamente
+            if latency_sec < self._baseline_latency:
+                self._baseline_latency = latency_sec
+            else:
+                self._baseline_latency += config.baseline_alpha * (
+                    latency_sec - self._baseline_latency
+                )
+
+        if self._recent_latency > self._baseline_latency * config.latency_tolerance:
+            if self._decrease(config.latency_backoff):
+                self._stats.latency_decreases += 1
+                logger.info(
+                    f"Limite de '{self.name}' reduzido para {self.limit} "
+                    f"(latência {self._recent_latency:.2f}s vs referência "
+                    f"{self._baseline_latency:.2f}s)"
+                )
+            return
+
+        # Só crescer quando o limite atual está efetivamente em uso
+        if self._in_flight + 1 >= self.limit and self._limit < config.max_limit:
+            previous = self.limit
+            self._limit = min(
+                float(config.max_limit),
+                self._limit + config.additive_increase / self._limit
+            )
+            if self.limit > previous:
+                self._stats.increases += 1
+                self._wake_waiters()
+
+    def on_rate_limited(self) -> None:
+        """Regista 429 do provedor e reduz o limite."""
+        if self._decrease(self.config.rate_limit_backoff):
+            self._stats.rate_limit_decreases += 1
+            logger.warning(f"Rate limit em '{self.name}', limite reduzido para {self.limit}")
+
+    @asynccontextmanager
+    async def slot(self, track_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Context manager que ocupa uma vaga durante a chamada.
+
+        Args:
+            track_latency: Usar a duração da chamada como sinal de latência
+        """
+        await self.acquire()
+        start_time = time.monotonic()
+        try:
+            yield
+        except LLMRateLimitError:
+            self.on_rate_limited()
+            raise
+        except LLMTimeoutError:
+            if self._decrease(self.config.latency_backoff):
+                self._stats.latency_decreases += 1
+            raise
+        else:
+            if track_latency:
+                self.on_success(time.monotonic() - start_time)
+        finally:
+            self.release()
+
+    def _take_slot(self) -> None:
+        """Ocupa uma vaga."""
+        self._in_flight += 1
+        self._stats.acquired += 1
+        if self._in_flight > self._stats.peak_in_flight:
+            self._stats.peak_in_flight = self._in_flight
+
+    def _decrease(self, factor: float) -> bool:
+        """Reduz o limite multiplicativamente respeitando o cooldown."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.config.decrease_cooldown_sec:
+            return False
+        self._last_decrease = now
+        self._limit = max(float(self.config.min_limit), self._limit * factor)
+        # Nova referência após o ajuste
+        self._recent_latency = self._baseline_latency
+        return True
+
+    def _wake_waiters(self) -> None:
+        """Concede vagas livres aos chamadores em espera (FIFO)."""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._take_slot()
+            waiter.set_result(None)
+
+    def _remove_waiter(self, waiter: asyncio.Future) -> None:
+        """Remove chamador da fila."""
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do limitador."""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "baseline_latency": self._baseline_latency,
+            "recent_latency": self._recent_latency,
+            "acquired": self._stats.acquired,
+            "queued": self._stats.queued,
+            "rejected": self._stats.rejected,
+            "timeouts": self._stats.timeouts,
+            "avg_queue_wait": self._stats.avg_queue_wait,
+            "peak_in_flight": self._stats.peak_in_flight,
+            "increases": self._stats.increases,
+            "rate_limit_decreases": self._stats.rate_limit_decreases,
+            "latency_decreases": self._stats.latency_decreases,
+        }
+
+
+class ConcurrencyManager:
+    """Registro de limitadores adaptativos por provedor/modelo."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        config: Optional[AdaptiveLimitConfig] = None
+    ):
+        """
+        Inicializa o gestor.
+
+        Args:
+            enabled: Habilitar limites adaptativos (usa config se None)
+            config: Configuração aplicada a novos limitadores
+        """
+        self._enabled = (
+            enabled
+            if enabled is not None
+            else settings.llm.adaptive_concurrency_enabled
+        )
+        self._config = config
+        self._limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se os limites adaptativos estão ativos."""
+        return self._enabled
+
+    def get_limiter(self, provider: str, model_name: str) -> Optional[AdaptiveConcurrencyLimiter]:
+        """Obtém ou cria o limitador de um provedor/modelo (None se desativado)."""
+        if not self._enabled:
+            return None
+
+        key = f"{provider}:{model_name}"
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(key, self._config)
+            self._limiters[key] = limiter
+            logger.debug(f"Limitador adaptativo criado para '{key}' (limite {limiter.limit})")
+        return limiter
+
+    def limit_for_model(self, model_name: str) -> Optional[int]:
+        """Limite atual de um modelo em qualquer provedor (None se desconhecido)."""
+        limits = [
+            limiter.limit
+            for key, limiter in self._limiters.items()
+            if key.split(":", 1)[1] == model_name
+        ]
+        return min(limits) if limits else None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de todos os limitadores."""
+        return {
+            "enabled": self._enabled,
+            "limiters": {key: limiter.get_metrics() for key, limiter in self._limiters.items()},
+        }
+
+
+# Instância global do gestor de concorrência
+concurrency_manager = ConcurrencyManager()
@@ -18,6 +18,29 @@ class CacheSettings(BaseModel):
     cache_max_size: int = 1000  # Field that was missing
     cache_compression: bool = True
     cleanup_interval_sec: float = 300.0
+    cleanup_slice_size: int = 1000  # Remoções por fatia antes de ceder o loop
+    shards: int = 1  # Segmentos independentes (lock/eviction por shard)
+    max_bytes: Optional[int] = None  # Orçamento de memória do cache em bytes (None = sem limite)
+
+    # Cache em dois níveis (L1 em processo + L2 Redis partilhado)
+    l2_enabled: bool = False  # Liga ao REDIS_URL no arranque
+    l1_ttl_sec: int = 60  # TTL máximo no L1 quando há L2
+    negative_ttl_sec: int = 30  # Cache de chaves inexistentes
+    l2_timeout_sec: float = 0.25  # Acima disto o L2 conta como miss
+
+    # Snapshots para warm restart (None = desligado)
+    snapshot_path: Optional[str] = None
+    snapshot_interval_sec: float = 600.0
+    snapshot_max_entries: Optional[int] = None  # Limite na restauração
+    snapshot_max_bytes: Optional[int] = None  # Limite na restauração
+
+    # Cache de respostas LLM
+    llm_response_cache_enabled: bool = True
+    llm_response_ttl_sec: int = 3600
+    llm_response_cache_max_size: int = 2000
+    semantic_cache_enabled: bool = False
+    semantic_similarity_threshold: float = 0.92
+    semantic_cache_max_entries: int = 5000
 
 
 class DatabaseSettings(BaseModel):
@@ -49,6 +72,79 @@ class LLMSettings(BaseModel):
     gemini_model: str = Field(default="gemini-1.5-pro-latest", env="GEMINI_MODEL")
     gemini_base_url: str = Field(default="https://generativelanguage.googleapis.com", env="GEMINI_BASE_URL")
 
+    # Coalescência de requisições idênticas em voo
+    request_coalescing_enabled: bool = True
+
+    # Hedging entre provedores (latência de cauda)
+    hedging_enabled: bool = True
+    hedge_delay_sec: Optional[float] = None  # None usa o percentil observado
+    hedge_percentile: float = 0.9
+    hedge_min_delay_sec: float = 0.5
+    hedge_max_delay_sec: float = 10.0
+    hedge_budget_ratio: float = 0.1  # Máximo de hedges por requisição
+    hedge_budget_burst: float = 5.0
+
+    # Cancelamento quando o cliente se desconecta
+    disconnect_poll_interval_sec: float = 0.25
+
+    # Limite adaptativo de concorrência (AIMD) por provedor/modelo
+    adaptive_concurrency_enabled: bool = True
+    concurrency_initial_limit: int = 8
+    concurrency_min_limit: int = 1
+    concurrency_max_limit: int = 64
+    concurrency_max_queue_wait_sec: float = 30.0
+
+    # Escalonador por faixas de prioridade (interativa/batch)
+    scheduler_enabled: bool = True
+    scheduler_max_concurrency: int = 32
+    scheduler_starvation_sec: float = 10.0
+    scheduler_interactive_weight: float = 8.0
+    scheduler_interactive_max_concurrency: int = 32
+    scheduler_interactive_tokens_per_minute: Optional[int] = None
+    scheduler_interactive_timeout_sec: float = 60.0
+    scheduler_batch_weight: float = 1.0
+    scheduler_batch_max_concurrency: int = 16
+    scheduler_batch_tokens_per_minute: Optional[int] = None
+    scheduler_batch_timeout_sec: float = 600.0
+
+    # Cache de prefixos de prompt nos provedores
+    prompt_caching_enabled: bool = True
+    gemini_context_cache_ttl_sec: int = 3600
+    gemini_context_cache_min_tokens: int = 32768  # Mínimo aceite pela API
+
+    # Geração em lote (offline)
+    batch_checkpoint_dir: str = "data/batch"
+    batch_max_concurrency: int = 4
+    batch_use_provider_api: bool = True
+    batch_provider_chunk_size: int = 10000
+    batch_poll_interval_sec: float = 30.0
+
+    # Orçamento de retentativas por provedor
+    retry_budget_ratio: float = 0.1  # Retentativas <= 10% das requisições
+    retry_budget_min_per_sec: float = 0.5
+    retry_budget_max_tokens: float = 20.0
+
+    # Quotas de tokens/custo por utilizador (None = sem limite)
+    user_token_quota: Optional[int] = None
+    user_cost_quota: Optional[float] = None  # USD
+    user_quota_window_sec: float = 86400.0
+
+    # Circuit breaker por provedor/modelo
+    circuit_breaker_enabled: bool = True
+    circuit_failure_threshold: int = 5  # Mínimo de falhas na janela
+    circuit_failure_rate_threshold: float = 0.5
+    circuit_window_sec: int = 60
+    circuit_reset_timeout_sec: int = 30
+    circuit_half_open_max_calls: int = 3
+
+    # Roteamento de modelos por latência e custo (modelo "auto")
+    routing_enabled: bool = True
+    routing_latency_slo_sec: float = 15.0
+    routing_cost_weight: float = 0.5
+    routing_exploration_ratio: float = 0.05
+    routing_legal_models: List[str] = []  # Vazio usa os modelos principais
+    routing_general_models: List[str] = []  # Vazio inclui também os modelos rápidos
+
 
 class Settings(BaseSettings):
     """Configurações principais da aplicação."""
@@ -159,6 +159,7 @@ class LLMError(MuzaiaError):
         code: str = "LLM_ERROR",
         provider: Optional[str] = None,
         model: Optional[str] = None,
+        retry_after: Optional[float] = None,
         **kwargs
     ):
         context = kwargs.get('context', {})
@@ -166,8 +167,12 @@ class LLMError(MuzaiaError):
             context['provider'] = provider
         if model:
             context['model'] = model
+        if retry_after is not None:
+            context['retry_after_seconds'] = retry_after
         kwargs['context'] = context
         super().__init__(message, code, **kwargs)
+        # Atraso sugerido pelo provedor (Retry-After) antes de nova tentativa
+        self.retry_after = retry_after
 
 
 class LLMConnectionError(LLMError):
@@ -191,12 +196,82 @@ class LLMTimeoutError(LLMError):
         super().__init__(message, "LLM_TIMEOUT_ERROR", **kwargs)
 
 
+class LLMRequestError(LLMError):
+    """
+    Erro de requisição recusada pelo provedor (4xx, exceto 429).
+
+    Não é repetida nem conta como falha para o circuit breaker: o
+    problema está no pedido (ou na credencial), não na saúde do provedor.
+    """
+    def __init__(
+        self,
+        message: str = "Requisição recusada pelo provedor LLM",
+        status_code: Optional[int] = None,
+        **kwargs
+    ):
+        context = kwargs.get('context', {})
+        if status_code:
+            context['status_code'] = status_code
+        kwargs['context'] = context
+        super().__init__(message, "LLM_REQUEST_ERROR", **kwargs)
+        self.status_code = status_code
+
+
+def llm_http_error(status: int, message: str, **kwargs) -> LLMError:
+    """
+    Exceção para uma resposta HTTP de erro de um provedor LLM.
+
+    4xx resulta em LLMRequestError (não repetível); 5xx e restantes em
+    LLMConnectionError (repetível e contabilizado pelo circuit breaker).
+    """
+    if 400 <= status < 500:
+        kwargs.pop('retry_after', None)
+        return LLMRequestError(message, status_code=status, **kwargs)
+    return LLMConnectionError(message, **kwargs)
+
+
 class LLMRateLimitError(LLMError):
     """Erro de limite de taxa LLM."""
     def __init__(self, message: str = "Limite de taxa da LLM excedido", **kwargs):
         super().__init__(message, "LLM_RATE_LIMIT_ERROR", **kwargs)
 
 
+class LLMConcurrencyLimitError(LLMError):
+    """Erro quando a fila do limite de concorrência LLM esgota."""
+    def __init__(
+        self,
+        message: str = "Limite de concorrência da LLM excedido",
+        queue_wait_seconds: Optional[float] = None,
+        **kwargs
+    ):
+        context = kwargs.get('context', {})
+        if queue_wait_seconds:
+            context['queue_wait_seconds'] = queue_wait_seconds
+        kwargs['context'] = context
+        super().__init__(message, "LLM_CONCURRENCY_LIMIT_ERROR", **kwargs)
+
+
+class LLMQuotaExceededError(LLMError):
+    """Erro quando o utilizador esgota a quota de tokens/custo."""
+    def __init__(
+        self,
+        message: str = "Quota de utilização LLM excedida",
+        user_id: Optional[str] = None,
+        **kwargs
+    ):
+        context = kwargs.get('context', {})
+        if user_id:
+            context['user_id'] = user_id
+        kwargs['context'] = context
+        super().__init__(message, "LLM_QUOTA_EXCEEDED_ERROR", **kwargs)
+
+
+class LLMCircuitOpenError(LLMError):
+    """Erro quando o circuit breaker do modelo está aberto (falha imediata)."""
+    def __init__(self, message: str = "Circuit breaker do modelo LLM aberto", **kwargs):
+        super().__init__(message, "LLM_CIRCUIT_OPEN_ERROR", **kwargs)
+
+
 class LLMInvalidResponseError(LLMError):
     """Erro de resposta inválida do LLM."""
     def __init__(
@@ -279,7 +354,11 @@ __all__ = [
     "LLMError",
     "LLMConnectionError",
     "LLMTimeoutError", 
+    "LLMRequestError",
     "LLMRateLimitError",
+    "LLMConcurrencyLimitError",
+    "LLMCircuitOpenError",
+    "LLMQuotaExceededError",
     "LLMInvalidResponseError",
     "LLMServiceError",
     
@@ -287,5 +366,6 @@ __all__ = [
     "ConsensusError",
     
     # Utilities
+    "llm_http_error",
     "create_error_response",
 ]
@@ -9,13 +9,18 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional, Type, Callable, Awaitable
+from typing import TYPE_CHECKING, Dict, Any, Optional, Type, Callable, Awaitable
 from functools import lru_cache
 import aiohttp
 
 from app.core.protocols import AbstractLLM, AbstractLLMFactory, LLMError
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from app.core.hedging import HedgingPolicy
+    from app.core.routing import ModelRouter
+    from app.schemas import ContextType
+
 logger = logging.getLogger(__name__)
 
 # Type alias para factory functions
@@ -35,6 +40,8 @@ class LLMRegistry:
         self._model_patterns: Dict[str, str] = {}
         self._factory_functions: Dict[str, LLMFactoryFunction] = {}
         self._provider_configs: Dict[str, Dict[str, Any]] = {}
+        # Resoluções modelo → provedor já calculadas
+        self._resolution_cache: Dict[str, Optional[str]] = {}
 
     def register_provider(
         self, 
@@ -54,6 +61,7 @@ class LLMRegistry:
         """
         self._providers[provider_name] = llm_class
         self._provider_configs[provider_name] = config or {}
+        self._resolution_cache.clear()
 
         if model_patterns:
             for pattern in model_patterns:
@@ -89,6 +97,15 @@ class LLMRegistry:
         Returns:
             Nome do provedor ou None se não encontrado
         """
+        try:
+            return self._resolution_cache[model_name]
+        except KeyError:
+            provider = self._resolve_provider(model_name)
+            self._resolution_cache[model_name] = provider
+            return provider
+
+    def _resolve_provider(self, model_name: str) -> Optional[str]:
+        """Resolve o provedor de um modelo percorrendo os padrões."""
         # Busca exata primeiro
         if model_name in self._model_patterns:
             return self._model_patterns[model_name]
@@ -181,6 +198,11 @@ class LLMFactory(AbstractLLMFactory):
         # Setup inicial dos provedores
         self._setup_default_providers()
 
+        # Tabela de rotas do modelo "auto" (compilada no arranque)
+        self._router: Optional[ModelRouter] = None
+        if settings.llm.routing_enabled:
+            self._compile_router()
+
         logger.info(
             f"LLMFactory inicializada com {len(self._registry.get_all_providers())} provedores"
         )
@@ -200,6 +222,7 @@ class LLMFactory(AbstractLLMFactory):
                 [
                     "claude-3-5-sonnet",
                     "claude-3-5-sonnet-20241022",
+                    "claude-3-5-haiku",
                     "claude-3-sonnet",
                     "claude-3-opus",
                     "claude-3-haiku"
@@ -266,6 +289,10 @@ class LLMFactory(AbstractLLMFactory):
             # Determinar provedor baseado no modelo ou usar sistema de prioridade
             provider_name = self._registry.get_provider_for_model(model_name)
             
+            # "auto" escolhe o modelo por requisição a partir das métricas
+            if model_name == "auto" and self._router is not None:
+                return self.create_routed_llm(config)
+
             # Se modelo não especificado ou é genérico, usar Claude como padrão
             if not provider_name or model_name in ["default", "auto"]:
                 provider_name = primary_provider
@@ -323,6 +350,85 @@ class LLMFactory(AbstractLLMFactory):
                 raise
             raise LLMError(f"Erro interno ao criar modelo '{model_name}': {str(e)}") from e
 
+    async def create_hedged_llm(
+        self,
+        primary_model: Optional[str] = None,
+        secondary_model: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+        policy: Optional[HedgingPolicy] = None
+    ) -> AbstractLLM:
+        """
+        Cria cliente com hedging entre dois modelos.
+        Por padrão Claude é o primário e Gemini o secundário.
+
+        Args:
+            primary_model: Modelo primário (usa Claude se None)
+            secondary_model: Modelo secundário (usa Gemini se None)
+            config: Configurações extras específicas
+            policy: Política de hedging (usa config se None)
+
+        Returns:
+            HedgedLLM, ou apenas o primário se o secundário não estiver disponível
+        """
+        from app.core.hedging import HedgedLLM
+
+        primary = await self.create_llm(primary_model or settings.llm.anthropic_model, config)
+
+        try:
+            secondary = await self.create_llm(secondary_model or settings.llm.gemini_model, config)
+        except LLMError as e:
+            logger.warning(f"Secundário indisponível para hedging, usando apenas o primário: {e}")
+            return primary
+
+        if secondary.model_name == primary.model_name:
+            logger.warning("Primário e secundário são o mesmo modelo, hedging desativado")
+            await secondary.close()
+            return primary
+
+        return HedgedLLM(primary, secondary, policy)
+
+    def _compile_router(self) -> None:
+        """Compila a tabela de rotas com os provedores registados."""
+        from app.core.routing import ModelRouter, default_route_models
+
+        self._router = ModelRouter.compile(
+            default_route_models(), self._registry.get_provider_for_model
+        )
+
+    @property
+    def router(self) -> Optional[ModelRouter]:
+        """Roteador de modelos (None se o roteamento estiver desativado)."""
+        return self._router
+
+    def create_routed_llm(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        context_type: Optional[ContextType] = None
+    ) -> AbstractLLM:
+        """
+        Cria cliente que escolhe o modelo por requisição.
+
+        Args:
+            config: Configurações extras passadas a cada modelo criado
+            context_type: Tipo de contexto por omissão (jurídico se None)
+
+        Returns:
+            RoutedLLM sobre a tabela de rotas da fábrica (com hedging entre
+            os dois melhores candidatos se settings.llm.hedging_enabled)
+        """
+        from app.core.routing import RoutedLLM
+        from app.schemas import ContextType
+
+        if self._router is None:
+            raise LLMError("Roteamento de modelos desativado")
+
+        return RoutedLLM(
+            self._router,
+            lambda model_name: self.create_llm(model_name, config),
+            context_type or ContextType.LEGAL,
+            hedging=settings.llm.hedging_enabled
+        )
+
     async def _create_with_fallback(
         self,
         provider_name: str,
@@ -457,6 +563,8 @@ class LLMFactory(AbstractLLMFactory):
 
         # Limpa cache para incluir novos modelos
         self.get_available_models.cache_clear()
+        if self._router is not None:
+            self._compile_router()
 
         logger.info(f"Provedor customizado '{provider_name}' registrado")
 
@@ -520,7 +628,8 @@ class LLMFactory(AbstractLLMFactory):
             "total_model_patterns": len(self._registry.get_all_models()),
             "providers": list(self._registry.get_all_providers()),
             "default_model": self.get_default_model(),
-            "provider_priority": self.get_provider_priority()
+            "provider_priority": self.get_provider_priority(),
+            "routing": self._router.get_metrics() if self._router else None
         }
 
     def _update_creation_metrics(
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Hedging de Requisições entre Provedores.
+
+Reduz a latência de cauda enviando a mesma requisição a um provedor
+secundário quando o primário demora mais do que o esperado:
+- Atraso do hedge pelo percentil observado do primário (ou fixo)
+- Primeira resposta bem-sucedida vence, a outra é cancelada
+- Orçamento de hedges (token bucket) para limitar o custo
+- Métricas de taxa de hedge, taxa de vitória e latência poupada
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import LLMQuotaExceededError
+from app.core.latency import LatencyRegistry, LatencyWindow, latency_registry
+from app.core.protocols import AbstractLLM, LLMStreamChunk
+from app.schemas import GenerationParams, LLMResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HedgingPolicy:
+    """Política de hedging."""
+    delay_sec: Optional[float] = None  # None usa o percentil observado
+    percentile: float = 0.9
+    min_delay_sec: float = 0.5
+    max_delay_sec: float = 10.0
+    default_delay_sec: float = 2.0  # Usado enquanto não há amostras suficientes
+    min_samples: int = 20
+    budget_ratio: float = 0.1
+    budget_burst: float = 5.0
+
+    @classmethod
+    def from_settings(cls) -> "HedgingPolicy":
+        """Cria política a partir das configurações."""
+        return cls(
+            delay_sec=settings.llm.hedge_delay_sec,
+            percentile=settings.llm.hedge_percentile,
+            min_delay_sec=settings.llm.hedge_min_delay_sec,
+            max_delay_sec=settings.llm.hedge_max_delay_sec,
+            budget_ratio=settings.llm.hedge_budget_ratio,
+            budget_burst=settings.llm.hedge_budget_burst,
+        )
+
+
+class HedgeBudget:
+    """
+    Orçamento de hedges em token bucket.
+
+    Cada requisição deposita `ratio` tokens (até `burst`) e cada hedge
+    consome um token, limitando os hedges a ~ratio das requisições.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self._ratio = ratio
+        self._burst = burst
+        self._tokens = burst
+
+    @property
+    def tokens(self) -> float:
+        """Tokens disponíveis."""
+        return self._tokens
+
+    def deposit(self) -> None:
+        """Credita uma requisição no orçamento."""
+        self._tokens = min(self._burst, self._tokens + self._ratio)
+
+    def try_acquire(self) -> bool:
+        """Consome um token se disponível."""
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class HedgingStats:
+    """Estatísticas de hedging."""
+    requests: int = 0
+    hedges_issued: int = 0
+    hedges_denied: int = 0
+    hedge_wins: int = 0
+    primary_wins: int = 0
+    failovers: int = 0
+    latency_saved_sec: float = 0.0
+
+    @property
+    def hedge_rate(self) -> float:
+        """Percentagem de requisições com hedge."""
+        return (self.hedges_issued / self.requests * 100) if self.requests > 0 else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """Percentagem de hedges em que o secundário venceu."""
+        return (self.hedge_wins / self.hedges_issued * 100) if self.hedges_issued > 0 else 0.0
+
+
+class HedgeController:
+    """Estado partilhado (orçamento e métricas) de um par primário/secundário."""
+
+    def __init__(
+        self,
+        primary_key: str,
+        secondary_key: str,
+        policy: HedgingPolicy,
+        registry: LatencyRegistry
+    ):
+        self.primary_key = primary_key
+        self.secondary_key = secondary_key
+        self.policy = policy
+        self.budget = HedgeBudget(policy.budget_ratio, policy.budget_burst)
+        self.stats = HedgingStats()
+        self._registry = registry
+        # Tempo até ao primeiro chunk do primário (streaming)
+        self.first_chunk_window = LatencyWindow()
+
+    def _delay_from_window(self, window: LatencyWindow) -> float:
+        """Calcula o atraso do hedge a partir de uma janela de latências."""
+        policy = self.policy
+        if policy.delay_sec is not None:
+            return policy.delay_sec
+
+        observed = None
+        if window.count >= policy.min_samples:
+            observed = window.percentile(policy.percentile)
+        if observed is None:
+            return policy.default_delay_sec
+
+        return min(policy.max_delay_sec, max(policy.min_delay_sec, observed))
+
+    def hedge_delay(self, primary: AbstractLLM) -> float:
+        """Atraso antes de emitir o hedge de uma geração."""
+        return self._delay_from_window(
+            self._registry.get(primary.provider, primary.model_name)
+        )
+
+    def stream_hedge_delay(self) -> float:
+        """Atraso antes de emitir o hedge de um stream."""
+        return self._delay_from_window(self.first_chunk_window)
+
+    def record_hedge_win(self, primary: AbstractLLM, elapsed_sec: float) -> None:
+        """
+        Regista vitória do secundário.
+
+        A latência poupada é estimada pela latência média histórica do
+        primário nas chamadas mais lentas que o instante da vitória.
+        """
+        self._record_win(self._registry.get(primary.provider, primary.model_name), elapsed_sec)
+
+    def record_stream_hedge_win(self, elapsed_sec: float) -> None:
+        """Regista vitória do secundário num stream (sobre o tempo até ao primeiro chunk)."""
+        self._record_win(self.first_chunk_window, elapsed_sec)
+
+    def _record_win(self, window: LatencyWindow, elapsed_sec: float) -> None:
+        self.stats.hedge_wins += 1
+        expected = window.mean_above(elapsed_sec)
+        if expected is not None:
+            self.stats.latency_saved_sec += max(0.0, expected - elapsed_sec)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do par."""
+        return {
+            "primary": self.primary_key,
+            "secondary": self.secondary_key,
+            "requests": self.stats.requests,
+            "hedges_issued": self.stats.hedges_issued,
+            "hedges_denied": self.stats.hedges_denied,
+            "hedge_rate": self.stats.hedge_rate,
+            "hedge_wins": self.stats.hedge_wins,
+            "primary_wins": self.stats.primary_wins,
+            "win_rate": self.stats.win_rate,
+            "failovers": self.stats.failovers,
+            "latency_saved_sec": self.stats.latency_saved_sec,
+            "budget_tokens": self.budget.tokens,
+        }
+
+
+class HedgingManager:
+    """Registro de controladores de hedging por par de modelos."""
+
+    def __init__(self, registry: Optional[LatencyRegistry] = None):
+        self._registry = registry or latency_registry
+        self._controllers: Dict[Tuple[str, str], HedgeController] = {}
+
+    def get_controller(
+        self,
+        primary: AbstractLLM,
+        secondary: AbstractLLM,
+        policy: Optional[HedgingPolicy] = None
+    ) -> HedgeController:
+        """Obtém ou cria o controlador de um par primário/secundário."""
+        primary_key = f"{primary.provider}:{primary.model_name}"
+        secondary_key = f"{secondary.provider}:{secondary.model_name}"
+        key = (primary_key, secondary_key)
+
+        controller = self._controllers.get(key)
+        if controller is None:
+            controller = HedgeController(
+                primary_key,
+                secondary_key,
+                policy or HedgingPolicy.from_settings(),
+                self._registry
+            )
+            self._controllers[key] = controller
+        return controller
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de todos os pares."""
+        return {
+            f"{primary}->{secondary}": controller.get_metrics()
+            for (primary, secondary), controller in self._controllers.items()
+        }
+
+
+async def _cancel_task(task: "asyncio.Future") -> None:
+    """Cancela tarefa e aguarda a sua conclusão."""
+    if not task.done():
+        task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+class HedgedLLM(AbstractLLM):
+    """
+    Cliente LLM com hedging entre um primário e um secundário.
+
+    Características:
+    - Primário chamado de imediato, secundário após o atraso do hedge
+    - Primeira resposta bem-sucedida vence e a outra é cancelada
+    - Falha rápida do primário recorre ao secundário (failover)
+    - Streaming com hedge sobre o primeiro chunk
+    """
+
+    def __init__(
+        self,
+        primary: AbstractLLM,
+        secondary: AbstractLLM,
+        policy: Optional[HedgingPolicy] = None,
+        manager: Optional["HedgingManager"] = None
+    ):
+        """
+        Inicializa o cliente com hedging.
+
+        Args:
+            primary: Cliente LLM primário
+            secondary: Cliente LLM secundário (hedge)
+            policy: Política de hedging (usa config se None)
+            manager: Gestor de hedging (usa o global se None)
+        """
+        self._primary = primary
+        self._secondary = secondary
+        self._controller = (manager or hedging_manager).get_controller(
+            primary, secondary, policy
+        )
+
+    @property
+    def model_name(self) -> str:
+        """Nome do modelo primário."""
+        return self._primary.model_name
+
+    @property
+    def provider(self) -> str:
+        """Nome do provedor primário."""
+        return self._primary.provider
+
+    async def generate(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> LLMResponse:
+        """Gera resposta com hedge no secundário se o primário demorar."""
+        controller = self._controller
+        controller.stats.requests += 1
+        controller.budget.deposit()
+
+        start_time = time.monotonic()
+        primary_task = asyncio.ensure_future(
+            self._primary.generate(prompt, context, system_prompt, params)
+        )
+        secondary_task: Optional[asyncio.Future] = None
+
+        try:
+            delay = controller.hedge_delay(self._primary)
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+
+            if done:
+                if primary_task.exception() is None:
+                    return primary_task.result()
+                if isinstance(primary_task.exception(), LLMQuotaExceededError):
+                    # Quota é do utilizador: o secundário não ajuda
+                    raise primary_task.exception()
+
+                controller.stats.failovers += 1
+                logger.warning(
+                    f"Primário '{self._primary.model_name}' falhou "
+                    f"({primary_task.exception()}), recorrendo a '{self._secondary.model_name}'"
+                )
+                return await self._secondary.generate(prompt, context, system_prompt, params)
+
+            if not controller.budget.try_acquire():
+                controller.stats.hedges_denied += 1
+                return await primary_task
+
+            controller.stats.hedges_issued += 1
+            logger.debug(
+                f"Hedge emitido para '{self._secondary.model_name}' após {delay:.3f}s"
+            )
+            secondary_task = asyncio.ensure_future(
+                self._secondary.generate(prompt, context, system_prompt, params)
+            )
+
+            winner = await self._first_success(primary_task, secondary_task)
+            elapsed = time.monotonic() - start_time
+
+            if winner is secondary_task:
+                controller.record_hedge_win(self._primary, elapsed)
+            else:
+                controller.stats.primary_wins += 1
+
+            response = winner.result()
+            response.metadata = {
+                **(response.metadata or {}),
+                "hedge": {
+                    "delay_sec": delay,
+                    "winner": "secondary" if winner is secondary_task else "primary",
+                },
+            }
+            return response
+
+        finally:
+            await _cancel_task(primary_task)
+            if secondary_task is not None:
+                await _cancel_task(secondary_task)
+
+    @staticmethod
+    async def _first_success(
+        primary_task: "asyncio.Future",
+        secondary_task: "asyncio.Future"
+    ) -> "asyncio.Future":
+        """Aguarda a primeira tarefa bem-sucedida (erro do primário se ambas falharem)."""
+        pending: Set[asyncio.Future] = {primary_task, secondary_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+
+        raise primary_task.exception()
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> AsyncGenerator[LLMStreamChunk, None]:
+        """
+        Streaming com hedge se o primeiro chunk do primário demorar.
+
+        Um primeiro chunk com erro (ex.: circuito aberto ou 5xx devolvidos
+        pelo BaseLLM como chunk) conta como falha: recorre ao secundário.
+        """
+        controller = self._controller
+        controller.stats.requests += 1
+        controller.budget.deposit()
+
+        start_time = time.monotonic()
+        primary_stream = self._primary.stream_generate(prompt, context, system_prompt, params)
+        primary_first = asyncio.ensure_future(self._next_chunk(primary_stream))
+        streams = {primary_first: primary_stream}
+        winner: Optional[asyncio.Future] = None
+
+        def start_secondary() -> asyncio.Future:
+            secondary_stream = self._secondary.stream_generate(
+                prompt, context, system_prompt, params
+            )
+            task = asyncio.ensure_future(self._next_chunk(secondary_stream))
+            streams[task] = secondary_stream
+            return task
+
+        try:
+            delay = controller.stream_hedge_delay()
+            done, _ = await asyncio.wait({primary_first}, timeout=delay)
+
+            if done or not controller.budget.try_acquire():
+                if not done:
+                    controller.stats.hedges_denied += 1
+                await asyncio.wait({primary_first})
+                winner = primary_first
+                if self._is_valid_first(primary_first):
+                    controller.first_chunk_window.record(time.monotonic() - start_time)
+                elif isinstance(primary_first.exception(), LLMQuotaExceededError):
+                    raise primary_first.exception()
+                else:
+                    controller.stats.failovers += 1
+                    logger.warning(
+                        f"Primário '{self._primary.model_name}' falhou no stream, "
+                        f"recorrendo a '{self._secondary.model_name}'"
+                    )
+                    winner = start_secondary()
+                    await asyncio.wait({winner})
+            else:
+                controller.stats.hedges_issued += 1
+                secondary_first = start_secondary()
+
+                winner = await self._first_stream(primary_first, secondary_first)
+                if winner is secondary_first:
+                    controller.record_stream_hedge_win(time.monotonic() - start_time)
+                else:
+                    controller.stats.primary_wins += 1
+                    controller.first_chunk_window.record(time.monotonic() - start_time)
+
+            for task, stream in streams.items():
+                if task is not winner:
+                    await _cancel_task(task)
+                    await stream.aclose()
+
+            first_chunk = winner.result()
+            if first_chunk is None:
+                return
+            yield first_chunk
+            async for chunk in streams[winner]:
+                yield chunk
+
+        finally:
+            for task, stream in streams.items():
+                await _cancel_task(task)
+                await stream.aclose()
+
+    @staticmethod
+    def _is_valid_first(task: "asyncio.Future") -> bool:
+        """Se o primeiro chunk de um stream é utilizável (sem exceção nem erro)."""
+        if task.exception() is not None:
+            return False
+        chunk = task.result()
+        return chunk is not None and not chunk.get("error")
+
+    @staticmethod
+    async def _next_chunk(stream: AsyncIterator[LLMStreamChunk]) -> Optional[LLMStreamChunk]:
+        """Obtém o próximo chunk do stream (None se terminou)."""
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    @staticmethod
+    async def _first_stream(
+        primary_first: "asyncio.Future",
+        secondary_first: "asyncio.Future"
+    ) -> "asyncio.Future":
+        """Aguarda o primeiro stream a produzir um chunk válido."""
+        pending: Set[asyncio.Future] = {primary_first, secondary_first}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if HedgedLLM._is_valid_first(task):
+                    return task
+
+        # Ambos falharam: devolver o resultado do primário (chunk de erro)
+        return primary_first
+
+    async def health_check(self) -> bool:
+        """Saudável se pelo menos um dos clientes estiver saudável."""
+        results = await asyncio.gather(
+            self._primary.health_check(),
+            self._secondary.health_check(),
+            return_exceptions=True
+        )
+        return any(result is True for result in results)
+
+    async def get_model_info(self) -> Dict[str, Any]:
+        """Informações do primário com o estado do hedging."""
+        info = await self._primary.get_model_info()
+        return {
+            **info,
+            "hedging": {
+                "secondary_model": self._secondary.model_name,
+                **self._controller.get_metrics(),
+            },
+        }
+
+    async def close(self) -> None:
+        """Fecha ambos os clientes."""
+        await asyncio.gather(
+            self._primary.close(),
+            self._secondary.close(),
+            return_exceptions=True
+        )
+
+    def __repr__(self) -> str:
+        """Representação string do cliente."""
+        return (
+            f"{self.__class__.__name__}("
+            f"primary='{self._primary.model_name}', "
+            f"secondary='{self._secondary.model_name}')"
+        )
+
+
+# Instância global do gestor de hedging
+hedging_manager = HedgingManager()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Observação de Latência por Provedor/Modelo.
+
+Mantém janelas deslizantes de latência e resultado das chamadas LLM
+para alimentar decisões em tempo real (hedging, roteamento, limites):
+- Percentis de latência (p50, p90, p99)
+- Taxa de erro na janela
+- Registro global por provedor e modelo
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """
+    Janela deslizante de amostras de latência.
+
+    Mantém as últimas `max_samples` chamadas com latência, resultado
+    e instante (monotónico), descartando as mais antigas que `max_age_sec`.
+    """
+
+    def __init__(self, max_samples: int = 500, max_age_sec: float = 300.0):
+        """
+        Inicializa a janela.
+
+        Args:
+            max_samples: Número máximo de amostras
+            max_age_sec: Idade máxima de uma amostra
+        """
+        self._max_age = max_age_sec
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=max_samples)
+        self._sorted_cache: Optional[List[float]] = None
+
+    def record(self, latency_sec: float, success: bool = True) -> None:
+        """Regista uma chamada."""
+        self._samples.append((time.monotonic(), latency_sec, success))
+        self._sorted_cache = None
+
+    def _prune(self) -> None:
+        """Remove amostras fora da janela temporal."""
+        cutoff = time.monotonic() - self._max_age
+        pruned = False
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+            pruned = True
+        if pruned:
+            self._sorted_cache = None
+
+    @property
+    def count(self) -> int:
+        """Número de amostras válidas."""
+        self._prune()
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Percentil de latência das chamadas bem-sucedidas.
+
+        Args:
+            q: Quantil entre 0.0 e 1.0
+
+        Returns:
+            Latência em segundos ou None sem amostras
+        """
+        self._prune()
+        if self._sorted_cache is None:
+            self._sorted_cache = sorted(lat for _, lat, ok in self._samples if ok)
+        values = self._sorted_cache
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+        return values[index]
+
+    def mean_above(self, threshold_sec: float) -> Optional[float]:
+        """Latência média das chamadas mais lentas que o limiar."""
+        self._prune()
+        slower = [lat for _, lat, ok in self._samples if ok and lat > threshold_sec]
+        if not slower:
+            return None
+        return sum(slower) / len(slower)
+
+    @property
+    def error_rate(self) -> float:
+        """Fração de chamadas falhadas na janela (0.0 a 1.0)."""
+        self._prune()
+        if not self._samples:
+            return 0.0
+        failures = sum(1 for _, _, ok in self._samples if not ok)
+        return failures / len(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo da janela para métricas."""
+        return {
+            "samples": self.count,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "error_rate": self.error_rate,
+        }
+
+
+class LatencyRegistry:
+    """Registro global de janelas de latência por provedor/modelo."""
+
+    def __init__(self, max_samples: int = 500, max_age_sec: float = 300.0):
+        self._max_samples = max_samples
+        self._max_age = max_age_sec
+        self._windows: Dict[str, LatencyWindow] = {}
+
+    @staticmethod
+    def _key(provider: str, model_name: str) -> str:
+        return f"{provider}:{model_name}"
+
+    def get(self, provider: str, model_name: str) -> LatencyWindow:
+        """Obtém ou cria a janela de um provedor/modelo."""
+        key = self._key(provider, model_name)
+        window = self._windows.get(key)
+        if window is None:
+            window = LatencyWindow(self._max_samples, self._max_age)
+            self._windows[key] = window
+        return window
+
+    def record(
+        self,
+        provider: str,
+        model_name: str,
+        latency_sec: float,
+        success: bool = True
+    ) -> None:
+        """Regista uma chamada de um provedor/modelo."""
+        self.get(provider, model_name).record(latency_sec, success)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Resumo de todas as janelas."""
+        return {key: window.snapshot() for key, window in self._windows.items()}
+
+
+# Instância global do registro de latências
+latency_registry = LatencyRegistry()
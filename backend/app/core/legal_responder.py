@@ -2,17 +2,34 @@
 Gerador de respostas legais em linguagem simples e acessível.
 """
 import asyncio
-from typing import List, Dict, Optional, Tuple
+from typing import Any, AsyncGenerator, List, Dict, Optional, Tuple, Union
 from datetime import datetime
 import structlog
 import httpx
 import json
 
 from app.core.semantic_search import SemanticSearchEngine
-from app.core.config import get_settings
+from app.core.config import settings
+from app.core.exceptions import LLMQuotaExceededError
+from app.core.protocols import AbstractLLM
+from app.core.response_cache import cache_document_scope
 
 logger = structlog.get_logger(__name__)
-settings = get_settings()
+
+# Instruções fixas no prompt do sistema: o prompt leva só a pergunta e o
+# contexto só a base legal, para que o cache de respostas (exato e
+# semântico) compare perguntas dentro da mesma base legal
+SYSTEM_PROMPT = (
+    "És um assistente jurídico moçambicano. Respondes apenas com base na "
+    "legislação fornecida, em português simples, citando a lei e o artigo.\n\n"
+    "INSTRUÇÕES:\n"
+    "- Responda em português simples e claro\n"
+    "- Use linguagem acessível ao cidadão comum\n"
+    "- Cite sempre a fonte legal (lei e artigo)\n"
+    "- Se houver dúvidas, seja honesto sobre limitações\n"
+    "- Mantenha o tom respeitoso e profissional\n"
+    "- Máximo 200 palavras"
+)
 
 
 class LegalResponseGenerator:
@@ -87,40 +104,145 @@ class LegalResponseGenerator:
         self,
         user_query: str,
         db,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        llm: Optional[AbstractLLM] = None
     ) -> Dict:
-        """Gera resposta baseada no repositório legal."""
+        """
+        Gera resposta baseada no repositório legal.
+
+        Usa o mesmo caminho de geração que stream_response (incluindo o
+        LLM, se disponível) e retorna o resultado do evento final.
+
+        Raises:
+            LLMQuotaExceededError: Se o utilizador esgotou a sua quota
+        """
         try:
-            # 0. Validar se a pergunta é sobre temas jurídicos
-            if not self._is_legal_question(user_query):
-                return self._generate_non_legal_response(user_query)
-
-            # 1. Buscar conteúdo relevante
-            matches = await self.search_engine.search_legal_content(
-                query=user_query,
-                db=db,
-                limit=5,
-                min_confidence=self.min_confidence_threshold
-            )
+            result = None
+            async for event in self.stream_response(user_query, db, context=context, llm=llm):
+                if event["type"] == "final":
+                    result = event["result"]
+            return result or self._generate_error_response()
+
+        except LLMQuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta legal: {e}")
+            return self._generate_error_response()
 
-            if not matches:
-                return self._generate_no_legal_basis_response(user_query)
+    async def stream_response(
+        self,
+        user_query: str,
+        db,
+        context: Optional[Dict] = None,
+        llm: Optional[AbstractLLM] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Gera a resposta em eventos incrementais.
 
-            # 2. Verificar se é tema sensível
-            is_sensitive = self._is_sensitive_topic(user_query)
-            max_confidence = max([m["confidence"] for m in matches])
+        Emite `status` (pesquisa e geração), depois `token` à medida que o
+        texto chega do LLM e, por fim, `final` com o resultado completo
+        (mesmo formato de generate_response, incluindo fontes e confiança).
+        Sem LLM disponível, a resposta simplificada é enviada em blocos.
 
-            if is_sensitive or max_confidence < 0.6:
-                return self._generate_escalation_response(user_query, matches, is_sensitive)
+        Raises:
+            LLMQuotaExceededError: Se o utilizador esgotou a sua quota
+        """
+        yield {"type": "status", "stage": "retrieval"}
+        try:
+            retrieved = await self._retrieve(user_query, db)
+        except Exception as e:
+            logger.error(f"Erro ao pesquisar base legal: {e}")
+            retrieved = self._generate_error_response()
 
-            # 3. Gerar resposta com base legal
-            response = await self._generate_legal_response(user_query, matches)
+        if isinstance(retrieved, dict):
+            # Respostas fixas (tema não jurídico, escalação, erro)
+            yield {"type": "token", "content": retrieved["response"]}
+            yield {"type": "final", "result": retrieved}
+            return
 
-            return response
+        matches = retrieved
+        yield {"type": "status", "stage": "generating", "search_matches": len(matches)}
 
-        except Exception as e:
-            logger.error(f"Erro ao gerar resposta legal: {e}")
-            return self._generate_error_response()
+        simplified = self._create_simplified_response(query=user_query, matches=matches)
+        result = {
+            "success": True,
+            "response": "",
+            "sources": simplified["sources"],
+            "confidence": simplified["confidence"],
+            "requires_human": False,
+            "search_matches": len(matches),
+            "response_type": "legal_guidance"
+        }
+
+        parts: List[str] = []
+        if llm is not None:
+            try:
+                # Respostas em cache ficam ligadas aos documentos usados
+                with cache_document_scope(self._document_ids(matches)):
+                    async for chunk in llm.stream_generate(
+                        self._build_prompt(user_query),
+                        context=self._build_legal_context(matches),
+                        system_prompt=SYSTEM_PROMPT
+                    ):
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        content = chunk.get("content")
+                        if content:
+                            parts.append(content)
+                            yield {"type": "token", "content": content}
+            except LLMQuotaExceededError:
+                # Sem resposta alternativa: a quota aplica-se a toda a geração
+                raise
+            except Exception as e:
+                logger.error(f"Erro no streaming da resposta legal: {e}")
+                if parts:
+                    # Texto parcial já enviado: terminar com erro
+                    result.update(success=False, response="".join(parts), error=str(e))
+                    yield {"type": "final", "result": result}
+                    return
+
+        if not parts:
+            # Sem LLM (ou falhou antes do primeiro token): resposta simplificada
+            for word in simplified["text"].split(" "):
+                content = word if not parts else f" {word}"
+                parts.append(content)
+                yield {"type": "token", "content": content}
+            result["response_type"] = "legal_guidance_simplified"
+
+        result["response"] = "".join(parts)
+        yield {"type": "final", "result": result}
+
+    async def _retrieve(self, user_query: str, db) -> Union[Dict, List[Dict]]:
+        """
+        Valida a pergunta e pesquisa a base legal.
+
+        Returns:
+            Lista de matches, ou a resposta final quando não há que gerar
+            (tema não jurídico, sem base legal ou escalação)
+        """
+        # 0. Validar se a pergunta é sobre temas jurídicos
+        if not self._is_legal_question(user_query):
+            return self._generate_non_legal_response(user_query)
+
+        # 1. Buscar conteúdo relevante
+        matches = await self.search_engine.search_legal_content(
+            query=user_query,
+            db=db,
+            limit=5,
+            min_confidence=self.min_confidence_threshold
+        )
+
+        if not matches:
+            return self._generate_no_legal_basis_response(user_query)
+
+        # 2. Verificar se é tema sensível
+        is_sensitive = self._is_sensitive_topic(user_query)
+        max_confidence = max([m["confidence"] for m in matches])
+
+        if is_sensitive or max_confidence < 0.6:
+            return self._generate_escalation_response(user_query, matches, is_sensitive)
+
+        return matches
 
     def _is_legal_question(self, query: str) -> bool:
         """
@@ -277,48 +399,23 @@ class LegalResponseGenerator:
             "response_type": "topic_restriction"
         }
 
-    async def _generate_legal_response(self, query: str, matches: List[Dict]) -> Dict:
-        """Gera resposta baseada nos matches encontrados."""
-        try:
-            # Construir contexto legal
-            legal_context = self._build_legal_context(matches)
-
-            # Prompt para linguagem simples
-            prompt = f"""
-Com base na legislação moçambicana fornecida, responda à pergunta de forma clara e simples.
-
-PERGUNTA: {query}
-
-BASE LEGAL:
-{legal_context}
-
-INSTRUÇÕES:
-- Responda em português simples e claro
-- Use linguagem acessível ao cidadão comum
-- Cite sempre a fonte legal (lei e artigo)
-- Se houver dúvidas, seja honesto sobre limitações
-- Mantenha o tom respeitoso e profissional
-- Máximo 200 palavras
-
-RESPOSTA:"""
-
-            # Para este MVP, vou usar uma resposta estruturada simples
-            # Em produção, aqui seria chamado um LLM como Claude ou GPT
-            simplified_response = self._create_simplified_response(query, matches)
-
-            return {
-                "success": True,
-                "response": simplified_response["text"],
-                "sources": simplified_response["sources"],
-                "confidence": simplified_response["confidence"],
-                "requires_human": False,
-                "search_matches": len(matches),
-                "response_type": "legal_guidance"
-            }
+    def _build_prompt(self, query: str) -> str:
+        """Constrói o prompt (a base legal segue como contexto)."""
+        return (
+            "Com base na legislação moçambicana fornecida, responda à pergunta "
+            f"de forma clara e simples.\n\nPERGUNTA: {query}"
+        )
 
-        except Exception as e:
-            logger.error(f"Erro ao gerar resposta legal: {e}")
-            return self._generate_error_response()
+    def _document_ids(self, matches: List[Dict]) -> List[str]:
+        """IDs dos documentos legais que sustentam os matches."""
+        ids = []
+        for match in matches:
+            doc_id = match.get("document_id") or (
+                match.get("id") if match.get("type") == "document" else None
+            )
+            if doc_id and doc_id not in ids:
+                ids.append(doc_id)
+        return ids
 
     def _build_legal_context(self, matches: List[Dict]) -> str:
         """Constrói contexto legal a partir dos matches."""
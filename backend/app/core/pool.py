@@ -22,6 +22,7 @@ from typing import Dict, AsyncGenerator, Optional, Set, Any, List
 from enum import Enum
 
 from app.core.protocols import AbstractLLM, AbstractLLMFactory, AbstractLLMPool, LLMError
+from app.core.concurrency import concurrency_manager
 
 logger = logging.getLogger(__name__)
 
@@ -250,6 +251,7 @@ class LLMPool(AbstractLLMPool):
     - Warm-up automático e otimizado
     - Balanceamento de carga
     - Recovery automático de falhas
+    - Tamanho máximo acompanha o limite adaptativo de concorrência
     """
 
     def __init__(
@@ -286,6 +288,7 @@ class LLMPool(AbstractLLMPool):
             "total_acquisitions": 0,
             "total_creations": 0,
             "total_errors": 0,
+            "total_cancelled": 0,
             "uptime_start": time.time()
         }
         
@@ -590,7 +593,7 @@ class LLMPool(AbstractLLMPool):
                 except asyncio.QueueEmpty:
                     # Criar nova instância se possível
                     current_instances = len(self._all_instances[model_name])
-                    if current_instances < self._config.max_size_per_model:
+                    if current_instances < self._effective_max_size(model_name):
                         try:
                             instance = await self._create_instance_with_retry(model_name)
                             wrapper = InstanceWrapper(instance, model_name)
@@ -626,6 +629,10 @@ class LLMPool(AbstractLLMPool):
 
             yield wrapper.instance
 
+        except asyncio.CancelledError:
+            # Cliente desistiu: não conta como falha da instância
+            self._global_metrics["total_cancelled"] += 1
+            raise
         except Exception as e:
             self._stats[model_name].total_failures += 1
             self._global_metrics["total_errors"] += 1
@@ -636,7 +643,8 @@ class LLMPool(AbstractLLMPool):
         
         finally:
             if wrapper:
-                await self._release_instance(model_name, wrapper)
+                # shield: a instância volta ao pool mesmo com cancelamento em curso
+                await asyncio.shield(self._release_instance(model_name, wrapper))
 
     async def _release_instance(self, model_name: str, wrapper: InstanceWrapper) -> None:
         """Libera instância de volta para o pool."""
@@ -659,6 +667,18 @@ class LLMPool(AbstractLLMPool):
         except Exception as e:
             logger.error(f"Erro ao liberar instância {model_name}: {e}")
 
+    def _effective_max_size(self, model_name: str) -> int:
+        """
+        Tamanho máximo efetivo do pool de um modelo.
+
+        Limitado pelo limite adaptativo de concorrência do modelo, para que
+        não se criem instâncias além da capacidade observada do upstream.
+        """
+        adaptive_limit = concurrency_manager.limit_for_model(model_name)
+        if adaptive_limit is None:
+            return self._config.max_size_per_model
+        return max(1, min(self._config.max_size_per_model, adaptive_limit))
+
     def _update_metrics(self, model_name: str, acquisition_time: float) -> None:
         """Atualiza métricas do pool."""
         if not self._config.enable_metrics:
@@ -769,6 +789,10 @@ class LLMPool(AbstractLLMPool):
             "total_instances_current": self.size,
             "total_available_current": self.available,
             "background_tasks": len(self._background_tasks),
+            "effective_max_size": {
+                model_name: self._effective_max_size(model_name)
+                for model_name in self._pools
+            },
             "config": {
                 "max_size_per_model": self._config.max_size_per_model,
                 "min_size_per_model": self._config.min_size_per_model,
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tabela de Preços dos Modelos LLM.
+
+Preços por milhão de tokens (USD) usados para estimar o custo de uma
+requisição antes de a enviar (roteamento, quotas), para calcular o custo
+real a partir do usage dos provedores e para relatórios.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """Preços de um modelo em USD por milhão de tokens."""
+    input_per_mtok: float
+    output_per_mtok: float
+    cache_read_per_mtok: Optional[float] = None
+    cache_write_per_mtok: Optional[float] = None
+
+    def estimate(self, input_tokens: int, output_tokens: int) -> float:
+        """Custo estimado de uma requisição sem cache."""
+        return (
+            input_tokens * self.input_per_mtok + output_tokens * self.output_per_mtok
+        ) / 1_000_000
+
+    def cost(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0
+    ) -> float:
+        """Custo real a partir do usage (cache sem preço próprio paga como input)."""
+        cache_read = self.cache_read_per_mtok if self.cache_read_per_mtok is not None else self.input_per_mtok
+        cache_write = self.cache_write_per_mtok if self.cache_write_per_mtok is not None else self.input_per_mtok
+        return (
+            input_tokens * self.input_per_mtok
+            + output_tokens * self.output_per_mtok
+            + cache_read_tokens * cache_read
+            + cache_write_tokens * cache_write
+        ) / 1_000_000
+
+
+# Chaves são prefixos do nome do modelo (o mais longo vence)
+MODEL_PRICING: Dict[str, ModelPricing] = {
+    "claude-3-5-sonnet": ModelPricing(3.0, 15.0, 0.30, 3.75),
+    "claude-3-5-haiku": ModelPricing(0.80, 4.0, 0.08, 1.0),
+    "claude-3-opus": ModelPricing(15.0, 75.0, 1.50, 18.75),
+    "claude-3-sonnet": ModelPricing(3.0, 15.0),
+    "claude-3-haiku": ModelPricing(0.25, 1.25, 0.03, 0.30),
+    "gemini-1.5-pro": ModelPricing(1.25, 5.0, 0.3125),
+    "gemini-1.5-flash": ModelPricing(0.075, 0.30, 0.01875),
+    "gemini-pro": ModelPricing(0.50, 1.50),
+}
+
+
+@lru_cache(maxsize=256)
+def get_model_pricing(model_name: str) -> Optional[ModelPricing]:
+    """
+    Obtém os preços de um modelo.
+
+    Args:
+        model_name: Nome completo do modelo (ex.: 'claude-3-5-sonnet-20241022')
+
+    Returns:
+        Preços do modelo ou None se desconhecido
+    """
+    matches = [prefix for prefix in MODEL_PRICING if model_name.startswith(prefix)]
+    if not matches:
+        return None
+    return MODEL_PRICING[max(matches, key=len)]
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Cache de Prefixos de Prompt nos Provedores.
+
+Suporte partilhado ao cache de prefixos estáveis (prompt do sistema e
+contexto jurídico da conversa) feito pelos próprios provedores:
+- Registro de handles de contexto em cache (cachedContents do Gemini)
+- Criação única por prefixo, reutilização entre turnos e renovação antes do TTL
+- Contabilização de tokens escritos/lidos do cache a partir do usage
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_prefix_key(model_name: str, system_prompt: Optional[str], context: str) -> str:
+    """Chave determinística de um prefixo de prompt (modelo + sistema + contexto)."""
+    digest = hashlib.sha256()
+    for part in (model_name, system_prompt or "", context or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+@dataclass
+class ContextCacheHandle:
+    """Handle de um contexto em cache no provedor."""
+    name: str
+    created_at: float
+    expires_at: float  # time.monotonic()
+    reuses: int = 0
+
+
+class ContextCacheRegistry:
+    """
+    Registro de handles de contexto em cache por prefixo.
+
+    Características:
+    - Uma única criação por prefixo, mesmo com turnos concorrentes
+    - Renovação antecipada antes do fim do TTL do provedor
+    - Memória negativa para prefixos que o provedor recusou
+    """
+
+    def __init__(
+        self,
+        ttl_sec: Optional[float] = None,
+        refresh_margin_sec: float = 60.0,
+        failure_ttl_sec: float = 300.0,
+        max_handles: int = 1000
+    ):
+        """
+        Inicializa o registro.
+
+        Args:
+            ttl_sec: TTL dos contextos no provedor (usa config se None)
+            refresh_margin_sec: Margem antes do fim do TTL para recriar
+            failure_ttl_sec: Tempo durante o qual uma falha não é repetida
+            max_handles: Número máximo de handles registados
+        """
+        self.ttl_sec = ttl_sec if ttl_sec is not None else settings.llm.gemini_context_cache_ttl_sec
+        self._refresh_margin = refresh_margin_sec
+        self._failure_ttl = failure_ttl_sec
+        self._max_handles = max_handles
+        self._handles: Dict[str, ContextCacheHandle] = {}
+        self._failures: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._next_sweep = time.monotonic() + self._refresh_margin
+        self._stats = {
+            "handles_created": 0,
+            "handle_reuses": 0,
+            "creation_failures": 0,
+            "skipped_after_failure": 0,
+        }
+
+    async def get_or_create(
+        self,
+        key: str,
+        creator: Callable[[float], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """
+        Obtém o handle de um prefixo, criando-o se necessário.
+
+        Args:
+            key: Chave do prefixo (ver build_prefix_key)
+            creator: Cria o contexto no provedor com o TTL dado e retorna o nome
+
+        Returns:
+            Nome do contexto em cache ou None se indisponível
+        """
+        handle = self._valid_handle(key)
+        if handle is not None:
+            handle.reuses += 1
+            self._stats["handle_reuses"] += 1
+            return handle.name
+
+        async with self._locks[key]:
+            # Outro turno pode ter criado o handle enquanto esperávamos
+            handle = self._valid_handle(key)
+            if handle is not None:
+                handle.reuses += 1
+                self._stats["handle_reuses"] += 1
+                return handle.name
+
+            failed_at = self._failures.get(key)
+            if failed_at is not None:
+                if time.monotonic() - failed_at < self._failure_ttl:
+                    self._stats["skipped_after_failure"] += 1
+                    return None
+                del self._failures[key]
+
+            try:
+                name = await creator(self.ttl_sec)
+            except Exception as e:
+                logger.warning(f"Falha ao criar contexto em cache no provedor: {e}")
+                name = None
+
+            self._sweep_if_due()
+            if not name:
+                self._failures[key] = time.monotonic()
+                self._stats["creation_failures"] += 1
+                return None
+
+            self._evict_if_needed()
+            now = time.monotonic()
+            self._handles[key] = ContextCacheHandle(
+                name=name,
+                created_at=now,
+                expires_at=now + self.ttl_sec,
+            )
+            self._stats["handles_created"] += 1
+            logger.debug(f"Contexto em cache criado: {name}")
+            return name
+
+    def invalidate(self, key: str) -> None:
+        """Esquece o handle de um prefixo (ex.: expirado no provedor)."""
+        self._handles.pop(key, None)
+        self._drop_lock(key)
+
+    def _valid_handle(self, key: str) -> Optional[ContextCacheHandle]:
+        """Handle ainda utilizável (fora da margem de renovação)."""
+        handle = self._handles.get(key)
+        if handle is None:
+            return None
+        if time.monotonic() >= handle.expires_at - self._refresh_margin:
+            del self._handles[key]
+            self._drop_lock(key)
+            return None
+        return handle
+
+    def _drop_lock(self, key: str) -> None:
+        """Remove o lock de um prefixo sem handle nem falha (se ninguém o usa)."""
+        if key in self._handles or key in self._failures:
+            return
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+
+    def _sweep_if_due(self) -> None:
+        """
+        Remove periodicamente handles expirados e falhas cujo TTL passou,
+        com os respetivos locks, para prefixos que não voltam a ser pedidos.
+        """
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._refresh_margin
+
+        for key in [k for k, h in self._handles.items() if now >= h.expires_at - self._refresh_margin]:
+            del self._handles[key]
+        for key in [k for k, failed_at in self._failures.items() if now - failed_at >= self._failure_ttl]:
+            del self._failures[key]
+        for key in list(self._locks):
+            self._drop_lock(key)
+
+    def _evict_if_needed(self) -> None:
+        """Remove os handles mais próximos de expirar quando cheio."""
+        while len(self._handles) >= self._max_handles:
+            oldest = min(self._handles, key=lambda k: self._handles[k].expires_at)
+            del self._handles[oldest]
+            self._drop_lock(oldest)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do registro."""
+        return {
+            **self._stats,
+            "active_handles": len(self._handles),
+            "tracked_failures": len(self._failures),
+            "tracked_locks": len(self._locks),
+            "ttl_seconds": self.ttl_sec,
+        }
+
+
+@dataclass
+class _ProviderCacheUsage:
+    """Uso de cache de prompt acumulado por provedor."""
+    requests: int = 0
+    cache_hit_requests: int = 0
+    uncached_input_tokens: int = 0
+    cache_write_tokens: int = 0
+    cache_read_tokens: int = 0
+
+
+class PromptCacheMetrics:
+    """Contabilização de cache de prompt a partir do usage dos provedores."""
+
+    def __init__(self):
+        self._usage: Dict[str, _ProviderCacheUsage] = defaultdict(_ProviderCacheUsage)
+
+    def record(
+        self,
+        provider: str,
+        uncached_input_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cache_read_tokens: int = 0
+    ) -> None:
+        """Regista o usage de uma requisição."""
+        usage = self._usage[provider]
+        usage.requests += 1
+        usage.uncached_input_tokens += uncached_input_tokens or 0
+        usage.cache_write_tokens += cache_write_tokens or 0
+        usage.cache_read_tokens += cache_read_tokens or 0
+        if cache_read_tokens:
+            usage.cache_hit_requests += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas por provedor."""
+        metrics = {}
+        for provider, usage in self._usage.items():
+            total_input = (
+                usage.uncached_input_tokens + usage.cache_write_tokens + usage.cache_read_tokens
+            )
+            metrics[provider] = {
+                "requests": usage.requests,
+                "cache_hit_requests": usage.cache_hit_requests,
+                "hit_rate": (
+                    usage.cache_hit_requests / usage.requests * 100
+                    if usage.requests > 0 else 0.0
+                ),
+                "uncached_input_tokens": usage.uncached_input_tokens,
+                "cache_write_tokens": usage.cache_write_tokens,
+                "cache_read_tokens": usage.cache_read_tokens,
+                "cached_input_ratio": (
+                    usage.cache_read_tokens / total_input * 100 if total_input > 0 else 0.0
+                ),
+            }
+        return metrics
+
+
+# Instâncias globais
+gemini_context_cache = ContextCacheRegistry()
+prompt_cache_metrics = PromptCacheMetrics()
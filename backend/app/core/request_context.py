@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Contexto de Requisição LLM.
+
+Propaga, via ContextVar, os metadados de agendamento de uma requisição
+até à camada de clientes LLM sem alterar as assinaturas do protocolo:
+- Faixa de prioridade (interativa ou batch)
+- Prazo (deadline) da requisição
+- Identificação do utilizador e da conversa
+- Tipo de contexto (restrições de roteamento de modelos)
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Iterator, Optional
+
+from app.schemas import ContextType
+
+
+class RequestLane(Enum):
+    """Faixas de prioridade das requisições LLM."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+@dataclass(frozen=True)
+class LLMRequestContext:
+    """Metadados de agendamento de uma requisição LLM."""
+    lane: RequestLane = RequestLane.INTERACTIVE
+    deadline: Optional[float] = None  # time.monotonic()
+    user_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    context_type: Optional[ContextType] = None
+
+    @property
+    def remaining_sec(self) -> Optional[float]:
+        """Tempo restante até ao prazo (None se sem prazo)."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+_current_context: ContextVar[LLMRequestContext] = ContextVar(
+    "llm_request_context", default=LLMRequestContext()
+)
+
+
+def get_request_context() -> LLMRequestContext:
+    """Retorna o contexto da requisição LLM atual."""
+    return _current_context.get()
+
+
+@contextmanager
+def llm_request_context(
+    lane: Optional[RequestLane] = None,
+    timeout_sec: Optional[float] = None,
+    user_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    context_type: Optional[ContextType] = None
+) -> Iterator[LLMRequestContext]:
+    """
+    Define o contexto das chamadas LLM feitas dentro do bloco.
+
+    Campos não indicados são herdados do contexto envolvente.
+
+    Args:
+        lane: Faixa de prioridade
+        timeout_sec: Prazo relativo da requisição
+        user_id: Identificador do utilizador
+        conversation_id: Identificador da conversa
+        context_type: Tipo de contexto da requisição
+    """
+    current = _current_context.get()
+    changes = {}
+    if lane is not None:
+        changes["lane"] = lane
+    if timeout_sec is not None:
+        changes["deadline"] = time.monotonic() + timeout_sec
+    if user_id is not None:
+        changes["user_id"] = user_id
+    if conversation_id is not None:
+        changes["conversation_id"] = conversation_id
+    if context_type is not None:
+        changes["context_type"] = context_type
+
+    context = replace(current, **changes)
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
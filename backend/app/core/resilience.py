@@ -5,15 +5,19 @@ Módulo de Resiliência para Mozaia LLM Orchestrator.
 Implementa padrões de resiliência essenciais para sistemas distribuídos:
 - Circuit Breaker: Previne cascata de falhas
 - Rate Limiter: Controla taxa de requisições
-- Retry com backoff: Retentativos inteligentes
+- Retry com backoff: Retentativos inteligentes (respeitam Retry-After)
+- Retry Budget: Limita retentativas a uma fração das requisições
 - Health Monitor: Monitoramento contínuo de saúde
 """
 import asyncio
+import inspect
+import re
 import time
 import logging
 import random
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Tuple, List, Optional, Callable, Any
+from email.utils import parsedate_to_datetime
+from typing import Dict, Tuple, List, Mapping, Optional, Callable, Any
 from enum import Enum
 from dataclasses import dataclass, field
 from contextlib import asynccontextmanager
@@ -33,22 +37,24 @@ class CircuitState(Enum):
 @dataclass
 class CircuitBreakerConfig:
     """Configuração do Circuit Breaker."""
-    failure_threshold: int = 5  # Número de falhas para abrir circuito
+    failure_threshold: int = 5  # Mínimo de falhas na janela para abrir circuito
+    failure_rate_threshold: float = 0.5  # Taxa de falhas na janela para abrir circuito
     reset_timeout_sec: int = 60  # Tempo antes de tentar half-open
     half_open_max_calls: int = 3  # Máximo de chamadas em half-open
     success_threshold: int = 2  # Sucessos necessários para fechar circuito
     monitor_window_sec: int = 300  # Janela para contar falhas
+    window_buckets: int = 10  # Resolução da janela deslizante
 
 
 @dataclass
 class CircuitBreakerMetrics:
-    """Métricas do Circuit Breaker."""
+    """Métricas do Circuit Breaker (instantes em time.time())."""
     state: CircuitState = CircuitState.CLOSED
     failure_count: int = 0
     success_count: int = 0
-    last_failure_time: Optional[datetime] = None
-    last_success_time: Optional[datetime] = None
-    state_changed_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    last_failure_time: Optional[float] = None
+    last_success_time: Optional[float] = None
+    state_changed_at: float = field(default_factory=time.time)
     total_requests: int = 0
     blocked_requests: int = 0
     half_open_attempts: int = 0
@@ -60,152 +66,195 @@ class CircuitBreaker:
     
     Características:
     - Estados CLOSED/OPEN/HALF_OPEN
-    - Janela deslizante para contagem de falhas
+    - Janela deslizante em buckets com taxa de falhas
+    - Caminho rápido síncrono (sem lock nem datetime) no estado CLOSED
+    - Relógio monotónico para timeouts
     - Métricas detalhadas
-    - Thread-safe com asyncio
     - Configuração flexível
+
+    Os métodos síncronos não cedem o event loop, pelo que são atómicos
+    entre corrotinas sem necessidade de lock.
     """
 
     def __init__(self, name: str, config: Optional[CircuitBreakerConfig] = None):
         self.name = name
         self.config = config or CircuitBreakerConfig()
         self.metrics = CircuitBreakerMetrics()
-        self._lock = asyncio.Lock()
-        self._failure_timestamps: List[float] = []
+        self._opened_at = 0.0
+        self._bucket_width = self.config.monitor_window_sec / max(1, self.config.window_buckets)
+        buckets = max(1, self.config.window_buckets)
+        self._bucket_ids = [-1] * buckets
+        self._bucket_successes = [0] * buckets
+        self._bucket_failures = [0] * buckets
         
         logger.info(f"Circuit Breaker '{name}' inicializado com threshold={self.config.failure_threshold}")
 
-    async def is_call_allowed(self) -> bool:
+    @property
+    def state(self) -> CircuitState:
+        return self.metrics.state
+
+    @property
+    def is_open(self) -> bool:
+        """Indica se as chamadas estão a ser recusadas (OPEN antes do reset)."""
+        return (
+            self.metrics.state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at < self.config.reset_timeout_sec
+        )
+
+    def allow_request(self) -> bool:
         """
         Verifica se uma chamada é permitida baseada no estado atual.
         
         Returns:
             True se a chamada for permitida
         """
-        async with self._lock:
-            self.metrics.total_requests += 1
-            current_time = datetime.now(timezone.utc)
-            
-            if self.metrics.state == CircuitState.CLOSED:
-                return True
-            
-            elif self.metrics.state == CircuitState.OPEN:
-                # Verificar se é hora de tentar half-open
-                if self._should_attempt_reset(current_time):
-                    logger.info(f"Circuit Breaker '{self.name}' mudando para HALF_OPEN")
-                    self._transition_to_half_open(current_time)
-                    return True
-                else:
-                    self.metrics.blocked_requests += 1
-                    logger.debug(f"Circuit Breaker '{self.name}' bloqueou requisição (OPEN)")
-                    return False
-            
-            elif self.metrics.state == CircuitState.HALF_OPEN:
-                # Permitir apenas um número limitado de tentativas
-                if self.metrics.half_open_attempts < self.config.half_open_max_calls:
-                    self.metrics.half_open_attempts += 1
-                    return True
-                else:
-                    self.metrics.blocked_requests += 1
-                    logger.debug(f"Circuit Breaker '{self.name}' bloqueou requisição (HALF_OPEN limit)")
-                    return False
+        self.metrics.total_requests += 1
+        state = self.metrics.state
+        if state is CircuitState.CLOSED:
+            return True
+        
+        if state is CircuitState.OPEN:
+            # Verificar se é hora de tentar half-open
+            if time.monotonic() - self._opened_at >= self.config.reset_timeout_sec:
+                logger.info(f"Circuit Breaker '{self.name}' mudando para HALF_OPEN")
+                self._transition_to_half_open()
+            else:
+                self.metrics.blocked_requests += 1
+                return False
         
+        # HALF_OPEN: permitir apenas um número limitado de tentativas
+        if self.metrics.half_open_attempts < self.config.half_open_max_calls:
+            self.metrics.half_open_attempts += 1
+            return True
+        self.metrics.blocked_requests += 1
         return False
 
-    async def record_success(self):
-        """Registra uma operação bem-sucedida."""
-        async with self._lock:
-            current_time = datetime.now(timezone.utc)
-            self.metrics.success_count += 1
-            self.metrics.last_success_time = current_time
-            
-            if self.metrics.state == CircuitState.HALF_OPEN:
-                # Verificar se devemos fechar o circuito
-                if self.metrics.success_count >= self.config.success_threshold:
-                    logger.info(f"Circuit Breaker '{self.name}' fechado após {self.metrics.success_count} sucessos")
-                    self._transition_to_closed(current_time)
-            
-            elif self.metrics.state == CircuitState.OPEN:
-                # Reset do estado se recebermos sucesso inesperado
-                logger.info(f"Circuit Breaker '{self.name}' fechado por sucesso inesperado")
-                self._transition_to_closed(current_time)
-
-    async def record_failure(self, error: Optional[Exception] = None):
+    def on_success(self) -> None:
+        """Regista uma operação bem-sucedida."""
+        self.metrics.success_count += 1
+        self.metrics.last_success_time = time.time()
+        state = self.metrics.state
+        
+        if state is CircuitState.CLOSED:
+            self._bucket_successes[self._current_bucket()] += 1
+        elif state is CircuitState.HALF_OPEN:
+            # Verificar se devemos fechar o circuito
+            if self.metrics.success_count >= self.config.success_threshold:
+                logger.info(f"Circuit Breaker '{self.name}' fechado após {self.metrics.success_count} sucessos")
+                self._transition_to_closed()
+        else:
+            # Reset do estado se recebermos sucesso inesperado
+            logger.info(f"Circuit Breaker '{self.name}' fechado por sucesso inesperado")
+            self._transition_to_closed()
+
+    def on_failure(self, error: Optional[Exception] = None) -> None:
         """
-        Registra uma falha na operação.
+        Regista uma falha na operação.
         
         Args:
             error: Exceção que causou a falha (opcional)
         """
-        async with self._lock:
-            current_time = datetime.now(timezone.utc)
-            current_timestamp = time.time()
-            
-            self.metrics.failure_count += 1
-            self.metrics.last_failure_time = current_time
-            self._failure_timestamps.append(current_timestamp)
-            
-            # Limpar timestamps antigos
-            self._cleanup_old_failures(current_timestamp)
-            
-            error_msg = f" - {str(error)}" if error else ""
-            logger.warning(f"Circuit Breaker '{self.name}' registrou falha{error_msg}")
-            
-            if self.metrics.state == CircuitState.CLOSED:
-                # Verificar se devemos abrir o circuito
-                if len(self._failure_timestamps) >= self.config.failure_threshold:
-                    logger.error(
-                        f"Circuit Breaker '{self.name}' aberto após "
-                        f"{len(self._failure_timestamps)} falhas em "
-                        f"{self.config.monitor_window_sec}s"
-                    )
-                    self._transition_to_open(current_time)
-            
-            elif self.metrics.state == CircuitState.HALF_OPEN:
-                # Falha em half-open volta para open
-                logger.warning(f"Circuit Breaker '{self.name}' voltou para OPEN devido à falha em HALF_OPEN")
-                self._transition_to_open(current_time)
-
-    def _should_attempt_reset(self, current_time: datetime) -> bool:
-        """Verifica se deve tentar reset do circuito."""
-        if not self.metrics.last_failure_time:
-            return True
+        self.metrics.failure_count += 1
+        self.metrics.last_failure_time = time.time()
+        state = self.metrics.state
+        
+        if state is CircuitState.CLOSED:
+            self._bucket_failures[self._current_bucket()] += 1
+            failures, total = self._window_counts()
+            # Abrir só com falhas suficientes e taxa acima do limiar
+            if (
+                failures >= self.config.failure_threshold
+                and failures / total >= self.config.failure_rate_threshold
+            ):
+                error_msg = f" - {error}" if error else ""
+                logger.error(
+                    f"Circuit Breaker '{self.name}' aberto após {failures}/{total} falhas em "
+                    f"{self.config.monitor_window_sec}s{error_msg}"
+                )
+                self._transition_to_open()
         
-        time_since_failure = current_time - self.metrics.last_failure_time
-        return time_since_failure.total_seconds() >= self.config.reset_timeout_sec
+        elif state is CircuitState.HALF_OPEN:
+            # Falha em half-open volta para open
+            logger.warning(f"Circuit Breaker '{self.name}' voltou para OPEN devido à falha em HALF_OPEN")
+            self._transition_to_open()
+
+    def on_ignored(self) -> None:
+        """Liberta uma vaga de half-open usada por uma chamada sem resultado (ex.: cancelada)."""
+        if self.metrics.state is CircuitState.HALF_OPEN and self.metrics.half_open_attempts > 0:
+            self.metrics.half_open_attempts -= 1
+
+    # Interface assíncrona mantida por compatibilidade
+    async def is_call_allowed(self) -> bool:
+        """Versão assíncrona de allow_request."""
+        return self.allow_request()
+
+    async def record_success(self):
+        """Versão assíncrona de on_success."""
+        self.on_success()
 
-    def _transition_to_closed(self, current_time: datetime):
+    async def record_failure(self, error: Optional[Exception] = None):
+        """Versão assíncrona de on_failure."""
+        self.on_failure(error)
+
+    def _current_bucket(self) -> int:
+        """Índice do bucket atual, reiniciando-o se pertencer a uma volta anterior."""
+        bucket_id = int(time.monotonic() / self._bucket_width)
+        index = bucket_id % len(self._bucket_ids)
+        if self._bucket_ids[index] != bucket_id:
+            self._bucket_ids[index] = bucket_id
+            self._bucket_successes[index] = 0
+            self._bucket_failures[index] = 0
+        return index
+
+    def _window_counts(self) -> Tuple[int, int]:
+        """Falhas e total de chamadas dentro da janela."""
+        oldest = int(time.monotonic() / self._bucket_width) - len(self._bucket_ids)
+        failures = total = 0
+        for index, bucket_id in enumerate(self._bucket_ids):
+            if bucket_id > oldest:
+                failures += self._bucket_failures[index]
+                total += self._bucket_failures[index] + self._bucket_successes[index]
+        return failures, total
+
+    def _reset_window(self) -> None:
+        for index in range(len(self._bucket_ids)):
+            self._bucket_ids[index] = -1
+            self._bucket_successes[index] = 0
+            self._bucket_failures[index] = 0
+
+    def _transition_to_closed(self):
         """Transição para estado CLOSED."""
         self.metrics.state = CircuitState.CLOSED
-        self.metrics.state_changed_at = current_time
+        self.metrics.state_changed_at = time.time()
         self.metrics.failure_count = 0
         self.metrics.success_count = 0
         self.metrics.half_open_attempts = 0
-        self._failure_timestamps.clear()
+        self._reset_window()
 
-    def _transition_to_open(self, current_time: datetime):
+    def _transition_to_open(self):
         """Transição para estado OPEN."""
         self.metrics.state = CircuitState.OPEN
-        self.metrics.state_changed_at = current_time
+        self.metrics.state_changed_at = time.time()
         self.metrics.success_count = 0
         self.metrics.half_open_attempts = 0
+        self._opened_at = time.monotonic()
 
-    def _transition_to_half_open(self, current_time: datetime):
+    def _transition_to_half_open(self):
         """Transição para estado HALF_OPEN."""
         self.metrics.state = CircuitState.HALF_OPEN
-        self.metrics.state_changed_at = current_time
+        self.metrics.state_changed_at = time.time()
         self.metrics.success_count = 0
         self.metrics.half_open_attempts = 0
 
-    def _cleanup_old_failures(self, current_timestamp: float):
-        """Remove timestamps de falhas antigas da janela."""
-        cutoff = current_timestamp - self.config.monitor_window_sec
-        self._failure_timestamps = [
-            ts for ts in self._failure_timestamps if ts > cutoff
-        ]
+    @staticmethod
+    def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
 
     def get_metrics(self) -> Dict[str, Any]:
         """Retorna métricas detalhadas do circuit breaker."""
+        failures, total = self._window_counts()
         return {
             "name": self.name,
             "state": self.metrics.state.value,
@@ -216,13 +265,16 @@ class CircuitBreaker:
             "block_rate": (
                 self.metrics.blocked_requests / max(self.metrics.total_requests, 1) * 100
             ),
-            "last_failure": self.metrics.last_failure_time.isoformat() if self.metrics.last_failure_time else None,
-            "last_success": self.metrics.last_success_time.isoformat() if self.metrics.last_success_time else None,
-            "state_changed_at": self.metrics.state_changed_at.isoformat(),
-            "current_failures_in_window": len(self._failure_timestamps),
+            "last_failure": self._isoformat(self.metrics.last_failure_time),
+            "last_success": self._isoformat(self.metrics.last_success_time),
+            "state_changed_at": self._isoformat(self.metrics.state_changed_at),
+            "current_failures_in_window": failures,
+            "calls_in_window": total,
+            "failure_rate": (failures / total * 100) if total else 0.0,
             "half_open_attempts": self.metrics.half_open_attempts,
             "config": {
                 "failure_threshold": self.config.failure_threshold,
+                "failure_rate_threshold": self.config.failure_rate_threshold,
                 "reset_timeout_sec": self.config.reset_timeout_sec,
                 "monitor_window_sec": self.config.monitor_window_sec,
             }
@@ -428,29 +480,174 @@ class RetryConfig:
         base_delay: float = 1.0,
         max_delay: float = 60.0,
         backoff_factor: float = 2.0,
-        jitter: bool = True
+        jitter: bool = True,
+        honor_retry_after: bool = True
     ):
         self.max_attempts = max_attempts
         self.base_delay = base_delay
         self.max_delay = max_delay
         self.backoff_factor = backoff_factor
         self.jitter = jitter
+        self.honor_retry_after = honor_retry_after
+
+
+_DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*s\s*$")
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Extrai o atraso sugerido pelo servidor dos headers de uma resposta.
+
+    Suporta `retry-after-ms`, `retry-after` em segundos ou data HTTP.
+
+    Returns:
+        Atraso em segundos ou None se ausente/inválido
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Converte durações no formato protobuf ("30s", "1.5s") em segundos."""
+    if not isinstance(value, str):
+        return None
+    match = _DURATION_PATTERN.match(value)
+    return float(match.group(1)) if match else None
+
+
+@dataclass
+class RetryBudgetConfig:
+    """Configuração do orçamento de retentativas."""
+    ratio: float = 0.1  # Retentativas permitidas por requisição
+    min_retries_per_sec: float = 0.5  # Piso para tráfego baixo
+    max_tokens: float = 20.0  # Rajada máxima de retentativas
+
+
+@dataclass
+class RetryBudgetStats:
+    """Estatísticas do orçamento de retentativas."""
+    requests: int = 0
+    retries_allowed: int = 0
+    retries_denied: int = 0
+    retry_after_honored: int = 0
+    retry_after_exceeded: int = 0  # Atraso pedido acima do máximo configurado
+    total_backoff_sec: float = 0.0
+
+
+class RetryBudget:
+    """
+    Orçamento de retentativas partilhado (token bucket).
+
+    Cada requisição deposita `ratio` fichas e cada retentativa gasta uma,
+    pelo que as retentativas ficam limitadas a ~ratio das requisições
+    mesmo quando todos os chamadores falham ao mesmo tempo. Um piso
+    temporal permite algumas retentativas com pouco tráfego.
+    """
+
+    def __init__(self, name: str, config: Optional[RetryBudgetConfig] = None):
+        self.name = name
+        self.config = config or RetryBudgetConfig()
+        self.stats = RetryBudgetStats()
+        self._tokens = self.config.max_tokens
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if elapsed > 0 and self.config.min_retries_per_sec > 0:
+            self._tokens = min(
+                self.config.max_tokens,
+                self._tokens + elapsed * self.config.min_retries_per_sec
+            )
+
+    def deposit(self) -> None:
+        """Regista uma requisição (primeira tentativa)."""
+        self.stats.requests += 1
+        self._tokens = min(self.config.max_tokens, self._tokens + self.config.ratio)
+
+    def try_acquire(self) -> bool:
+        """Tenta gastar uma ficha para uma retentativa."""
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.stats.retries_allowed += 1
+            return True
+        self.stats.retries_denied += 1
+        return False
+
+    def record_backoff(self, delay: float, from_server: bool = False) -> None:
+        """Regista o tempo de espera antes de uma retentativa."""
+        self.stats.total_backoff_sec += delay
+        if from_server:
+            self.stats.retry_after_honored += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do orçamento."""
+        stats = self.stats
+        attempts = stats.retries_allowed + stats.retries_denied
+        return {
+            "name": self.name,
+            "available_tokens": round(self._tokens, 2),
+            "requests": stats.requests,
+            "retries_allowed": stats.retries_allowed,
+            "retries_denied": stats.retries_denied,
+            "retry_ratio": stats.retries_allowed / max(stats.requests, 1),
+            "denial_rate": (stats.retries_denied / attempts * 100) if attempts else 0.0,
+            "retry_after_honored": stats.retry_after_honored,
+            "retry_after_exceeded": stats.retry_after_exceeded,
+            "total_backoff_sec": round(stats.total_backoff_sec, 3),
+            "avg_backoff_sec": (
+                stats.total_backoff_sec / stats.retries_allowed if stats.retries_allowed else 0.0
+            ),
+            "config": {
+                "ratio": self.config.ratio,
+                "min_retries_per_sec": self.config.min_retries_per_sec,
+                "max_tokens": self.config.max_tokens,
+            }
+        }
 
 
 async def retry_with_backoff(
     func: Callable,
     config: Optional[RetryConfig] = None,
     exceptions: Tuple = (Exception,),
-    on_retry: Optional[Callable] = None
+    on_retry: Optional[Callable] = None,
+    budget: Optional[RetryBudget] = None
 ) -> Any:
     """
     Executa função com retry e backoff exponencial.
     
+    Se a exceção trouxer `retry_after` (Retry-After do provedor), esse
+    atraso substitui o backoff calculado; atrasos acima de max_delay não
+    são aguardados. Com um orçamento, cada retentativa gasta uma ficha e
+    é recusada se o orçamento estiver esgotado.
+    
     Args:
         func: Função a ser executada
         config: Configuração de retry
         exceptions: Tupla de exceções para retry
         on_retry: Callback chamado em cada retry
+        budget: Orçamento de retentativas partilhado (opcional)
         
     Returns:
         Resultado da função
@@ -460,13 +657,16 @@ async def retry_with_backoff(
     """
     config = config or RetryConfig()
     last_exception = None
+    if budget is not None:
+        budget.deposit()
     
     for attempt in range(config.max_attempts):
         try:
-            if asyncio.iscoroutinefunction(func):
-                return await func()
-            else:
-                return func()
+            result = func()
+            # Suporta lambdas que retornam corrotinas
+            if inspect.isawaitable(result):
+                result = await result
+            return result
                 
         except exceptions as e:
             last_exception = e
@@ -475,15 +675,35 @@ async def retry_with_backoff(
                 logger.error(f"Todas as {config.max_attempts} tentativas falharam: {e}")
                 raise
             
-            # Calcular delay
-            delay = min(
-                config.base_delay * (config.backoff_factor ** attempt),
-                config.max_delay
-            )
+            # Atraso sugerido pelo servidor tem prioridade sobre o backoff
+            server_delay = getattr(e, "retry_after", None) if config.honor_retry_after else None
+            if server_delay is not None:
+                if server_delay > config.max_delay:
+                    if budget is not None:
+                        budget.stats.retry_after_exceeded += 1
+                    logger.warning(
+                        f"Retry-After de {server_delay:.1f}s excede o máximo de "
+                        f"{config.max_delay:.1f}s, desistindo: {e}"
+                    )
+                    raise
+                # Pequeno jitter positivo para não sincronizar os chamadores
+                delay = server_delay * (1.0 + random.random() * 0.1) if config.jitter else server_delay
+            else:
+                delay = min(
+                    config.base_delay * (config.backoff_factor ** attempt),
+                    config.max_delay
+                )
+                
+                # Adicionar jitter
+                if config.jitter:
+                    delay *= (0.5 + random.random() * 0.5)
             
-            # Adicionar jitter
-            if config.jitter:
-                delay *= (0.5 + random.random() * 0.5)
+            if budget is not None and not budget.try_acquire():
+                logger.warning(
+                    f"Retentativa recusada pelo orçamento '{budget.name}' "
+                    f"(tentativa {attempt + 1}): {e}"
+                )
+                raise
             
             logger.warning(f"Tentativa {attempt + 1} falhou: {e}. Tentando novamente em {delay:.2f}s")
             
@@ -496,6 +716,8 @@ async def retry_with_backoff(
                 except Exception as callback_error:
                     logger.error(f"Erro no callback de retry: {callback_error}")
             
+            if budget is not None:
+                budget.record_backoff(delay, from_server=server_delay is not None)
             await asyncio.sleep(delay)
     
     raise last_exception
@@ -512,6 +734,7 @@ class ResilienceManager:
     def __init__(self):
         self._circuit_breakers: Dict[str, CircuitBreaker] = {}
         self._rate_limiters: Dict[str, RateLimiter] = {}
+        self._retry_budgets: Dict[str, RetryBudget] = {}
         self._lock = asyncio.Lock()
         
         logger.info("Resilience Manager inicializado")
@@ -522,10 +745,47 @@ class ResilienceManager:
         config: Optional[CircuitBreakerConfig] = None
     ) -> CircuitBreaker:
         """Obtém ou cria circuit breaker."""
-        async with self._lock:
-            if name not in self._circuit_breakers:
-                self._circuit_breakers[name] = CircuitBreaker(name, config)
-            return self._circuit_breakers[name]
+        return self.ensure_circuit_breaker(name, config)
+
+    def ensure_circuit_breaker(
+        self,
+        name: str,
+        config: Optional[CircuitBreakerConfig] = None
+    ) -> CircuitBreaker:
+        """Obtém ou cria circuit breaker (síncrono; atómico no event loop)."""
+        breaker = self._circuit_breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, config)
+            self._circuit_breakers[name] = breaker
+        return breaker
+
+    def find_circuit_breaker(self, name: str) -> Optional[CircuitBreaker]:
+        """Obtém um circuit breaker existente sem o criar (leitura sem lock)."""
+        return self._circuit_breakers.get(name)
+
+    def get_circuit_breaker_metrics(self, prefix: str = "") -> Dict[str, Any]:
+        """Retorna métricas dos circuit breakers cujo nome começa por `prefix`."""
+        return {
+            name: cb.get_metrics()
+            for name, cb in self._circuit_breakers.items()
+            if name.startswith(prefix)
+        }
+
+    def get_retry_budget(
+        self,
+        name: str,
+        config: Optional[RetryBudgetConfig] = None
+    ) -> RetryBudget:
+        """Obtém ou cria orçamento de retentativas (ex.: por provedor)."""
+        budget = self._retry_budgets.get(name)
+        if budget is None:
+            budget = RetryBudget(name, config)
+            self._retry_budgets[name] = budget
+        return budget
+
+    def get_retry_budget_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de todos os orçamentos de retentativas."""
+        return {name: budget.get_metrics() for name, budget in self._retry_budgets.items()}
 
     async def get_rate_limiter(
         self,
@@ -577,14 +837,12 @@ class ResilienceManager:
     def get_all_metrics(self) -> Dict[str, Any]:
         """Retorna métricas de todos os componentes."""
         return {
-            "circuit_breakers": {
-                name: cb.get_metrics() 
-                for name, cb in self._circuit_breakers.items()
-            },
+            "circuit_breakers": self.get_circuit_breaker_metrics(),
             "rate_limiters": {
                 name: rl.get_metrics() 
                 for name, rl in self._rate_limiters.items()
             },
+            "retry_budgets": self.get_retry_budget_metrics(),
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
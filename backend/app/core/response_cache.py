@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Cache de Respostas LLM.
+
+Cache em duas camadas à frente de BaseLLM.generate:
+- Camada exata: hash da requisição completa
+- Camada semântica (opcional): pergunta com embedding próximo de uma
+  pergunta já respondida, com o mesmo contexto jurídico recuperado
+- Invalidação por documento e por versão do corpus legal
+- Métricas de hit-rate, poupança e staleness
+"""
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.cache import AsyncInMemoryCache
+from app.core.coalescing import build_request_key
+from app.core.config import settings
+from app.schemas import LLMResponse, GenerationParams
+
+logger = logging.getLogger(__name__)
+
+# Função assíncrona que gera o embedding de um texto
+Embedder = Callable[[str], Awaitable[List[float]]]
+
+# Documentos legais que sustentam a resposta em construção
+_document_scope: ContextVar[Tuple[str, ...]] = ContextVar(
+    "llm_cache_document_scope", default=()
+)
+
+
+@contextmanager
+def cache_document_scope(document_ids: Iterable[Any]):
+    """
+    Associa as respostas geradas neste bloco aos documentos indicados.
+
+    Quando um destes documentos muda, as respostas são invalidadas.
+
+    Args:
+        document_ids: IDs dos documentos usados como contexto
+    """
+    token = _document_scope.set(tuple(str(doc_id) for doc_id in document_ids))
+    try:
+        yield
+    finally:
+        _document_scope.reset(token)
+
+
+def build_scope_key(
+    provider: str,
+    model_name: str,
+    context: str = "",
+    system_prompt: Optional[str] = None,
+    params: Optional[GenerationParams] = None
+) -> str:
+    """
+    Chave de escopo semântico: tudo exceto a pergunta.
+
+    Duas perguntas só partilham resposta semântica se tiverem o mesmo
+    modelo, prompt do sistema, contexto recuperado e parâmetros.
+    """
+    return build_request_key(provider, model_name, "", context, system_prompt, params)
+
+
+@dataclass
+class CachedResponse:
+    """Resposta armazenada no cache."""
+    response: LLMResponse
+    created_at: float
+    corpus_version: int
+    document_ids: Tuple[str, ...] = ()
+
+
+@dataclass
+class _SemanticEntry:
+    """Entrada do índice semântico."""
+    request_key: str
+    embedding: List[float]
+    created_at: float
+
+
+@dataclass
+class ResponseCacheStats:
+    """Estatísticas do cache de respostas."""
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    stale_rejections: int = 0
+    invalidations: int = 0
+    invalidated_entries: int = 0
+    semantic_near_misses: int = 0
+    tokens_saved: int = 0
+    cost_saved: float = 0.0
+    latency_saved_sec: float = 0.0
+    total_hit_age_sec: float = 0.0
+    max_hit_age_sec: float = 0.0
+    total_semantic_similarity: float = 0.0
+    embedding_errors: int = 0
+    document_index_prunes: int = 0
+
+    @property
+    def hits(self) -> int:
+        """Total de hits (exatos e semânticos)."""
+        return self.exact_hits + self.semantic_hits
+
+    @property
+    def hit_rate(self) -> float:
+        """Taxa de acerto do cache (%)."""
+        total = self.hits + self.misses
+        return (self.hits / total * 100) if total > 0 else 0.0
+
+
+class LLMResponseCache:
+    """
+    Cache de respostas LLM com camada exata e semântica.
+
+    Características:
+    - TTL configurável
+    - Camada semântica opcional com limiar de similaridade
+    - Invalidação por documento legal ou por todo o corpus
+    - Rejeição de entradas de versões antigas do corpus
+    - Métricas para afinar limiares com segurança
+    """
+
+    # Respostas associadas a documentos antes da primeira limpeza do índice
+    _MIN_PRUNE_THRESHOLD = 1024
+
+    def __init__(
+        self,
+        cache: Optional[AsyncInMemoryCache] = None,
+        enabled: Optional[bool] = None,
+        ttl_sec: Optional[int] = None,
+        namespace: str = "llm_responses",
+        embedder: Optional[Embedder] = None,
+        semantic_enabled: Optional[bool] = None,
+        similarity_threshold: Optional[float] = None,
+        max_semantic_entries: Optional[int] = None
+    ):
+        """
+        Inicializa o cache de respostas.
+
+        Args:
+            cache: Cache subjacente (cria um dedicado se None)
+            enabled: Habilitar cache (usa config se None)
+            ttl_sec: TTL das respostas (usa config se None)
+            namespace: Namespace no cache subjacente
+            embedder: Função de embedding para a camada semântica
+            semantic_enabled: Habilitar camada semântica (usa config se None)
+            similarity_threshold: Similaridade coseno mínima (usa config se None)
+            max_semantic_entries: Máximo de entradas no índice semântico
+        """
+        cache_settings = settings.cache
+        self._enabled = (
+            enabled if enabled is not None else cache_settings.llm_response_cache_enabled
+        )
+        self._ttl = ttl_sec or cache_settings.llm_response_ttl_sec
+        self._namespace = namespace
+        self._cache = cache or AsyncInMemoryCache(
+            ttl_sec=self._ttl,
+            max_size=cache_settings.llm_response_cache_max_size
+        )
+        self._embedder = embedder
+        self._semantic_enabled = (
+            semantic_enabled
+            if semantic_enabled is not None
+            else cache_settings.semantic_cache_enabled
+        )
+        self._similarity_threshold = (
+            similarity_threshold or cache_settings.semantic_similarity_threshold
+        )
+        self._max_semantic_entries = (
+            max_semantic_entries or cache_settings.semantic_cache_max_entries
+        )
+
+        # Índices auxiliares
+        self._semantic_index: Dict[str, Deque[_SemanticEntry]] = {}
+        self._semantic_order: Deque[Tuple[str, str]] = deque()
+        self._document_index: Dict[str, Set[str]] = {}
+        self._key_documents: Dict[str, Tuple[str, ...]] = {}
+        self._prune_threshold = self._MIN_PRUNE_THRESHOLD
+        self._corpus_version = 0
+        self._stats = ResponseCacheStats()
+
+        logger.info(
+            f"Cache de respostas LLM inicializado: enabled={self._enabled}, "
+            f"ttl={self._ttl}s, semantic={self._semantic_enabled}, "
+            f"threshold={self._similarity_threshold}"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o cache está ativo."""
+        return self._enabled
+
+    @property
+    def semantic_active(self) -> bool:
+        """Indica se a camada semântica está ativa."""
+        return self._semantic_enabled and self._embedder is not None
+
+    def set_embedder(self, embedder: Optional[Embedder]) -> None:
+        """Define a função de embedding da camada semântica."""
+        self._embedder = embedder
+
+    async def lookup(
+        self,
+        request_key: str,
+        prompt: str,
+        scope_key: str
+    ) -> Optional[LLMResponse]:
+        """
+        Procura resposta em cache (exata e depois semântica).
+
+        Args:
+            request_key: Chave da requisição completa
+            prompt: Pergunta original (para a camada semântica)
+            scope_key: Chave de escopo (ver build_scope_key)
+
+        Returns:
+            LLMResponse em cache ou None
+        """
+        if not self._enabled:
+            return None
+
+        cached = await self._get_valid(request_key)
+        if cached is not None:
+            self._stats.exact_hits += 1
+            return self._serve(cached, "exact")
+
+        if self.semantic_active:
+            cached, similarity = await self._semantic_lookup(prompt, scope_key)
+            if cached is not None:
+                self._stats.semantic_hits += 1
+                self._stats.total_semantic_similarity += similarity
+                return self._serve(cached, "semantic", similarity)
+
+        self._stats.misses += 1
+        return None
+
+    async def store(
+        self,
+        request_key: str,
+        prompt: str,
+        scope_key: str,
+        response: LLMResponse
+    ) -> bool:
+        """
+        Armazena uma resposta bem-sucedida.
+
+        Args:
+            request_key: Chave da requisição completa
+            prompt: Pergunta original
+            scope_key: Chave de escopo semântico
+            response: Resposta a armazenar
+
+        Returns:
+            True se armazenada
+        """
+        if not self._enabled or not response.success or response.error:
+            return False
+
+        document_ids = _document_scope.get()
+        entry = CachedResponse(
+            response=response,
+            created_at=time.time(),
+            corpus_version=self._corpus_version,
+            document_ids=document_ids
+        )
+
+        stored = await self._cache.set(
+            request_key, entry, ttl=self._ttl, namespace=self._namespace
+        )
+        if not stored:
+            return False
+
+        self._stats.stores += 1
+        self._forget_documents(request_key)
+        if document_ids:
+            self._key_documents[request_key] = document_ids
+            for doc_id in document_ids:
+                self._document_index.setdefault(doc_id, set()).add(request_key)
+            if len(self._key_documents) > self._prune_threshold:
+                await self._prune_document_index()
+
+        if self.semantic_active:
+            await self._index_semantic(request_key, prompt, scope_key)
+
+        return True
+
+    async def invalidate_documents(self, document_ids: Iterable[Any]) -> int:
+        """
+        Invalida respostas sustentadas pelos documentos indicados.
+
+        Args:
+            document_ids: IDs dos documentos alterados
+
+        Returns:
+            Número de entradas removidas
+        """
+        keys: Set[str] = set()
+        for doc_id in document_ids:
+            keys.update(self._document_index.get(str(doc_id), ()))
+        for key in keys:
+            self._forget_documents(key)
+
+        removed = 0
+        for key in keys:
+            if await self._cache.delete(key, namespace=self._namespace):
+                removed += 1
+        self._drop_semantic_keys(keys)
+
+        self._stats.invalidations += 1
+        self._stats.invalidated_entries += removed
+        logger.info(f"Cache de respostas: {removed} entradas invalidadas por alteração de documentos")
+        return removed
+
+    async def invalidate_all(self) -> None:
+        """Invalida todo o cache (ex.: reindexação do corpus legal)."""
+        self._corpus_version += 1
+        removed = await self._cache.size(namespace=self._namespace)
+        await self._cache.clear(namespace=self._namespace)
+        self._semantic_index.clear()
+        self._semantic_order.clear()
+        self._document_index.clear()
+        self._key_documents.clear()
+
+        self._stats.invalidations += 1
+        self._stats.invalidated_entries += removed
+        logger.info(f"Cache de respostas invalidado (corpus v{self._corpus_version})")
+
+    async def _get_valid(self, request_key: str) -> Optional[CachedResponse]:
+        """Obtém entrada se existir e pertencer à versão atual do corpus."""
+        cached = await self._cache.get(request_key, namespace=self._namespace)
+        if cached is None:
+            # Expirou ou foi expulsa: deixa de sustentar qualquer documento
+            self._forget_documents(request_key)
+            return None
+
+        if cached.corpus_version != self._corpus_version:
+            self._stats.stale_rejections += 1
+            await self._cache.delete(request_key, namespace=self._namespace)
+            self._forget_documents(request_key)
+            return None
+
+        return cached
+
+    def _forget_documents(self, request_key: str) -> None:
+        """Remove uma resposta do índice de documentos."""
+        for doc_id in self._key_documents.pop(request_key, ()):
+            keys = self._document_index.get(doc_id)
+            if keys is None:
+                continue
+            keys.discard(request_key)
+            if not keys:
+                del self._document_index[doc_id]
+
+    async def _prune_document_index(self) -> None:
+        """
+        Remove do índice de documentos as respostas que já saíram do
+        cache (TTL ou eviction). O limiar seguinte é o dobro das que
+        restam, pelo que o custo é amortizado por escrita.
+        """
+        live = set(await self._cache.keys(namespace=self._namespace))
+        gone = [key for key in self._key_documents if key not in live]
+        for key in gone:
+            self._forget_documents(key)
+        self._prune_threshold = max(self._MIN_PRUNE_THRESHOLD, 2 * len(self._key_documents))
+        self._stats.document_index_prunes += 1
+        logger.debug(f"Índice de documentos do cache de respostas: {len(gone)} respostas removidas")
+
+    async def _semantic_lookup(
+        self,
+        prompt: str,
+        scope_key: str
+    ) -> Tuple[Optional[CachedResponse], float]:
+        """Procura pergunta semanticamente equivalente no mesmo escopo."""
+        entries = self._semantic_index.get(scope_key)
+        if not entries:
+            return None, 0.0
+
+        embedding = await self._embed(prompt)
+        if not embedding:
+            return None, 0.0
+
+        best_entry: Optional[_SemanticEntry] = None
+        best_similarity = 0.0
+        for entry in entries:
+            similarity = sum(a * b for a, b in zip(embedding, entry.embedding))
+            if similarity > best_similarity:
+                best_entry, best_similarity = entry, similarity
+
+        if best_entry is None or best_similarity < self._similarity_threshold:
+            if best_similarity >= self._similarity_threshold - 0.05:
+                self._stats.semantic_near_misses += 1
+            return None, best_similarity
+
+        cached = await self._get_valid(best_entry.request_key)
+        if cached is None:
+            # Entrada expirou ou foi invalidada no cache subjacente
+            entries.remove(best_entry)
+            return None, best_similarity
+
+        return cached, best_similarity
+
+    async def _index_semantic(self, request_key: str, prompt: str, scope_key: str) -> None:
+        """Adiciona a pergunta ao índice semântico."""
+        embedding = await self._embed(prompt)
+        if not embedding:
+            return
+
+        entries = self._semantic_index.setdefault(scope_key, deque())
+        entries.append(_SemanticEntry(request_key, embedding, time.time()))
+        self._semantic_order.append((scope_key, request_key))
+
+        # Limitar tamanho removendo as entradas mais antigas
+        while len(self._semantic_order) > self._max_semantic_entries:
+            old_scope, old_key = self._semantic_order.popleft()
+            old_entries = self._semantic_index.get(old_scope)
+            if not old_entries:
+                continue
+            for entry in old_entries:
+                if entry.request_key == old_key:
+                    old_entries.remove(entry)
+                    break
+            if not old_entries:
+                del self._semantic_index[old_scope]
+
+    def _drop_semantic_keys(self, keys: Set[str]) -> None:
+        """Remove chaves invalidadas do índice semântico."""
+        if not keys:
+            return
+        for scope_key in list(self._semantic_index.keys()):
+            remaining = deque(
+                e for e in self._semantic_index[scope_key] if e.request_key not in keys
+            )
+            if remaining:
+                self._semantic_index[scope_key] = remaining
+            else:
+                del self._semantic_index[scope_key]
+        self._semantic_order = deque(
+            item for item in self._semantic_order if item[1] not in keys
+        )
+
+    async def _embed(self, text: str) -> List[float]:
+        """Gera embedding normalizado (vazio em caso de erro)."""
+        try:
+            vector = await self._embedder(text)
+        except Exception as e:
+            self._stats.embedding_errors += 1
+            logger.warning(f"Erro ao gerar embedding para cache semântico: {e}")
+            return []
+
+        norm = math.sqrt(sum(v * v for v in vector)) if vector else 0.0
+        if norm == 0:
+            return []
+        return [v / norm for v in vector]
+
+    def _serve(
+        self,
+        cached: CachedResponse,
+        layer: str,
+        similarity: Optional[float] = None
+    ) -> LLMResponse:
+        """Atualiza métricas de poupança e devolve cópia da resposta."""
+        age = time.time() - cached.created_at
+        response = cached.response
+
+        self._stats.tokens_saved += response.tokens_used or 0
+        self._stats.cost_saved += response.cost or 0.0
+        self._stats.latency_saved_sec += response.processing_time or 0.0
+        self._stats.total_hit_age_sec += age
+        self._stats.max_hit_age_sec = max(self._stats.max_hit_age_sec, age)
+
+        metadata = dict(response.metadata or {})
+        metadata.update({
+            "cache_layer": layer,
+            "cache_age_sec": age,
+        })
+        if similarity is not None:
+            metadata["cache_similarity"] = similarity
+
+        logger.debug(f"Cache de respostas HIT ({layer}, idade {age:.1f}s)")
+        return response.model_copy(update={"metadata": metadata})
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do cache de respostas."""
+        stats = self._stats
+        return {
+            "enabled": self._enabled,
+            "semantic_active": self.semantic_active,
+            "similarity_threshold": self._similarity_threshold,
+            "ttl_seconds": self._ttl,
+            "corpus_version": self._corpus_version,
+            "exact_hits": stats.exact_hits,
+            "semantic_hits": stats.semantic_hits,
+            "misses": stats.misses,
+            "hit_rate": stats.hit_rate,
+            "stores": stats.stores,
+            "tokens_saved": stats.tokens_saved,
+            "cost_saved": stats.cost_saved,
+            "latency_saved_sec": stats.latency_saved_sec,
+            "avg_hit_age_sec": stats.total_hit_age_sec / max(stats.hits, 1),
+            "max_hit_age_sec": stats.max_hit_age_sec,
+            "stale_rejections": stats.stale_rejections,
+            "invalidations": stats.invalidations,
+            "invalidated_entries": stats.invalidated_entries,
+            "avg_semantic_similarity": (
+                stats.total_semantic_similarity / max(stats.semantic_hits, 1)
+            ),
+            "semantic_near_misses": stats.semantic_near_misses,
+            "semantic_index_size": len(self._semantic_order),
+            "embedding_errors": stats.embedding_errors,
+            "tracked_documents": len(self._document_index),
+            "tracked_responses": len(self._key_documents),
+            "document_index_prunes": stats.document_index_prunes,
+        }
+
+
+# Instância global do cache de respostas
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Roteamento de Modelos por Latência e Custo.
+
+Escolhe o modelo de cada requisição a partir de sinais em tempo real,
+em vez de saturar sempre o mesmo provedor:
+- Percentis de latência e taxa de erro (janelas do latency_registry)
+- Estado do circuit breaker de cada modelo
+- Folga no limite adaptativo de concorrência (orçamento de taxa restante)
+- Custo estimado por token (tabela de preços)
+- Restrições por tipo de contexto, resolvidas numa tabela no arranque
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import (
+    Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+)
+
+from app.core.concurrency import ConcurrencyManager, concurrency_manager
+from app.core.config import settings
+from app.core.exceptions import LLMError, LLMQuotaExceededError
+from app.core.hedging import HedgedLLM
+from app.core.latency import LatencyRegistry, latency_registry
+from app.core.pricing import ModelPricing, get_model_pricing
+from app.core.protocols import AbstractLLM, LLMStreamChunk
+from app.core.request_context import get_request_context
+from app.core.resilience import resilience_manager
+from app.schemas import ContextType, GenerationParams, LLMResponse
+
+logger = logging.getLogger(__name__)
+
+
+def default_route_models() -> Dict[ContextType, List[str]]:
+    """
+    Modelos permitidos por tipo de contexto (a ordem desempata pontuações iguais).
+
+    Contextos jurídicos e académicos ficam restritos aos modelos
+    principais; os restantes podem usar também os modelos rápidos.
+    """
+    primary = [settings.llm.anthropic_model, settings.llm.gemini_model]
+    legal = settings.llm.routing_legal_models or primary
+    general = settings.llm.routing_general_models or primary + [
+        "claude-3-5-haiku-20241022",
+        "gemini-1.5-flash",
+    ]
+    return {
+        context_type: (legal if context_type in (ContextType.LEGAL, ContextType.ACADEMIC) else general)
+        for context_type in ContextType
+    }
+
+
+@dataclass(frozen=True)
+class RouteCandidate:
+    """Modelo candidato numa rota."""
+    provider: str
+    model_name: str
+    pricing: Optional[ModelPricing] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model_name}"
+
+
+@dataclass
+class RoutingPolicy:
+    """Pesos e limites da decisão de roteamento."""
+    latency_slo_sec: float = 15.0
+    latency_percentile: float = 0.9
+    default_latency_sec: float = 5.0  # Estimativa enquanto não há amostras
+    min_samples: int = 10
+    slo_violation_penalty: float = 4.0
+    error_weight: float = 5.0
+    cost_weight: float = 0.5
+    max_error_rate: float = 0.5  # Acima disto o modelo só é usado como último recurso
+    exploration_ratio: float = 0.05  # Fração de decisões que testa o segundo melhor
+
+    @classmethod
+    def from_settings(cls) -> "RoutingPolicy":
+        """Cria política a partir das settings."""
+        return cls(
+            latency_slo_sec=settings.llm.routing_latency_slo_sec,
+            cost_weight=settings.llm.routing_cost_weight,
+            exploration_ratio=settings.llm.routing_exploration_ratio,
+        )
+
+
+@dataclass
+class CandidateSignals:
+    """Sinais observados de um candidato no momento da decisão."""
+    latency_sec: float
+    error_rate: float
+    samples: int
+    circuit_open: bool
+    headroom: float  # Fração livre do limite de concorrência
+    queue_depth: int
+    limit: int
+    estimated_cost: float
+
+
+class ModelRouter:
+    """
+    Roteador de modelos com tabela de rotas compilada.
+
+    A resolução modelo → provedor é feita uma única vez na construção;
+    cada decisão apenas lê a tabela e os sinais em memória.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[ContextType, Sequence[RouteCandidate]],
+        policy: Optional[RoutingPolicy] = None,
+        latency: Optional[LatencyRegistry] = None,
+        concurrency: Optional[ConcurrencyManager] = None
+    ):
+        """
+        Inicializa o roteador.
+
+        Args:
+            routes: Candidatos por tipo de contexto
+            policy: Política de roteamento (usa config se None)
+            latency: Registro de latência (usa o global se None)
+            concurrency: Gestor de concorrência (usa o global se None)
+        """
+        self.policy = policy or RoutingPolicy.from_settings()
+        self._latency = latency or latency_registry
+        self._concurrency = concurrency or concurrency_manager
+        self._table: Dict[str, Tuple[RouteCandidate, ...]] = {
+            ContextType(context_type).value: tuple(candidates)
+            for context_type, candidates in routes.items()
+        }
+        self._decisions = 0
+        self._stats = {
+            "decisions": 0,
+            "explorations": 0,
+            "fallbacks": 0,
+            "by_model": {},
+        }
+
+    @classmethod
+    def compile(
+        cls,
+        route_models: Dict[ContextType, Iterable[str]],
+        resolve_provider: Callable[[str], Optional[str]],
+        policy: Optional[RoutingPolicy] = None
+    ) -> "ModelRouter":
+        """
+        Compila a tabela de rotas resolvendo cada modelo para o seu provedor.
+
+        Modelos sem provedor registado são descartados.
+
+        Args:
+            route_models: Nomes de modelos permitidos por tipo de contexto
+            resolve_provider: Resolve o provedor de um modelo (None se indisponível)
+            policy: Política de roteamento
+        """
+        resolved: Dict[str, Optional[RouteCandidate]] = {}
+        routes: Dict[ContextType, List[RouteCandidate]] = {}
+
+        for context_type, models in route_models.items():
+            candidates = []
+            for model_name in models:
+                if model_name not in resolved:
+                    provider = resolve_provider(model_name)
+                    resolved[model_name] = (
+                        RouteCandidate(provider, model_name, get_model_pricing(model_name))
+                        if provider else None
+                    )
+                    if provider is None:
+                        logger.warning(f"Modelo '{model_name}' sem provedor registado, removido das rotas")
+                candidate = resolved[model_name]
+                if candidate is not None and candidate not in candidates:
+                    candidates.append(candidate)
+            routes[context_type] = candidates
+
+        router = cls(routes, policy)
+        logger.info(
+            "Tabela de rotas compilada: " + ", ".join(
+                f"{context}={[c.model_name for c in candidates]}"
+                for context, candidates in router._table.items()
+            )
+        )
+        return router
+
+    def candidates_for(self, context_type: Optional[ContextType]) -> Tuple[RouteCandidate, ...]:
+        """Candidatos permitidos para um tipo de contexto."""
+        key = ContextType(context_type).value if context_type else ContextType.GENERAL.value
+        candidates = self._table.get(key)
+        if candidates is None:
+            # Contextos sem rota própria usam a rota geral
+            candidates = self._table.get(ContextType.GENERAL.value)
+        if not candidates:
+            raise LLMError(f"Nenhum modelo disponível para o contexto '{key}'", "LLM_ROUTING_ERROR")
+        return candidates
+
+    def signals(
+        self,
+        candidate: RouteCandidate,
+        input_tokens: int = 0,
+        output_tokens: int = 0
+    ) -> CandidateSignals:
+        """Lê os sinais atuais de um candidato."""
+        policy = self.policy
+        window = self._latency.get(candidate.provider, candidate.model_name)
+        samples = window.count
+        latency = window.percentile(policy.latency_percentile) if samples >= policy.min_samples else None
+
+        limiter = self._concurrency.get_limiter(candidate.provider, candidate.model_name)
+        if limiter is not None:
+            limit = limiter.limit
+            headroom = max(0.0, (limit - limiter.in_flight) / limit)
+            queue_depth = limiter.queue_depth
+        else:
+            limit, headroom, queue_depth = 0, 1.0, 0
+
+        pricing = candidate.pricing
+        return CandidateSignals(
+            latency_sec=latency if latency is not None else policy.default_latency_sec,
+            error_rate=window.error_rate if samples >= policy.min_samples else 0.0,
+            samples=samples,
+            circuit_open=self._circuit_open(candidate),
+            headroom=headroom,
+            queue_depth=queue_depth,
+            limit=limit,
+            estimated_cost=pricing.estimate(input_tokens, output_tokens) if pricing else 0.0,
+        )
+
+    @staticmethod
+    def _circuit_open(candidate: RouteCandidate) -> bool:
+        """Indica se o circuit breaker do modelo está aberto."""
+        breaker = resilience_manager.find_circuit_breaker(f"llm:{candidate.key}")
+        return breaker is not None and breaker.is_open
+
+    def score(self, signals: CandidateSignals, max_cost: float) -> float:
+        """
+        Pontuação de um candidato (menor é melhor).
+
+        A latência esperada cresce com a fila do limitador; estimativas
+        acima do SLO são fortemente penalizadas, pelo que o custo só
+        desempata entre modelos que cumprem o SLO.
+        """
+        policy = self.policy
+        # Cada "limite" de requisições em fila à frente custa mais uma latência
+        saturation = 1.0 + signals.queue_depth / max(1, signals.limit)
+        expected_latency = signals.latency_sec * saturation
+        latency_term = expected_latency / policy.latency_slo_sec
+        if expected_latency > policy.latency_slo_sec:
+            latency_term *= policy.slo_violation_penalty
+
+        cost_term = (signals.estimated_cost / max_cost) if max_cost > 0 else 0.0
+        return (
+            latency_term
+            + policy.error_weight * signals.error_rate
+            + policy.cost_weight * cost_term
+        )
+
+    def rank(
+        self,
+        context_type: Optional[ContextType],
+        input_tokens: int = 0,
+        output_tokens: int = 0
+    ) -> List[RouteCandidate]:
+        """
+        Ordena os candidatos de um contexto para uma requisição.
+
+        Returns:
+            Candidatos por ordem de preferência (os seguintes servem de fallback)
+        """
+        candidates = self.candidates_for(context_type)
+        if len(candidates) == 1:
+            ranked = list(candidates)
+        else:
+            signals = {c: self.signals(c, input_tokens, output_tokens) for c in candidates}
+            max_cost = max(s.estimated_cost for s in signals.values())
+            policy = self.policy
+
+            def sort_key(candidate: RouteCandidate) -> Tuple[bool, float]:
+                s = signals[candidate]
+                unhealthy = s.circuit_open or s.error_rate > policy.max_error_rate
+                return (unhealthy, self.score(s, max_cost))
+
+            ranked = sorted(candidates, key=sort_key)
+
+            # Exploração: manter as estatísticas do segundo melhor atualizadas
+            self._decisions += 1
+            if (
+                policy.exploration_ratio > 0
+                and self._decisions % max(1, round(1 / policy.exploration_ratio)) == 0
+                and not sort_key(ranked[1])[0]
+            ):
+                ranked[0], ranked[1] = ranked[1], ranked[0]
+                self._stats["explorations"] += 1
+
+        self._stats["decisions"] += 1
+        by_model = self._stats["by_model"]
+        by_model[ranked[0].model_name] = by_model.get(ranked[0].model_name, 0) + 1
+        return ranked
+
+    def record_fallback(self) -> None:
+        """Regista o uso de um candidato de fallback."""
+        self._stats["fallbacks"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do roteador."""
+        candidates = {c for route in self._table.values() for c in route}
+        return {
+            **self._stats,
+            "by_model": dict(self._stats["by_model"]),
+            "routes": {
+                context: [c.model_name for c in route]
+                for context, route in self._table.items()
+            },
+            "signals": {
+                c.key: {
+                    "latency_sec": s.latency_sec,
+                    "error_rate": s.error_rate,
+                    "samples": s.samples,
+                    "circuit_open": s.circuit_open,
+                    "headroom": s.headroom,
+                    "queue_depth": s.queue_depth,
+                }
+                for c in candidates
+                for s in (self.signals(c),)
+            },
+            "policy": {
+                "latency_slo_sec": self.policy.latency_slo_sec,
+                "cost_weight": self.policy.cost_weight,
+                "exploration_ratio": self.policy.exploration_ratio,
+            },
+        }
+
+
+class RoutedLLM(AbstractLLM):
+    """
+    Cliente LLM que escolhe o modelo por requisição através do roteador.
+
+    O tipo de contexto vem do contexto da requisição (llm_request_context)
+    ou do valor por omissão do cliente. Erros do modelo escolhido recorrem
+    ao candidato seguinte. Com hedging, a primeira tentativa é um
+    HedgedLLM entre os dois melhores candidatos.
+    """
+
+    def __init__(
+        self,
+        router: ModelRouter,
+        llm_provider: Callable[[str], Awaitable[AbstractLLM]],
+        context_type: ContextType = ContextType.LEGAL,
+        max_attempts: int = 2,
+        hedging: bool = False
+    ):
+        """
+        Inicializa o cliente roteado.
+
+        Args:
+            router: Roteador de modelos
+            llm_provider: Cria o cliente de um modelo (ex.: LLMFactory.create_llm)
+            context_type: Tipo de contexto por omissão
+            max_attempts: Número máximo de modelos tentados por requisição
+            hedging: Hedge do melhor candidato no segundo melhor
+        """
+        self._router = router
+        self._llm_provider = llm_provider
+        self._context_type = context_type
+        self._max_attempts = max(1, max_attempts)
+        self._hedging = hedging
+        self._instances: Dict[str, AbstractLLM] = {}
+        self._hedged: Dict[Tuple[str, str], HedgedLLM] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return "auto"
+
+    @property
+    def provider(self) -> str:
+        return "router"
+
+    @property
+    def router(self) -> ModelRouter:
+        return self._router
+
+    async def _get_llm(self, candidate: RouteCandidate) -> AbstractLLM:
+        """Obtém (ou cria) o cliente de um candidato."""
+        instance = self._instances.get(candidate.model_name)
+        if instance is None:
+            async with self._lock:
+                instance = self._instances.get(candidate.model_name)
+                if instance is None:
+                    instance = await self._llm_provider(candidate.model_name)
+                    self._instances[candidate.model_name] = instance
+        return instance
+
+    async def _get_attempt_llm(self, candidates: Tuple[RouteCandidate, ...]) -> AbstractLLM:
+        """Cliente de uma tentativa (HedgedLLM quando tem dois candidatos)."""
+        if len(candidates) == 1:
+            return await self._get_llm(candidates[0])
+        primary, secondary = candidates
+        key = (primary.model_name, secondary.model_name)
+        hedged = self._hedged.get(key)
+        if hedged is None:
+            hedged = HedgedLLM(await self._get_llm(primary), await self._get_llm(secondary))
+            self._hedged[key] = hedged
+        return hedged
+
+    def _plan(self, ranked: List[RouteCandidate]) -> List[Tuple[RouteCandidate, ...]]:
+        """Tentativas por ordem; com hedging os dois primeiros partilham a primeira."""
+        if self._hedging and len(ranked) > 1:
+            return [tuple(ranked[:2])] + [(candidate,) for candidate in ranked[2:]]
+        return [(candidate,) for candidate in ranked]
+
+    def _rank(
+        self,
+        prompt: str,
+        context: str,
+        system_prompt: Optional[str],
+        params: Optional[GenerationParams]
+    ) -> List[RouteCandidate]:
+        """Candidatos para a requisição atual."""
+        context_type = get_request_context().context_type or self._context_type
+        # Estimativa grosseira: ~4 caracteres por token
+        input_tokens = (len(prompt) + len(context or "") + len(system_prompt or "")) // 4
+        output_tokens = (params.max_tokens if params and params.max_tokens else 1000)
+        ranked = self._router.rank(context_type, input_tokens, output_tokens)
+        return ranked[:self._max_attempts]
+
+    async def generate(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> LLMResponse:
+        """Gera resposta no melhor modelo disponível, com fallback."""
+        ranked = self._rank(prompt, context, system_prompt, params)
+        last_error: Optional[Exception] = None
+
+        for attempt, candidates in enumerate(self._plan(ranked)):
+            candidate = candidates[0]
+            if attempt > 0:
+                self._router.record_fallback()
+                logger.warning(
+                    f"Roteamento a recorrer a '{candidate.model_name}' após erro: {last_error}"
+                )
+            try:
+                llm = await self._get_attempt_llm(candidates)
+                response = await llm.generate(prompt, context, system_prompt, params)
+            except LLMQuotaExceededError:
+                # Quota é do utilizador: outro modelo não ajuda
+                raise
+            except LLMError as e:
+                last_error = e
+                continue
+
+            response.metadata = {
+                **(response.metadata or {}),
+                "routing": {
+                    "selected_model": candidate.model_name,
+                    "attempt": attempt + 1,
+                    "candidates": [c.model_name for c in ranked],
+                },
+            }
+            return response
+
+        raise last_error
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> AsyncGenerator[LLMStreamChunk, None]:
+        """Streaming no melhor modelo; recorre ao seguinte se falhar antes do primeiro chunk."""
+        ranked = self._rank(prompt, context, system_prompt, params)
+        plan = self._plan(ranked)
+        last_error: Optional[Exception] = None
+
+        for attempt, candidates in enumerate(plan):
+            candidate = candidates[0]
+            if attempt > 0:
+                self._router.record_fallback()
+                logger.warning(
+                    f"Roteamento a recorrer a '{candidate.model_name}' após erro: {last_error}"
+                )
+            started = False
+            stream = None
+            try:
+                llm = await self._get_attempt_llm(candidates)
+                stream = llm.stream_generate(prompt, context, system_prompt, params)
+                async for chunk in stream:
+                    if not started and chunk.get("error") and attempt + 1 < len(plan):
+                        last_error = LLMError(chunk["error"], "LLM_STREAM_ERROR", model=candidate.model_name)
+                        break
+                    started = True
+                    yield chunk
+                else:
+                    return
+            except LLMQuotaExceededError:
+                raise
+            except LLMError as e:
+                if started:
+                    raise
+                last_error = e
+            finally:
+                if stream is not None:
+                    await stream.aclose()
+
+        raise last_error
+
+    async def health_check(self) -> bool:
+        """Saudável se algum dos modelos já criados estiver saudável."""
+        if not self._instances:
+            return True
+        results = await asyncio.gather(
+            *(instance.health_check() for instance in self._instances.values()),
+            return_exceptions=True
+        )
+        return any(result is True for result in results)
+
+    async def get_model_info(self) -> Dict[str, Any]:
+        """Informações do roteamento."""
+        return {
+            "model_name": self.model_name,
+            "provider": self.provider,
+            "type": "router",
+            "default_context_type": self._context_type.value,
+            "routing": self._router.get_metrics(),
+        }
+
+    async def close(self) -> None:
+        """Fecha todos os clientes criados."""
+        await asyncio.gather(
+            *(instance.close() for instance in self._instances.values()),
+            return_exceptions=True
+        )
+        self._instances.clear()
+        # Os HedgedLLM só agrupam instâncias já fechadas acima
+        self._hedged.clear()
+
+    def __repr__(self) -> str:
+        return f"RoutedLLM(context_type={self._context_type.value}, instances={list(self._instances)})"
@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Agendamento de Requisições LLM por Prioridade.
+
+Coloca um escalonador à frente dos clientes LLM para que o chat
+interativo não dispute a quota do provedor com trabalho em lote:
+- Faixas ponderadas (interativa e batch) com partilha justa (stride)
+- Limite de concorrência e orçamento de tokens por faixa
+- Ordenação por prazo (EDF) dentro de cada faixa
+- Proteção contra inanição por envelhecimento
+- Métricas de profundidade de fila e tempo de espera por faixa
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.exceptions import LLMConcurrencyLimitError, LLMTimeoutError
+from app.core.request_context import RequestLane, get_request_context
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LaneConfig:
+    """Configuração de uma faixa de prioridade."""
+    weight: float = 1.0
+    max_concurrency: int = 16
+    tokens_per_minute: Optional[int] = None  # None = sem orçamento de tokens
+    default_timeout_sec: float = 60.0  # Prazo em fila quando a requisição não define um
+    max_queue_size: int = 1000
+
+
+def _default_lanes() -> Dict[RequestLane, LaneConfig]:
+    """Faixas padrão a partir das configurações."""
+    return {
+        RequestLane.INTERACTIVE: LaneConfig(
+            weight=settings.llm.scheduler_interactive_weight,
+            max_concurrency=settings.llm.scheduler_interactive_max_concurrency,
+            tokens_per_minute=settings.llm.scheduler_interactive_tokens_per_minute,
+            default_timeout_sec=settings.llm.scheduler_interactive_timeout_sec,
+        ),
+        RequestLane.BATCH: LaneConfig(
+            weight=settings.llm.scheduler_batch_weight,
+            max_concurrency=settings.llm.scheduler_batch_max_concurrency,
+            tokens_per_minute=settings.llm.scheduler_batch_tokens_per_minute,
+            default_timeout_sec=settings.llm.scheduler_batch_timeout_sec,
+        ),
+    }
+
+
+@dataclass
+class SchedulerConfig:
+    """Configuração do escalonador."""
+    max_concurrency: int = 32
+    starvation_sec: float = 10.0  # Espera a partir da qual a faixa é promovida
+    lanes: Dict[RequestLane, LaneConfig] = field(default_factory=_default_lanes)
+
+    @classmethod
+    def from_settings(cls) -> "SchedulerConfig":
+        """Cria configuração a partir das configurações."""
+        return cls(
+            max_concurrency=settings.llm.scheduler_max_concurrency,
+            starvation_sec=settings.llm.scheduler_starvation_sec,
+        )
+
+
+@dataclass
+class LaneStats:
+    """Estatísticas de uma faixa."""
+    submitted: int = 0
+    dispatched: int = 0
+    rejected: int = 0
+    expired: int = 0
+    starvation_promotions: int = 0
+    tokens_charged: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        """Tempo médio de espera na fila."""
+        return (self.total_wait / self.dispatched) if self.dispatched > 0 else 0.0
+
+
+@dataclass(order=True)
+class SchedulerTicket:
+    """Requisição em fila ou em execução no escalonador."""
+    deadline: float
+    seq: int
+    lane: RequestLane = field(compare=False)
+    estimated_tokens: int = field(compare=False, default=0)
+    enqueued_at: float = field(compare=False, default=0.0)
+    dispatched_at: Optional[float] = field(compare=False, default=None)
+    actual_tokens: Optional[int] = field(compare=False, default=None)
+    future: Optional[asyncio.Future] = field(compare=False, default=None, repr=False)
+
+    @property
+    def wait_time(self) -> float:
+        """Tempo de espera em fila."""
+        end = self.dispatched_at if self.dispatched_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    def record_tokens(self, tokens: Optional[int]) -> None:
+        """Regista os tokens efetivamente consumidos pela requisição."""
+        if tokens:
+            self.actual_tokens = tokens
+
+
+class _LaneState:
+    """Estado em execução de uma faixa."""
+
+    def __init__(self, lane: RequestLane, config: LaneConfig):
+        self.lane = lane
+        self.config = config
+        self.heap: List[SchedulerTicket] = []
+        self.queued = 0
+        self.in_flight = 0
+        self.pass_value = 0.0
+        self.tokens = float(config.tokens_per_minute or 0)
+        self.last_refill = time.monotonic()
+        self.stats = LaneStats()
+
+    def refill(self, now: float) -> None:
+        """Repõe o orçamento de tokens proporcionalmente ao tempo decorrido."""
+        capacity = self.config.tokens_per_minute
+        if capacity:
+            elapsed = now - self.last_refill
+            self.tokens = min(float(capacity), self.tokens + elapsed * capacity / 60.0)
+        self.last_refill = now
+
+    def has_token_budget(self) -> bool:
+        """Indica se o orçamento de tokens permite despachar."""
+        return not self.config.tokens_per_minute or self.tokens > 0
+
+    def seconds_until_budget(self) -> float:
+        """Tempo até o orçamento voltar a ficar positivo."""
+        capacity = self.config.tokens_per_minute
+        if not capacity or self.tokens > 0:
+            return 0.0
+        return (-self.tokens + 1) / (capacity / 60.0)
+
+    def head(self) -> Optional[SchedulerTicket]:
+        """Primeira requisição viva da fila (descarta canceladas)."""
+        while self.heap and self.heap[0].future.done():
+            heapq.heappop(self.heap)
+        return self.heap[0] if self.heap else None
+
+
+class LLMScheduler:
+    """
+    Escalonador de requisições LLM com faixas de prioridade.
+
+    Características:
+    - Partilha ponderada entre faixas (stride scheduling)
+    - Trabalho conservado: faixas ociosas cedem capacidade às restantes
+    - Limites de concorrência global e por faixa
+    - Orçamento de tokens por minuto por faixa
+    - Prazo por requisição (contexto) com ordenação EDF
+    - Promoção de faixas com requisições à espera há demasiado tempo
+    """
+
+    def __init__(
+        self,
+        config: Optional[SchedulerConfig] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Inicializa o escalonador.
+
+        Args:
+            config: Configuração do escalonador (usa config se None)
+            enabled: Habilitar escalonamento (usa config se None)
+        """
+        self.config = config or SchedulerConfig.from_settings()
+        self._enabled = (
+            enabled
+            if enabled is not None
+            else settings.llm.scheduler_enabled
+        )
+        self._lanes: Dict[RequestLane, _LaneState] = {
+            lane: _LaneState(lane, lane_config)
+            for lane, lane_config in self.config.lanes.items()
+        }
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        logger.info(
+            f"LLM scheduler inicializado: enabled={self._enabled}, "
+            f"max_concurrency={self.config.max_concurrency}"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o escalonamento está ativo."""
+        return self._enabled
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0) -> AsyncIterator[Optional[SchedulerTicket]]:
+        """
+        Ocupa uma vaga na faixa do contexto atual durante a chamada.
+
+        Args:
+            estimated_tokens: Estimativa de tokens (entrada + saída)
+
+        Yields:
+            Ticket da requisição (None se o escalonador estiver desativado)
+        """
+        if not self._enabled:
+            yield None
+            return
+
+        ticket = await self.acquire(estimated_tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    async def acquire(self, estimated_tokens: int = 0) -> SchedulerTicket:
+        """
+        Coloca a requisição em fila e aguarda a sua vez.
+
+        Raises:
+            LLMConcurrencyLimitError: Se a fila da faixa estiver cheia
+            LLMTimeoutError: Se o prazo expirar antes do despacho
+        """
+        context = get_request_context()
+        lane = self._lanes.get(context.lane) or self._lanes[RequestLane.INTERACTIVE]
+        lane.stats.submitted += 1
+
+        if lane.queued >= lane.config.max_queue_size:
+            lane.stats.rejected += 1
+            raise LLMConcurrencyLimitError(
+                f"Fila da faixa '{lane.lane.value}' cheia ({lane.queued} em espera)"
+            )
+
+        now = time.monotonic()
+        deadline = (
+            context.deadline
+            if context.deadline is not None
+            else now + lane.config.default_timeout_sec
+        )
+        if deadline <= now:
+            lane.stats.expired += 1
+            raise LLMTimeoutError("Prazo da requisição expirado antes do agendamento")
+
+        ticket = SchedulerTicket(
+            deadline=deadline,
+            seq=next(self._seq),
+            lane=lane.lane,
+            estimated_tokens=estimated_tokens,
+            enqueued_at=now,
+            future=asyncio.get_running_loop().create_future(),
+        )
+
+        if lane.head() is None:
+            # Faixa reativada não acumula crédito do período ocioso
+            lane.pass_value = max(lane.pass_value, self._virtual_time)
+        heapq.heappush(lane.heap, ticket)
+        lane.queued += 1
+        self._dispatch()
+
+        if not ticket.future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), timeout=deadline - now)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if ticket.future.done() and not ticket.future.cancelled():
+                    # Despachado no mesmo instante: devolver a vaga
+                    self.release(ticket)
+                else:
+                    ticket.future.cancel()
+                    lane.queued -= 1
+
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+
+                lane.stats.expired += 1
+                raise LLMTimeoutError(
+                    f"Prazo expirado na fila da faixa '{lane.lane.value}'",
+                    timeout_seconds=deadline - now
+                )
+
+        return ticket
+
+    def release(self, ticket: SchedulerTicket) -> None:
+        """Liberta a vaga e acerta o orçamento com os tokens reais."""
+        lane = self._lanes[ticket.lane]
+        self._in_flight = max(0, self._in_flight - 1)
+        lane.in_flight = max(0, lane.in_flight - 1)
+
+        if ticket.actual_tokens is not None:
+            adjustment = ticket.actual_tokens - ticket.estimated_tokens
+            lane.stats.tokens_charged += adjustment
+            if lane.config.tokens_per_minute:
+                lane.tokens -= adjustment
+
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Despacha requisições enquanto houver capacidade global."""
+        now = time.monotonic()
+        for lane in self._lanes.values():
+            lane.refill(now)
+
+        while self._in_flight < self.config.max_concurrency:
+            lane = self._select_lane(now)
+            if lane is None:
+                break
+
+            ticket = heapq.heappop(lane.heap)
+            lane.queued -= 1
+            lane.in_flight += 1
+            self._in_flight += 1
+
+            lane.pass_value += 1.0 / max(lane.config.weight, 1e-6)
+            self._virtual_time = max(self._virtual_time, lane.pass_value)
+
+            if lane.config.tokens_per_minute:
+                lane.tokens -= ticket.estimated_tokens
+            lane.stats.tokens_charged += ticket.estimated_tokens
+
+            ticket.dispatched_at = now
+            wait = now - ticket.enqueued_at
+            lane.stats.dispatched += 1
+            lane.stats.total_wait += wait
+            lane.stats.max_wait = max(lane.stats.max_wait, wait)
+            ticket.future.set_result(None)
+
+        self._schedule_budget_wakeup()
+
+    def _select_lane(self, now: float) -> Optional[_LaneState]:
+        """Escolhe a próxima faixa a despachar."""
+        eligible = [
+            lane for lane in self._lanes.values()
+            if lane.head() is not None
+            and lane.in_flight < lane.config.max_concurrency
+            and lane.has_token_budget()
+        ]
+        if not eligible:
+            return None
+
+        # Proteção contra inanição: faixa parada com espera excessiva passa à frente
+        starving = [
+            lane for lane in eligible
+            if lane.in_flight == 0
+            and now - lane.heap[0].enqueued_at >= self.config.starvation_sec
+        ]
+        if starving:
+            lane = min(starving, key=lambda l: l.heap[0].enqueued_at)
+            if lane is not min(eligible, key=lambda l: l.pass_value):
+                lane.stats.starvation_promotions += 1
+            return lane
+
+        return min(eligible, key=lambda l: (l.pass_value, -l.config.weight))
+
+    def _schedule_budget_wakeup(self) -> None:
+        """Agenda novo despacho quando faixas bloqueadas por tokens recuperarem."""
+        if self._wakeup is not None or self._in_flight >= self.config.max_concurrency:
+            return
+
+        delays = [
+            lane.seconds_until_budget()
+            for lane in self._lanes.values()
+            if lane.head() is not None
+            and lane.in_flight < lane.config.max_concurrency
+            and not lane.has_token_budget()
+        ]
+        if not delays:
+            return
+
+        def _wake():
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = asyncio.get_running_loop().call_later(min(delays), _wake)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas por faixa."""
+        return {
+            "enabled": self._enabled,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.config.max_concurrency,
+            "lanes": {
+                lane.lane.value: {
+                    "weight": lane.config.weight,
+                    "queue_depth": lane.queued,
+                    "in_flight": lane.in_flight,
+                    "max_concurrency": lane.config.max_concurrency,
+                    "submitted": lane.stats.submitted,
+                    "dispatched": lane.stats.dispatched,
+                    "rejected": lane.stats.rejected,
+                    "expired": lane.stats.expired,
+                    "avg_wait": lane.stats.avg_wait,
+                    "max_wait": lane.stats.max_wait,
+                    "starvation_promotions": lane.stats.starvation_promotions,
+                    "tokens_available": (
+                        lane.tokens if lane.config.tokens_per_minute else None
+                    ),
+                    "tokens_charged": lane.stats.tokens_charged,
+                }
+                for lane in self._lanes.values()
+            },
+        }
+
+
+# Instância global do escalonador
+llm_scheduler = LLMScheduler()
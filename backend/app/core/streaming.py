@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Parsing Incremental de Streams dos Provedores LLM.
+
+Camada partilhada pelos clientes de streaming para processar as
+respostas à medida que os bytes chegam, sem re-decodificar o buffer:
+- Parser de Server-Sent Events (SSE) sobre buffer de bytes
+- Parser incremental de arrays JSON (streamGenerateContent do Gemini)
+- Acumulação de texto em lista (linear no tamanho da resposta)
+"""
+import codecs
+import json
+import re
+from typing import Any, Iterable, List, NamedTuple, Optional
+
+
+class SSEEvent(NamedTuple):
+    """Evento Server-Sent Events completo."""
+    event: str
+    data: str
+    id: Optional[str] = None
+
+    def json(self) -> Any:
+        """Decodifica o campo data como JSON."""
+        return json.loads(self.data)
+
+
+class SSEParser:
+    """
+    Parser incremental de Server-Sent Events.
+
+    Recebe blocos de bytes arbitrários (podem cortar linhas ou caracteres
+    UTF-8 a meio) e devolve os eventos completos. As linhas são separadas
+    em C (bytes.split) e os dados de cada evento são decodificados uma
+    única vez; linhas de comentário são ignoradas.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._event = ""
+        self._data: List[bytes] = []
+        self._id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """
+        Processa um bloco de bytes.
+
+        Args:
+            chunk: Bytes recebidos do provedor
+
+        Returns:
+            Eventos completados por este bloco
+        """
+        buffer = self._buffer
+        buffer += chunk
+        last_newline = buffer.rfind(b"\n")
+        if last_newline < 0:
+            return []
+
+        complete = bytes(buffer[:last_newline])
+        del buffer[:last_newline + 1]
+
+        events: List[SSEEvent] = []
+        data = self._data
+        for line in complete.split(b"\n"):
+            # Caminho rápido para as linhas mais frequentes
+            if line.startswith(b"data: "):
+                data.append(line[6:].rstrip(b"\r"))
+            elif not line or line == b"\r":
+                if data:
+                    self._dispatch(events)
+                    data = self._data
+                else:
+                    self._event = ""
+            else:
+                self._process_field(line.rstrip(b"\r"))
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """Processa o que restar no buffer no fim do stream."""
+        events: List[SSEEvent] = []
+        if self._buffer:
+            events.extend(self.feed(b"\n"))
+        self._dispatch(events)
+        return events
+
+    def _process_field(self, line: bytes) -> None:
+        """Interpreta uma linha de campo que não seja 'data: '."""
+        if not line or line.startswith(b":"):
+            return  # Linha vazia após CR / comentário / keep-alive
+
+        field, _, value = line.partition(b":")
+        if value.startswith(b" "):
+            value = value[1:]
+        if field == b"data":
+            self._data.append(value)
+        elif field == b"event":
+            self._event = value.decode("utf-8")
+        elif field == b"id":
+            self._id = value.decode("utf-8")
+
+    def _dispatch(self, events: List[SSEEvent]) -> None:
+        """Emite o evento acumulado (linha vazia)."""
+        if self._data:
+            data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+            events.append(SSEEvent(self._event or "message", data.decode("utf-8"), self._id))
+        self._event = ""
+        self._data = []
+
+
+class JSONArrayStreamParser:
+    """
+    Parser incremental de um array JSON de topo.
+
+    Emite cada elemento assim que fica completo, independentemente da
+    formatação (pretty-printed ou numa só linha). Elementos completos
+    são decodificados diretamente com raw_decode; apenas o elemento
+    cortado na fronteira de um bloco passa pelo scanner estrutural, cujo
+    estado é preservado entre blocos. Elementos malformados são
+    descartados e contabilizados em `malformed`.
+    """
+
+    _SEPARATORS = re.compile(r"[\s,]*")
+    _STRUCTURAL = re.compile(r'[\[\]{}"]')
+    _STRING_SPECIAL = re.compile(r'["\\]')
+
+    def __init__(self):
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._opened = False
+        self._closed = False
+        # Estado do scanner do elemento parcial
+        self._element_start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.malformed = 0
+
+    @property
+    def closed(self) -> bool:
+        """Indica se o array de topo já foi fechado."""
+        return self._closed
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """
+        Processa um bloco de bytes.
+
+        Args:
+            chunk: Bytes recebidos do provedor
+
+        Returns:
+            Elementos do array completados por este bloco
+        """
+        text = self._text_decoder.decode(chunk)
+        if not text or self._closed:
+            return []
+        self._buffer += text
+        return self._parse()
+
+    def _parse(self) -> List[Any]:
+        """Extrai os elementos completos do buffer."""
+        buffer = self._buffer
+        length = len(buffer)
+        pos = self._pos
+        elements: List[Any] = []
+
+        while True:
+            if self._element_start is not None:
+                end = self._scan_element(buffer, pos)
+                if end is None:
+                    pos = length
+                    break
+                try:
+                    elements.append(json.loads(buffer[self._element_start:end]))
+                except json.JSONDecodeError:
+                    self.malformed += 1
+                self._element_start = None
+                pos = end
+                continue
+
+            pos = self._SEPARATORS.match(buffer, pos).end()
+            if pos >= length:
+                break
+
+            char = buffer[pos]
+            if not self._opened:
+                self._opened = True
+                if char == "[":
+                    pos += 1
+                    continue
+            if char == "]":
+                self._closed = True
+                pos = length
+                break
+
+            try:
+                element, pos = self._json_decoder.raw_decode(buffer, pos)
+                elements.append(element)
+            except json.JSONDecodeError:
+                if char not in "[{":
+                    # Escalar incompleto: aguardar mais dados
+                    break
+                self._element_start = pos
+                self._depth = 0
+                self._in_string = False
+                self._escape = False
+
+        # Descartar prefixo já consumido
+        keep_from = self._element_start if self._element_start is not None else pos
+        if keep_from:
+            self._buffer = buffer[keep_from:]
+            if self._element_start is not None:
+                self._element_start = 0
+            pos -= keep_from
+        self._pos = pos
+        return elements
+
+    def _scan_element(self, buffer: str, pos: int) -> Optional[int]:
+        """
+        Avança o scanner do elemento parcial.
+
+        Returns:
+            Índice após o fecho do elemento, ou None se ainda incompleto
+        """
+        length = len(buffer)
+        while pos < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = self._STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            match = self._STRUCTURAL.search(buffer, pos)
+            if match is None:
+                return None
+            char = match.group()
+            pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+        return None
+
+
+class TextAccumulator:
+    """Acumulação de texto em lista, com junção única no fim."""
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._length = 0
+
+    def append(self, text: str) -> None:
+        """Acrescenta um fragmento."""
+        if text:
+            self._parts.append(text)
+            self._length += len(text)
+
+    def extend(self, texts: Iterable[str]) -> None:
+        """Acrescenta vários fragmentos."""
+        for text in texts:
+            self.append(text)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def getvalue(self) -> str:
+        """Retorna o texto completo."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Contabilização de Tokens e Quotas por Utilizador.
+
+Substitui as contagens por palavras por uma contabilização coerente:
+- Estimativa local rápida (caracteres por token) calibrada com o usage
+  devolvido pelos provedores, por modelo
+- Livro-razão (ledger) de tokens e custo por utilizador, conversa e modelo
+- Quotas de tokens/custo por utilizador verificadas em O(1) antes de
+  a requisição ser enviada ao provedor
+"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import LLMQuotaExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenEstimator:
+    """
+    Estimador de tokens por caracteres, calibrado por modelo.
+
+    A estimativa é O(1) (len do texto dividido pelos caracteres por
+    token do modelo). Cada resposta com usage real ajusta a razão do
+    modelo por média móvel exponencial.
+    """
+
+    def __init__(
+        self,
+        default_chars_per_token: float = 4.0,
+        smoothing: float = 0.1,
+        min_calibration_tokens: int = 32
+    ):
+        """
+        Inicializa o estimador.
+
+        Args:
+            default_chars_per_token: Razão inicial antes de calibrar
+            smoothing: Peso de cada nova observação (EWMA)
+            min_calibration_tokens: Ignora amostras pequenas (dominadas pelo overhead)
+        """
+        self._default = default_chars_per_token
+        self._smoothing = smoothing
+        self._min_tokens = min_calibration_tokens
+        self._ratios: Dict[Tuple[str, str], float] = {}
+        self._samples: Dict[Tuple[str, str], int] = {}
+
+    def chars_per_token(self, provider: str, model: str) -> float:
+        """Razão atual de caracteres por token do modelo."""
+        return self._ratios.get((provider, model), self._default)
+
+    def estimate_chars(self, chars: int, provider: str = "", model: str = "") -> int:
+        """Estima os tokens de um texto a partir do número de caracteres."""
+        if chars <= 0:
+            return 0
+        return max(1, int(chars / self.chars_per_token(provider, model) + 0.5))
+
+    def estimate(self, text: Optional[str], provider: str = "", model: str = "") -> int:
+        """Estima os tokens de um texto."""
+        return self.estimate_chars(len(text) if text else 0, provider, model)
+
+    def calibrate(self, provider: str, model: str, chars: int, actual_tokens: int) -> None:
+        """
+        Ajusta a razão do modelo com uma contagem real do provedor.
+
+        Args:
+            provider: Nome do provedor
+            model: Nome do modelo
+            chars: Caracteres do texto enviado
+            actual_tokens: Tokens de entrada reportados pelo provedor
+        """
+        if actual_tokens < self._min_tokens or chars <= 0:
+            return
+        key = (provider, model)
+        observed = chars / actual_tokens
+        current = self._ratios.get(key)
+        self._ratios[key] = (
+            observed if current is None
+            else current + self._smoothing * (observed - current)
+        )
+        self._samples[key] = self._samples.get(key, 0) + 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna as razões calibradas por modelo."""
+        return {
+            f"{provider}:{model}": {
+                "chars_per_token": round(ratio, 3),
+                "samples": self._samples.get((provider, model), 0),
+            }
+            for (provider, model), ratio in self._ratios.items()
+        }
+
+
+@dataclass
+class TokenUsage:
+    """Tokens e custo acumulados."""
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    estimated: int = 0  # Registos sem usage real do provedor
+
+    def add(self, input_tokens: int, output_tokens: int, cost: float, estimated: bool) -> None:
+        self.requests += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost += cost
+        if estimated:
+            self.estimated += 1
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6),
+            "estimated": self.estimated,
+        }
+
+
+class TokenLedger:
+    """
+    Livro-razão de tokens e custo por utilizador, conversa e modelo.
+
+    Utilizadores e conversas ficam em LRUs limitadas; os agregados por
+    modelo e o total nunca são descartados.
+    """
+
+    def __init__(self, max_users: int = 10000, max_conversations: int = 50000):
+        self._max_users = max_users
+        self._max_conversations = max_conversations
+        self._by_user: "OrderedDict[str, TokenUsage]" = OrderedDict()
+        self._by_conversation: "OrderedDict[str, TokenUsage]" = OrderedDict()
+        self._by_model: Dict[str, TokenUsage] = {}
+        self._total = TokenUsage()
+
+    @staticmethod
+    def _touch(table: "OrderedDict[str, TokenUsage]", key: str, max_size: int) -> TokenUsage:
+        usage = table.get(key)
+        if usage is None:
+            usage = TokenUsage()
+            table[key] = usage
+            if len(table) > max_size:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return usage
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        user_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        estimated: bool = False
+    ) -> None:
+        """Regista o consumo de uma requisição."""
+        args = (input_tokens, output_tokens, cost, estimated)
+        self._total.add(*args)
+        model_key = f"{provider}:{model}"
+        usage = self._by_model.get(model_key)
+        if usage is None:
+            usage = self._by_model[model_key] = TokenUsage()
+        usage.add(*args)
+        if user_id:
+            self._touch(self._by_user, user_id, self._max_users).add(*args)
+        if conversation_id:
+            self._touch(self._by_conversation, conversation_id, self._max_conversations).add(*args)
+
+    def get_user_usage(self, user_id: str) -> Optional[TokenUsage]:
+        return self._by_user.get(user_id)
+
+    def get_conversation_usage(self, conversation_id: str) -> Optional[TokenUsage]:
+        return self._by_conversation.get(conversation_id)
+
+    def top_users(self, limit: int = 10) -> List[Tuple[str, TokenUsage]]:
+        """Utilizadores com maior custo."""
+        return sorted(self._by_user.items(), key=lambda item: item[1].cost, reverse=True)[:limit]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas do ledger."""
+        return {
+            "total": self._total.to_dict(),
+            "by_model": {key: usage.to_dict() for key, usage in self._by_model.items()},
+            "tracked_users": len(self._by_user),
+            "tracked_conversations": len(self._by_conversation),
+            "top_users": {user: usage.to_dict() for user, usage in self.top_users()},
+        }
+
+
+@dataclass
+class TokenQuotaConfig:
+    """Configuração das quotas por utilizador (None = sem limite)."""
+    tokens_per_window: Optional[int] = None
+    cost_per_window: Optional[float] = None
+    window_sec: float = 86400.0
+    max_users: int = 100000
+
+    @classmethod
+    def from_settings(cls) -> "TokenQuotaConfig":
+        llm = settings.llm
+        return cls(
+            tokens_per_window=llm.user_token_quota,
+            cost_per_window=llm.user_cost_quota,
+            window_sec=llm.user_quota_window_sec,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.tokens_per_window is not None or self.cost_per_window is not None
+
+
+class _QuotaState:
+    """Consumo de um utilizador na janela atual (inclui reservas em voo)."""
+    __slots__ = ("window_start", "tokens", "cost")
+
+    def __init__(self, window_start: float):
+        self.window_start = window_start
+        self.tokens = 0
+        self.cost = 0.0
+
+
+class TokenQuotaManager:
+    """
+    Quotas de tokens e custo por utilizador em janela fixa.
+
+    `reserve` verifica e reserva a estimativa antes do envio (O(1) por
+    utilizador), rejeitando a requisição se a quota estiver esgotada;
+    `settle` troca a reserva pelo consumo real quando a resposta chega.
+    """
+
+    def __init__(self, config: Optional[TokenQuotaConfig] = None):
+        self.config = config or TokenQuotaConfig()
+        self._states: "OrderedDict[str, _QuotaState]" = OrderedDict()
+        self._stats = {"reserved": 0, "rejected": 0}
+
+    def _state(self, user_id: str, now: float) -> _QuotaState:
+        state = self._states.get(user_id)
+        if state is None:
+            state = self._states[user_id] = _QuotaState(now)
+            if len(self._states) > self.config.max_users:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(user_id)
+            if now - state.window_start >= self.config.window_sec:
+                state.window_start = now
+                state.tokens = 0
+                state.cost = 0.0
+        return state
+
+    def reserve(self, user_id: Optional[str], tokens: int, cost: float = 0.0) -> bool:
+        """
+        Reserva a estimativa de uma requisição na quota do utilizador.
+
+        Returns:
+            True se foi feita uma reserva (deve ser liquidada com settle)
+
+        Raises:
+            LLMQuotaExceededError: Se a requisição exceder a quota
+        """
+        config = self.config
+        if not user_id or not config.enabled:
+            return False
+        now = time.monotonic()
+        state = self._state(user_id, now)
+        over_tokens = (
+            config.tokens_per_window is not None
+            and state.tokens + tokens > config.tokens_per_window
+        )
+        over_cost = (
+            config.cost_per_window is not None
+            and state.cost + cost > config.cost_per_window
+        )
+        if over_tokens or over_cost:
+            self._stats["rejected"] += 1
+            retry_after = max(0.0, config.window_sec - (now - state.window_start))
+            logger.warning(
+                f"Quota do utilizador '{user_id}' excedida "
+                f"({state.tokens} tokens, ${state.cost:.4f} na janela)"
+            )
+            raise LLMQuotaExceededError(
+                f"Quota de {'tokens' if over_tokens else 'custo'} excedida",
+                user_id=user_id,
+                retry_after=retry_after
+            )
+        state.tokens += tokens
+        state.cost += cost
+        self._stats["reserved"] += 1
+        return True
+
+    def settle(
+        self,
+        user_id: Optional[str],
+        reserved_tokens: int,
+        reserved_cost: float,
+        actual_tokens: int,
+        actual_cost: float
+    ) -> None:
+        """Substitui a reserva pelo consumo real (0 se a requisição falhou)."""
+        state = self._states.get(user_id) if user_id else None
+        if state is None:
+            return
+        state.tokens = max(0, state.tokens - reserved_tokens + actual_tokens)
+        state.cost = max(0.0, state.cost - reserved_cost + actual_cost)
+
+    def get_user_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Consumo atual de um utilizador na janela."""
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        return {"tokens": state.tokens, "cost": state.cost}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna métricas das quotas."""
+        return {
+            **self._stats,
+            "enabled": self.config.enabled,
+            "tracked_users": len(self._states),
+            "tokens_per_window": self.config.tokens_per_window,
+            "cost_per_window": self.config.cost_per_window,
+            "window_sec": self.config.window_sec,
+        }
+
+
+# Instâncias globais
+token_estimator = TokenEstimator()
+token_ledger = TokenLedger()
+token_quota = TokenQuotaManager(TokenQuotaConfig.from_settings())
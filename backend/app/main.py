@@ -10,8 +10,11 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 import structlog
 
+from app.core.cache import global_cache
+from app.core.cache_tiered import tiered_cache
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.response_cache import llm_response_cache
 from app.api.glossario import router as glossario_router
 from app.api.auth import router as auth_router
 from app.api.system_health import router as system_router
@@ -25,9 +28,23 @@ logger = structlog.get_logger(__name__)
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação."""
     logger.info("🚀 Iniciando aplicação Mozaia Backend")
+    await tiered_cache.start()
+    if settings.cache.semantic_cache_enabled:
+        # Camada semântica usa o mesmo modelo de embedding da pesquisa legal
+        from app.core.legal_responder import response_generator
+        llm_response_cache.set_embedder(response_generator.search_engine.get_embedding)
+    if settings.cache.snapshot_path:
+        await global_cache.start_snapshots()
 
     yield
 
+    # Gravações pendentes do chat legal e a sessão HTTP do seu LLM
+    from app.api.smart_legal_chat import close_legal_chat
+    await close_legal_chat()
+    if settings.cache.snapshot_path:
+        await global_cache.stop_snapshots()
+    await tiered_cache.stop()
+
     logger.info("✅ Aplicação finalizada")
 
 
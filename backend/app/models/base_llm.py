@@ -10,16 +10,31 @@ import asyncio
 import logging
 import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, AsyncGenerator, Type
+from contextlib import aclosing, nullcontext
+from typing import Optional, Dict, Any, AsyncGenerator, Tuple, Type
 from types import TracebackType
 
 import aiohttp
 
 from app.core.protocols import AbstractLLM, LLMStreamChunk
 from app.schemas import LLMResponse, GenerationParams
-from app.core.exceptions import LLMConnectionError, LLMTimeoutError
-from app.core.resilience import retry_with_backoff, RetryConfig
+from app.core.exceptions import (
+    LLMCircuitOpenError, LLMConnectionError, LLMTimeoutError, LLMRateLimitError
+)
+from app.core.pricing import ModelPricing, get_model_pricing
+from app.core.request_context import get_request_context
+from app.core.tokens import token_estimator, token_ledger, token_quota
+from app.core.resilience import (
+    CircuitBreaker, CircuitBreakerConfig, RetryBudget, RetryBudgetConfig, RetryConfig,
+    resilience_manager, retry_with_backoff
+)
+from app.core.config import settings
 from app.core.cache import cache_result
+from app.core.coalescing import RequestCoalescer, build_request_key, request_coalescer
+from app.core.response_cache import LLMResponseCache, build_scope_key, llm_response_cache
+from app.core.latency import latency_registry
+from app.core.concurrency import AdaptiveConcurrencyLimiter, concurrency_manager
+from app.core.scheduler import LLMScheduler, llm_scheduler
 
 
 class BaseLLM(AbstractLLM, ABC):
@@ -34,8 +49,17 @@ class BaseLLM(AbstractLLM, ABC):
     - Métricas básicas
     - Health checking
     - Cache de informações do modelo
+    - Coalescência de requisições idênticas em voo
+    - Cache de respostas (exato e semântico)
+    - Limite adaptativo de concorrência por modelo
+    - Agendamento por faixa de prioridade (interativa/batch)
+    - Circuit breaker por modelo (falha imediata com o circuito aberto)
+    - Contabilização de tokens/custo e quotas por utilizador
     """
 
+    # Modelo cujos preços se usam quando o modelo não está na tabela
+    PRICING_FALLBACK_MODEL: Optional[str] = None
+
     def __init__(
         self,
         model_name: str,
@@ -43,6 +67,9 @@ class BaseLLM(AbstractLLM, ABC):
         timeout: float = 30.0,
         max_retries: int = 3,
         base_delay: float = 1.0,
+        coalescer: Optional[RequestCoalescer] = None,
+        response_cache: Optional[LLMResponseCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
         **kwargs
     ):
         """
@@ -54,6 +81,9 @@ class BaseLLM(AbstractLLM, ABC):
             timeout: Timeout para requisições
             max_retries: Número máximo de tentativas
             base_delay: Delay inicial para retry
+            coalescer: Coalescedor de requisições (usa o global se None)
+            response_cache: Cache de respostas (usa o global se None)
+            scheduler: Escalonador de requisições (usa o global se None)
             **kwargs: Argumentos adicionais específicos do provedor
         """
         self._model_name = model_name
@@ -62,6 +92,9 @@ class BaseLLM(AbstractLLM, ABC):
         self._timeout = timeout
         self._max_retries = max_retries
         self._base_delay = base_delay
+        self._coalescer = coalescer or request_coalescer
+        self._response_cache = response_cache or llm_response_cache
+        self._scheduler = scheduler or llm_scheduler
         
         # Configuração de retry
         self._retry_config = RetryConfig(
@@ -85,12 +118,17 @@ class BaseLLM(AbstractLLM, ABC):
             "avg_response_time": 0.0,
             "last_used": None,
             "health_checks": 0,
-            "health_check_failures": 0
+            "health_check_failures": 0,
+            "cache_hits": 0,
+            "requests_cancelled": 0
         }
         
         # Estado
         self._initialized = False
         self._closed = False
+        self._limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        self._circuit_breaker: Optional[CircuitBreaker] = None
+        self._pricing: Optional[ModelPricing] = None
         
         self.log.debug(f"Cliente LLM '{model_name}' inicializado")
 
@@ -105,6 +143,17 @@ class BaseLLM(AbstractLLM, ABC):
         """Nome do provedor (deve ser implementado pelas subclasses)."""
         pass
 
+    @property
+    def pricing(self) -> ModelPricing:
+        """Preços do modelo (tabela em app.core.pricing)."""
+        if self._pricing is None:
+            self._pricing = (
+                get_model_pricing(self.model_name)
+                or (get_model_pricing(self.PRICING_FALLBACK_MODEL) if self.PRICING_FALLBACK_MODEL else None)
+                or ModelPricing(0.0, 0.0)
+            )
+        return self._pricing
+
     # Métodos abstratos que devem ser implementados pelas subclasses
     @abstractmethod
     async def _generate_impl(
@@ -164,27 +213,155 @@ class BaseLLM(AbstractLLM, ABC):
     ) -> LLMResponse:
         """
         Gera resposta usando o modelo LLM com retry e métricas.
+
+        Respostas em cache são servidas sem chamar o provedor e chamadas
+        idênticas concorrentes do mesmo utilizador e faixa partilham uma
+        única requisição.
+        """
+        if self._closed:
+            raise LLMConnectionError("Cliente LLM está fechado", model=self.model_name)
+        
+        request_key = build_request_key(
+            self.provider, self.model_name, prompt, context, system_prompt, params
+        )
+        scope_key = build_scope_key(
+            self.provider, self.model_name, context, system_prompt, params
+        )
+        
+        cached = await self._response_cache.lookup(request_key, prompt, scope_key)
+        if cached is not None:
+            self._metrics["cache_hits"] += 1
+            return cached
+        
+        await self._ensure_session()
+        
+        response = await self._coalescer.run(
+            self._flight_key(request_key),
+            lambda: self._generate_and_store(
+                request_key, scope_key, prompt, context, system_prompt, params
+            )
+        )
+        # Cópia rasa para que chamadores coalescidos não partilhem o objeto
+        return response.model_copy()
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> AsyncGenerator[LLMStreamChunk, None]:
+        """
+        Gera resposta em streaming com error handling.
+
+        Respostas em cache são reenviadas sem chamar o provedor; streams
+        concluídos são guardados no mesmo cache que generate. Streams
+        idênticos concorrentes do mesmo utilizador e faixa partilham a
+        mesma conexão ao provedor (fan-out).
         """
         if self._closed:
-            raise LLMConnectionError("Cliente LLM está fechado", self.model_name)
+            raise LLMConnectionError("Cliente LLM está fechado", model=self.model_name)
+        
+        request_key = build_request_key(
+            self.provider, self.model_name, prompt, context, system_prompt, params
+        )
+        scope_key = build_scope_key(
+            self.provider, self.model_name, context, system_prompt, params
+        )
+        
+        cached = await self._response_cache.lookup(request_key, prompt, scope_key)
+        if cached is not None:
+            self._metrics["cache_hits"] += 1
+            yield {"content": cached.content, "is_final": False, "model": self.model_name}
+            yield {
+                "content": "",
+                "is_final": True,
+                "model": self.model_name,
+                "metadata": cached.metadata,
+                "processing_time": 0.0,
+                "token_count": cached.tokens_used or 0
+            }
+            return
         
         await self._ensure_session()
         
+        # Fecho explícito: consumidor que desiste liberta já o subscritor
+        async with aclosing(self._coalescer.stream(
+            self._flight_key(request_key),
+            lambda: self._stream_upstream(
+                prompt, context, system_prompt, params, request_key, scope_key
+            )
+        )) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    @staticmethod
+    def _flight_key(request_key: str) -> str:
+        """
+        Chave de coalescência: a da requisição mais o utilizador e a faixa.
+
+        O voo corre no contexto de quem o inicia (quota, ledger e faixa do
+        scheduler), por isso só é partilhado por chamadores com a mesma
+        identidade; o cache de respostas continua a usar request_key.
+        """
+        context = get_request_context()
+        return f"{request_key}:{context.lane.value}:{context.user_id or ''}"
+
+    async def _generate_and_store(
+        self,
+        request_key: str,
+        scope_key: str,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> LLMResponse:
+        """Chama o provedor e guarda a resposta no cache."""
+        response = await self._generate_upstream(prompt, context, system_prompt, params)
+        await self._response_cache.store(request_key, prompt, scope_key, response)
+        return response
+
+    async def _generate_upstream(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> LLMResponse:
+        """Executa a requisição ao provedor com retry e métricas."""
+        # Circuito aberto: falhar já, sem ocupar fila nem vaga
+        self._check_circuit()
+        input_chars = self._input_chars(prompt, context, system_prompt)
+        estimated_tokens = self._estimate_request_tokens(prompt, context, system_prompt, params)
+        # Quota do utilizador verificada antes de enviar ao provedor
+        reservation = self._reserve_quota(input_chars, estimated_tokens)
         start_time = time.time()
         self._metrics["requests_total"] += 1
         
         try:
-            # Executar com retry
-            response = await retry_with_backoff(
-                lambda: self._generate_impl(prompt, context, system_prompt, params),
-                config=self._retry_config,
-                exceptions=(LLMConnectionError, LLMTimeoutError),
-                on_retry=self._log_retry
+            # Aguardar vez na faixa de prioridade e executar com retry
+            async with self._scheduler.slot(estimated_tokens) as ticket:
+                response = await retry_with_backoff(
+                    lambda: self._generate_with_limit(prompt, context, system_prompt, params),
+                    config=self._retry_config,
+                    exceptions=(LLMConnectionError, LLMTimeoutError, LLMRateLimitError),
+                    on_retry=self._log_retry,
+                    budget=self._get_retry_budget()
+                )
+                if ticket is not None:
+                    ticket.record_tokens(response.tokens_used)
+            
+            self._record_usage(
+                input_chars, len(response.content or ""), response.metadata,
+                response.cost, reservation
             )
             
             # Atualizar métricas de sucesso
             processing_time = time.time() - start_time
+            if not response.processing_time:
+                response.processing_time = processing_time
             self._update_success_metrics(response, processing_time)
+            latency_registry.record(self.provider, self.model_name, processing_time)
             
             self.log.debug(
                 f"Geração bem-sucedida em {processing_time:.3f}s "
@@ -193,62 +370,152 @@ class BaseLLM(AbstractLLM, ABC):
             
             return response
             
+        except asyncio.CancelledError:
+            # Cliente desistiu: nada a registar como erro do provedor
+            self._release_quota(reservation)
+            self._metrics["requests_cancelled"] += 1
+            self.log.debug(f"Geração cancelada após {time.time() - start_time:.3f}s")
+            raise
         except Exception as e:
+            self._release_quota(reservation)
             # Atualizar métricas de erro
             processing_time = time.time() - start_time
             self._update_error_metrics(e, processing_time)
+            latency_registry.record(
+                self.provider, self.model_name, processing_time, success=False
+            )
             
-            self.log.error(f"Erro na geração de resposta: {str(e)}", 
-                          error_type=type(e).__name__, 
-                          processing_time=processing_time)
+            self.log.error(
+                f"Erro na geração de resposta ({type(e).__name__}) "
+                f"após {processing_time:.3f}s: {str(e)}"
+            )
             raise
 
-    async def stream_generate(
+    async def _generate_with_limit(
         self,
         prompt: str,
         context: str = "",
         system_prompt: Optional[str] = None,
         params: Optional[GenerationParams] = None
-    ) -> AsyncGenerator[LLMStreamChunk, None]:
-        """
-        Gera resposta em streaming com error handling.
-        """
-        if self._closed:
-            raise LLMConnectionError("Cliente LLM está fechado", self.model_name)
+    ) -> LLMResponse:
+        """Executa uma tentativa ocupando vaga no limite adaptativo e no circuit breaker."""
+        breaker = self._get_circuit_breaker()
+        if breaker is not None and not breaker.allow_request():
+            raise self._circuit_open_error()
         
-        await self._ensure_session()
+        limiter = self._get_limiter()
+        try:
+            if limiter is None:
+                response = await self._generate_impl(prompt, context, system_prompt, params)
+            else:
+                async with limiter.slot():
+                    response = await self._generate_impl(prompt, context, system_prompt, params)
+        except (LLMConnectionError, LLMTimeoutError) as e:
+            if breaker is not None:
+                breaker.on_failure(e)
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.on_ignored()
+            raise
         
+        if breaker is not None:
+            breaker.on_success()
+        return response
+
+    async def _stream_upstream(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None,
+        request_key: Optional[str] = None,
+        scope_key: Optional[str] = None
+    ) -> AsyncGenerator[LLMStreamChunk, None]:
+        """Executa o streaming do provedor com métricas, cache e chunk de erro."""
+        input_chars = self._input_chars(prompt, context, system_prompt)
+        estimated_tokens = self._estimate_request_tokens(prompt, context, system_prompt, params)
+        # Quota esgotada é erro do pedido (como em generate), não chunk de erro
+        reservation = self._reserve_quota(input_chars, estimated_tokens)
         start_time = time.time()
         self._metrics["requests_total"] += 1
         token_count = 0
+        output_chars = 0
+        parts = []
+        limiter = self._get_limiter()
+        # Duração do stream não serve de sinal de latência para o limite
+        slot = limiter.slot(track_latency=False) if limiter else nullcontext()
+        breaker = self._get_circuit_breaker()
+        breaker_pending = False
+        finished = False
         
         try:
-            async for chunk in self._stream_generate_impl(prompt, context, system_prompt, params):
-                # Contar tokens (estimativa)
-                if chunk.get("content"):
-                    token_count += len(chunk["content"].split())
-                
-                # Adicionar metadados
-                chunk["model"] = self.model_name
-                chunk["processing_time"] = time.time() - start_time
-                chunk["token_count"] = token_count
-                
-                yield chunk
-                
-                # Se é chunk final, atualizar métricas
-                if chunk.get("is_final", False):
-                    processing_time = time.time() - start_time
-                    self._metrics["requests_successful"] += 1
-                    self._metrics["total_tokens"] += token_count
-                    self._update_avg_response_time(processing_time)
-                    self._metrics["last_used"] = time.time()
+            if breaker is not None:
+                if not breaker.allow_request():
+                    raise self._circuit_open_error()
+                breaker_pending = True
+            async with self._scheduler.slot(estimated_tokens), slot, aclosing(
+                self._stream_generate_impl(prompt, context, system_prompt, params)
+            ) as upstream:
+                async for chunk in upstream:
+                    # Contar tokens (estimativa calibrada do modelo)
+                    if chunk.get("content"):
+                        parts.append(chunk["content"])
+                        output_chars += len(chunk["content"])
+                        token_count = token_estimator.estimate_chars(
+                            output_chars, self.provider, self.model_name
+                        )
+                    
+                    # Adicionar metadados
+                    chunk["model"] = self.model_name
+                    chunk["processing_time"] = time.time() - start_time
+                    chunk["token_count"] = token_count
+                    
+                    yield chunk
                     
-                    self.log.debug(
-                        f"Stream concluído em {processing_time:.3f}s "
-                        f"({token_count} tokens estimados)"
-                    )
+                    # Se é chunk final, atualizar métricas
+                    if chunk.get("is_final", False):
+                        finished = True
+                        if breaker_pending:
+                            breaker_pending = False
+                            breaker.on_success()
+                        metadata = chunk.get("metadata") or {}
+                        total_tokens = self._record_usage(
+                            input_chars, output_chars, metadata, metadata.get("cost"), reservation
+                        )
+                        reservation = None
+                        processing_time = time.time() - start_time
+                        self._metrics["requests_successful"] += 1
+                        self._metrics["total_tokens"] += total_tokens
+                        self._update_avg_response_time(processing_time)
+                        self._metrics["last_used"] = time.time()
+                        
+                        self.log.debug(
+                            f"Stream concluído em {processing_time:.3f}s "
+                            f"({token_count} tokens estimados)"
+                        )
+                        
+                        if request_key is not None and parts and not chunk.get("error"):
+                            await self._response_cache.store(
+                                request_key, prompt, scope_key,
+                                LLMResponse(
+                                    content="".join(parts),
+                                    provider=self.provider,
+                                    model=self.model_name,
+                                    tokens_used=total_tokens,
+                                    processing_time=processing_time,
+                                    cost=metadata.get("cost") or 0.0,
+                                    metadata={
+                                        k: v for k, v in metadata.items() if k != "total_content"
+                                    }
+                                )
+                            )
                     
         except Exception as e:
+            finished = True
+            if breaker_pending and isinstance(e, (LLMConnectionError, LLMTimeoutError)):
+                breaker_pending = False
+                breaker.on_failure(e)
             processing_time = time.time() - start_time
             self._update_error_metrics(e, processing_time)
             
@@ -262,6 +529,18 @@ class BaseLLM(AbstractLLM, ABC):
                 "model": self.model_name,
                 "processing_time": processing_time
             }
+        finally:
+            # Stream interrompido sem resultado (cancelado ou fechado)
+            if not finished:
+                self._metrics["requests_cancelled"] += 1
+            if breaker_pending:
+                breaker.on_ignored()
+            if reservation is not None:
+                if output_chars:
+                    # Tokens já gerados contam para a quota
+                    self._record_usage(input_chars, output_chars, {}, None, reservation)
+                else:
+                    self._release_quota(reservation)
 
     async def health_check(self) -> bool:
         """
@@ -307,7 +586,7 @@ class BaseLLM(AbstractLLM, ABC):
         Obtém informações do modelo com cache.
         """
         if self._closed:
-            raise LLMConnectionError("Cliente LLM está fechado", self.model_name)
+            raise LLMConnectionError("Cliente LLM está fechado", model=self.model_name)
         
         await self._ensure_session()
         
@@ -419,6 +698,144 @@ class BaseLLM(AbstractLLM, ABC):
             self._owns_session = True
             self.log.debug("Nova sessão HTTP criada")
 
+    @staticmethod
+    def _input_chars(prompt: str, context: str = "", system_prompt: Optional[str] = None) -> int:
+        """Caracteres enviados ao modelo (base da estimativa de tokens de entrada)."""
+        return len(prompt) + len(context or "") + len(system_prompt or "")
+
+    def _estimate_request_tokens(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> int:
+        """Estimativa de tokens da requisição (entrada calibrada + máximo de saída)."""
+        input_tokens = token_estimator.estimate_chars(
+            self._input_chars(prompt, context, system_prompt), self.provider, self.model_name
+        )
+        max_output = params.max_tokens if params and params.max_tokens else 1000
+        return input_tokens + max_output
+
+    def _reserve_quota(self, input_chars: int, estimated_tokens: int) -> Optional[Tuple[int, float]]:
+        """
+        Reserva a estimativa da requisição na quota do utilizador atual.
+
+        Returns:
+            (tokens, custo) reservados, ou None sem utilizador/quota
+
+        Raises:
+            LLMQuotaExceededError: Se a quota estiver esgotada
+        """
+        input_tokens = token_estimator.estimate_chars(input_chars, self.provider, self.model_name)
+        estimated_cost = self.pricing.estimate(input_tokens, estimated_tokens - input_tokens)
+        if token_quota.reserve(get_request_context().user_id, estimated_tokens, estimated_cost):
+            return estimated_tokens, estimated_cost
+        return None
+
+    @staticmethod
+    def _release_quota(reservation: Optional[Tuple[int, float]]) -> None:
+        """Devolve uma reserva de quota de uma requisição sem consumo."""
+        if reservation is not None:
+            token_quota.settle(get_request_context().user_id, *reservation, 0, 0.0)
+
+    @staticmethod
+    def _usage_tokens(metadata: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Tokens de entrada e saída reportados pelo provedor (None se ausentes)."""
+        if "input_tokens" in metadata:
+            # Anthropic: entrada sem cache + escritas e leituras de cache
+            input_tokens = (
+                (metadata.get("input_tokens") or 0)
+                + (metadata.get("cache_creation_input_tokens") or 0)
+                + (metadata.get("cache_read_input_tokens") or 0)
+            )
+            return input_tokens, metadata.get("output_tokens") or 0
+        if "prompt_tokens" in metadata:
+            # Gemini: promptTokenCount já inclui o contexto em cache
+            return metadata.get("prompt_tokens") or 0, metadata.get("completion_tokens") or 0
+        return None
+
+    def _record_usage(
+        self,
+        input_chars: int,
+        output_chars: int,
+        metadata: Optional[Dict[str, Any]],
+        cost: Optional[float],
+        reservation: Optional[Tuple[int, float]]
+    ) -> int:
+        """
+        Regista o consumo no ledger, calibra o estimador e liquida a quota.
+
+        Returns:
+            Total de tokens (reais se o provedor os reportou)
+        """
+        usage = self._usage_tokens(metadata or {})
+        if usage is not None:
+            input_tokens, output_tokens = usage
+            token_estimator.calibrate(self.provider, self.model_name, input_chars, input_tokens)
+        else:
+            input_tokens = token_estimator.estimate_chars(input_chars, self.provider, self.model_name)
+            output_tokens = token_estimator.estimate_chars(output_chars, self.provider, self.model_name)
+        if cost is None:
+            cost = self.pricing.cost(input_tokens, output_tokens)
+        
+        context = get_request_context()
+        token_ledger.record(
+            self.provider, self.model_name, input_tokens, output_tokens, cost,
+            user_id=context.user_id,
+            conversation_id=context.conversation_id,
+            estimated=usage is None
+        )
+        if reservation is not None:
+            token_quota.settle(context.user_id, *reservation, input_tokens + output_tokens, cost)
+        return input_tokens + output_tokens
+
+    def _get_circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """Circuit breaker do modelo (partilhado entre instâncias; None se desativado)."""
+        if self._circuit_breaker is None and settings.llm.circuit_breaker_enabled:
+            self._circuit_breaker = resilience_manager.ensure_circuit_breaker(
+                f"llm:{self.provider}:{self.model_name}",
+                CircuitBreakerConfig(
+                    failure_threshold=settings.llm.circuit_failure_threshold,
+                    failure_rate_threshold=settings.llm.circuit_failure_rate_threshold,
+                    reset_timeout_sec=settings.llm.circuit_reset_timeout_sec,
+                    half_open_max_calls=settings.llm.circuit_half_open_max_calls,
+                    monitor_window_sec=settings.llm.circuit_window_sec
+                )
+            )
+        return self._circuit_breaker
+
+    def _check_circuit(self) -> None:
+        """Falha imediatamente se o circuito do modelo estiver aberto."""
+        breaker = self._get_circuit_breaker()
+        if breaker is not None and breaker.is_open:
+            breaker.metrics.blocked_requests += 1
+            raise self._circuit_open_error()
+
+    def _circuit_open_error(self) -> LLMCircuitOpenError:
+        return LLMCircuitOpenError(
+            f"Circuit breaker aberto para '{self.provider}:{self.model_name}'",
+            provider=self.provider,
+            model=self.model_name
+        )
+
+    def _get_retry_budget(self) -> RetryBudget:
+        """Orçamento de retentativas partilhado pelos clientes do provedor."""
+        return resilience_manager.get_retry_budget(
+            f"llm:{self.provider}",
+            RetryBudgetConfig(
+                ratio=settings.llm.retry_budget_ratio,
+                min_retries_per_sec=settings.llm.retry_budget_min_per_sec,
+                max_tokens=settings.llm.retry_budget_max_tokens
+            )
+        )
+
+    def _get_limiter(self) -> Optional[AdaptiveConcurrencyLimiter]:
+        """Obtém o limitador adaptativo do modelo (None se desativado)."""
+        if self._limiter is None:
+            self._limiter = concurrency_manager.get_limiter(self.provider, self.model_name)
+        return self._limiter
+
     def _update_success_metrics(self, response: LLMResponse, processing_time: float):
         """Atualiza métricas de sucesso."""
         self._metrics["requests_successful"] += 1
@@ -453,6 +870,10 @@ class BaseLLM(AbstractLLM, ABC):
             f"tentando novamente em {delay:.2f}s"
         )
 
+    def __cache_key__(self) -> tuple:
+        """Identidade estável do cliente para chaves de cache_result."""
+        return (self.provider, self.model_name)
+
     def __repr__(self) -> str:
         """Representação string do cliente."""
         status = "closed" if self._closed else "open"
@@ -7,16 +7,23 @@ Implementa comunicação com a API da Anthropic para o modelo Claude 3.5 Sonnet,
 incluindo suporte a streaming e error handling robusto.
 """
 
+import asyncio
 import json
 import time
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, Optional, AsyncGenerator, List, Union
 
 import aiohttp
 
 from app.models.base_llm import BaseLLM
 from app.schemas import LLMResponse, GenerationParams
 from app.core.protocols import LLMStreamChunk
-from app.core.exceptions import LLMConnectionError, LLMTimeoutError, LLMRateLimitError
+from app.core.exceptions import (
+    LLMConnectionError, LLMRequestError, LLMTimeoutError, LLMRateLimitError, llm_http_error
+)
+from app.core.resilience import parse_retry_after
+from app.core.streaming import SSEParser, TextAccumulator
+from app.core.prompt_cache import prompt_cache_metrics
+from app.core.batch import BatchItem, BatchResult
 from app.core.config import settings
 
 
@@ -27,11 +34,20 @@ class ClaudeLLM(BaseLLM):
     Características:
     - Suporte completo à API da Anthropic
     - Streaming de respostas
+    - Cache de prompt (prompt do sistema e contexto jurídico)
+    - Geração em lote via Message Batches API
     - Retry automático com backoff
     - Métricas detalhadas
     - Error handling robusto
     """
 
+    # Preços de modelos fora da tabela (ver app.core.pricing)
+    PRICING_FALLBACK_MODEL = "claude-3-5-sonnet"
+    BATCH_DISCOUNT = 0.5            # Message Batches: 50% do preço normal
+
+    # Suporte ao endpoint batch (ver app.core.batch.BatchGenerator)
+    supports_batch_api = True
+
     def __init__(
         self,
         model_name: str = "claude-3-5-sonnet-20241022",
@@ -55,6 +71,7 @@ class ClaudeLLM(BaseLLM):
         self._api_key = api_key or settings.llm.anthropic_api_key
         self._base_url = base_url.rstrip('/')
         self._anthropic_version = "2023-06-01"
+        self._prompt_caching = settings.llm.prompt_caching_enabled
         
         if not self._api_key:
             raise ValueError("API key da Anthropic é obrigatória")
@@ -80,7 +97,7 @@ class ClaudeLLM(BaseLLM):
         prompt: str,
         context: str = "",
         system_prompt: Optional[str] = None
-    ) -> tuple[str, list]:
+    ) -> tuple[Union[str, list], list]:
         """
         Constrói mensagens no formato Claude.
         
@@ -91,20 +108,72 @@ class ClaudeLLM(BaseLLM):
         system_message = system_prompt or "Você é um assistente jurídico especializado."
         
         # Construir prompt completo
-        full_prompt = prompt
-        if context:
-            full_prompt = f"Contexto: {context}\n\nPergunta: {prompt}"
+        if self._prompt_caching:
+            # Prefixos estáveis marcados para cache: o system prompt e o bloco
+            # de contexto repetem-se entre turnos; só a pergunta varia
+            system_message = [
+                {
+                    "type": "text",
+                    "text": system_message,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ]
+            content = [{"type": "text", "text": prompt}]
+            if context:
+                content = [
+                    {
+                        "type": "text",
+                        "text": f"Contexto: {context}\n\n",
+                        "cache_control": {"type": "ephemeral"}
+                    },
+                    {"type": "text", "text": f"Pergunta: {prompt}"}
+                ]
+        else:
+            content = prompt
+            if context:
+                content = f"Contexto: {context}\n\nPergunta: {prompt}"
         
         # Messages array
         messages = [
             {
                 "role": "user",
-                "content": full_prompt
+                "content": content
             }
         ]
         
         return system_message, messages
 
+    def _usage_summary(self, usage: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Interpreta o usage da Anthropic, incluindo os tokens de cache.
+
+        Regista leituras/escritas de cache nas métricas de prompt cache.
+        """
+        input_tokens = usage.get("input_tokens", 0) or 0
+        cache_write = usage.get("cache_creation_input_tokens", 0) or 0
+        cache_read = usage.get("cache_read_input_tokens", 0) or 0
+        output_tokens = usage.get("output_tokens", 0) or 0
+
+        prompt_cache_metrics.record(
+            self.provider,
+            uncached_input_tokens=input_tokens,
+            cache_write_tokens=cache_write,
+            cache_read_tokens=cache_read
+        )
+
+        cost = self.pricing.cost(
+            input_tokens, output_tokens,
+            cache_read_tokens=cache_read, cache_write_tokens=cache_write
+        )
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read,
+            "total_tokens": input_tokens + cache_write + cache_read + output_tokens,
+            "cost": cost
+        }
+
     def _build_request_data(
         self,
         prompt: str,
@@ -157,14 +226,20 @@ class ClaudeLLM(BaseLLM):
             ) as response:
                 
                 if response.status == 429:
-                    raise LLMRateLimitError("Rate limit excedido", self.model_name)
+                    raise LLMRateLimitError(
+                        "Rate limit excedido",
+                        model=self.model_name,
+                        retry_after=parse_retry_after(response.headers)
+                    )
                 elif response.status == 401:
-                    raise LLMConnectionError("API key inválida", self.model_name)
+                    raise LLMRequestError("API key inválida", status_code=401, model=self.model_name)
                 elif response.status not in (200, 201):
                     error_text = await response.text()
-                    raise LLMConnectionError(
+                    raise llm_http_error(
+                        response.status,
                         f"Erro HTTP {response.status}: {error_text}", 
-                        self.model_name
+                        model=self.model_name,
+                        retry_after=parse_retry_after(response.headers)
                     )
                 
                 result = await response.json()
@@ -174,32 +249,29 @@ class ClaudeLLM(BaseLLM):
                 if result.get("content") and len(result["content"]) > 0:
                     content = result["content"][0].get("text", "")
                 
-                # Calcular tokens e custo estimado
-                tokens_used = result.get("usage", {}).get("output_tokens", 0)
-                input_tokens = result.get("usage", {}).get("input_tokens", 0)
-                total_tokens = tokens_used + input_tokens
-                
-                # Custo estimado (Claude 3.5 Sonnet: $3/1M input, $15/1M output)
-                cost = (input_tokens * 0.000003) + (tokens_used * 0.000015)
+                # Calcular tokens e custo estimado (inclui leituras/escritas de cache)
+                usage = self._usage_summary(result.get("usage", {}))
                 
                 return LLMResponse(
                     content=content,
                     model=self.model_name,
                     provider=self.provider,
-                    tokens_used=total_tokens,
-                    cost=cost,
+                    tokens_used=usage["total_tokens"],
+                    cost=usage["cost"],
                     metadata={
-                        "input_tokens": input_tokens,
-                        "output_tokens": tokens_used,
+                        "input_tokens": usage["input_tokens"],
+                        "output_tokens": usage["output_tokens"],
+                        "cache_creation_input_tokens": usage["cache_creation_input_tokens"],
+                        "cache_read_input_tokens": usage["cache_read_input_tokens"],
                         "stop_reason": result.get("stop_reason"),
                         "anthropic_id": result.get("id")
                     }
                 )
                 
-        except aiohttp.ClientTimeout:
+        except asyncio.TimeoutError:
             raise LLMTimeoutError(f"Timeout na requisição para {self.model_name}")
         except aiohttp.ClientError as e:
-            raise LLMConnectionError(f"Erro de conexão: {str(e)}", self.model_name)
+            raise LLMConnectionError(f"Erro de conexão: {str(e)}", model=self.model_name)
 
     async def _stream_generate_impl(
         self,
@@ -213,6 +285,7 @@ class ClaudeLLM(BaseLLM):
         data = self._build_request_data(prompt, context, system_prompt, params, stream=True)
         url = f"{self._base_url}/v1/messages"
         
+        response = None
         try:
             async with self._session.post(
                 url,
@@ -221,45 +294,49 @@ class ClaudeLLM(BaseLLM):
                 timeout=aiohttp.ClientTimeout(total=self._timeout)
             ) as response:
                 
-                if response.status != 200:
+                if response.status == 429:
+                    raise LLMRateLimitError(
+                        "Rate limit excedido",
+                        model=self.model_name,
+                        retry_after=parse_retry_after(response.headers)
+                    )
+                elif response.status != 200:
                     error_text = await response.text()
-                    raise LLMConnectionError(
+                    raise llm_http_error(
+                        response.status,
                         f"Erro HTTP {response.status}: {error_text}",
-                        self.model_name
+                        model=self.model_name,
+                        retry_after=parse_retry_after(response.headers)
                     )
                 
-                accumulated_content = ""
-                input_tokens = 0
-                output_tokens = 0
+                accumulated_content = TextAccumulator()
+                usage_data: Dict[str, Any] = {}
+                parser = SSEParser()
                 
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
-                    
-                    if not line or not line.startswith('data: '):
-                        continue
-                    
-                    # Remove prefixo 'data: '
-                    json_str = line[6:]
-                    
-                    # Event stream ended
-                    if json_str == '[DONE]':
-                        break
-                    
-                    try:
-                        event_data = json.loads(json_str)
+                async for raw_chunk in response.content.iter_any():
+                    for event in parser.feed(raw_chunk):
+                        # Event stream ended
+                        if event.data == '[DONE]':
+                            return
+                        
+                        try:
+                            event_data = event.json()
+                        except json.JSONDecodeError:
+                            # Ignorar eventos malformados
+                            continue
+                        
                         event_type = event_data.get("type")
                         
                         if event_type == "message_start":
                             # Início da mensagem
-                            usage = event_data.get("message", {}).get("usage", {})
-                            input_tokens = usage.get("input_tokens", 0)
+                            usage_data.update(event_data.get("message", {}).get("usage", {}))
                             
                         elif event_type == "content_block_delta":
                             # Chunk de conteúdo
                             delta = event_data.get("delta", {})
                             if delta.get("type") == "text_delta":
                                 chunk_content = delta.get("text", "")
-                                accumulated_content += chunk_content
+                                accumulated_content.append(chunk_content)
                                 
                                 yield {
                                     "content": chunk_content,
@@ -272,35 +349,166 @@ class ClaudeLLM(BaseLLM):
                         
                         elif event_type == "message_delta":
                             # Delta da mensagem (inclui uso final)
-                            usage = event_data.get("usage", {})
-                            output_tokens = usage.get("output_tokens", 0)
+                            usage_data.update(event_data.get("usage", {}))
                             
                         elif event_type == "message_stop":
                             # Fim da mensagem
-                            total_tokens = input_tokens + output_tokens
-                            cost = (input_tokens * 0.000003) + (output_tokens * 0.000015)
+                            usage = self._usage_summary(usage_data)
                             
                             yield {
                                 "content": "",
                                 "is_final": True,
                                 "model": self.model_name,
                                 "metadata": {
-                                    "total_content": accumulated_content,
-                                    "input_tokens": input_tokens,
-                                    "output_tokens": output_tokens,
-                                    "total_tokens": total_tokens,
-                                    "cost": cost
+                                    "total_content": accumulated_content.getvalue(),
+                                    **usage
                                 }
                             }
-                            
-                    except json.JSONDecodeError:
-                        # Ignorar linhas malformadas
-                        continue
                         
-        except aiohttp.ClientTimeout:
+        except (asyncio.CancelledError, GeneratorExit):
+            # Consumidor desistiu: fechar a conexão para o provedor parar de gerar
+            if response is not None:
+                response.close()
+            raise
+        except asyncio.TimeoutError:
             raise LLMTimeoutError(f"Timeout no streaming para {self.model_name}")
         except aiohttp.ClientError as e:
-            raise LLMConnectionError(f"Erro de conexão no streaming: {str(e)}", self.model_name)
+            raise LLMConnectionError(f"Erro de conexão no streaming: {str(e)}", model=self.model_name)
+
+    # Message Batches API
+    async def submit_batch(self, items: List[BatchItem]) -> str:
+        """
+        Envia um lote de requisições à Message Batches API.
+
+        Returns:
+            Identificador do lote na Anthropic
+        """
+        await self._ensure_session()
+        requests = []
+        for item in items:
+            data = self._build_request_data(
+                item.prompt, item.context, item.system_prompt, item.params
+            )
+            data.pop("stream", None)
+            requests.append({"custom_id": item.custom_id, "params": data})
+
+        url = f"{self._base_url}/v1/messages/batches"
+        try:
+            async with self._session.post(
+                url,
+                headers=self._get_headers(),
+                json={"requests": requests},
+                timeout=aiohttp.ClientTimeout(total=max(self._timeout, 120.0))
+            ) as response:
+                if response.status == 429:
+                    raise LLMRateLimitError(
+                        "Rate limit excedido",
+                        model=self.model_name,
+                        retry_after=parse_retry_after(response.headers)
+                    )
+                elif response.status not in (200, 201):
+                    error_text = await response.text()
+                    raise llm_http_error(
+                        response.status,
+                        f"Erro HTTP {response.status} ao enviar lote: {error_text}",
+                        model=self.model_name
+                    )
+                result = await response.json()
+                return result["id"]
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Timeout ao enviar lote para {self.model_name}")
+        except aiohttp.ClientError as e:
+            raise LLMConnectionError(f"Erro de conexão ao enviar lote: {str(e)}", model=self.model_name)
+
+    async def get_batch_status(self, batch_id: str) -> Dict[str, Any]:
+        """Obtém o estado de processamento de um lote."""
+        await self._ensure_session()
+        url = f"{self._base_url}/v1/messages/batches/{batch_id}"
+        try:
+            async with self._session.get(
+                url,
+                headers=self._get_headers(),
+                timeout=aiohttp.ClientTimeout(total=self._timeout)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise llm_http_error(
+                        response.status,
+                        f"Erro HTTP {response.status} ao consultar lote: {error_text}",
+                        model=self.model_name
+                    )
+                result = await response.json()
+                return {
+                    "ended": result.get("processing_status") == "ended",
+                    "processing_status": result.get("processing_status"),
+                    "request_counts": result.get("request_counts", {}),
+                    "results_url": result.get("results_url")
+                }
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Timeout ao consultar lote {batch_id}")
+        except aiohttp.ClientError as e:
+            raise LLMConnectionError(f"Erro de conexão ao consultar lote: {str(e)}", model=self.model_name)
+
+    async def iter_batch_results(self, batch_id: str) -> AsyncGenerator[BatchResult, None]:
+        """Lê os resultados de um lote terminado (JSONL em streaming)."""
+        await self._ensure_session()
+        url = f"{self._base_url}/v1/messages/batches/{batch_id}/results"
+        try:
+            async with self._session.get(
+                url,
+                headers=self._get_headers(),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=self._timeout)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise llm_http_error(
+                        response.status,
+                        f"Erro HTTP {response.status} ao obter resultados do lote: {error_text}",
+                        model=self.model_name
+                    )
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield self._parse_batch_result(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        self.log.warning(f"Linha de resultado inválida no lote {batch_id}")
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Timeout ao obter resultados do lote {batch_id}")
+        except aiohttp.ClientError as e:
+            raise LLMConnectionError(f"Erro de conexão ao obter resultados do lote: {str(e)}", model=self.model_name)
+
+    def _parse_batch_result(self, record: Dict[str, Any]) -> BatchResult:
+        """Converte uma linha de resultado da Message Batches API."""
+        custom_id = record["custom_id"]
+        result = record.get("result", {})
+        result_type = result.get("type")
+
+        if result_type != "succeeded":
+            error = result.get("error", {}).get("error", {}).get("message") or result_type
+            return BatchResult(custom_id=custom_id, success=False, error=f"{result_type}: {error}")
+
+        message = result.get("message", {})
+        content = "".join(
+            block.get("text", "") for block in message.get("content", [])
+            if block.get("type") == "text"
+        )
+        usage = self._usage_summary(message.get("usage", {}))
+        return BatchResult(
+            custom_id=custom_id,
+            success=True,
+            content=content,
+            tokens_used=usage["total_tokens"],
+            cost=usage["cost"] * self.BATCH_DISCOUNT,
+            metadata={
+                "model": message.get("model", self.model_name),
+                "provider": self.provider,
+                "input_tokens": usage["input_tokens"],
+                "output_tokens": usage["output_tokens"],
+                "stop_reason": message.get("stop_reason"),
+                "anthropic_id": message.get("id")
+            }
+        )
 
     async def _health_check_impl(self) -> bool:
         """Health check específico do Claude."""
@@ -7,16 +7,23 @@ Implementa comunicação com a API do Google Gemini AI,
 incluindo suporte a streaming e error handling robusto.
 """
 
+import asyncio
 import json
 import time
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, Optional, AsyncGenerator, Tuple
 
 import aiohttp
 
 from app.models.base_llm import BaseLLM
 from app.schemas import LLMResponse, GenerationParams
 from app.core.protocols import LLMStreamChunk
-from app.core.exceptions import LLMConnectionError, LLMTimeoutError, LLMRateLimitError
+from app.core.exceptions import (
+    LLMConnectionError, LLMRequestError, LLMTimeoutError, LLMRateLimitError, llm_http_error
+)
+from app.core.resilience import parse_duration, parse_retry_after
+from app.core.streaming import JSONArrayStreamParser, TextAccumulator
+from app.core.prompt_cache import build_prefix_key, gemini_context_cache, prompt_cache_metrics
+from app.core.tokens import token_estimator
 from app.core.config import settings
 
 
@@ -27,11 +34,15 @@ class GeminiLLM(BaseLLM):
     Características:
     - Suporte completo à API do Google Gemini
     - Streaming de respostas
+    - Contexto jurídico em cache (cachedContents) reutilizado entre turnos
     - Retry automático com backoff
     - Métricas detalhadas
     - Error handling robusto
     """
 
+    # Preços de modelos fora da tabela (ver app.core.pricing)
+    PRICING_FALLBACK_MODEL = "gemini-1.5-pro"
+
     def __init__(
         self,
         model_name: str = "gemini-1.5-pro-latest",
@@ -54,6 +65,8 @@ class GeminiLLM(BaseLLM):
         
         self._api_key = api_key or settings.llm.google_api_key
         self._base_url = base_url.rstrip('/')
+        self._prompt_caching = settings.llm.prompt_caching_enabled
+        self._context_cache = gemini_context_cache
         
         if not self._api_key:
             raise ValueError("API key do Google é obrigatória")
@@ -152,6 +165,137 @@ class GeminiLLM(BaseLLM):
             "safetySettings": safety_settings
         }
 
+    async def _create_cached_context(
+        self,
+        context: str,
+        system_prompt: Optional[str],
+        ttl_sec: float
+    ) -> Optional[str]:
+        """
+        Cria o contexto jurídico em cache no Gemini.
+
+        Returns:
+            Nome do recurso cachedContents ou None se recusado
+        """
+        data: Dict[str, Any] = {
+            "model": f"models/{self.model_name}",
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": f"Contexto: {context}"}]
+                }
+            ],
+            "ttl": f"{int(ttl_sec)}s"
+        }
+        if system_prompt:
+            data["systemInstruction"] = {"parts": [{"text": system_prompt}]}
+
+        url = f"{self._base_url}/v1beta/cachedContents?key={self._api_key}"
+        async with self._session.post(
+            url,
+            headers={"Content-Type": "application/json"},
+            json=data,
+            timeout=aiohttp.ClientTimeout(total=self._timeout)
+        ) as response:
+            if response.status not in (200, 201):
+                error_text = await response.text()
+                self.log.warning(
+                    f"Contexto em cache recusado pelo Gemini (HTTP {response.status}): {error_text[:200]}"
+                )
+                return None
+            result = await response.json()
+            return result.get("name")
+
+    async def _prepare_request_data(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: Optional[str] = None,
+        params: Optional[GenerationParams] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Constrói os dados da requisição, usando o contexto em cache quando possível.
+
+        Contextos abaixo do mínimo de tokens da API seguem inline.
+
+        Returns:
+            Tuple com (dados, chave do prefixo em cache ou None)
+        """
+        min_tokens = settings.llm.gemini_context_cache_min_tokens
+        if (
+            self._prompt_caching
+            and context
+            and token_estimator.estimate_chars(len(context), self.provider, self.model_name) >= min_tokens
+        ):
+            prefix_key = build_prefix_key(self.model_name, system_prompt, context)
+            cached_name = await self._context_cache.get_or_create(
+                prefix_key,
+                lambda ttl: self._create_cached_context(context, system_prompt, ttl)
+            )
+            if cached_name:
+                data = self._build_request_data(f"Pergunta: {prompt}", "", None, params)
+                data["cachedContent"] = cached_name
+                return data, prefix_key
+
+        return self._build_request_data(prompt, context, system_prompt, params), None
+
+    def _usage_summary(self, usage: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Interpreta o usageMetadata, separando os tokens lidos do cache.
+
+        Regista o uso nas métricas de prompt cache.
+        """
+        prompt_tokens = usage.get("promptTokenCount", 0) or 0
+        cached_tokens = usage.get("cachedContentTokenCount", 0) or 0
+        completion_tokens = usage.get("candidatesTokenCount", 0) or 0
+        total_tokens = usage.get("totalTokenCount", prompt_tokens + completion_tokens)
+
+        # promptTokenCount já inclui os tokens do contexto em cache
+        uncached_tokens = max(0, prompt_tokens - cached_tokens)
+        prompt_cache_metrics.record(
+            self.provider,
+            uncached_input_tokens=uncached_tokens,
+            cache_read_tokens=cached_tokens
+        )
+
+        cost = self.pricing.cost(uncached_tokens, completion_tokens, cache_read_tokens=cached_tokens)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "cached_content_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "cost": cost
+        }
+
+    @staticmethod
+    def _retry_after(headers: Any, error_text: str = "") -> Optional[float]:
+        """Atraso sugerido pela API (header Retry-After ou RetryInfo do corpo)."""
+        retry_after = parse_retry_after(headers)
+        if retry_after is not None or not error_text:
+            return retry_after
+        try:
+            details = json.loads(error_text).get("error", {}).get("details", [])
+        except (ValueError, AttributeError):
+            return None
+        for detail in details:
+            if isinstance(detail, dict) and detail.get("@type", "").endswith("RetryInfo"):
+                return parse_duration(detail.get("retryDelay"))
+        return None
+
+    def _check_cached_context_error(self, status: int, prefix_key: Optional[str]) -> None:
+        """
+        Esquece o handle se o provedor já não reconhece o contexto em cache.
+
+        Raises:
+            LLMConnectionError: Repetível, para a nova tentativa recriar o contexto
+        """
+        if prefix_key and status in (400, 403, 404):
+            self._context_cache.invalidate(prefix_key)
+            raise LLMConnectionError(
+                f"Contexto em cache recusado pelo Gemini (HTTP {status})",
+                model=self.model_name
+            )
+
     async def _generate_impl(
         self,
         prompt: str,
@@ -161,10 +305,10 @@ class GeminiLLM(BaseLLM):
     ) -> LLMResponse:
         """Implementação da geração Gemini."""
         
-        data = self._build_request_data(prompt, context, system_prompt, params)
         url = self._get_url("generateContent", stream=False)
         
         try:
+            data, prefix_key = await self._prepare_request_data(prompt, context, system_prompt, params)
             async with self._session.post(
                 url,
                 headers={"Content-Type": "application/json"},
@@ -172,15 +316,29 @@ class GeminiLLM(BaseLLM):
                 timeout=aiohttp.ClientTimeout(total=self._timeout)
             ) as response:
                 
+                if response.status != 200:
+                    self._check_cached_context_error(response.status, prefix_key)
+                
                 if response.status == 429:
-                    raise LLMRateLimitError("Rate limit excedido", self.model_name)
+                    error_text = await response.text()
+                    raise LLMRateLimitError(
+                        "Rate limit excedido",
+                        model=self.model_name,
+                        retry_after=self._retry_after(response.headers, error_text)
+                    )
                 elif response.status == 403:
-                    raise LLMConnectionError("API key inválida ou permissões insuficientes", self.model_name)
+                    raise LLMRequestError(
+                        "API key inválida ou permissões insuficientes",
+                        status_code=403,
+                        model=self.model_name
+                    )
                 elif response.status not in (200, 201):
                     error_text = await response.text()
-                    raise LLMConnectionError(
+                    raise llm_http_error(
+                        response.status,
                         f"Erro HTTP {response.status}: {error_text}",
-                        self.model_name
+                        model=self.model_name,
+                        retry_after=self._retry_after(response.headers)
                     )
                 
                 result = await response.json()
@@ -188,14 +346,14 @@ class GeminiLLM(BaseLLM):
                 # Verificar se há candidatos
                 candidates = result.get("candidates", [])
                 if not candidates:
-                    raise LLMConnectionError("Nenhuma resposta gerada", self.model_name)
+                    raise LLMConnectionError("Nenhuma resposta gerada", model=self.model_name)
                 
                 candidate = candidates[0]
                 
                 # Verificar se foi bloqueado por segurança
                 finish_reason = candidate.get("finishReason")
                 if finish_reason == "SAFETY":
-                    raise LLMConnectionError("Resposta bloqueada por filtros de segurança", self.model_name)
+                    raise LLMRequestError("Resposta bloqueada por filtros de segurança", model=self.model_name)
                 
                 # Extrair conteúdo
                 content = ""
@@ -203,33 +361,29 @@ class GeminiLLM(BaseLLM):
                 if parts:
                     content = parts[0].get("text", "")
                 
-                # Calcular tokens e custo estimado
-                usage = result.get("usageMetadata", {})
-                prompt_tokens = usage.get("promptTokenCount", 0)
-                completion_tokens = usage.get("candidatesTokenCount", 0)
-                total_tokens = usage.get("totalTokenCount", prompt_tokens + completion_tokens)
-                
-                # Custo estimado (Gemini Pro 1.5: $1.25/1M input, $5/1M output)
-                cost = (prompt_tokens * 0.00000125) + (completion_tokens * 0.000005)
+                # Calcular tokens e custo estimado (inclui tokens lidos do cache)
+                usage = self._usage_summary(result.get("usageMetadata", {}))
                 
                 return LLMResponse(
                     content=content,
                     model=self.model_name,
                     provider=self.provider,
-                    tokens_used=total_tokens,
-                    cost=cost,
+                    tokens_used=usage["total_tokens"],
+                    cost=usage["cost"],
                     metadata={
-                        "prompt_tokens": prompt_tokens,
-                        "completion_tokens": completion_tokens,
+                        "prompt_tokens": usage["prompt_tokens"],
+                        "cached_content_tokens": usage["cached_content_tokens"],
+                        "completion_tokens": usage["completion_tokens"],
+                        "cached_content": data.get("cachedContent"),
                         "finish_reason": finish_reason,
                         "safety_ratings": candidate.get("safetyRatings", [])
                     }
                 )
                 
-        except aiohttp.ClientTimeout:
+        except asyncio.TimeoutError:
             raise LLMTimeoutError(f"Timeout na requisição para {self.model_name}")
         except aiohttp.ClientError as e:
-            raise LLMConnectionError(f"Erro de conexão: {str(e)}", self.model_name)
+            raise LLMConnectionError(f"Erro de conexão: {str(e)}", model=self.model_name)
 
     async def _stream_generate_impl(
         self,
@@ -240,10 +394,11 @@ class GeminiLLM(BaseLLM):
     ) -> AsyncGenerator[LLMStreamChunk, None]:
         """Implementação do streaming Gemini."""
         
-        data = self._build_request_data(prompt, context, system_prompt, params)
         url = self._get_url("streamGenerateContent", stream=True)
         
+        response = None
         try:
+            data, prefix_key = await self._prepare_request_data(prompt, context, system_prompt, params)
             async with self._session.post(
                 url,
                 headers={"Content-Type": "application/json"},
@@ -252,26 +407,27 @@ class GeminiLLM(BaseLLM):
             ) as response:
                 
                 if response.status != 200:
+                    self._check_cached_context_error(response.status, prefix_key)
                     error_text = await response.text()
-                    raise LLMConnectionError(
+                    if response.status == 429:
+                        raise LLMRateLimitError(
+                            "Rate limit excedido",
+                            model=self.model_name,
+                            retry_after=self._retry_after(response.headers, error_text)
+                        )
+                    raise llm_http_error(
+                        response.status,
                         f"Erro HTTP {response.status}: {error_text}",
-                        self.model_name
+                        model=self.model_name,
+                        retry_after=self._retry_after(response.headers)
                     )
                 
-                accumulated_content = ""
-                total_prompt_tokens = 0
-                total_completion_tokens = 0
+                accumulated_content = TextAccumulator()
+                # Sem alt=sse o Gemini devolve um único array JSON (pretty-printed)
+                parser = JSONArrayStreamParser()
                 
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
-                    
-                    if not line:
-                        continue
-                    
-                    try:
-                        # Gemini retorna JSON completo em cada linha
-                        chunk_data = json.loads(line)
-                        
+                async for raw_chunk in response.content.iter_any():
+                    for chunk_data in parser.feed(raw_chunk):
                         candidates = chunk_data.get("candidates", [])
                         if not candidates:
                             continue
@@ -293,16 +449,13 @@ class GeminiLLM(BaseLLM):
                         parts = candidate.get("content", {}).get("parts", [])
                         if parts:
                             chunk_content = parts[0].get("text", "")
-                            accumulated_content += chunk_content
+                            accumulated_content.append(chunk_content)
                             
                             # Verificar se é chunk final
                             is_final = finish_reason in ("STOP", "MAX_TOKENS")
                             
                             # Extrair uso de tokens (quando disponível)
                             usage = chunk_data.get("usageMetadata", {})
-                            if usage:
-                                total_prompt_tokens = usage.get("promptTokenCount", 0)
-                                total_completion_tokens = usage.get("candidatesTokenCount", 0)
                             
                             chunk_metadata = {
                                 "accumulated_length": len(accumulated_content),
@@ -310,15 +463,10 @@ class GeminiLLM(BaseLLM):
                             }
                             
                             if is_final and usage:
-                                total_tokens = usage.get("totalTokenCount", total_prompt_tokens + total_completion_tokens)
-                                cost = (total_prompt_tokens * 0.00000125) + (total_completion_tokens * 0.000005)
-                                
                                 chunk_metadata.update({
-                                    "total_content": accumulated_content,
-                                    "prompt_tokens": total_prompt_tokens,
-                                    "completion_tokens": total_completion_tokens,
-                                    "total_tokens": total_tokens,
-                                    "cost": cost
+                                    "total_content": accumulated_content.getvalue(),
+                                    "cached_content": data.get("cachedContent"),
+                                    **self._usage_summary(usage)
                                 })
                             
                             yield {
@@ -329,16 +477,17 @@ class GeminiLLM(BaseLLM):
                             }
                             
                             if is_final:
-                                break
-                                
-                    except json.JSONDecodeError:
-                        # Ignorar linhas malformadas
-                        continue
+                                return
                         
-        except aiohttp.ClientTimeout:
+        except (asyncio.CancelledError, GeneratorExit):
+            # Consumidor desistiu: fechar a conexão para o provedor parar de gerar
+            if response is not None:
+                response.close()
+            raise
+        except asyncio.TimeoutError:
             raise LLMTimeoutError(f"Timeout no streaming para {self.model_name}")
         except aiohttp.ClientError as e:
-            raise LLMConnectionError(f"Erro de conexão no streaming: {str(e)}", self.model_name)
+            raise LLMConnectionError(f"Erro de conexão no streaming: {str(e)}", model=self.model_name)
 
     async def _health_check_impl(self) -> bool:
         """Health check específico do Gemini."""
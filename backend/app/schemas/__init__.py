@@ -14,6 +14,7 @@ from .glossario import (
 
 # Schemas do LLM
 from .llm import (
+    ContextType,
     LLMProvider,
     GenerationParams,
     LLMRequest,
@@ -36,6 +37,7 @@ __all__ = [
     "StatusGlossario",
 
     # LLM
+    "ContextType",
     "LLMProvider",
     "GenerationParams",
     "LLMRequest",
@@ -14,6 +14,15 @@ class ModelResponse(BaseModel):
     error: Optional[str] = None
 
 
+class ContextType(str, Enum):
+    """Tipos de contexto suportados."""
+    GENERAL = "general"
+    LEGAL = "legal"
+    TECHNICAL = "technical"
+    BUSINESS = "business"
+    ACADEMIC = "academic"
+
+
 class LLMProvider(str, Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
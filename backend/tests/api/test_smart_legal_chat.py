@@ -0,0 +1,117 @@
+# backend/tests/api/test_smart_legal_chat.py
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.api import smart_legal_chat
+from app.api.smart_legal_chat import LegalChatRequest, perguntar_legal_stream
+from app.core.legal_responder import response_generator
+from app.core.request_context import get_request_context
+from app.models.legal_repository import LegalQuery
+
+_MATCHES = [{
+    "document_id": "lei-trabalho",
+    "source": "Lei do Trabalho",
+    "full_reference": "Lei n.º 13/2023, artigo 99",
+    "content": "O trabalhador tem direito a férias remuneradas em cada ano civil.",
+    "confidence": 0.92,
+}]
+
+
+class _FakeSession:
+    """Sessão de base de dados que só regista o que é adicionado."""
+
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+class _FakeLLM:
+    """LLM que responde palavra a palavra e regista o utilizador do contexto."""
+
+    user_ids = []
+
+    async def stream_generate(self, prompt, context="", system_prompt=None, params=None):
+        self.user_ids.append(get_request_context().user_id)
+        for word in ("Tem", " direito", " a", " férias."):
+            yield {"content": word, "is_final": False}
+        yield {"content": "", "is_final": True}
+
+
+def _patch_chat(monkeypatch) -> _FakeSession:
+    session = _FakeSession()
+
+    @asynccontextmanager
+    async def get_session():
+        yield session
+
+    async def retrieve(user_query, db):
+        return _MATCHES
+
+    async def get_legal_llm():
+        return _FakeLLM()
+
+    monkeypatch.setattr(smart_legal_chat.db_manager, "get_session", get_session)
+    monkeypatch.setattr(smart_legal_chat, "get_legal_llm", get_legal_llm)
+    monkeypatch.setattr(response_generator, "_retrieve", retrieve)
+    return session
+
+
+def _event_names(body: str):
+    return [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+
+
+def test_stream_emits_status_then_tokens_then_final(monkeypatch):
+    """
+    Testa se o SSE emite primeiro os estados, depois o texto do LLM em
+    tokens e por fim o evento final com a resposta completa e as fontes.
+    """
+    # Dado (Given): uma pergunta com base legal e um LLM que responde em tokens.
+    _patch_chat(monkeypatch)
+    request = LegalChatRequest(pergunta="Tenho direito a férias no trabalho?")
+
+    async def scenario():
+        # Quando (When): o stream é consumido até ao fim.
+        response = await perguntar_legal_stream(request)
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    body = asyncio.run(scenario())
+    events = _event_names(body)
+
+    # Então (Then): status → token → final, sem eventos depois do final.
+    assert events == ["status", "status", "token", "token", "token", "token", "final"]
+    assert '"resposta": "Tem direito a férias."' in body
+    assert "Lei n.º 13/2023, artigo 99" in body
+
+
+def test_query_log_is_written_after_final_event(monkeypatch):
+    """
+    Testa se o registo LegalQuery é gravado em segundo plano, só depois
+    de o evento final ter sido entregue ao cliente, e se a chamada ao LLM
+    leva o utilizador autenticado no contexto.
+    """
+    # Dado (Given): uma sessão de base de dados que regista as gravações.
+    session = _patch_chat(monkeypatch)
+    request = LegalChatRequest(pergunta="Tenho direito a férias no trabalho?")
+
+    async def scenario():
+        # Quando (When): o evento final chega ao cliente...
+        async for event in smart_legal_chat.stream_legal_answer(request, "conversa-1", "u1"):
+            if event["type"] == "final":
+                written_before_final = list(session.added)
+        # ... e as gravações pendentes terminam.
+        await asyncio.gather(*smart_legal_chat._background_tasks)
+        return written_before_final
+
+    written_before_final = asyncio.run(scenario())
+
+    # Então (Then): nada foi gravado antes do final e o registo tem a resposta do LLM.
+    assert written_before_final == []
+    assert _FakeLLM.user_ids[-1] == "u1"
+    assert len(session.added) == 1
+    query_log = session.added[0]
+    assert isinstance(query_log, LegalQuery)
+    assert query_log.conversation_id == "conversa-1"
+    assert query_log.ai_response == "Tem direito a férias."
+    assert query_log.meta_data["streamed"] is True
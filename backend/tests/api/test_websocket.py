@@ -0,0 +1,78 @@
+# backend/tests/api/test_websocket.py
+import asyncio
+import json
+
+from fastapi import WebSocketDisconnect
+
+from app.api import smart_legal_chat
+from app.api.websocket import manager, websocket_user_endpoint
+
+
+class _FakeWebSocket:
+    """WebSocket que entrega as mensagens dadas e fecha quando `done` é assinalado."""
+
+    def __init__(self, messages, done: asyncio.Event):
+        self._messages = [json.dumps(message) for message in messages]
+        self._done = done
+        self.sent = []
+
+    async def accept(self):
+        return None
+
+    async def receive_text(self):
+        if self._messages:
+            return self._messages.pop(0)
+        await self._done.wait()
+        raise WebSocketDisconnect()
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def _patch_stream(monkeypatch, done: asyncio.Event):
+    quota_users = []
+
+    def chat_user_from_token(token):
+        return {"token-valido": "u1"}.get(token)
+
+    async def stream_legal_answer(request, conversation_id, user_id=None):
+        quota_users.append(user_id)
+        yield {"type": "final", "resposta": "Tem direito a férias."}
+        done.set()
+
+    monkeypatch.setattr(smart_legal_chat, "chat_user_from_token", chat_user_from_token)
+    monkeypatch.setattr(smart_legal_chat, "stream_legal_answer", stream_legal_answer)
+    return quota_users
+
+
+def test_legal_question_uses_token_subject_not_path_user_id(monkeypatch):
+    """
+    Testa se a quota e o ledger usam o utilizador do token de acesso, e
+    não o user_id do caminho, e se conexões sem token válido são anónimas.
+    """
+    question = {
+        "type": "legal_question",
+        "content": "Tenho direito a férias no trabalho?",
+        "conversation_id": "conversa-1",
+    }
+
+    async def scenario():
+        # Dado (Given): um stream que regista o utilizador usado para a quota.
+        done = asyncio.Event()
+        quota_users = _patch_stream(monkeypatch, done)
+        sockets = []
+
+        # Quando (When): a mesma pergunta chega com token válido, inválido e sem token.
+        for path_user, token in (("vitima", "token-valido"), ("vitima", "forjado"), ("outro", None)):
+            done.clear()
+            socket = _FakeWebSocket([question], done)
+            sockets.append(socket)
+            await asyncio.wait_for(websocket_user_endpoint(socket, path_user, token), timeout=1.0)
+        return quota_users, sockets
+
+    quota_users, sockets = asyncio.run(scenario())
+
+    # Então (Then): só o token identifica o utilizador; os eventos vão para a conexão.
+    assert quota_users == ["u1", None, None]
+    assert all(socket.sent[-1]["type"] == "legal_final" for socket in sockets)
+    assert not manager.user_connections and not manager.user_tasks
@@ -0,0 +1,97 @@
+# backend/tests/core/test_batch.py
+import asyncio
+
+from app.core.batch import BatchConfig, BatchGenerator, BatchItem, BatchResult
+from app.schemas import LLMResponse
+
+
+class FakeLLM:
+    """Cliente LLM mínimo para testes do executor em lote."""
+
+    def __init__(self, fail_ids=()):
+        self.calls = []
+        self.fail_ids = set(fail_ids)
+
+    async def generate(self, prompt, context="", system_prompt=None, params=None):
+        self.calls.append(prompt)
+        await asyncio.sleep(0)
+        if prompt in self.fail_ids:
+            raise RuntimeError("falha simulada")
+        return LLMResponse(
+            content=f"resumo de {prompt}", model="fake", provider="fake",
+            tokens_used=10, cost=0.001
+        )
+
+
+class FakeBatchLLM(FakeLLM):
+    """Cliente com endpoint batch simulado."""
+
+    supports_batch_api = True
+
+    def __init__(self):
+        super().__init__()
+        self.batches = {}
+        self.polls = 0
+
+    async def submit_batch(self, items):
+        batch_id = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = items
+        return batch_id
+
+    async def get_batch_status(self, batch_id):
+        self.polls += 1
+        return {"ended": self.polls > 1}
+
+    async def iter_batch_results(self, batch_id):
+        for item in self.batches[batch_id]:
+            yield BatchResult(custom_id=item.custom_id, success=True, content=item.prompt,
+                              tokens_used=5, cost=0.0005)
+
+
+def _items(n):
+    return [BatchItem(custom_id=f"artigo-{i}", prompt=f"artigo {i}") for i in range(n)]
+
+
+def test_worker_pool_resumes_from_checkpoint(tmp_path):
+    """
+    Testa se um job interrompido retoma sem reprocessar itens concluídos
+    e se os itens falhados são tentados novamente.
+    """
+    # Dado (Given): um primeiro run em que um item falha.
+    config = BatchConfig(checkpoint_dir=str(tmp_path), max_concurrency=3)
+    first = FakeLLM(fail_ids={"artigo 2"})
+    report = asyncio.run(BatchGenerator(first, config).run("resumos", _items(10)))
+    assert report.completed == 9 and report.failed == 1
+
+    # Quando (When): o job é executado de novo com o mesmo identificador.
+    second = FakeLLM()
+    report = asyncio.run(BatchGenerator(second, config).run("resumos", _items(10)))
+
+    # Então (Then): só o item falhado volta a ser gerado.
+    assert second.calls == ["artigo 2"]
+    assert report.skipped == 9
+    assert report.completed == 1
+    assert report.mode == "worker_pool"
+
+
+def test_provider_batch_submits_polls_and_collects(tmp_path):
+    """
+    Testa se o modo batch do provedor envia os itens em lotes, aguarda o
+    fim do processamento e contabiliza tokens e custo.
+    """
+    # Dado (Given): um cliente com endpoint batch e lotes de 4 itens.
+    config = BatchConfig(
+        checkpoint_dir=str(tmp_path), provider_batch_size=4, poll_interval_sec=0
+    )
+    llm = FakeBatchLLM()
+
+    # Quando (When): 10 itens são processados.
+    report = asyncio.run(BatchGenerator(llm, config).run("glossario", _items(10)))
+
+    # Então (Then): são criados 3 lotes e todos os resultados são recolhidos.
+    assert len(llm.batches) == 3
+    assert llm.calls == []
+    assert report.mode == "provider_batch"
+    assert report.completed == 10
+    assert report.tokens_used == 50
+    assert abs(report.cost - 0.005) < 1e-9
@@ -0,0 +1,64 @@
+# backend/tests/core/test_cache.py
+import asyncio
+
+from app.core.cache import AsyncInMemoryCache, EvictionPolicy
+
+
+def test_lru_eviction_is_preserved_within_each_shard():
+    """
+    Testa se a eviction LRU continua a remover a entrada menos usada
+    recentemente dentro do shard da chave.
+    """
+    async def scenario():
+        # Dado (Given): um cache de 3 entradas por shard.
+        cache = AsyncInMemoryCache(
+            ttl_sec=60, max_size=12, eviction_policy=EvictionPolicy.LRU,
+            enable_compression=False, shards=4
+        )
+        shard = cache._shards[0]
+        keys = [k for k in (f"k{i}" for i in range(500)) if cache._shard_for(k) is shard][:4]
+
+        # Quando (When): três chaves do mesmo shard são escritas, a primeira
+        # é lida e uma quarta chave chega.
+        for key in keys[:3]:
+            await cache.set(key, key)
+        assert await cache.get(keys[0]) == keys[0]
+        await cache.set(keys[3], keys[3])
+
+        return keys, [await cache.get(key) for key in keys]
+
+    keys, values = asyncio.run(scenario())
+
+    # Então (Then): sai a menos usada recentemente (a segunda).
+    assert values == [keys[0], None, keys[2], keys[3]]
+
+
+def test_stats_and_namespaces_span_all_shards():
+    """
+    Testa se as estatísticas e as operações por namespace agregam todos
+    os shards.
+    """
+    async def scenario():
+        # Dado (Given): um cache particionado com dois namespaces.
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=1000, enable_compression=False, shards=8)
+        for i in range(100):
+            await cache.set(f"p{i}", {"n": i}, namespace="a")
+            await cache.set(f"p{i}", {"n": i}, namespace="b")
+
+        # Quando (When): há leituras, misses e limpeza de um namespace.
+        for i in range(50):
+            assert await cache.get(f"p{i}", namespace="a") == {"n": i}
+        assert await cache.get("inexistente", namespace="a") is None
+        await cache.clear(namespace="a")
+        return cache, await cache.get_stats()
+
+    cache, stats = asyncio.run(scenario())
+
+    # Então (Then): os contadores somam todos os shards e só "b" resta.
+    assert stats["shards"] == 8
+    assert stats["sets"] == 200
+    assert stats["hits"] == 50 and stats["misses"] == 1
+    assert stats["current_size"] == 100
+    assert sum(stats["shard_sizes"]) == 100
+    assert sum(1 for s in stats["shard_sizes"] if s) > 1
+    assert asyncio.run(cache.size(namespace="b")) == 100
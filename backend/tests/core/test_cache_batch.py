@@ -0,0 +1,94 @@
+# backend/tests/core/test_cache_batch.py
+import asyncio
+
+from app.core.cache import AsyncInMemoryCache
+from app.core.cache_tiered import NEGATIVE, InMemoryRedis, TieredCache, TieredCacheConfig
+
+
+class _CountingLock(asyncio.Lock):
+    def __init__(self):
+        super().__init__()
+        self.acquisitions = 0
+
+    async def acquire(self):
+        self.acquisitions += 1
+        return await super().acquire()
+
+
+def test_bulk_operations_take_each_shard_lock_once():
+    """
+    Testa se get_many, set_many e delete_many devolvem os mapas corretos
+    e adquirem o lock de cada shard uma única vez por operação.
+    """
+    async def scenario():
+        # Dado (Given): um cache com 4 shards e locks instrumentados.
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=1000, shards=4)
+        for shard in cache._shards:
+            shard.lock = _CountingLock()
+        embeddings = {f"artigo{i}": [i / 10] * 8 for i in range(200)}
+
+        # Quando (When): escreve-se, lê-se e apaga-se em lote.
+        stored = await cache.set_many(embeddings, namespace="emb")
+        batch = await cache.get_many([*embeddings, "inexistente"], namespace="emb")
+        removed = await cache.delete_many(list(embeddings)[:50] + ["inexistente"], namespace="emb")
+        after = await cache.get_many(["artigo0", "artigo199"], namespace="emb")
+        locks = [shard.lock.acquisitions for shard in cache._shards]
+        return stored, batch, removed, after, locks, await cache.get_stats()
+
+    stored, batch, removed, after, locks, stats = asyncio.run(scenario())
+
+    # Então (Then): todos guardados, um lock por shard e operação, stats coerentes.
+    assert all(stored.values()) and len(stored) == 200
+    assert batch.hits["artigo7"] == [0.7] * 8 and len(batch.hits) == 200
+    assert batch.misses == ["inexistente"]
+    assert removed == 50
+    assert list(after.hits) == ["artigo199"] and after.misses == ["artigo0"]
+    assert max(locks) <= 4 and sum(locks) <= 4 * 4
+    assert stats["hits"] == 201 and stats["misses"] == 2 and stats["deletes"] == 50
+
+
+def test_tiered_bulk_operations_pipeline_l2_round_trips():
+    """
+    Testa se o cache em dois níveis usa uma ida e volta ao L2 por lote e
+    invalida o L1 dos outros workers com uma única mensagem.
+    """
+    async def scenario():
+        # Dado (Given): dois workers com o mesmo Redis, B já com uma cópia local.
+        redis = InMemoryRedis()
+        config = TieredCacheConfig()
+        a = TieredCache(AsyncInMemoryCache(ttl_sec=60, max_size=1000, shards=2), redis, config)
+        b = TieredCache(AsyncInMemoryCache(ttl_sec=60, max_size=1000, shards=2), redis, config)
+        await a.start()
+        await b.start()
+        await b.l1.set("r1", "antiga", namespace="respostas")
+
+        # Quando (When): A escreve 100 respostas em lote e B lê-as em lote.
+        before = redis.commands
+        await a.set_many({f"r{i}": f"resposta {i}" for i in range(100)}, namespace="respostas")
+        await a.set_negative("r404", namespace="respostas")
+        writes = redis.commands - before
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        before = redis.commands
+        batch = await b.get_many([f"r{i}" for i in range(100)] + ["r404", "r999"], namespace="respostas")
+        reads = redis.commands - before
+        again = await b.get_many(["r1", "r2"], namespace="respostas")
+        metrics = b.get_metrics()
+        removed = await a.delete_many(["r1", "r2"], namespace="respostas")
+        await a.stop()
+        await b.stop()
+        return writes, batch, reads, again, removed, metrics, await b.l1.get("r404", namespace="respostas")
+
+    writes, batch, reads, again, removed, metrics, l1_negative = asyncio.run(scenario())
+
+    # Então (Then): 1 pipeline para o lote (+2 do set_negative), 1 MGET para a leitura.
+    assert writes == 3
+    assert reads == 1
+    assert batch.hits["r1"] == "resposta 1" and len(batch.hits) == 100
+    assert sorted(batch.misses) == ["r404", "r999"]
+    assert l1_negative is NEGATIVE
+    assert again.hits == {"r1": "resposta 1", "r2": "resposta 2"}
+    assert removed == 2
+    assert metrics["l2_hits"] == 101 and metrics["negative_hits"] == 1
+    assert metrics["invalidations_received"] == 101
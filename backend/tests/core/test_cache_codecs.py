@@ -0,0 +1,88 @@
+# backend/tests/core/test_cache_codecs.py
+import asyncio
+import os
+import threading
+
+import numpy as np
+
+from app.core.cache import AsyncInMemoryCache
+from app.core.cache_codecs import CodecConfig
+
+
+def test_codec_is_chosen_by_size_and_sampled_ratio():
+    """
+    Testa se valores imutáveis pequenos ficam por referência, texto
+    grande é comprimido e dados incompressíveis deixam de ser
+    comprimidos após a amostragem.
+    """
+    async def scenario():
+        # Dado (Given): um cache com compressão automática.
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=1000, enable_compression=True, shards=1)
+        small = "resposta curta"
+        text = "Artigo 23.º da Lei do Trabalho: direito a férias. " * 200
+
+        # Quando (When): são guardados valores de vários tipos e tamanhos.
+        await cache.set("pequeno", small)
+        await cache.set("dict", {"a": 1})
+        await cache.set("texto", [text])
+        for i in range(20):
+            await cache.set(f"aleatorio{i}", [os.urandom(4096)], namespace="bin")
+
+        values = (
+            await cache.get("pequeno"), await cache.get("dict"), await cache.get("texto")
+        )
+        return cache, small, text, values, await cache.get_stats()
+
+    cache, small, text, (got_small, got_dict, got_text), stats = asyncio.run(scenario())
+    shard = cache._shards[0]
+
+    # Então (Then): cada valor usa o codec adequado e volta intacto.
+    assert got_small is small
+    assert got_dict == {"a": 1} and got_text == [text]
+    assert shard.entries["pequeno"].codec == "identity"
+    assert shard.entries["dict"].codec == "pickle"
+    assert shard.entries["texto"].codec.startswith("pickle+")
+    assert shard.entries["texto"].size_bytes < len(text) / 5
+    assert all(shard.entries[f"bin:aleatorio{i}"].codec == "pickle" for i in range(20))
+    assert stats["codecs"]["sampled_ratio"]["bin"] > 0.9
+    assert stats["codecs"]["by_codec"]["pickle"]["encodes"] == 21
+
+
+def test_namespace_codecs_buffers_and_unpicklable_values():
+    """
+    Testa o codec por namespace (lzma), os buffers fora de banda do
+    pickle 5 e o fallback por referência de valores não serializáveis.
+    """
+    async def scenario():
+        # Dado (Given): um namespace de arquivo com lzma.
+        cache = AsyncInMemoryCache(
+            ttl_sec=60, max_size=1000, shards=1,
+            codecs={"arquivo": CodecConfig(compressor="lzma", level=1, size_threshold=0)}
+        )
+        embedding = np.arange(2048, dtype=np.float32)
+        lock = threading.Lock()
+
+        # Quando (When): são guardados texto, um array e um objeto não serializável.
+        await cache.set("doc", {"texto": "lei " * 500}, namespace="arquivo")
+        await cache.set("emb", embedding)
+        embedding[0] = -1  # Alterar o original não afeta o valor em cache
+        await cache.set("lock", lock)
+
+        return (
+            cache,
+            await cache.get("doc", namespace="arquivo"),
+            await cache.get("emb"),
+            await cache.get("lock") is lock,
+            await cache.get_stats(),
+        )
+
+    cache, doc, emb, same_lock, stats = asyncio.run(scenario())
+    entries = cache._shards[0].entries
+
+    # Então (Then): cada caso segue o seu codec e as estatísticas registam tempos.
+    assert doc == {"texto": "lei " * 500}
+    assert entries["arquivo:doc"].codec == "pickle+lzma"
+    assert entries["emb"].buffers and emb[0] == 0 and emb.sum() == sum(range(2048))
+    assert same_lock and entries["lock"].codec == "identity"
+    assert stats["codecs"]["by_codec"]["pickle+lzma"]["decodes"] == 1
+    assert stats["codecs"]["by_codec"]["pickle+lzma"]["avg_encode_us"] > 0
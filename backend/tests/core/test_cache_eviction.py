@@ -0,0 +1,78 @@
+# backend/tests/core/test_cache_eviction.py
+import asyncio
+
+from app.core.cache import AsyncInMemoryCache, EvictionPolicy, _LFUTracker
+
+
+def test_lfu_evicts_least_frequent_and_ages_old_hot_keys():
+    """
+    Testa se o LFU escolhe a chave menos frequente (desempate pela mais
+    antiga) e se o envelhecimento liberta chaves que já não são usadas.
+    """
+    async def scenario():
+        # Dado (Given): um cache LFU cheio em que "a" é muito lida.
+        cache = AsyncInMemoryCache(
+            ttl_sec=60, max_size=3, eviction_policy=EvictionPolicy.LFU,
+            enable_compression=False, shards=1
+        )
+        for key in ("a", "b", "c"):
+            await cache.set(key, key)
+        for _ in range(5):
+            await cache.get("a")
+        await cache.get("c")
+
+        # Quando (When): chega uma chave nova.
+        await cache.set("d", "d")
+        return [await cache.get(key) for key in ("a", "b", "c", "d")]
+
+    # Então (Then): sai "b" (frequência 1), as restantes ficam.
+    assert asyncio.run(scenario()) == ["a", None, "c", "d"]
+
+    # Dado (Given): um tracker com envelhecimento a cada 20 acessos.
+    tracker = _LFUTracker(decay_interval=20)
+    tracker.add("antiga")
+    for _ in range(15):
+        tracker.touch("antiga")
+    tracker.add("nova")
+
+    # Quando (When): a chave nova passa a ser a mais usada.
+    for _ in range(10):
+        tracker.touch("nova")
+
+    # Então (Then): a contagem antiga foi reduzida e passa a ser a vítima.
+    assert tracker.decays == 1
+    assert tracker.frequency("antiga") < 16
+    assert tracker.victim() == "antiga"
+
+
+def test_tinylfu_protects_hot_keys_from_scans():
+    """
+    Testa se a admissão TinyLFU impede que uma varredura de chaves
+    únicas expulse o conjunto de chaves frequentes.
+    """
+    async def run(policy: EvictionPolicy) -> int:
+        cache = AsyncInMemoryCache(
+            ttl_sec=60, max_size=100, eviction_policy=policy,
+            enable_compression=False, shards=1
+        )
+
+        async def cache_aside(key: str) -> bool:
+            if await cache.get(key) is not None:
+                return True
+            await cache.set(key, key)
+            return False
+
+        # Dado (Given): 50 chaves quentes lidas repetidamente.
+        for _ in range(5):
+            for i in range(50):
+                await cache_aside(f"quente{i}")
+
+        # Quando (When): uma varredura de 1000 chaves únicas passa pelo cache.
+        for i in range(1000):
+            await cache_aside(f"scan{i}")
+
+        # Então (Then): conta quantas chaves quentes sobreviveram.
+        return sum([await cache.get(f"quente{i}") is not None for i in range(50)])
+
+    assert asyncio.run(run(EvictionPolicy.LRU)) == 0
+    assert asyncio.run(run(EvictionPolicy.TINY_LFU)) >= 45  # Sketch é aproximado
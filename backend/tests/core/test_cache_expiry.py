@@ -0,0 +1,106 @@
+# backend/tests/core/test_cache_expiry.py
+import asyncio
+import time
+
+from app.core.cache import AsyncInMemoryCache, CacheEntry, EvictionPolicy
+
+
+def test_cleanup_only_touches_due_entries_in_one_million():
+    """
+    Testa se, com 1M de entradas, o cleanup remove só as vencidas em
+    fatias limitadas, sem percorrer o cache inteiro.
+    """
+    # Dado (Given): 1M de entradas num shard, 1% já expiradas.
+    cache = AsyncInMemoryCache(
+        ttl_sec=600, max_size=1_000_000, enable_compression=False,
+        cleanup_slice_size=500, shards=1
+    )
+    shard = cache._shards[0]
+    now = time.monotonic()
+    expired = CacheEntry(value="x", expiration_time=now - 1, codec="identity")
+    alive = CacheEntry(value="x", expiration_time=now + 600, codec="identity")
+    for i in range(1_000_000):
+        shard.store(f"k{i}", expired if i % 100 == 0 else alive)
+
+    # Quando (When): o cleanup corre com um leitor concorrente.
+    async def scenario():
+        reads = 0
+
+        async def reader():
+            nonlocal reads
+            while True:
+                await cache.get("k1")
+                reads += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(reader())
+        removed = await cache.cleanup_expired()
+        task.cancel()
+        return removed, reads, await cache.get_stats()
+
+    removed, reads, stats = asyncio.run(scenario())
+
+    # Então (Then): 10k removidas em 21 fatias de até 500, leituras intercaladas.
+    assert removed == 10_000
+    assert stats["current_size"] == 990_000
+    assert stats["cleanup"]["last_run_slices"] == 21
+    assert reads >= 20
+    assert stats["cleanup"]["max_slice_ms"] < 1000
+    assert len(shard.expiry_heap) == 990_000
+
+
+def test_rewritten_keys_use_their_latest_expiration():
+    """
+    Testa se itens obsoletos do índice (chaves regravadas ou apagadas)
+    não removem a entrada atual.
+    """
+    async def scenario():
+        # Dado (Given): uma chave gravada com TTL 0 e regravada com TTL longo.
+        cache = AsyncInMemoryCache(ttl_sec=600, max_size=100, enable_compression=False, shards=1)
+        await cache.set("regravada", 1, ttl=0)
+        await cache.set("regravada", 2, ttl=600)
+        await cache.set("apagada", 3, ttl=0)
+        await cache.delete("apagada")
+        await cache.set("vencida", 4, ttl=0)
+
+        # Quando (When): o cleanup corre.
+        removed = await cache.cleanup_expired()
+        return removed, await cache.get("regravada"), await cache.size()
+
+    # Então (Then): só a entrada realmente vencida sai.
+    assert asyncio.run(scenario()) == (1, 2, 1)
+
+
+def test_fifo_cleanup_removes_expired_keys_without_scanning_the_order():
+    """
+    Testa se, em FIFO, o cleanup remove entradas vencidas sem percorrer
+    a fila inteira por cada uma e se a ordem de eviction se mantém.
+    """
+    # Dado (Given): 200k entradas FIFO, com 2k vencidas no fim da fila.
+    cache = AsyncInMemoryCache(
+        ttl_sec=600, max_size=200_000, eviction_policy=EvictionPolicy.FIFO,
+        enable_compression=False, shards=1
+    )
+    shard = cache._shards[0]
+    now = time.monotonic()
+    expired = CacheEntry(value="x", expiration_time=now - 1, codec="identity")
+    alive = CacheEntry(value="x", expiration_time=now + 600, codec="identity")
+    for i in range(200_000):
+        shard.store(f"k{i}", expired if i >= 198_000 else alive)
+
+    async def scenario():
+        # Quando (When): o cleanup corre e o cache volta a encher.
+        start = time.perf_counter()
+        removed = await cache.cleanup_expired()
+        elapsed = time.perf_counter() - start
+        await cache.get("k0")  # Leituras não mudam a ordem FIFO
+        for i in range(2_001):
+            await cache.set(f"novo{i}", i)
+        return removed, elapsed, await cache.get("k0"), await cache.get("k1")
+
+    removed, elapsed, first, second = asyncio.run(scenario())
+
+    # Então (Then): as vencidas saem depressa e a mais antiga é a vítima.
+    assert removed == 2_000
+    assert elapsed < 0.5
+    assert first is None and second == "x"
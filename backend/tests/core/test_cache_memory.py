@@ -0,0 +1,67 @@
+# backend/tests/core/test_cache_memory.py
+import asyncio
+import tracemalloc
+
+from app.core.cache import AsyncInMemoryCache, EvictionPolicy
+
+
+def test_byte_budget_evicts_large_cold_entries_and_rejects_oversize():
+    """
+    Testa se o orçamento de bytes é respeitado, se o GDS expulsa primeiro
+    os valores grandes e pouco usados e se valores acima do limite por
+    entrada são recusados sem mexer no cache.
+    """
+    async def scenario():
+        # Dado (Given): um cache GDS com 64 KB de orçamento e entradas de até 32 KB.
+        cache = AsyncInMemoryCache(
+            ttl_sec=60, max_size=10_000, eviction_policy=EvictionPolicy.GDS,
+            enable_compression=False, shards=1,
+            max_bytes=64 * 1024, max_entry_bytes=32 * 1024
+        )
+        for i in range(20):
+            await cache.set(f"emb{i}", f"e{i}")
+        for i in range(2):
+            await cache.set(f"consenso{i}", "x" * 20_000)
+        for _ in range(3):
+            for i in range(20):
+                await cache.get(f"emb{i}")
+
+        # Quando (When): chegam mais valores grandes e um valor enorme.
+        for i in range(2, 5):
+            await cache.set(f"consenso{i}", "y" * 20_000)
+        accepted = await cache.set("enorme", "z" * 100_000)
+
+        small = [await cache.get(f"emb{i}") for i in range(20)]
+        return accepted, small, await cache.get_stats()
+
+    accepted, small, stats = asyncio.run(scenario())
+
+    # Então (Then): os valores pequenos e quentes ficam e o limite é cumprido.
+    assert not accepted and stats["oversize_rejections"] == 1
+    assert small == [f"e{i}" for i in range(20)]
+    assert stats["memory_bytes"] <= 64 * 1024
+    assert stats["evictions"] >= 2
+
+
+def test_reported_memory_tracks_traced_allocations():
+    """
+    Testa se a memória reportada pelo cache fica próxima das alocações
+    reais medidas com tracemalloc.
+    """
+    async def scenario():
+        # Dado (Given): um cache LRU sem limite de bytes.
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=100_000, enable_compression=False, shards=4)
+
+        # Quando (When): são guardados 20k valores de tamanhos variados.
+        tracemalloc.start()
+        for i in range(20_000):
+            await cache.set(f"resposta:{i}", {"id": i, "texto": "lei " * (i % 50)}, namespace="llm")
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return traced, await cache.get_stats()
+
+    traced, stats = asyncio.run(scenario())
+
+    # Então (Then): a estimativa difere menos de 15% do medido.
+    assert stats["current_size"] == 20_000
+    assert abs(stats["memory_bytes"] - traced) / traced < 0.15
@@ -0,0 +1,112 @@
+# backend/tests/core/test_cache_namespaces.py
+import asyncio
+import time
+
+from app.core.cache import AsyncInMemoryCache, CacheEntry
+
+
+def test_namespace_operations_only_touch_the_namespace():
+    """
+    Testa se clear/size/keys por namespace usam o índice e custam o
+    tamanho do namespace, não o do cache.
+    """
+    # Dado (Given): 500k entradas em "pesquisa" e 100 em "aprovacao".
+    cache = AsyncInMemoryCache(ttl_sec=600, max_size=600_000, enable_compression=False, shards=4)
+    entry = CacheEntry(
+        value="resultado", expiration_time=time.monotonic() + 600,
+        namespace="pesquisa", codec="identity"
+    )
+    for i in range(500_000):
+        key = f"pesquisa:q{i}"
+        cache._shard_for(key).store(key, entry)
+
+    async def scenario():
+        for i in range(100):
+            await cache.set(f"doc{i}", i, namespace="aprovacao")
+        await cache.set("aprovacao:sem-namespace", 1)  # Mesmo prefixo, sem namespace
+        size = await cache.size(namespace="aprovacao")
+        keys = await cache.keys(namespace="aprovacao")
+
+        # Quando (When): o namespace pequeno é invalidado.
+        start = time.perf_counter()
+        await cache.clear(namespace="aprovacao")
+        elapsed = time.perf_counter() - start
+        return size, keys, elapsed, await cache.get("aprovacao:sem-namespace")
+
+    size, keys, elapsed, untouched = asyncio.run(scenario())
+
+    # Então (Then): só as 100 entradas do namespace saem, sem varrer as 500k.
+    assert size == 100 and len(keys) == 100
+    assert "aprovacao:sem-namespace" not in keys
+    assert untouched == 1
+    assert elapsed < 0.05
+    assert asyncio.run(cache.size(namespace="pesquisa")) == 500_000
+    assert asyncio.run(cache.size(namespace="aprovacao")) == 0
+
+
+def test_namespace_quotas_and_stats():
+    """
+    Testa se as quotas por namespace expulsam as entradas menos usadas
+    do próprio namespace e se as estatísticas são separadas.
+    """
+    async def scenario():
+        # Dado (Given): quota de 3 entradas em "sessao" e 2 KB em "docs".
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=1000, enable_compression=False, shards=1)
+        cache.set_namespace_quota("sessao", max_entries=3)
+        cache.set_namespace_quota("docs", max_bytes=2048)
+        await cache.set("global", "fica")
+
+        # Quando (When): "sessao" recebe 4 entradas (a primeira é lida) e
+        # "docs" recebe valores de ~1 KB e um maior que a quota.
+        for i in range(3):
+            await cache.set(f"s{i}", i, namespace="sessao")
+        await cache.get("s0", namespace="sessao")
+        await cache.set("s3", 3, namespace="sessao")
+        for i in range(3):
+            await cache.set(f"d{i}", "x" * 1000, namespace="docs")
+        too_big = await cache.set("enorme", "x" * 5000, namespace="docs")
+        await cache.get("inexistente", namespace="sessao")
+
+        sessao = [await cache.get(f"s{i}", namespace="sessao") for i in range(4)]
+        return cache, sessao, too_big
+
+    cache, sessao, too_big = asyncio.run(scenario())
+
+    # Então (Then): sai a menos usada de cada namespace e o resto não muda.
+    assert sessao == [0, None, 2, 3]
+    assert not too_big
+    stats = cache.get_namespace_stats("sessao")
+    assert stats["entries"] == 3 and stats["quota_evictions"] == 1
+    assert stats["misses"] == 2 and stats["hits"] == 4
+    docs = cache.get_namespace_stats("docs")
+    assert docs["entries"] == 2 and docs["size_bytes"] <= 2048
+    assert asyncio.run(cache.get("global")) == "fica"
+    assert set(asyncio.run(cache.get_stats())["namespaces"]) == {"sessao", "docs"}
+
+
+def test_namespace_quota_is_global_and_rejected_overwrite_keeps_value():
+    """
+    Testa se a quota de um namespace vale para o cache inteiro (e não
+    por shard) e se regravar uma chave com um valor recusado mantém o
+    valor antigo.
+    """
+    async def scenario():
+        # Dado (Given): 16 shards e quota de 10 entradas / 4 KB em "sessao".
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=1000, enable_compression=False, shards=16)
+        cache.set_namespace_quota("sessao", max_entries=10, max_bytes=4096)
+
+        # Quando (When): entram 40 chaves espalhadas pelos shards...
+        for i in range(40):
+            await cache.set(f"s{i}", i, namespace="sessao")
+        # ... e uma delas é regravada com um valor maior que a quota.
+        rejected = await cache.set("s39", "x" * 5000, namespace="sessao")
+        return cache, rejected, await cache.get("s39", namespace="sessao")
+
+    cache, rejected, kept = asyncio.run(scenario())
+
+    # Então (Then): ficam só 10 entradas e o valor antigo sobrevive.
+    stats = cache.get_namespace_stats("sessao")
+    assert stats["entries"] == 10 and stats["quota_evictions"] == 30
+    assert asyncio.run(cache.size(namespace="sessao")) == 10
+    assert not rejected
+    assert kept == 39
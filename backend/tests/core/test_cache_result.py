@@ -0,0 +1,100 @@
+# backend/tests/core/test_cache_result.py
+import asyncio
+from dataclasses import dataclass
+
+from app.core.cache import AsyncInMemoryCache, CachedResult, build_call_key, cache_result
+
+
+def test_single_flight_and_stale_while_revalidate():
+    """
+    Testa se misses concorrentes executam a função uma só vez e se, após
+    o TTL, o valor vencido é servido enquanto uma única tarefa o refresca.
+    """
+    async def scenario():
+        # Dado (Given): uma função lenta com TTL 0 e 60s de janela "stale".
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=100, shards=1)
+        calls = []
+
+        @cache_result(ttl=0, stale_ttl=60, early_expiration_beta=0, cache=cache)
+        async def pesquisar(termo: str) -> str:
+            calls.append(termo)
+            await asyncio.sleep(0.01)
+            return f"{termo}-v{len(calls)}"
+
+        # Quando (When): 50 pedidos simultâneos chegam sem valor em cache...
+        first = await asyncio.gather(*(pesquisar("férias") for _ in range(50)))
+        calls_after_miss = len(calls)
+
+        # ... e depois 20 pedidos simultâneos chegam com o valor vencido.
+        stale = await asyncio.gather(*(pesquisar("férias") for _ in range(20)))
+        await asyncio.sleep(0.05)
+        record = await cache.get(build_call_key(pesquisar.__wrapped__, ("férias",), {}), namespace="functions")
+        return first, calls_after_miss, stale, len(calls), record
+
+    first, calls_after_miss, stale, total_calls, record = asyncio.run(scenario())
+
+    # Então (Then): uma execução no miss, o valor vencido servido e um só refrescamento.
+    assert set(first) == {"férias-v1"} and calls_after_miss == 1
+    assert set(stale) == {"férias-v1"}
+    assert total_calls == 2
+    assert isinstance(record, CachedResult) and record.value == "férias-v2"
+
+
+def test_call_keys_and_probabilistic_early_refresh():
+    """
+    Testa se a chave não depende de str() dos argumentos e se a expiração
+    antecipada refresca em segundo plano antes do fim do TTL.
+    """
+    @dataclass
+    class Filtro:
+        area: str
+        anos: tuple
+
+    class Cliente:
+        def __init__(self, nome: str):
+            self.nome = nome
+
+        def __cache_key__(self):
+            return self.nome
+
+    async def consultar(cliente, filtro, pagina=1, opcoes=None):
+        return pagina
+
+    # Dado (Given): chamadas equivalentes escritas de formas diferentes.
+    a = build_call_key(consultar, (Cliente("x"), Filtro("laboral", (2020,))), {"opcoes": {"b": 1, "a": {2, 1}}})
+    b = build_call_key(
+        consultar, (), {"cliente": Cliente("x"), "filtro": Filtro("laboral", (2020,)),
+                        "pagina": 1, "opcoes": {"a": {1, 2}, "b": 1}}
+    )
+    c = build_call_key(consultar, (Cliente("y"), Filtro("laboral", (2020,))), {})
+
+    # Então (Then): a mesma chamada gera a mesma chave; outro cliente não.
+    assert a == b and a != c
+    try:
+        build_call_key(consultar, (object(), None), {})
+        raise AssertionError("objeto sem __cache_key__ deveria ser recusado")
+    except TypeError:
+        pass
+
+    async def scenario():
+        # Dado (Given): um TTL longo e um beta muito alto.
+        cache = AsyncInMemoryCache(ttl_sec=60, max_size=100, shards=1)
+        calls = []
+
+        @cache_result(ttl=60, early_expiration_beta=1e9, cache=cache)
+        async def calcular() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.005)
+            return len(calls)
+
+        # Quando (When): lê-se duas vezes e dá-se tempo ao refrescamento.
+        values = [await calcular(), await calcular()]
+        await asyncio.sleep(0.05)
+        values.append(await cache.get(build_call_key(calcular.__wrapped__, (), {}), namespace="functions"))
+        return values, len(calls)
+
+    values, total_calls = asyncio.run(scenario())
+
+    # Então (Then): a segunda leitura serve o valor atual e refresca antes de vencer.
+    assert values[:2] == [1, 1]
+    assert total_calls == 2 and values[2].value == 2
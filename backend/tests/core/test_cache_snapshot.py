@@ -0,0 +1,166 @@
+# backend/tests/core/test_cache_snapshot.py
+import asyncio
+import struct
+import threading
+import time
+
+import numpy as np
+
+from app.core.cache import SNAPSHOT_MAGIC, AsyncInMemoryCache, EvictionPolicy
+
+
+def test_snapshot_round_trip_preserves_values_ttl_and_eviction_order(tmp_path):
+    """
+    Testa se um snapshot restaura valores de todos os codecs, o TTL
+    restante e a ordem de eviction (LRU e frequências do LFU).
+    """
+    path = str(tmp_path / "cache.snap")
+
+    async def scenario():
+        # Dado (Given): um cache LRU com valores variados e um LFU com frequências.
+        cache = AsyncInMemoryCache(ttl_sec=600, max_size=5, shards=1, snapshot_path=path)
+        await cache.set("texto", ["Lei do Trabalho " * 200], namespace="leis")
+        await cache.set("emb", np.arange(64, dtype=np.float32), namespace="emb")
+        await cache.set("curta", "resposta", ttl=30)
+        await cache.set("vencida", "x", ttl=0)
+        await cache.set("lock", threading.Lock())
+        await cache.get("texto", namespace="leis")  # "emb" passa a ser a vítima LRU
+
+        lfu = AsyncInMemoryCache(ttl_sec=600, max_size=3, eviction_policy=EvictionPolicy.LFU, shards=1)
+        for key, reads in (("a", 5), ("b", 0), ("c", 2)):
+            await lfu.set(key, key)
+            for _ in range(reads):
+                await lfu.get(key)
+
+        # Quando (When): os dois são gravados e restaurados em caches novos.
+        summary = await cache.save_snapshot()
+        await lfu.save_snapshot(str(tmp_path / "lfu.snap"))
+        restored = AsyncInMemoryCache(ttl_sec=600, max_size=3, shards=1, snapshot_path=path)
+        loaded = await restored.load_snapshot()
+        restored_lfu = AsyncInMemoryCache(
+            ttl_sec=600, max_size=3, eviction_policy=EvictionPolicy.LFU, shards=1
+        )
+        await restored_lfu.load_snapshot(str(tmp_path / "lfu.snap"))
+
+        await restored.set("nova", 1)
+        await restored_lfu.set("d", "d")
+        shard = restored._shards[0]
+        return (
+            summary, loaded,
+            await restored.get("texto", namespace="leis"),
+            await restored.get("emb", namespace="emb"),
+            shard.entries["curta"].expiration_time - time.monotonic(),
+            [key for key in ("a", "b", "c", "d") if await restored_lfu.get(key) is not None],
+        )
+
+    summary, loaded, text, emb, ttl_left, lfu_keys = asyncio.run(scenario())
+
+    # Então (Then): o lock (não serializável) e a vencida ficam de fora, "emb" é a vítima.
+    assert summary["entries"] == 3 and summary["skipped"] == 1
+    assert loaded == 3
+    assert text == ["Lei do Trabalho " * 200]
+    assert emb is None  # Expulsa ao entrar "nova": continuava a ser a menos usada
+    assert 25 < ttl_left <= 30
+    assert lfu_keys == ["a", "c", "d"]  # "b" (frequência 1) continua a ser a vítima
+
+
+def test_snapshot_guards_and_background_restore(tmp_path):
+    """
+    Testa a recusa de versões incompatíveis, a restauração parcial de
+    ficheiros truncados, o limite de entradas e a restauração em
+    background com snapshot final na paragem.
+    """
+    path = tmp_path / "cache.snap"
+
+    async def scenario():
+        # Dado (Given): um snapshot de 100 entradas (as últimas lidas são as mais quentes).
+        cache = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=4)
+        for i in range(100):
+            await cache.set(f"k{i}", {"n": i})
+        await cache.save_snapshot(str(path))
+        data = path.read_bytes()
+
+        # Quando (When): o ficheiro é lido com limite, truncado e com outra versão.
+        capped = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=4)
+        capped_count = await capped.load_snapshot(str(path), max_entries=10)
+
+        (tmp_path / "truncado.snap").write_bytes(data[: len(data) // 2])
+        partial = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=4)
+        partial_count = await partial.load_snapshot(str(tmp_path / "truncado.snap"))
+
+        (tmp_path / "antigo.snap").write_bytes(data.replace(SNAPSHOT_MAGIC, b"MUZAIA-CACHE-V0\n", 1))
+        rejected_count = await partial.load_snapshot(str(tmp_path / "antigo.snap"))
+
+        # E um cache novo restaura em background enquanto recebe uma escrita.
+        warm = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=4, snapshot_path=str(path))
+        await warm.start_snapshots(interval_sec=3600)
+        await warm.set("k0", "escrita ao vivo")
+        await warm._restore_task
+        live = await warm.get("k0")
+        await warm.set("k100", {"n": 100})
+        await warm.stop_snapshots()
+
+        final = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=4)
+        final_count = await final.load_snapshot(str(path))
+        return (
+            capped_count, [key for shard in capped._shards for key in shard.entries],
+            partial_count, (await partial.get_stats())["snapshot"],
+            rejected_count, live, final_count,
+        )
+
+    (capped_count, capped_keys, partial_count, partial_stats,
+     rejected_count, live, final_count) = asyncio.run(scenario())
+
+    # Então (Then): só as 10 mais recentes, parte do truncado, nada do incompatível.
+    assert capped_count == 10
+    assert sorted(capped_keys) == sorted(f"k{i}" for i in range(90, 100))
+    assert 0 < partial_count < 100
+    assert partial_stats["truncated_snapshots"] == 1 and partial_stats["rejected_snapshots"] == 1
+    assert rejected_count == 0
+    assert live == "escrita ao vivo"
+    assert final_count == 101
+
+
+def test_snapshot_skips_unreadable_records_and_keeps_namespace_order(tmp_path):
+    """
+    Testa se um registo que não deserializa é saltado sem abortar o
+    resto da restauração e se a ordem de expulsão por quota de namespace
+    sobrevive ao snapshot.
+    """
+    path = tmp_path / "cache.snap"
+
+    async def scenario():
+        # Dado (Given): quota de 3 entradas em "sessao", com "s1" a menos usada.
+        cache = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=1)
+        cache.set_namespace_quota("sessao", max_entries=3)
+        for i in range(3):
+            await cache.set(f"s{i}", i, namespace="sessao")
+        await cache.get("s0", namespace="sessao")
+        for i in range(20):
+            await cache.set(f"k{i}", i)
+        await cache.save_snapshot(str(path))
+
+        # Quando (When): um registo a meio do ficheiro fica ilegível...
+        data = bytearray(path.read_bytes())
+        offset = len(SNAPSHOT_MAGIC)
+        for _ in range(10):  # Cabeçalho e 9 registos
+            (length,) = struct.unpack_from("<I", data, offset)
+            offset += 4 + length
+        (length,) = struct.unpack_from("<I", data, offset)
+        data[offset + 4: offset + 4 + length] = b"\xff" * length
+        path.write_bytes(bytes(data))
+
+        restored = AsyncInMemoryCache(ttl_sec=600, max_size=1000, shards=1)
+        restored.set_namespace_quota("sessao", max_entries=3)
+        loaded = await restored.load_snapshot(str(path))
+        # ... e uma nova entrada excede a quota após a restauração.
+        await restored.set("s3", 3, namespace="sessao")
+        sessao = [await restored.get(f"s{i}", namespace="sessao") for i in range(4)]
+        return loaded, (await restored.get_stats())["snapshot"], sessao
+
+    loaded, stats, sessao = asyncio.run(scenario())
+
+    # Então (Then): só o registo ilegível falta e sai a menos usada de "sessao".
+    assert loaded == 22
+    assert stats["unreadable_records"] == 1 and stats["truncated_snapshots"] == 0
+    assert sessao == [0, None, 2, 3]
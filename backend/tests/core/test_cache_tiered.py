@@ -0,0 +1,178 @@
+# backend/tests/core/test_cache_tiered.py
+import asyncio
+import time
+
+from app.core.cache import AsyncInMemoryCache, cache_result
+from app.core.cache_tiered import InMemoryPubSub, InMemoryRedis, TieredCache, TieredCacheConfig
+
+
+def _worker(redis: InMemoryRedis, **config) -> TieredCache:
+    l1 = AsyncInMemoryCache(ttl_sec=60, max_size=1000, shards=1)
+    return TieredCache(l1=l1, redis=redis, config=TieredCacheConfig(**config))
+
+
+async def _drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_workers_share_l2_and_invalidate_each_other_l1():
+    """
+    Testa se um worker lê do L2 o que outro escreveu, se passa a servir
+    do L1 e se uma escrita noutro worker invalida essa cópia local.
+    """
+    async def scenario():
+        # Dado (Given): dois workers com o mesmo Redis.
+        redis = InMemoryRedis()
+        a, b = _worker(redis), _worker(redis)
+        await a.start()
+        await b.start()
+
+        # Quando (When): A escreve, B lê duas vezes, A atualiza e B volta a ler.
+        await a.set("lei:23", {"artigo": 23, "versao": 1}, namespace="leis")
+        await _drain()
+        first = await b.get("lei:23", namespace="leis")
+        second = await b.get("lei:23", namespace="leis")
+        await a.set("lei:23", {"artigo": 23, "versao": 2}, namespace="leis")
+        await _drain()
+        updated = await b.get("lei:23", namespace="leis")
+
+        metrics = b.get_metrics()
+        await a.stop()
+        await b.stop()
+        return first, second, updated, metrics
+
+    first, second, updated, metrics = asyncio.run(scenario())
+
+    # Então (Then): B vê a versão nova e as métricas separam os níveis.
+    assert first == second == {"artigo": 23, "versao": 1}
+    assert updated == {"artigo": 23, "versao": 2}
+    assert metrics["l1_hits"] == 1 and metrics["l2_hits"] == 2
+    assert metrics["invalidations_received"] == 2  # Uma por escrita de A
+    assert metrics["l2_latency"]["samples"] == 2
+
+
+def test_read_through_negative_cache_and_l2_failures():
+    """
+    Testa se chaves inexistentes ficam em cache negativo entre workers e
+    se um L2 lento degrada para miss sem falhar o pedido.
+    """
+    async def scenario():
+        # Dado (Given): dois workers e um loader que não encontra a chave.
+        redis = InMemoryRedis()
+        a, b = _worker(redis), _worker(redis)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        # Quando (When): os dois pedem a mesma chave inexistente.
+        missing = [
+            await a.get_or_load("inexistente", loader, namespace="glossario"),
+            await b.get_or_load("inexistente", loader, namespace="glossario", default="-"),
+        ]
+
+        # E um terceiro worker usa um Redis mais lento que o timeout.
+        slow = _worker(InMemoryRedis(latency_sec=0.05), l2_timeout_sec=0.01)
+        loaded = await slow.get_or_load("termo", lambda: asyncio.sleep(0, result="definição"))
+        cached = await slow.get("termo")
+        return missing, calls, b.get_metrics(), loaded, cached, slow.get_metrics()
+
+    missing, calls, b_metrics, loaded, cached, slow_metrics = asyncio.run(scenario())
+
+    # Então (Then): o loader corre uma vez e o L2 lento só conta erros.
+    assert missing == [None, "-"] and len(calls) == 1
+    assert b_metrics["negative_hits"] == 1 and b_metrics["loads"] == 0
+    assert loaded == cached == "definição"
+    assert slow_metrics["l2_errors"] == 3  # get, set e publish
+    assert slow_metrics["l1_hits"] == 1
+
+
+class _FlakyPubSub(InMemoryPubSub):
+    """Subscrição que cai depois de entregar a primeira mensagem."""
+
+    async def listen(self):
+        async for message in super().listen():
+            yield message
+            if message["type"] == "message":
+                self._server.flaky = False  # A reconexão já recebe uma subscrição estável
+                raise ConnectionError("ligação ao Redis perdida")
+
+
+class _FlakyRedis(InMemoryRedis):
+    flaky = False
+
+    def pubsub(self) -> InMemoryPubSub:
+        return _FlakyPubSub(self) if self.flaky else InMemoryPubSub(self)
+
+
+def test_l1_fill_uses_remaining_l2_ttl_and_listener_reconnects():
+    """
+    Testa se o L1 preenchido a partir do L2 não vive mais que a cópia no
+    L2 e se a subscrição de invalidações volta a ligar depois de cair.
+    """
+    async def scenario():
+        # Dado (Given): um Redis cuja subscrição cai uma vez.
+        redis = _FlakyRedis()
+        a = _worker(redis)
+        b = _worker(redis, reconnect_delay_sec=0.01)
+        await a.start()
+        redis.flaky = True
+        await b.start()
+
+        # Quando (When): A grava com TTL de 2s e B lê do L2...
+        await a.set("prazo", "curto", ttl=2)
+        await a.set_many({"p1": 1, "p2": 2}, ttl=2)
+        await b.get("prazo")
+        await b.get_many(["p1", "p2"])
+        l1_ttls = [
+            b.l1._shard_for(key).entries[key].expiration_time - time.monotonic()
+            for key in ("prazo", "p1", "p2")
+        ]
+
+        # ... e, depois de a subscrição de B cair e voltar, A atualiza a chave.
+        await asyncio.sleep(0.05)
+        await a.set("prazo", "atualizado", ttl=2)
+        await _drain()
+        updated = await b.get("prazo")
+        metrics = b.get_metrics()
+        await a.stop()
+        await b.stop()
+        return l1_ttls, updated, metrics
+
+    l1_ttls, updated, metrics = asyncio.run(scenario())
+
+    # Então (Then): o L1 expira com o L2 e a invalidação chega após a reconexão.
+    assert all(0 < ttl <= 2 for ttl in l1_ttls)
+    assert updated == "atualizado"
+    assert metrics["listener_alive"] and metrics["listener_reconnects"] == 1
+
+
+def test_cache_result_shares_results_between_workers():
+    """
+    Testa se o cache_result sobre um TieredCache reaproveita noutro
+    worker o resultado calculado no primeiro.
+    """
+    async def scenario():
+        # Dado (Given): dois workers com o mesmo Redis e uma função decorada em cada.
+        redis = InMemoryRedis()
+        a, b = _worker(redis), _worker(redis)
+        calls = []
+
+        async def consultar(artigo: int) -> str:
+            calls.append(artigo)
+            return f"artigo {artigo}"
+
+        em_a = cache_result(ttl=60, cache=a)(consultar)
+        em_b = cache_result(ttl=60, cache=b)(consultar)
+
+        # Quando (When): A calcula e B pede o mesmo resultado.
+        return await em_a(99), await em_b(99), calls, b.get_metrics()
+
+    first, second, calls, metrics = asyncio.run(scenario())
+
+    # Então (Then): a função correu uma só vez e B leu do L2.
+    assert first == second == "artigo 99"
+    assert calls == [99]
+    assert metrics["l2_hits"] == 1
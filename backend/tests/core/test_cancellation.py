@@ -0,0 +1,114 @@
+# backend/tests/core/test_cancellation.py
+import asyncio
+
+import pytest
+
+from app.core.cancellation import CancellationMetrics, ClientDisconnectedError, run_until_disconnected
+from app.models.base_llm import BaseLLM
+from app.schemas import LLMResponse
+
+
+class _FakeRequest:
+    """Requisição cujo cliente se desconecta após N verificações."""
+
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.checks >= self.disconnect_after
+
+
+def test_disconnect_cancels_running_handler():
+    """
+    Testa se a desconexão do cliente cancela o trabalho em curso em vez
+    de o deixar terminar.
+    """
+    state = {"cancelled": False, "finished": False}
+
+    async def slow_llm_call():
+        try:
+            await asyncio.sleep(10)
+            state["finished"] = True
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def scenario():
+        # Dado (Given): um cliente que se desconecta na segunda verificação.
+        request = _FakeRequest(disconnect_after=2)
+
+        # Quando (When): o handler espera por uma chamada lenta.
+        with pytest.raises(ClientDisconnectedError):
+            await run_until_disconnected(request, slow_llm_call(), poll_interval=0.01)
+
+        # E um handler rápido termina normalmente.
+        return await run_until_disconnected(_FakeRequest(1), asyncio.sleep(0, "ok"), poll_interval=1)
+
+    # Então (Then): a chamada foi cancelada e nunca completou.
+    assert asyncio.run(scenario()) == "ok"
+    assert state == {"cancelled": True, "finished": False}
+
+    metrics = CancellationMetrics()
+    metrics.record("sse", 0.5)
+    assert metrics.get_metrics()["by_source"] == {"sse": 1}
+
+
+class _SlowStreamLLM(BaseLLM):
+    """Cliente cujo stream gera tokens lentamente."""
+
+    closed = 0
+
+    @property
+    def provider(self) -> str:
+        return "teste-cancelamento"
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        await asyncio.sleep(10)
+
+    async def _stream_generate_impl(self, prompt, context="", system_prompt=None, params=None):
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield {"content": f"t{i} ", "is_final": False, "model": self.model_name, "metadata": {}}
+        finally:
+            type(self).closed += 1
+
+    async def _health_check_impl(self) -> bool:
+        return True
+
+    async def _get_model_info_impl(self):
+        return {}
+
+
+def test_llm_calls_stop_when_consumer_gives_up():
+    """
+    Testa se o abandono do stream fecha o gerador do provedor e se o
+    cancelamento de generate chega à chamada upstream.
+    """
+    async def scenario():
+        # Dado (Given): um cliente com stream e geração lentos.
+        llm = _SlowStreamLLM("modelo-lento", max_retries=1, base_delay=0.0)
+        llm._session = object()
+        llm._ensure_session = lambda: asyncio.sleep(0)
+
+        # Quando (When): o consumidor lê dois tokens e desiste.
+        stream = llm.stream_generate("pergunta longa")
+        received = [await stream.__anext__() for _ in range(2)]
+        await stream.aclose()
+
+        # E uma geração é cancelada a meio.
+        task = asyncio.create_task(llm.generate("outra pergunta"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return llm, received
+
+    llm, received = asyncio.run(scenario())
+
+    # Então (Then): o upstream foi fechado e ambos os cancelamentos contados.
+    assert len(received) == 2
+    assert _SlowStreamLLM.closed == 1
+    assert llm._metrics["requests_cancelled"] == 2
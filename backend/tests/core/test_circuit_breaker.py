@@ -0,0 +1,151 @@
+# backend/tests/core/test_circuit_breaker.py
+import asyncio
+from unittest.mock import patch
+
+from app.core.exceptions import (
+    LLMCircuitOpenError, LLMConnectionError, LLMRequestError, llm_http_error
+)
+from app.core.resilience import CircuitBreaker, CircuitBreakerConfig, CircuitState
+from app.models.base_llm import BaseLLM
+from app.schemas import LLMResponse
+
+
+class _Clock:
+    """Relógio monotónico controlado pelo teste."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_failure_rate_and_recovers():
+    """
+    Testa se o circuito abre pela taxa de falhas na janela (e não pelo
+    número absoluto) e fecha após sucessos em half-open.
+    """
+    clock = _Clock()
+    config = CircuitBreakerConfig(
+        failure_threshold=3, failure_rate_threshold=0.5, reset_timeout_sec=10,
+        success_threshold=2, monitor_window_sec=60
+    )
+    with patch("app.core.resilience.time.monotonic", clock):
+        breaker = CircuitBreaker("llm:teste:modelo", config)
+
+        # Dado (Given): muito tráfego com poucas falhas (3 em 23).
+        for _ in range(20):
+            assert breaker.allow_request()
+            breaker.on_success()
+        for _ in range(3):
+            breaker.on_failure()
+
+        # Então (Then): taxa abaixo do limiar mantém o circuito fechado.
+        assert breaker.state is CircuitState.CLOSED
+
+        # Quando (When): a janela expira e as falhas passam a dominar.
+        clock.now += 120
+        for _ in range(3):
+            breaker.on_failure()
+
+        # Então (Then): o circuito abre e recusa chamadas até ao reset.
+        assert breaker.is_open
+        assert not breaker.allow_request()
+
+        clock.now += 11
+        assert not breaker.is_open
+        assert breaker.allow_request()
+        assert breaker.state is CircuitState.HALF_OPEN
+        breaker.on_success()
+        assert breaker.allow_request()
+        breaker.on_success()
+        assert breaker.state is CircuitState.CLOSED
+        assert breaker.get_metrics()["blocked_requests"] == 1
+
+
+class _FailingLLM(BaseLLM):
+    """Cliente cujo provedor está sempre em falha."""
+
+    calls = 0
+
+    @property
+    def provider(self) -> str:
+        return "teste-circuito"
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        type(self).calls += 1
+        raise LLMConnectionError("Erro HTTP 503", model=self.model_name)
+
+    async def _stream_generate_impl(self, prompt, context="", system_prompt=None, params=None):
+        yield {}
+
+    async def _health_check_impl(self) -> bool:
+        return False
+
+    async def _get_model_info_impl(self):
+        return {}
+
+
+def test_generate_fails_fast_when_circuit_is_open():
+    """
+    Testa se, com o circuito aberto, as chamadas falham de imediato
+    sem contactar o provedor.
+    """
+    async def scenario():
+        # Dado (Given): um cliente sem retentativas e um provedor em falha.
+        llm = _FailingLLM("modelo-x", max_retries=1, base_delay=0.0)
+        llm._session = object()  # Sessão não é usada por _generate_impl
+        llm._ensure_session = lambda: asyncio.sleep(0)
+        errors = []
+
+        # Quando (When): várias perguntas distintas são feitas.
+        for i in range(8):
+            try:
+                await llm.generate(f"pergunta {i}")
+            except (LLMConnectionError, LLMCircuitOpenError) as e:
+                errors.append(type(e))
+        return errors
+
+    errors = asyncio.run(scenario())
+
+    # Então (Then): após 5 falhas o circuito abre e o provedor deixa de ser chamado.
+    assert errors == [LLMConnectionError] * 5 + [LLMCircuitOpenError] * 3
+    assert _FailingLLM.calls == 5
+
+
+class _RejectingLLM(_FailingLLM):
+    """Cliente cujo provedor recusa o pedido (4xx)."""
+
+    calls = 0
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        type(self).calls += 1
+        raise llm_http_error(400, "Erro HTTP 400: pedido inválido", model=self.model_name)
+
+
+def test_client_errors_are_not_retried_nor_counted_by_breaker():
+    """
+    Testa se respostas 4xx não são repetidas nem abrem o circuito, já
+    que indicam um problema no pedido e não na saúde do provedor.
+    """
+    async def scenario():
+        # Dado (Given): um cliente com retentativas e um provedor que recusa o pedido.
+        llm = _RejectingLLM("modelo-4xx", max_retries=3, base_delay=0.0)
+        llm._session = object()
+        llm._ensure_session = lambda: asyncio.sleep(0)
+        errors = []
+
+        # Quando (When): várias perguntas são recusadas.
+        for i in range(8):
+            try:
+                await llm.generate(f"pergunta {i}")
+            except (LLMRequestError, LLMCircuitOpenError) as e:
+                errors.append(e)
+        return errors
+
+    errors = asyncio.run(scenario())
+
+    # Então (Then): uma chamada por pergunta e o circuito continua fechado.
+    assert [type(e) for e in errors] == [LLMRequestError] * 8
+    assert errors[0].status_code == 400
+    assert _RejectingLLM.calls == 8
@@ -0,0 +1,126 @@
+# backend/tests/core/test_coalescing.py
+import asyncio
+
+from app.core.coalescing import RequestCoalescer, build_request_key
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    """
+    Testa se chamadas idênticas em voo resultam numa única chamada ao
+    provedor e se pedidos diferentes não são agrupados.
+    """
+    async def scenario():
+        # Dado (Given): um provedor lento que conta as chamadas recebidas.
+        coalescer = RequestCoalescer(enabled=True)
+        calls = []
+
+        async def upstream(prompt):
+            calls.append(prompt)
+            await asyncio.sleep(0.01)
+            return f"resposta:{prompt}"
+
+        key_a = build_request_key("openai", "gpt", "Quais são os direitos do trabalhador?")
+        key_b = build_request_key("openai", "gpt", "O que diz o artigo 23?")
+
+        # Quando (When): 20 chamadas idênticas e uma diferente chegam em simultâneo.
+        results = await asyncio.gather(
+            *(coalescer.run(key_a, lambda: upstream("a")) for _ in range(20)),
+            coalescer.run(key_b, lambda: upstream("b")),
+        )
+        return results, calls, coalescer.get_metrics()
+
+    results, calls, metrics = asyncio.run(scenario())
+
+    # Então (Then): uma chamada por pedido distinto e o resultado partilhado.
+    assert sorted(calls) == ["a", "b"]
+    assert results[:20] == ["resposta:a"] * 20 and results[20] == "resposta:b"
+    assert metrics["leader_calls"] == 2 and metrics["coalesced_calls"] == 19
+    assert metrics["in_flight"] == 0
+
+
+def test_flight_is_cancelled_when_last_waiter_leaves():
+    """
+    Testa se o voo só é cancelado quando o último chamador desiste e se
+    o mesmo vale para streams partilhados.
+    """
+    async def scenario():
+        # Dado (Given): um provedor que nunca responde e dois chamadores.
+        coalescer = RequestCoalescer(enabled=True)
+        upstream_cancelled = asyncio.Event()
+
+        async def upstream():
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+
+        first = asyncio.ensure_future(coalescer.run("chave", upstream))
+        second = asyncio.ensure_future(coalescer.run("chave", upstream))
+        await asyncio.sleep(0)
+
+        # Quando (When): o primeiro desiste, e depois o segundo.
+        first.cancel()
+        await asyncio.sleep(0)
+        cancelled_after_first = upstream_cancelled.is_set()
+        second.cancel()
+        await asyncio.sleep(0.01)
+
+        # E um stream partilhado perde o último subscritor.
+        stream_closed = asyncio.Event()
+
+        async def source():
+            try:
+                yield {"content": "Lei"}
+                await asyncio.sleep(3600)
+            finally:
+                stream_closed.set()
+
+        subscriber = coalescer.stream("stream", source)
+        first_chunk = await subscriber.__anext__()
+        await subscriber.aclose()
+        await asyncio.sleep(0.01)
+
+        return (
+            cancelled_after_first, upstream_cancelled.is_set(),
+            first_chunk, stream_closed.is_set(), coalescer.get_metrics()
+        )
+
+    cancelled_after_first, cancelled, first_chunk, stream_closed, metrics = asyncio.run(scenario())
+
+    # Então (Then): o voo sobrevive ao primeiro e é cancelado com o último.
+    assert not cancelled_after_first
+    assert cancelled and stream_closed
+    assert first_chunk == {"content": "Lei"}
+    assert metrics["cancelled_flights"] == 2
+    assert metrics["in_flight"] == 0 and metrics["streams_in_flight"] == 0
+
+
+def test_failed_flight_counts_one_shared_failure():
+    """
+    Testa se um voo que falha com vários chamadores conta uma única
+    falha partilhada, e não uma por chamador.
+    """
+    async def scenario():
+        # Dado (Given): um provedor que falha depois de uma pequena espera.
+        coalescer = RequestCoalescer(enabled=True)
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("provedor indisponível")
+
+        key = build_request_key("openai", "gpt", "Quais são os direitos do trabalhador?")
+
+        # Quando (When): 5 chamadas idênticas partilham o voo e um pedido isolado falha.
+        results = await asyncio.gather(
+            *(coalescer.run(key, upstream) for _ in range(5)), return_exceptions=True
+        )
+        alone = await asyncio.gather(coalescer.run("outra", upstream), return_exceptions=True)
+        await asyncio.sleep(0)
+        return results + alone, coalescer.get_metrics()
+
+    results, metrics = asyncio.run(scenario())
+
+    # Então (Then): todos recebem o erro, mas só o voo partilhado conta.
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert metrics["shared_failures"] == 1
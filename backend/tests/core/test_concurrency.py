@@ -0,0 +1,72 @@
+# backend/tests/core/test_concurrency.py
+import asyncio
+
+import pytest
+
+from app.core.concurrency import AdaptiveConcurrencyLimiter, AdaptiveLimitConfig
+from app.core.exceptions import LLMConcurrencyLimitError, LLMRateLimitError
+
+
+def test_rate_limit_halves_limit_once_per_burst():
+    """
+    Testa se um 429 reduz o limite para metade e se uma rajada de 429
+    dentro do cooldown conta como uma única redução.
+    """
+    async def scenario():
+        # Dado (Given): um limitador com limite inicial de 8.
+        limiter = AdaptiveConcurrencyLimiter(
+            "teste:modelo",
+            AdaptiveLimitConfig(initial_limit=8, min_limit=1, max_limit=16, decrease_cooldown_sec=60.0)
+        )
+
+        # Quando (When): três chamadas recebem 429 em sequência.
+        for _ in range(3):
+            with pytest.raises(LLMRateLimitError):
+                async with limiter.slot():
+                    raise LLMRateLimitError("429")
+        return limiter.get_metrics()
+
+    metrics = asyncio.run(scenario())
+
+    # Então (Then): o limite cai para 4 uma só vez e as vagas são devolvidas.
+    assert metrics["limit"] == 4
+    assert metrics["rate_limit_decreases"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_queue_wait_timeout_gives_slot_back():
+    """
+    Testa se quem desiste da fila (por timeout ou cancelamento) não fica
+    com uma vaga e se a vaga libertada vai para o próximo da fila.
+    """
+    async def scenario():
+        # Dado (Given): um limitador com uma só vaga já ocupada.
+        limiter = AdaptiveConcurrencyLimiter(
+            "teste:modelo",
+            AdaptiveLimitConfig(initial_limit=1, min_limit=1, max_limit=1, max_queue_wait_sec=0.05)
+        )
+        await limiter.acquire()
+
+        # Quando (When): um chamador esgota a espera na fila...
+        with pytest.raises(LLMConcurrencyLimitError):
+            await limiter.acquire()
+        after_timeout = (limiter.in_flight, limiter.queue_depth)
+
+        # ... outro é cancelado enquanto espera e um terceiro fica na fila.
+        cancelled = asyncio.ensure_future(limiter.acquire())
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        # E a vaga original é libertada.
+        limiter.release()
+        await asyncio.wait_for(waiting, timeout=0.01)
+        return after_timeout, limiter.get_metrics()
+
+    after_timeout, metrics = asyncio.run(scenario())
+
+    # Então (Then): a vaga passou ao chamador que ainda esperava.
+    assert after_timeout == (1, 0)
+    assert metrics["timeouts"] == 1
+    assert metrics["in_flight"] == 1 and metrics["queue_depth"] == 0
@@ -0,0 +1,122 @@
+# backend/tests/core/test_hedging.py
+import asyncio
+
+from app.core.hedging import HedgedLLM, HedgingManager, HedgingPolicy
+from app.core.latency import LatencyRegistry
+from app.core.protocols import AbstractLLM
+from app.schemas import LLMResponse
+
+
+class _FakeLLM(AbstractLLM):
+    """Cliente com atraso fixo e, opcionalmente, um chunk de erro imediato."""
+
+    def __init__(self, name: str, delay: float, error_chunk: bool = False):
+        self._name = name
+        self._delay = delay
+        self._error_chunk = error_chunk
+        self.closed_streams = 0
+
+    @property
+    def model_name(self) -> str:
+        return self._name
+
+    @property
+    def provider(self) -> str:
+        return "teste-hedge"
+
+    async def generate(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        await asyncio.sleep(self._delay)
+        return LLMResponse(content=f"{self._name}:{prompt}", provider=self.provider, model=self._name)
+
+    async def stream_generate(self, prompt, context="", system_prompt=None, params=None):
+        try:
+            if self._error_chunk:
+                yield {"content": "", "is_final": True, "error": "Circuito aberto"}
+                return
+            await asyncio.sleep(self._delay)
+            yield {"content": f"{self._name} ", "is_final": False}
+            yield {"content": "", "is_final": True}
+        finally:
+            self.closed_streams += 1
+
+    async def health_check(self) -> bool:
+        return True
+
+    async def get_model_info(self):
+        return {}
+
+    async def close(self) -> None:
+        pass
+
+
+def _hedged(primary: AbstractLLM, secondary: AbstractLLM, registry: LatencyRegistry) -> HedgedLLM:
+    policy = HedgingPolicy(delay_sec=0.02, budget_ratio=1.0, budget_burst=5.0)
+    return HedgedLLM(primary, secondary, policy=policy, manager=HedgingManager(registry))
+
+
+def test_generate_hedge_wins_and_records_latency_saved():
+    """
+    Testa se um primário lento é ultrapassado pelo hedge e se a latência
+    poupada é estimada a partir do histórico do primário.
+    """
+    async def scenario():
+        # Dado (Given): um primário que costuma demorar ~1s e um secundário rápido.
+        registry = LatencyRegistry()
+        primary = _FakeLLM("lento", delay=1.0)
+        secondary = _FakeLLM("rapido", delay=0.0)
+        for _ in range(5):
+            registry.record(primary.provider, primary.model_name, 1.0)
+        llm = _hedged(primary, secondary, registry)
+
+        # Quando (When): uma geração é pedida.
+        response = await llm.generate("artigo 23")
+        return response, llm._controller.get_metrics()
+
+    response, metrics = asyncio.run(scenario())
+
+    # Então (Then): o secundário vence e a poupança fica registada.
+    assert response.content == "rapido:artigo 23"
+    assert response.metadata["hedge"]["winner"] == "secondary"
+    assert metrics["hedges_issued"] == 1 and metrics["hedge_wins"] == 1
+    assert metrics["latency_saved_sec"] > 0.9
+
+
+def test_stream_fails_over_on_error_chunk_and_records_hedge_wins():
+    """
+    Testa se um chunk de erro rápido do primário recorre ao secundário e
+    se uma vitória do hedge num stream atualiza a latência poupada.
+    """
+    async def collect(llm):
+        return "".join([c.get("content", "") async for c in llm.stream_generate("férias")])
+
+    async def scenario():
+        registry = LatencyRegistry()
+
+        # Dado (Given): um primário que devolve logo um chunk de erro...
+        failing = _FakeLLM("falha", delay=0.0, error_chunk=True)
+        backup = _FakeLLM("reserva", delay=0.0)
+        failover_llm = _hedged(failing, backup, registry)
+        # ... e um par em que o primeiro chunk do primário costuma levar ~1s.
+        slow = _FakeLLM("lento", delay=1.0)
+        fast = _FakeLLM("rapido", delay=0.0)
+        hedged_llm = _hedged(slow, fast, registry)
+        for _ in range(5):
+            hedged_llm._controller.first_chunk_window.record(1.0)
+
+        # Quando (When): os dois streams são consumidos.
+        failover_text = await collect(failover_llm)
+        hedged_text = await collect(hedged_llm)
+        return (
+            failover_text, failover_llm._controller.get_metrics(), failing.closed_streams,
+            hedged_text, hedged_llm._controller.get_metrics(), slow.closed_streams
+        )
+
+    (failover_text, failover_metrics, failing_closed,
+     hedged_text, hedged_metrics, slow_closed) = asyncio.run(scenario())
+
+    # Então (Then): o erro não chega ao cliente e o hedge conta a poupança.
+    assert failover_text == "reserva "
+    assert failover_metrics["failovers"] == 1 and failing_closed == 1
+    assert hedged_text == "rapido "
+    assert hedged_metrics["hedge_wins"] == 1 and slow_closed == 1
+    assert hedged_metrics["latency_saved_sec"] > 0.9
@@ -0,0 +1,179 @@
+# backend/tests/core/test_prompt_cache.py
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.core.prompt_cache import ContextCacheRegistry, prompt_cache_metrics
+from app.models.claude_llm import ClaudeLLM
+from app.models.gemini_llm import GeminiLLM
+
+
+def test_expired_handles_and_failures_release_their_locks():
+    """
+    Testa se handles expirados e falhas com TTL vencido deixam de ocupar
+    memória (incluindo os locks por prefixo), mesmo para prefixos que
+    nunca mais são pedidos.
+    """
+    async def scenario():
+        # Dado (Given): um registro com TTL curto e um provedor que recusa um prefixo.
+        registry = ContextCacheRegistry(ttl_sec=0.05, refresh_margin_sec=0.01, failure_ttl_sec=0.05)
+
+        async def create(ttl):
+            return "cachedContents/lei-trabalho"
+
+        async def refuse(ttl):
+            return None
+
+        await registry.get_or_create("lei-trabalho", create)
+        await registry.get_or_create("prefixo-recusado", refuse)
+        before = registry.get_metrics()
+
+        # Quando (When): os TTL passam e outro prefixo é criado.
+        time.sleep(0.06)
+        await registry.get_or_create("constituicao", create)
+        return before, registry.get_metrics()
+
+    before, after = asyncio.run(scenario())
+
+    # Então (Then): só o prefixo novo continua registado.
+    assert before["tracked_locks"] == 2 and before["tracked_failures"] == 1
+    assert after["active_handles"] == 1
+    assert after["tracked_failures"] == 0
+    assert after["tracked_locks"] == 1
+
+
+class _FakeResponse:
+    """Resposta HTTP mínima (interface usada de aiohttp.ClientResponse)."""
+
+    def __init__(self, status: int, body: dict):
+        self.status = status
+        self.headers = {}
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+    async def text(self):
+        return json.dumps(self._body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeSession:
+    """Sessão que responde por ordem e regista cada POST (endpoint, corpo)."""
+
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.requests = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        endpoint = url.split("?")[0].rsplit("/", 1)[-1]
+        self.requests.append((endpoint, json))
+        return _FakeResponse(*self._responses.pop(0))
+
+
+def _client(llm_class, model_name, responses, **kwargs):
+    llm = llm_class(model_name, api_key="teste", base_delay=0.0, **kwargs)
+    llm._session = _FakeSession(responses)
+    llm._ensure_session = lambda: asyncio.sleep(0)
+    return llm
+
+
+def test_claude_marks_stable_prefixes_and_accounts_cache_usage():
+    """
+    Testa se o Claude marca o prompt do sistema e o contexto com
+    cache_control e se as leituras/escritas de cache do usage entram
+    nas métricas e no custo.
+    """
+    async def scenario():
+        # Dado (Given): um Claude que responde com tokens escritos e lidos do cache.
+        usage = {
+            "input_tokens": 100, "cache_creation_input_tokens": 1000,
+            "cache_read_input_tokens": 2000, "output_tokens": 50,
+        }
+        llm = _client(ClaudeLLM, "claude-3-5-sonnet-20241022", [
+            (200, {"id": "msg_1", "content": [{"text": "Tem direito a férias."}], "usage": usage}),
+        ])
+        before = prompt_cache_metrics.get_metrics().get("anthropic", {})
+
+        # Quando (When): uma pergunta é feita com contexto jurídico.
+        response = await llm._generate_impl(
+            "Tenho direito a férias?", context="Lei do Trabalho, artigo 99", system_prompt="Jurista"
+        )
+        return llm._session.requests, response, before, prompt_cache_metrics.get_metrics()["anthropic"]
+
+    requests, response, before, after = asyncio.run(scenario())
+
+    # Então (Then): os prefixos estáveis têm cache_control e a pergunta não.
+    (_, body), = requests
+    assert body["system"][0]["cache_control"] == {"type": "ephemeral"}
+    context_block, question_block = body["messages"][0]["content"]
+    assert context_block["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in question_block
+    # Input a 3.0, saída a 15.0, leitura a 0.30 e escrita a 3.75 por milhão.
+    assert response.cost == pytest.approx((100 * 3.0 + 50 * 15.0 + 2000 * 0.30 + 1000 * 3.75) / 1e6)
+    assert response.tokens_used == 3150
+    assert after["cache_read_tokens"] - before.get("cache_read_tokens", 0) == 2000
+    assert after["cache_write_tokens"] - before.get("cache_write_tokens", 0) == 1000
+    assert after["cache_hit_requests"] - before.get("cache_hit_requests", 0) == 1
+
+
+def test_gemini_reuses_cached_context_and_recreates_it_when_rejected():
+    """
+    Testa se o Gemini envia contextos longos por cachedContents, reutiliza
+    o handle entre turnos e, quando o provedor já não o reconhece, o
+    esquece e recria na nova tentativa; contextos curtos seguem inline.
+    """
+    answer = {
+        "candidates": [{"content": {"parts": [{"text": "Sim."}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": 40_000, "cachedContentTokenCount": 39_000, "candidatesTokenCount": 10,
+        },
+    }
+
+    async def scenario():
+        # Dado (Given): um contexto acima do mínimo da API e um registro vazio.
+        llm = _client(GeminiLLM, "gemini-1.5-pro-cache-teste", [
+            (200, {"name": "cachedContents/c1"}), (200, answer),  # 1.º turno: cria e usa
+            (200, answer),                                          # 2.º turno: reutiliza
+            (404, {"error": {"message": "CachedContent not found"}}),  # 3.º turno: expirou
+            (200, {"name": "cachedContents/c2"}), (200, answer),    # nova tentativa
+            (200, answer),                                          # contexto curto
+        ], max_retries=2)
+        llm._context_cache = ContextCacheRegistry(ttl_sec=3600)
+        context = "Lei do Trabalho, artigo 99. " * 5_000
+        before = prompt_cache_metrics.get_metrics().get("google", {})
+
+        # Quando (When): três turnos usam o contexto longo e um usa um curto.
+        responses = [
+            await llm.generate(f"Pergunta {i}", context=context, system_prompt="Jurista") for i in range(3)
+        ]
+        responses.append(await llm.generate("Pergunta curta", context="Artigo 99"))
+        after = prompt_cache_metrics.get_metrics()["google"]
+        return llm._session.requests, responses, llm._context_cache.get_metrics(), before, after
+
+    requests, responses, registry, before, after = asyncio.run(scenario())
+
+    # Então (Then): dois contextos criados, o rejeitado esquecido e o curto inline.
+    generate = "gemini-1.5-pro-cache-teste:generateContent"
+    assert [endpoint for endpoint, _ in requests] == [
+        "cachedContents", generate, generate, generate, "cachedContents", generate, generate
+    ]
+    assert [body.get("cachedContent") for _, body in requests[1:4]] == ["cachedContents/c1"] * 3
+    assert requests[5][1]["cachedContent"] == "cachedContents/c2"
+    assert requests[1][1]["contents"][0]["parts"][0]["text"] == "Pergunta: Pergunta 0"
+    assert "cachedContent" not in requests[6][1]
+    assert "Artigo 99" in requests[6][1]["contents"][0]["parts"][0]["text"]
+    assert [r.metadata["cached_content"] for r in responses] == [
+        "cachedContents/c1", "cachedContents/c1", "cachedContents/c2", None
+    ]
+    assert registry["handles_created"] == 2 and registry["active_handles"] == 1
+    # Gemini só paga à parte a parte do prompt fora do cache.
+    assert responses[0].cost == pytest.approx((1_000 * 1.25 + 10 * 5.0 + 39_000 * 0.3125) / 1e6)
+    assert after["cache_read_tokens"] - before.get("cache_read_tokens", 0) == 4 * 39_000
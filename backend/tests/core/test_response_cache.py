@@ -0,0 +1,118 @@
+# backend/tests/core/test_response_cache.py
+import asyncio
+
+from app.core.cache import AsyncInMemoryCache
+from app.core.response_cache import LLMResponseCache, cache_document_scope
+from app.models.base_llm import BaseLLM
+from app.schemas import LLMResponse
+
+_VOCABULARY = ["férias", "dias", "trabalhador", "direito", "quantos", "tem", "a", "de"]
+
+
+async def _embed(text: str):
+    """Embedding de brincadeira: contagem de palavras de um vocabulário fixo."""
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(word)) for word in _VOCABULARY]
+
+
+def _response_cache(**kwargs) -> LLMResponseCache:
+    cache = AsyncInMemoryCache(ttl_sec=600, max_size=kwargs.pop("max_size", 100), shards=1)
+    return LLMResponseCache(cache=cache, enabled=True, ttl_sec=600, **kwargs)
+
+
+class _CountingLLM(BaseLLM):
+    """Cliente que conta as chamadas ao provedor."""
+
+    @property
+    def provider(self) -> str:
+        return "teste-cache"
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        self.calls += 1
+        return LLMResponse(content=f"gerado:{prompt}", provider=self.provider, model=self.model_name)
+
+    async def _stream_generate_impl(self, prompt, context="", system_prompt=None, params=None):
+        self.calls += 1
+        for word in ("O", "trabalhador", "tem", "30", "dias."):
+            yield {"content": f"{word} ", "is_final": False, "model": self.model_name}
+        yield {"content": "", "is_final": True, "model": self.model_name, "metadata": {}}
+
+    async def _health_check_impl(self) -> bool:
+        return True
+
+    async def _get_model_info_impl(self):
+        return {}
+
+
+def test_stream_and_generate_share_exact_and_semantic_hits():
+    """
+    Testa se um stream concluído fica em cache, se a mesma pergunta é
+    reenviada sem chamar o provedor e se uma pergunta equivalente com a
+    mesma base legal é servida pela camada semântica.
+    """
+    async def scenario():
+        # Dado (Given): um cliente com cache semântico e a mesma base legal.
+        cache = _response_cache(semantic_enabled=True, similarity_threshold=0.9, embedder=_embed)
+        llm = _CountingLLM("modelo-cache", response_cache=cache, max_retries=1)
+        llm.calls = 0
+        llm._session = object()
+        llm._ensure_session = lambda: asyncio.sleep(0)
+        base_legal = "Lei do Trabalho, artigo 99"
+
+        async def ask_stream(question):
+            chunks = [c async for c in llm.stream_generate(question, context=base_legal)]
+            return "".join(c.get("content", "") for c in chunks)
+
+        # Quando (When): a mesma pergunta é feita duas vezes em stream...
+        first = await ask_stream("Quantos dias de férias tem o trabalhador?")
+        second = await ask_stream("Quantos dias de férias tem o trabalhador?")
+        # ... uma equivalente chega por generate e outra com outra base legal.
+        semantic = await llm.generate("Quantos dias de férias tem o trabalhador", context=base_legal)
+        other_scope = await llm.generate("Quantos dias de férias tem o trabalhador", context="Outra lei")
+        return first, second, semantic, other_scope, llm.calls, cache.get_metrics()
+
+    first, second, semantic, other_scope, calls, metrics = asyncio.run(scenario())
+
+    # Então (Then): só a primeira e a de outra base legal chegam ao provedor.
+    assert first == second == "O trabalhador tem 30 dias. "
+    assert semantic.content == first
+    assert semantic.metadata["cache_layer"] == "semantic"
+    assert other_scope.content.startswith("gerado:")
+    assert calls == 2
+    assert metrics["exact_hits"] == 1 and metrics["semantic_hits"] == 1
+
+
+def test_document_invalidation_and_index_pruning():
+    """
+    Testa se alterar um documento invalida só as respostas que o usaram
+    e se o índice de documentos não guarda respostas que já saíram do cache.
+    """
+    def response(text):
+        return LLMResponse(content=text, provider="teste", model="m")
+
+    async def scenario():
+        # Dado (Given): respostas sustentadas por documentos diferentes.
+        cache = _response_cache(max_size=10)
+        with cache_document_scope(["lei-trabalho"]):
+            await cache.store("k-ferias", "férias", "escopo", response("30 dias"))
+        with cache_document_scope(["lei-familia", "constituicao"]):
+            await cache.store("k-divorcio", "divórcio", "escopo", response("por mútuo acordo"))
+
+        # Quando (When): a Lei do Trabalho muda.
+        removed = await cache.invalidate_documents(["lei-trabalho"])
+        ferias = await cache.lookup("k-ferias", "férias", "escopo")
+        divorcio = await cache.lookup("k-divorcio", "divórcio", "escopo")
+
+        # E chegam muitas respostas num cache que só guarda 10.
+        with cache_document_scope(["codigo-civil"]):
+            for i in range(1100):
+                await cache.store(f"k{i}", f"pergunta {i}", "escopo", response(f"resposta {i}"))
+        return removed, ferias, divorcio, cache.get_metrics()
+
+    removed, ferias, divorcio, metrics = asyncio.run(scenario())
+
+    # Então (Then): só a resposta da lei alterada sai e o índice fica limitado.
+    assert removed == 1 and ferias is None
+    assert divorcio.content == "por mútuo acordo"
+    assert metrics["document_index_prunes"] == 1
+    assert metrics["tracked_responses"] < 200
@@ -0,0 +1,84 @@
+# backend/tests/core/test_retry.py
+import asyncio
+from unittest.mock import patch
+
+from app.core.exceptions import LLMConnectionError, LLMRateLimitError
+from app.core.resilience import (
+    RetryBudget, RetryBudgetConfig, RetryConfig, parse_retry_after, retry_with_backoff
+)
+
+
+def test_retry_honors_server_retry_after():
+    """
+    Testa se o atraso indicado pelo provedor substitui o backoff
+    exponencial e se valores acima do máximo não são aguardados.
+    """
+    # Dado (Given): uma função que falha uma vez com Retry-After de 2s.
+    calls = []
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise LLMRateLimitError("Rate limit excedido", retry_after=parse_retry_after({"retry-after": "2"}))
+        return "ok"
+
+    config = RetryConfig(max_attempts=3, base_delay=0.01, max_delay=5.0)
+
+    # Quando (When): a função é executada com retry.
+    with patch("app.core.resilience.asyncio.sleep", fake_sleep):
+        result = asyncio.run(retry_with_backoff(flaky, config=config, exceptions=(LLMRateLimitError,)))
+
+        async def too_long():
+            raise LLMRateLimitError("Rate limit excedido", retry_after=60.0)
+
+        # Então (Then): espera ~2s (com jitter) e desiste se o atraso excede max_delay.
+        assert result == "ok"
+        assert 2.0 <= slept[0] <= 2.2
+        try:
+            asyncio.run(retry_with_backoff(too_long, config=config, exceptions=(LLMRateLimitError,)))
+            assert False, "deveria ter desistido"
+        except LLMRateLimitError:
+            pass
+        assert len(slept) == 1
+
+
+def test_retry_budget_caps_retries_during_outage():
+    """
+    Testa se o orçamento partilhado limita as retentativas a uma
+    fração das requisições quando o provedor está em falha.
+    """
+    # Dado (Given): um orçamento de 10% sem mínimo por segundo.
+    budget = RetryBudget("llm:teste", RetryBudgetConfig(ratio=0.1, min_retries_per_sec=0.0, max_tokens=5.0))
+    attempts = []
+
+    async def always_fails():
+        attempts.append(1)
+        raise LLMConnectionError("Erro HTTP 503")
+
+    async def no_sleep(delay):
+        return None
+
+    async def run_all():
+        for _ in range(100):
+            try:
+                await retry_with_backoff(
+                    always_fails,
+                    config=RetryConfig(max_attempts=3, base_delay=0.0),
+                    exceptions=(LLMConnectionError,),
+                    budget=budget,
+                )
+            except LLMConnectionError:
+                pass
+
+    # Quando (When): 100 requisições falham seguidamente.
+    with patch("app.core.resilience.asyncio.sleep", no_sleep):
+        asyncio.run(run_all())
+
+    # Então (Then): as retentativas ficam perto de 10% em vez de 200%.
+    retries = len(attempts) - 100
+    assert retries <= 15  # Rajada inicial (5) + 10% de 100
+    assert budget.get_metrics()["retries_denied"] > 0
@@ -0,0 +1,66 @@
+# backend/tests/core/test_routing.py
+from app.core.concurrency import ConcurrencyManager
+from app.core.latency import LatencyRegistry
+from app.core.routing import ModelRouter, RoutingPolicy
+from app.schemas import ContextType
+
+ROUTES = {
+    ContextType.LEGAL: ["claude-3-5-sonnet-20241022", "gemini-1.5-pro-latest"],
+    ContextType.GENERAL: [
+        "claude-3-5-sonnet-20241022", "gemini-1.5-pro-latest", "gemini-1.5-flash", "modelo-desconhecido"
+    ],
+}
+
+
+def _resolve(model_name):
+    if model_name.startswith("claude"):
+        return "anthropic"
+    if model_name.startswith("gemini"):
+        return "google"
+    return None
+
+
+def _router(latency):
+    router = ModelRouter.compile(ROUTES, _resolve, RoutingPolicy(exploration_ratio=0))
+    router._latency = latency
+    router._concurrency = ConcurrencyManager(enabled=False)
+    return router
+
+
+def test_router_moves_traffic_away_from_slow_model():
+    """
+    Testa se o roteador deixa de escolher um modelo cuja latência
+    observada viola o SLO, mesmo sendo o mais barato.
+    """
+    # Dado (Given): Gemini (mais barato) com p90 acima do SLO e Claude rápido.
+    latency = LatencyRegistry()
+    for _ in range(20):
+        latency.record("google", "gemini-1.5-pro-latest", 40.0)
+        latency.record("anthropic", "claude-3-5-sonnet-20241022", 2.0)
+    router = _router(latency)
+
+    # Quando (When): é pedida uma rota para uma pergunta jurídica.
+    ranked = router.rank(ContextType.LEGAL, input_tokens=2000, output_tokens=1000)
+
+    # Então (Then): Claude é escolhido e Gemini fica como fallback.
+    assert [c.model_name for c in ranked] == ["claude-3-5-sonnet-20241022", "gemini-1.5-pro-latest"]
+
+
+def test_router_respects_context_constraints():
+    """
+    Testa se os modelos rápidos só são usados em contextos que os
+    permitem e se modelos sem provedor são removidos na compilação.
+    """
+    # Dado (Given): um roteador sem amostras de latência.
+    router = _router(LatencyRegistry())
+
+    # Quando (When): são pedidas rotas para contextos jurídico e geral.
+    legal = {c.model_name for c in router.rank(ContextType.LEGAL)}
+    general = {c.model_name for c in router.rank(ContextType.GENERAL, 1000, 1000)}
+
+    # Então (Then): o modelo rápido só aparece no geral e o desconhecido em nenhum.
+    assert "gemini-1.5-flash" not in legal
+    assert "gemini-1.5-flash" in general
+    assert "modelo-desconhecido" not in general
+    # Contextos sem rota própria usam a rota geral
+    assert router.candidates_for(ContextType.TECHNICAL) == router.candidates_for(ContextType.GENERAL)
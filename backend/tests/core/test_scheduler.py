@@ -0,0 +1,98 @@
+# backend/tests/core/test_scheduler.py
+import asyncio
+
+from app.core.request_context import RequestLane, llm_request_context
+from app.core.scheduler import LaneConfig, LLMScheduler, SchedulerConfig
+
+
+def _scheduler(interactive: LaneConfig, batch: LaneConfig, **kwargs) -> LLMScheduler:
+    config = SchedulerConfig(
+        lanes={RequestLane.INTERACTIVE: interactive, RequestLane.BATCH: batch},
+        **kwargs
+    )
+    return LLMScheduler(config=config, enabled=True)
+
+
+def test_weighted_share_between_lanes_and_edf_within_lane():
+    """
+    Testa se a capacidade é repartida pelo peso das faixas e se, dentro
+    de uma faixa, a requisição com prazo mais curto sai primeiro.
+    """
+    async def scenario():
+        # Dado (Given): uma vaga global, interativa com peso 3 e batch com peso 1.
+        scheduler = _scheduler(LaneConfig(weight=3.0), LaneConfig(weight=1.0), max_concurrency=1)
+        order = []
+
+        async def request(label):
+            ticket = await scheduler.acquire()
+            order.append(label)
+            scheduler.release(ticket)
+
+        holder = await scheduler.acquire()
+        tasks = []
+        # Quando (When): chegam prazos fora de ordem numa faixa...
+        for timeout in (30.0, 10.0, 20.0):
+            with llm_request_context(RequestLane.INTERACTIVE, timeout_sec=timeout):
+                tasks.append(asyncio.ensure_future(request(f"prazo-{int(timeout)}")))
+        # ... e muitas requisições nas duas faixas.
+        for i in range(9):
+            with llm_request_context(RequestLane.INTERACTIVE, timeout_sec=60.0):
+                tasks.append(asyncio.ensure_future(request("interativa")))
+            with llm_request_context(RequestLane.BATCH, timeout_sec=60.0):
+                tasks.append(asyncio.ensure_future(request("batch")))
+        await asyncio.sleep(0)
+
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+
+    # Então (Then): EDF na faixa e ~3 interativas por cada batch.
+    interactive = [label for label in order if label != "batch"]
+    assert interactive[:3] == ["prazo-10", "prazo-20", "prazo-30"]
+    assert order[:16].count("batch") == 4
+
+
+def test_starvation_promotion_and_token_budget_wakeup():
+    """
+    Testa se uma faixa de peso ínfimo é promovida após esperar demasiado
+    e se uma faixa sem tokens é despachada quando o orçamento recupera,
+    sem depender de outra libertação.
+    """
+    async def scenario():
+        # Dado (Given): batch com peso ínfimo e espera máxima de 50 ms.
+        scheduler = _scheduler(
+            LaneConfig(weight=1.0),
+            LaneConfig(weight=0.001, tokens_per_minute=6000),
+            max_concurrency=1,
+            starvation_sec=0.05
+        )
+        holder = await scheduler.acquire()
+        with llm_request_context(RequestLane.BATCH):
+            batch = asyncio.ensure_future(scheduler.acquire(estimated_tokens=6000))
+        with llm_request_context(RequestLane.INTERACTIVE):
+            interactive = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0.06)
+
+        # Quando (When): a vaga é libertada com a batch à espera há 60 ms.
+        scheduler.release(holder)
+        batch_ticket = await batch
+        promoted_first = not interactive.done()
+        scheduler.release(batch_ticket)
+        scheduler.release(await interactive)
+
+        # E uma batch chega com o orçamento de tokens esgotado (100 tokens/s).
+        with llm_request_context(RequestLane.BATCH):
+            budget_ticket = await asyncio.wait_for(scheduler.acquire(estimated_tokens=10), timeout=1.0)
+        scheduler.release(budget_ticket)
+        return promoted_first, budget_ticket.wait_time, scheduler.get_metrics()
+
+    promoted_first, budget_wait, metrics = asyncio.run(scenario())
+
+    # Então (Then): a batch passou à frente e o orçamento acordou o despacho.
+    assert promoted_first
+    assert metrics["lanes"]["batch"]["starvation_promotions"] == 1
+    assert metrics["lanes"]["batch"]["dispatched"] == 2
+    assert budget_wait > 0.0
+    assert metrics["in_flight"] == 0
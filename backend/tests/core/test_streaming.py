@@ -0,0 +1,83 @@
+# backend/tests/core/test_streaming.py
+import json
+
+from app.core.streaming import JSONArrayStreamParser, SSEParser, TextAccumulator
+
+
+def _split(data: bytes, size: int):
+    """Divide os bytes em blocos de tamanho fixo (simula a rede)."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_sse_parser_handles_arbitrary_chunk_boundaries():
+    """
+    Testa se o parser SSE reconstrói eventos cortados a meio de linhas
+    e de caracteres UTF-8 multibyte.
+    """
+    # Dado (Given): um stream SSE com CRLF, comentários e texto acentuado.
+    stream = (
+        b": keep-alive\r\n"
+        b"event: content_block_delta\r\n"
+        b'data: {"delta": {"text": "Constitui\xc3\xa7\xc3\xa3o"}}\r\n'
+        b"\r\n"
+        b"data: linha 1\n"
+        b"data: linha 2\n"
+        b"\n"
+    )
+
+    # Quando (When): o stream chega em blocos de 1 byte.
+    parser = SSEParser()
+    events = []
+    for chunk in _split(stream, 1):
+        events.extend(parser.feed(chunk))
+    events.extend(parser.flush())
+
+    # Então (Then): os dois eventos são emitidos completos.
+    assert len(events) == 2
+    assert events[0].event == "content_block_delta"
+    assert events[0].json()["delta"]["text"] == "Constituição"
+    assert events[1].event == "message"
+    assert events[1].data == "linha 1\nlinha 2"
+
+
+def test_json_array_parser_emits_pretty_printed_elements():
+    """
+    Testa se o parser de arrays JSON emite cada elemento de um array
+    pretty-printed (formato do streamGenerateContent do Gemini).
+    """
+    # Dado (Given): um array com strings contendo chaves, aspas escapadas e acentos.
+    elements = [
+        {"candidates": [{"content": {"parts": [{"text": "Artigo {1} \"citado\" ção"}]}}]},
+        {"candidates": [{"content": {"parts": [{"text": "fim ]}\\"}]}, "finishReason": "STOP"}]},
+    ]
+    stream = json.dumps(elements, indent=2, ensure_ascii=False).encode("utf-8")
+
+    # Quando (When): o array chega em blocos pequenos.
+    parser = JSONArrayStreamParser()
+    parsed = []
+    for chunk in _split(stream, 7):
+        parsed.extend(parser.feed(chunk))
+
+    # Então (Then): todos os elementos são recuperados sem perdas.
+    assert parsed == elements
+    assert parser.malformed == 0
+
+
+def test_json_array_parser_skips_malformed_elements():
+    """Testa se um elemento malformado é descartado sem parar o stream."""
+    parser = JSONArrayStreamParser()
+
+    parsed = parser.feed(b'[{"a": 1}, {"b": tru}, {"c": 3}]')
+
+    assert parsed == [{"a": 1}, {"c": 3}]
+    assert parser.malformed == 1
+
+
+def test_text_accumulator_joins_fragments():
+    """Testa se o acumulador mantém comprimento e texto completo."""
+    accumulator = TextAccumulator()
+
+    accumulator.extend(["Lei ", "", "n.º ", "2/2024"])
+
+    assert len(accumulator) == len("Lei n.º 2/2024")
+    assert accumulator.getvalue() == "Lei n.º 2/2024"
@@ -0,0 +1,181 @@
+# backend/tests/core/test_tokens.py
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.core.exceptions import LLMQuotaExceededError
+from app.core.request_context import RequestLane, llm_request_context
+from app.core.tokens import TokenEstimator, TokenLedger, TokenQuotaConfig, TokenQuotaManager
+from app.models.base_llm import BaseLLM
+from app.schemas import LLMResponse
+
+
+def test_estimator_calibrates_against_provider_usage():
+    """
+    Testa se a estimativa converge para a razão caracteres/token
+    observada no usage real de cada modelo.
+    """
+    # Dado (Given): um modelo cujo texto tem ~3 caracteres por token.
+    estimator = TokenEstimator(default_chars_per_token=4.0, smoothing=0.5)
+    text = "Artigo 23.º da Lei do Trabalho: direito a férias remuneradas. " * 20
+
+    # Quando (When): o provedor reporta várias contagens reais.
+    before = estimator.estimate(text, "anthropic", "claude")
+    for _ in range(10):
+        estimator.calibrate("anthropic", "claude", len(text), len(text) // 3)
+
+    # Então (Then): a estimativa aproxima-se do real e outros modelos não mudam.
+    after = estimator.estimate(text, "anthropic", "claude")
+    assert abs(after - len(text) // 3) <= 2
+    assert before < after
+    assert estimator.chars_per_token("google", "gemini") == 4.0
+
+
+def test_quota_rejects_before_dispatch_and_settles_actual_usage():
+    """
+    Testa se a quota reserva a estimativa, rejeita requisições acima do
+    limite e liquida com o consumo real.
+    """
+    # Dado (Given): quota de 1000 tokens por utilizador.
+    quota = TokenQuotaManager(TokenQuotaConfig(tokens_per_window=1000, window_sec=60))
+    ledger = TokenLedger()
+
+    # Quando (When): duas requisições de 400 tokens estimados são reservadas.
+    assert quota.reserve("u1", 400)
+    assert quota.reserve("u1", 400)
+
+    # Então (Then): a terceira é rejeitada antes de chegar ao provedor.
+    with pytest.raises(LLMQuotaExceededError) as info:
+        quota.reserve("u1", 400)
+    assert info.value.retry_after is not None
+    assert quota.reserve("u2", 400)  # Outros utilizadores não são afetados
+
+    # Quando (When): as respostas reais consomem menos do que o estimado.
+    for _ in range(2):
+        quota.settle("u1", 400, 0.0, 150, 0.001)
+        ledger.record("anthropic", "claude", 100, 50, 0.001, user_id="u1", conversation_id="c1")
+
+    # Então (Then): a folga volta a permitir requisições e o ledger agrega.
+    assert quota.get_user_state("u1")["tokens"] == 300
+    assert quota.reserve("u1", 400)
+    usage = ledger.get_user_usage("u1")
+    assert usage.requests == 2 and usage.total_tokens == 300
+    assert ledger.get_metrics()["by_model"]["anthropic:claude"]["cost"] == 0.002
+
+
+class _VerboseLLM(BaseLLM):
+    """Cliente cujas respostas consomem muitos tokens de saída."""
+
+    calls = 0
+
+    @property
+    def provider(self) -> str:
+        return "teste-quota"
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        type(self).calls += 1
+        return LLMResponse(
+            content="resposta longa", provider=self.provider, model=self.model_name,
+            metadata={"input_tokens": 100, "output_tokens": 4500}
+        )
+
+    async def _stream_generate_impl(self, prompt, context="", system_prompt=None, params=None):
+        type(self).calls += 1
+        yield {"content": "resposta", "is_final": False}
+
+    async def _health_check_impl(self) -> bool:
+        return True
+
+    async def _get_model_info_impl(self):
+        return {}
+
+
+def test_generate_and_stream_reject_user_over_quota():
+    """
+    Testa se o utilizador do contexto da requisição é cobrado pelo
+    consumo real e se, esgotada a quota, generate e stream_generate
+    falham antes de chegar ao provedor.
+    """
+    async def scenario():
+        # Dado (Given): quota de 5000 tokens e uma resposta que consome 4600.
+        llm = _VerboseLLM("modelo-quota", max_retries=1, base_delay=0.0)
+        llm._session = object()
+        llm._ensure_session = lambda: asyncio.sleep(0)
+        errors = []
+
+        # Quando (When): o mesmo utilizador faz mais perguntas...
+        with llm_request_context(user_id="u1"):
+            await llm.generate("Quais são os direitos do trabalhador?")
+            with pytest.raises(LLMQuotaExceededError) as generate_error:
+                await llm.generate("E quantos dias de férias?")
+            with pytest.raises(LLMQuotaExceededError):
+                async for _ in llm.stream_generate("E o subsídio de férias?"):
+                    pass
+            errors.append(generate_error.value)
+        # ... e outro utilizador pergunta depois.
+        with llm_request_context(user_id="u2"):
+            await llm.generate("O que diz o artigo 23?")
+        return errors
+
+    quota = TokenQuotaManager(TokenQuotaConfig(tokens_per_window=5000, window_sec=60))
+    with patch("app.models.base_llm.token_quota", quota):
+        errors = asyncio.run(scenario())
+
+    # Então (Then): só as chamadas dentro da quota chegaram ao provedor.
+    assert errors[0].context["user_id"] == "u1"
+    assert quota.get_user_state("u1")["tokens"] == 4600
+    assert _VerboseLLM.calls == 2
+
+
+class _SlowVerboseLLM(_VerboseLLM):
+    """Cliente lento, para que as chamadas concorrentes se sobreponham."""
+
+    calls = 0
+
+    async def _generate_impl(self, prompt, context="", system_prompt=None, params=None) -> LLMResponse:
+        await asyncio.sleep(0.01)
+        return await super()._generate_impl(prompt, context, system_prompt, params)
+
+
+def test_concurrent_identical_calls_charge_each_user_separately():
+    """
+    Testa se chamadas idênticas concorrentes de utilizadores diferentes
+    não partilham o voo: cada um responde pela sua quota, ledger e faixa,
+    e só as do mesmo utilizador e faixa são coalescidas.
+    """
+    prompt = "Quais são os direitos do trabalhador?"
+
+    async def ask(llm, user_id, lane=RequestLane.INTERACTIVE):
+        with llm_request_context(lane, user_id=user_id):
+            return await llm.generate(prompt)
+
+    async def scenario():
+        # Dado (Given): "esgotado" sem quota e "novo" com a quota inteira.
+        llm = _SlowVerboseLLM("modelo-quota-voo", max_retries=1, base_delay=0.0)
+        llm._session = object()
+        llm._ensure_session = lambda: asyncio.sleep(0)
+
+        # Quando (When): os dois fazem a mesma pergunta ao mesmo tempo ("esgotado" primeiro),
+        # e "novo" repete-a na mesma faixa e numa faixa batch.
+        return await asyncio.gather(
+            ask(llm, "esgotado"), ask(llm, "novo"), ask(llm, "novo"),
+            ask(llm, "novo", RequestLane.BATCH),
+            return_exceptions=True
+        )
+
+    quota = TokenQuotaManager(TokenQuotaConfig(tokens_per_window=10_000, window_sec=60))
+    quota.reserve("esgotado", 9_500)
+    ledger = TokenLedger()
+    with patch("app.models.base_llm.token_quota", quota), patch("app.models.base_llm.token_ledger", ledger):
+        results = asyncio.run(scenario())
+
+    # Então (Then): só "esgotado" é recusado e "novo" paga os seus dois voos.
+    exhausted, fresh, coalesced, batch = results
+    assert isinstance(exhausted, LLMQuotaExceededError)
+    assert exhausted.context["user_id"] == "esgotado"
+    assert fresh.content == coalesced.content == batch.content == "resposta longa"
+    assert _SlowVerboseLLM.calls == 2
+    assert quota.get_user_state("novo")["tokens"] == 2 * 4600
+    assert ledger.get_user_usage("novo").requests == 2
+    assert ledger.get_user_usage("esgotado") is None
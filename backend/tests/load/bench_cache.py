@@ -0,0 +1,188 @@
+# backend/tests/load/bench_cache.py
+"""
+Micro-benchmark do AsyncInMemoryCache.
+
+Executa uma mistura de leituras e escritas (por defeito 80/20) com N
+corrotinas concorrentes e compara o cache com um único segmento e o modo
+particionado (shards). Mede também a latência máxima de leitura enquanto
+o cleanup varre um cache grande com metade das entradas expiradas e o
+custo por chave de leituras em leque (get em ciclo vs get_many), no L1 e
+com o L1 frio contra um Redis simulado com latência de rede.
+
+Uso:
+    cd backend && python -m tests.load.bench_cache [--ops 200000] [--keys 5000] [--shards 16]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List
+
+from app.core.cache import AsyncInMemoryCache
+from app.core.cache_tiered import InMemoryRedis, TieredCache
+
+VALUE = {"resposta": "Artigo 23.º da Lei do Trabalho: direito a férias remuneradas.", "confianca": 0.92}
+
+
+async def run_workload(
+    cache: AsyncInMemoryCache,
+    ops: int,
+    concurrency: int,
+    keys: int,
+    read_ratio: float,
+    seed: int = 42
+) -> float:
+    """Executa `ops` operações repartidas por `concurrency` corrotinas; retorna ops/s."""
+    per_worker = ops // concurrency
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        for _ in range(per_worker):
+            key = f"k{rng.randrange(keys)}"
+            if rng.random() < read_ratio:
+                await cache.get(key, namespace="bench")
+            else:
+                await cache.set(key, VALUE, namespace="bench")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return per_worker * concurrency / elapsed
+
+
+async def cleanup_stall(shards: int, entries: int) -> float:
+    """Latência máxima (ms) de `get` durante um cleanup_expired concorrente."""
+    cache = AsyncInMemoryCache(
+        ttl_sec=600, max_size=entries, enable_compression=False, shards=shards
+    )
+    for i in range(entries):
+        await cache.set(f"k{i}", i, ttl=0 if i % 2 else 600)
+
+    worst = 0.0
+    done = False
+
+    async def reader():
+        nonlocal worst
+        i = 0
+        while not done:
+            start = time.perf_counter()
+            await cache.get(f"k{i % entries}")
+            await asyncio.sleep(0)
+            worst = max(worst, time.perf_counter() - start)
+            i += 2
+
+    task = asyncio.create_task(reader())
+    await asyncio.sleep(0)
+    await cache.cleanup_expired()
+    done = True
+    await task
+    return worst * 1000
+
+
+async def fanout_cost(shards: int, fanout: int, rounds: int = 200) -> Dict[str, float]:
+    """Custo por chave (µs) de ler `fanout` chaves com get em ciclo e com get_many."""
+    cache = AsyncInMemoryCache(ttl_sec=600, max_size=fanout * 2, enable_compression=False, shards=shards)
+    keys = [f"artigo{i}" for i in range(fanout)]
+    await cache.set_many({key: VALUE for key in keys}, namespace="emb")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            await cache.get(key, namespace="emb")
+    loop_cost = (time.perf_counter() - start) / (rounds * fanout) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await cache.get_many(keys, namespace="emb")
+    batch_cost = (time.perf_counter() - start) / (rounds * fanout) * 1e6
+    return {"loop": loop_cost, "batch": batch_cost}
+
+
+async def fanout_l2_cost(fanout: int, latency_ms: float, rounds: int = 5) -> Dict[str, float]:
+    """Custo por chave (µs) de uma leitura em leque com L1 frio e L2 a `latency_ms`."""
+    redis = InMemoryRedis(latency_sec=latency_ms / 1000)
+    keys = [f"artigo{i}" for i in range(fanout)]
+    writer = TieredCache(AsyncInMemoryCache(ttl_sec=600, max_size=fanout * 2), redis)
+    await writer.set_many({key: VALUE for key in keys}, namespace="emb")
+
+    def cold_reader() -> TieredCache:
+        return TieredCache(AsyncInMemoryCache(ttl_sec=600, max_size=fanout * 2), redis)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        reader = cold_reader()
+        for key in keys:
+            await reader.get(key, namespace="emb")
+    loop_cost = (time.perf_counter() - start) / (rounds * fanout) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await cold_reader().get_many(keys, namespace="emb")
+    batch_cost = (time.perf_counter() - start) / (rounds * fanout) * 1e6
+    return {"loop": loop_cost, "batch": batch_cost}
+
+
+async def main(args: argparse.Namespace) -> None:
+    # Evitar que o logging domine a medição
+    logging.getLogger("app.core.cache").setLevel(logging.WARNING)
+
+    results: Dict[int, List[float]] = {}
+    for shards in (1, args.shards):
+        results[shards] = []
+        for concurrency in args.concurrency:
+            cache = AsyncInMemoryCache(
+                ttl_sec=600, max_size=args.max_size, enable_compression=False, shards=shards
+            )
+            throughput = await run_workload(
+                cache, args.ops, concurrency, args.keys, args.read_ratio
+            )
+            stats = await cache.get_stats()
+            results[shards].append(throughput)
+            print(
+                f"shards={shards:<3} concorrência={concurrency:<5} "
+                f"{throughput:>10.0f} ops/s  hit_rate={stats['hit_rate']:.1f}%  "
+                f"evictions={stats['evictions']}"
+            )
+
+    print()
+    for i, concurrency in enumerate(args.concurrency):
+        ratio = results[args.shards][i] / results[1][i]
+        print(f"concorrência={concurrency:<5} shards={args.shards} vs 1: {ratio:.2f}x")
+
+    print()
+    for shards in (1, args.shards):
+        stall = await cleanup_stall(shards, args.cleanup_entries)
+        print(
+            f"cleanup de {args.cleanup_entries} entradas, shards={shards:<3} "
+            f"latência máx. de get: {stall:.1f} ms"
+        )
+
+    print()
+    for shards in (1, args.shards):
+        cost = await fanout_cost(shards, args.fanout)
+        print(
+            f"leitura em leque de {args.fanout} chaves, shards={shards:<3} "
+            f"get: {cost['loop']:.2f} µs/chave  get_many: {cost['batch']:.2f} µs/chave  "
+            f"({cost['loop'] / cost['batch']:.1f}x)"
+        )
+    cost = await fanout_l2_cost(args.fanout, args.l2_latency_ms)
+    print(
+        f"leitura em leque de {args.fanout} chaves, L1 frio, L2 a {args.l2_latency_ms} ms "
+        f"get: {cost['loop']:.0f} µs/chave  get_many: {cost['batch']:.0f} µs/chave  "
+        f"({cost['loop'] / cost['batch']:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark do cache em memória")
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--max-size", type=int, default=4000)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--cleanup-entries", type=int, default=200000)
+    parser.add_argument("--fanout", type=int, default=100)
+    parser.add_argument("--l2-latency-ms", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 1000])
+    asyncio.run(main(parser.parse_args()))
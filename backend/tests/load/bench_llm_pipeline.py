@@ -0,0 +1,112 @@
+# backend/tests/load/bench_llm_pipeline.py
+"""
+Benchmark offline da camada de clientes LLM contra o servidor simulado.
+
+Inicia o MockLLMServer em processo, aponta ClaudeLLM/GeminiLLM para ele
+e mede throughput e latência do pipeline completo (cache, coalescência,
+escalonador, limite adaptativo, retry e parsing).
+
+Uso:
+    cd backend && python -m tests.load.bench_llm_pipeline --provider claude \
+        --requests 5000 --concurrency 200 --latency-ms 5 [--stream] [--error-rate 0.01]
+
+Com o servidor noutro processo (CPU separado do cliente):
+    python -m tests.load.mock_llm_server --port 8089 --latency-ms 5 --tokens-per-sec 0 &
+    python -m tests.load.bench_llm_pipeline --base-url http://127.0.0.1:8089
+"""
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+from typing import List, Optional
+
+import aiohttp
+
+from app.models.claude_llm import ClaudeLLM
+from app.models.gemini_llm import GeminiLLM
+from tests.load.mock_llm_server import MockLLMServer, MockServerConfig
+
+
+async def run(args: argparse.Namespace) -> None:
+    config = MockServerConfig(
+        latency_median_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec or None,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    server: Optional[MockLLMServer] = None
+    async with contextlib.AsyncExitStack() as stack:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            server = await stack.enter_async_context(MockLLMServer(config))
+            base_url = server.base_url
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            llm_class = ClaudeLLM if args.provider == "claude" else GeminiLLM
+            llm = llm_class(api_key="mock", base_url=base_url, session=session, base_delay=0.05)
+
+            latencies: List[float] = []
+            failures = 0
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(i: int) -> None:
+                nonlocal failures
+                # Prompts distintos: sem acertos de cache nem coalescência
+                prompt = f"Pergunta de carga número {i} sobre direito do trabalho"
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        if args.stream:
+                            async for chunk in llm.stream_generate(prompt):
+                                if chunk.get("error"):
+                                    raise RuntimeError(chunk["error"])
+                        else:
+                            await llm.generate(prompt)
+                        latencies.append(time.perf_counter() - start)
+                    except Exception:
+                        failures += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+    mode = "stream" if args.stream else "generate"
+    print(f"{args.provider}/{mode}: {args.requests} requisições, concorrência {args.concurrency}")
+    print(f"  throughput : {args.requests / elapsed:8.1f} req/s ({elapsed:.2f}s)")
+    print(f"  falhas     : {failures}")
+    if latencies:
+        print(
+            f"  latência ms: média {statistics.mean(latencies) * 1000:.1f} | "
+            f"p50 {pct(0.5):.1f} | p90 {pct(0.9):.1f} | p99 {pct(0.99):.1f}"
+        )
+    if server is not None:
+        print(f"  servidor   : {server.stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--provider", choices=("claude", "gemini"), default="claude")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--base-url", help="Servidor simulado externo (por omissão inicia um em processo)")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="0 = sem espera entre tokens")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# backend/tests/load/bench_stream_parsers.py
+"""
+Benchmark de throughput dos parsers de streaming (Claude SSE e Gemini JSON).
+
+Gera gravações sintéticas de vários megabytes no formato de cada provedor
+e compara o processamento linha-a-linha anterior com os parsers incrementais
+de app.core.streaming.
+
+Uso:
+    cd backend && python -m tests.load.bench_stream_parsers [--mb 8] [--chunk 8192]
+"""
+import argparse
+import json
+import time
+from typing import Callable, Iterator, List, Tuple
+
+from app.core.streaming import JSONArrayStreamParser, SSEParser, TextAccumulator
+
+FRAGMENT = "O artigo 35.º da Constituição da República de Moçambique estabelece a igualdade. "
+
+
+def record_claude_stream(target_bytes: int) -> bytes:
+    """Gera um stream SSE no formato da API Messages da Anthropic."""
+    events = [
+        b'event: message_start\ndata: {"type": "message_start", "message": {"usage": {"input_tokens": 120}}}\n\n'
+    ]
+    size = 0
+    while size < target_bytes:
+        payload = json.dumps(
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": FRAGMENT}},
+            ensure_ascii=False
+        )
+        event = f"event: content_block_delta\ndata: {payload}\n\n".encode("utf-8")
+        events.append(event)
+        size += len(event)
+    events.append(b'event: message_stop\ndata: {"type": "message_stop"}\n\n')
+    return b"".join(events)
+
+
+def record_gemini_stream(target_bytes: int) -> bytes:
+    """Gera um array JSON pretty-printed no formato streamGenerateContent."""
+    element = {"candidates": [{"content": {"parts": [{"text": FRAGMENT}], "role": "model"}, "index": 0}]}
+    element_size = len(json.dumps(element, indent=2, ensure_ascii=False).encode("utf-8"))
+    count = max(1, target_bytes // element_size)
+    elements = [element] * count
+    return json.dumps(elements, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def split_chunks(data: bytes, chunk_size: int) -> List[bytes]:
+    """Simula `response.content.iter_any()` (blocos de rede)."""
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def iter_lines(chunks: List[bytes]) -> Iterator[bytes]:
+    """Leitura linha-a-linha sobre blocos, como `async for line in response.content`."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            yield bytes(buffer[start:end + 1])
+            start = end + 1
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+def legacy_claude(chunks: List[bytes]) -> Tuple[int, int]:
+    """Processamento anterior: decode + json.loads por linha e concatenação."""
+    accumulated = ""
+    deltas = 0
+    for line in iter_lines(chunks):
+        line = line.decode("utf-8").strip()
+        if not line or not line.startswith("data: "):
+            continue
+        try:
+            event = json.loads(line[6:])
+        except json.JSONDecodeError:
+            continue
+        if event.get("type") == "content_block_delta":
+            accumulated += event["delta"].get("text", "")
+            deltas += 1
+    return deltas, len(accumulated)
+
+
+def incremental_claude(chunks: List[bytes]) -> Tuple[int, int]:
+    """Parser SSE incremental com acumulação em lista."""
+    parser = SSEParser()
+    accumulated = TextAccumulator()
+    deltas = 0
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            data = event.json()
+            if data.get("type") == "content_block_delta":
+                accumulated.append(data["delta"].get("text", ""))
+                deltas += 1
+    return deltas, len(accumulated.getvalue())
+
+
+def legacy_gemini(chunks: List[bytes]) -> Tuple[int, int]:
+    """Processamento anterior: um objeto JSON por linha (descarta o resto)."""
+    accumulated = ""
+    parts = 0
+    for line in iter_lines(chunks):
+        line = line.decode("utf-8").strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        candidates = data.get("candidates", []) if isinstance(data, dict) else []
+        if candidates:
+            accumulated += candidates[0]["content"]["parts"][0].get("text", "")
+            parts += 1
+    return parts, len(accumulated)
+
+
+def incremental_gemini(chunks: List[bytes]) -> Tuple[int, int]:
+    """Parser incremental de array JSON com acumulação em lista."""
+    parser = JSONArrayStreamParser()
+    accumulated = TextAccumulator()
+    parts = 0
+    for chunk in chunks:
+        for data in parser.feed(chunk):
+            accumulated.append(data["candidates"][0]["content"]["parts"][0].get("text", ""))
+            parts += 1
+    return parts, len(accumulated.getvalue())
+
+
+def run(
+    name: str,
+    data: bytes,
+    parse: Callable[[List[bytes]], Tuple[int, int]],
+    chunk_size: int,
+    repeats: int
+) -> None:
+    """Executa e imprime o melhor tempo de `repeats` execuções."""
+    pieces = split_chunks(data, chunk_size)
+    best = float("inf")
+    result = (0, 0)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = parse(pieces)
+        best = min(best, time.perf_counter() - start)
+    mb = len(data) / (1024 * 1024)
+    print(
+        f"{name:<28} {mb:6.1f} MB  {best * 1000:9.1f} ms  {mb / best:8.1f} MB/s  "
+        f"fragmentos={result[0]:<7} caracteres={result[1]}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=8.0, help="Tamanho de cada gravação em MB")
+    parser.add_argument("--chunk", type=int, default=8192, help="Tamanho dos blocos de rede")
+    parser.add_argument("--repeats", type=int, default=3, help="Execuções por cenário")
+    args = parser.parse_args()
+
+    target = int(args.mb * 1024 * 1024)
+    claude = record_claude_stream(target)
+    gemini = record_gemini_stream(target)
+
+    run("claude legado (readline)", claude, legacy_claude, args.chunk, args.repeats)
+    run("claude SSEParser", claude, incremental_claude, args.chunk, args.repeats)
+    run("gemini legado (readline)", gemini, legacy_gemini, args.chunk, args.repeats)
+    run("gemini JSONArrayStreamParser", gemini, incremental_gemini, args.chunk, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# backend/tests/load/mock_llm_server.py
+"""
+Servidor local que simula as APIs da Anthropic e do Google Gemini.
+
+Permite testes de carga e de latência de ClaudeLLM, GeminiLLM, LLMPool e
+consenso sem consumir quota real. Basta apontar anthropic_base_url /
+gemini_base_url (ou o argumento base_url dos clientes) para o servidor.
+
+Endpoints:
+    POST /v1/messages                                  (JSON e SSE)
+    POST /v1beta/models/{modelo}:generateContent
+    POST /v1beta/models/{modelo}:streamGenerateContent (array JSON em streaming)
+    POST /v1beta/cachedContents
+    GET  /_mock/stats                                  (contadores do servidor)
+
+Uso em processo:
+    async with MockLLMServer(MockServerConfig(latency_median_ms=50)) as server:
+        llm = ClaudeLLM(api_key="mock", base_url=server.base_url)
+
+Uso como subprocesso:
+    cd backend && python -m tests.load.mock_llm_server --port 8089 --latency-ms 200 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+CANNED_ANSWERS = [
+    "Nos termos do artigo 35.º da Constituição da República de Moçambique, todos os "
+    "cidadãos são iguais perante a lei, gozam dos mesmos direitos e estão sujeitos aos "
+    "mesmos deveres.",
+    "A Lei do Trabalho prevê que o contrato de trabalho por tempo indeterminado só pode "
+    "cessar por justa causa, mediante processo disciplinar e com direito de defesa.",
+    "O Código Civil estabelece que a capacidade de exercício de direitos se adquire com "
+    "a maioridade, salvo as exceções previstas na lei.",
+    "Segundo a Lei de Terras, a terra é propriedade do Estado e não pode ser vendida, "
+    "alienada, hipotecada ou penhorada; o direito de uso e aproveitamento pode ser adquirido.",
+]
+
+
+@dataclass
+class MockServerConfig:
+    """Comportamento simulado do servidor."""
+    latency_median_ms: float = 200.0  # Latência até ao primeiro byte (lognormal)
+    latency_sigma: float = 0.5  # Dispersão da lognormal (0 = latência fixa)
+    tokens_per_sec: Optional[float] = 200.0  # Ritmo do streaming (None = sem espera)
+    answer_tokens: int = 120  # Tamanho máximo das respostas
+    error_rate: float = 0.0  # Fração de respostas 500/529
+    rate_limit_rate: float = 0.0  # Fração de respostas 429
+    retry_after_sec: float = 1.0
+    seed: Optional[int] = 42
+
+
+class MockLLMServer:
+    """Servidor aiohttp com as APIs simuladas dos provedores."""
+
+    def __init__(self, config: Optional[MockServerConfig] = None):
+        self.config = config or MockServerConfig()
+        self._random = random.Random(self.config.seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "streams": 0,
+            "errors_injected": 0,
+            "rate_limited": 0,
+            "output_tokens": 0,
+        }
+        self.app = self._build_app()
+
+    def _build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/messages", self._anthropic_messages)
+        app.router.add_post("/v1beta/models/{model_action}", self._gemini_generate)
+        app.router.add_post("/v1beta/cachedContents", self._gemini_cached_contents)
+        app.router.add_get("/_mock/stats", self._stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Inicia o servidor em processo e retorna o URL base."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "MockLLMServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    # Comportamento simulado
+    def _sample_latency(self) -> float:
+        config = self.config
+        if config.latency_median_ms <= 0:
+            return 0.0
+        sample = self._random.lognormvariate(math.log(config.latency_median_ms), config.latency_sigma)
+        return sample / 1000.0
+
+    def _injected_failure(self) -> Optional[web.Response]:
+        """Resposta de erro injetada (ou None)."""
+        roll = self._random.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return web.json_response(
+                {"error": {"type": "rate_limit_error", "message": "Mock rate limit"}},
+                status=429,
+                headers={"retry-after": str(self.config.retry_after_sec)},
+            )
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats["errors_injected"] += 1
+            status = self._random.choice((500, 529))
+            return web.json_response(
+                {"error": {"type": "api_error", "message": "Mock server error"}}, status=status
+            )
+        return None
+
+    def _answer(self, prompt: str, max_tokens: Optional[int]) -> List[str]:
+        """Resposta determinística para o prompt, em tokens (palavras)."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = CANNED_ANSWERS[digest[0] % len(CANNED_ANSWERS)].split()
+        limit = min(self.config.answer_tokens, max_tokens or self.config.answer_tokens)
+        tokens = [words[i % len(words)] for i in range(limit)]
+        return [token if i == 0 else f" {token}" for i, token in enumerate(tokens)]
+
+    async def _stream_pause(self, tokens: int) -> None:
+        if self.config.tokens_per_sec:
+            await asyncio.sleep(tokens / self.config.tokens_per_sec)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+    # Anthropic
+    @staticmethod
+    def _anthropic_prompt(body: Dict[str, Any]) -> Tuple[str, str]:
+        """Extrai (system, texto do utilizador) de um pedido Messages."""
+        system = body.get("system", "")
+        if isinstance(system, list):
+            system = "".join(block.get("text", "") for block in system)
+        user_text = []
+        for message in body.get("messages", []):
+            content = message.get("content", "")
+            if isinstance(content, list):
+                content = "".join(block.get("text", "") for block in content)
+            user_text.append(content)
+        return system, "\n".join(user_text)
+
+    async def _anthropic_messages(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(self._sample_latency())
+
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        system, prompt = self._anthropic_prompt(body)
+        tokens = self._answer(prompt, body.get("max_tokens"))
+        input_tokens = self._estimate_tokens(system + prompt)
+        self.stats["output_tokens"] += len(tokens)
+        message_id = "msg_mock_" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        model = body.get("model", "claude-mock")
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": "".join(tokens)}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": input_tokens, "output_tokens": len(tokens)},
+            })
+
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(event: str, data: Dict[str, Any]) -> None:
+            await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        await send("message_start", {
+            "type": "message_start",
+            "message": {"id": message_id, "model": model, "usage": {"input_tokens": input_tokens, "output_tokens": 1}},
+        })
+        await send("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for token in tokens:
+            await self._stream_pause(1)
+            await send("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}
+            })
+        await send("content_block_stop", {"type": "content_block_stop", "index": 0})
+        await send("message_delta", {
+            "type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": len(tokens)}
+        })
+        await send("message_stop", {"type": "message_stop"})
+        await response.write_eof()
+        return response
+
+    # Gemini
+    async def _gemini_generate(self, request: web.Request) -> web.StreamResponse:
+        model, _, action = request.match_info["model_action"].partition(":")
+        if action not in ("generateContent", "streamGenerateContent"):
+            return web.json_response({"error": {"message": f"Ação desconhecida: {action}"}}, status=404)
+
+        self.stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(self._sample_latency())
+
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        max_tokens = body.get("generationConfig", {}).get("maxOutputTokens")
+        tokens = self._answer(prompt, max_tokens)
+        prompt_tokens = self._estimate_tokens(prompt)
+        cached_tokens = 4096 if body.get("cachedContent") else 0
+        self.stats["output_tokens"] += len(tokens)
+
+        def usage(completion_tokens: int) -> Dict[str, int]:
+            data = {
+                "promptTokenCount": prompt_tokens + cached_tokens,
+                "candidatesTokenCount": completion_tokens,
+                "totalTokenCount": prompt_tokens + cached_tokens + completion_tokens,
+            }
+            if cached_tokens:
+                data["cachedContentTokenCount"] = cached_tokens
+            return data
+
+        def candidate(text: str, finish_reason: Optional[str]) -> Dict[str, Any]:
+            data = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+            if finish_reason:
+                data["finishReason"] = finish_reason
+            return data
+
+        if action == "generateContent":
+            return web.json_response({
+                "candidates": [candidate("".join(tokens), "STOP")],
+                "usageMetadata": usage(len(tokens)),
+                "modelVersion": model,
+            })
+
+        # Sem alt=sse o Gemini devolve um array JSON pretty-printed em blocos
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        chunk_size = 8
+        for start in range(0, len(tokens), chunk_size):
+            piece = tokens[start:start + chunk_size]
+            await self._stream_pause(len(piece))
+            is_last = start + chunk_size >= len(tokens)
+            element = {"candidates": [candidate("".join(piece), "STOP" if is_last else None)]}
+            if is_last:
+                element["usageMetadata"] = usage(len(tokens))
+            prefix = "[" if start == 0 else ",\r\n"
+            await response.write((prefix + json.dumps(element, ensure_ascii=False, indent=2)).encode("utf-8"))
+        await response.write(b"]" if tokens else b"[]")
+        await response.write_eof()
+        return response
+
+    async def _gemini_cached_contents(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        digest = hashlib.sha256(json.dumps(body.get("contents"), sort_keys=True).encode("utf-8")).hexdigest()
+        return web.json_response({
+            "name": f"cachedContents/mock-{digest[:12]}",
+            "model": body.get("model"),
+            "usageMetadata": {"totalTokenCount": 4096},
+        })
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Latência mediana até ao primeiro byte")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Dispersão da lognormal")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Ritmo do streaming (0 = sem espera)")
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server = MockLLMServer(MockServerConfig(
+        latency_median_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec or None,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    ))
+    print(f"Mock LLM em http://{args.host}:{args.port}")
+    web.run_app(server.app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()